@@ -1,21 +1,30 @@
-from typing import List, Tuple, Dict, Optional, Union
+from typing import List, Tuple, Dict, Optional, Union, Iterable, Iterator
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import hashlib
+import itertools
 import os
 import pathlib
+import threading
 import pandas as pd
 import boto3
 import semver
 import tqdm
 import re
-import json
 import warnings
 from botocore import UNSIGNED
+from botocore.exceptions import BotoCoreError
+from urllib3.exceptions import HTTPError
 from botocore.client import Config
 from allensdk.internal.core.lims_utilities import safe_system_path
 from allensdk.api.cloud_cache.manifest import Manifest
 from allensdk.api.cloud_cache.file_attributes import CacheFileAttributes
+from allensdk.api.cloud_cache.downloaded_data_index import (
+    DownloadedDataIndex)
 from allensdk.api.cloud_cache.utils import file_hash_from_path
+from allensdk.api.cloud_cache.utils import file_hasher_from_path
 from allensdk.api.cloud_cache.utils import bucket_name_from_url
 from allensdk.api.cloud_cache.utils import relative_path_from_url
 
@@ -369,17 +378,26 @@ class CloudCacheBase(BasicLocalCache):
         # was emitted
         self._manifest_last_warned_on = None
 
+        # serializes access to the record of downloaded files (and the
+        # symlinks made from it) when files are downloaded concurrently
+        self._downloads_lock = threading.RLock()
+
         c_path = pathlib.Path(self._cache_dir)
 
         # self._manifest_last_used contains the name of the manifest
         # last loaded from this cache dir (if applicable)
         self._manifest_last_used = c_path / '_manifest_last_used.txt'
 
-        # self._downloaded_data_path is where we will keep a JSONized
-        # dict mapping paths to downloaded files to their file_hashes;
+        # self._downloaded_data_path is the log backing the index
+        # mapping paths to downloaded files to their file_hashes;
         # this will be used when determining if a downloaded file
-        # can instead be a symlink
-        self._downloaded_data_path = c_path / '_downloaded_data.json'
+        # can instead be a symlink. Caches written by earlier versions
+        # kept this mapping as a single JSON dict, which is migrated
+        # to the log the first time the cache directory is opened.
+        self._downloaded_data_path = c_path / '_downloaded_data.jsonl'
+        self._downloaded_data_index = DownloadedDataIndex(
+            self._downloaded_data_path,
+            legacy_json_path=c_path / '_downloaded_data.json')
 
         # if the local manifest is missing but there are
         # data files in cache_dir, emit a warning
@@ -390,7 +408,9 @@ class CloudCacheBase(BasicLocalCache):
             has_files = False
             for fname in file_list:
                 if fname.is_file():
-                    if 'json' not in fname.name:
+                    # interrupted downloads are not data files
+                    if 'json' not in fname.name and \
+                            fname.suffix != '.partial':
                         has_files = True
                         break
             if has_files:
@@ -424,6 +444,9 @@ class CloudCacheBase(BasicLocalCache):
         for file_name in file_iterator:
             if file_name.is_file():
                 if 'json' not in file_name.name:
+                    if file_name.suffix == '.partial':
+                        # an interrupted download
+                        continue
                     if file_name != self._manifest_last_used:
                         files_to_hash.add(file_name.resolve())
 
@@ -435,8 +458,7 @@ class CloudCacheBase(BasicLocalCache):
                 hsh = file_hash_from_path(local_path)
                 lookup[str(local_path.absolute())] = hsh
 
-        with open(self._downloaded_data_path, 'w') as out_file:
-            out_file.write(json.dumps(lookup, indent=2, sort_keys=True))
+        self._downloaded_data_index.replace(lookup)
 
     def _warn_of_outdated_manifest(self, manifest_name: str) -> None:
         """
@@ -634,24 +656,9 @@ class CloudCacheBase(BasicLocalCache):
             # This file does not exist; there is nothing to do
             return None
 
-        if self._downloaded_data_path.exists():
-            with open(self._downloaded_data_path, 'rb') as in_file:
-                downloaded_data = json.load(in_file)
-        else:
-            downloaded_data = {}
-
+        # the index does nothing if this file has already been logged
         abs_path = str(file_attributes.local_path.resolve())
-        if abs_path in downloaded_data:
-            if downloaded_data[abs_path] == file_attributes.file_hash:
-                # this file has already been logged;
-                # there is nothing to do
-                return None
-
-        downloaded_data[abs_path] = file_attributes.file_hash
-        with open(self._downloaded_data_path, 'w') as out_file:
-            out_file.write(json.dumps(downloaded_data,
-                                      indent=2,
-                                      sort_keys=True))
+        self._downloaded_data_index.add(abs_path, file_attributes.file_hash)
         return None
 
     def _check_for_identical_copy(self,
@@ -675,33 +682,27 @@ class CloudCacheBase(BasicLocalCache):
         -------
         bool
         """
-        if not self._downloaded_data_path.exists():
-            return False
-
-        with open(self._downloaded_data_path, 'rb') as in_file:
-            available_files = json.load(in_file)
-
-        matched_path = None
-        for abs_path in available_files:
-            if available_files[abs_path] == file_attributes.file_hash:
-                matched_path = pathlib.Path(abs_path)
+        with self._downloads_lock:
+            candidates = self._downloaded_data_index.paths_for_hash(
+                file_attributes.file_hash)
 
+            matched_path = None
+            for candidate in candidates:
                 # check that the file still exists,
                 # in case someone accidentally deleted
                 # the file at the root of a symlink
-                if matched_path.is_file():
+                if candidate.is_file():
+                    matched_path = candidate
                     break
-                else:
-                    matched_path = None
 
-        if matched_path is None:
-            return False
+            if matched_path is None:
+                return False
 
-        local_parent = file_attributes.local_path.parent.resolve()
-        if not local_parent.exists():
-            os.makedirs(local_parent)
+            local_parent = file_attributes.local_path.parent.resolve()
+            if not local_parent.exists():
+                os.makedirs(local_parent)
 
-        file_attributes.local_path.symlink_to(matched_path.resolve())
+            file_attributes.local_path.symlink_to(matched_path.resolve())
         return True
 
     def _file_exists(self, file_attributes: CacheFileAttributes) -> bool:
@@ -769,6 +770,79 @@ class CloudCacheBase(BasicLocalCache):
             self._update_list_of_downloads(file_attributes)
         return file_attributes.local_path
 
+    def download_data_many(self,
+                           file_ids: Iterable,
+                           max_workers: int = 8) -> Dict:
+        """
+        Return the local paths to many data files, downloading the files
+        that are missing with up to max_workers concurrent transfers
+
+        Parameters
+        ----------
+        file_ids: Iterable
+            The unique identifiers of the files to be accessed
+
+        max_workers: int
+            The maximum number of files downloaded at the same time
+
+        Returns
+        -------
+        Dict
+            Maps each file_id to a pathlib.Path indicating where the
+            file is stored on the local system
+
+        Raises
+        ------
+        RuntimeError
+            If any of the files cannot be downloaded
+        """
+        all_attributes = {file_id: self.data_path(file_id)['file_attributes']
+                          for file_id in file_ids}
+
+        # files with identical contents are only transferred once; the
+        # others are then symlinked to the first copy
+        first_copies = dict()
+        duplicates = []
+        for file_id, file_attributes in all_attributes.items():
+            if file_attributes.file_hash in first_copies:
+                duplicates.append(file_attributes)
+            else:
+                first_copies[file_attributes.file_hash] = file_attributes
+
+        def _download(file_attributes):
+            if self._download_file(file_attributes):
+                self._update_list_of_downloads(file_attributes)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # consume the results so that any exception is raised here
+            list(executor.map(_download, first_copies.values()))
+
+        for file_attributes in duplicates:
+            _download(file_attributes)
+
+        return {file_id: file_attributes.local_path
+                for file_id, file_attributes in all_attributes.items()}
+
+    def prefetch(self,
+                 file_ids: Optional[Iterable] = None,
+                 max_workers: int = 8) -> None:
+        """
+        Download data files ahead of time, with up to max_workers
+        concurrent transfers
+
+        Parameters
+        ----------
+        file_ids: Optional[Iterable]
+            The unique identifiers of the files to download. If None,
+            every data file in the currently loaded manifest is downloaded.
+
+        max_workers: int
+            The maximum number of files downloaded at the same time
+        """
+        if file_ids is None:
+            file_ids = self._manifest.file_id_values
+        self.download_data_many(file_ids, max_workers=max_workers)
+
     def download_metadata(self, fname: str) -> pathlib.Path:
         """
         Return the local path to a metadata file, downloading the
@@ -1041,13 +1115,29 @@ class S3CloudCache(CloudCacheBase):
                          ui_class_name=ui_class_name)
 
     _s3_client = None
+    _s3_client_lock = threading.Lock()
+
+    # size of the connection pool shared by every thread using s3_client
+    max_pool_connections = 64
+
+    # objects at least this large are fetched as concurrent ranged GETs
+    # of multipart_chunksize bytes, using up to max_part_workers threads
+    multipart_threshold = 64 * 1024 * 1024
+    multipart_chunksize = 16 * 1024 * 1024
+    max_part_workers = 8
 
     @property
     def s3_client(self):
+        # boto3 clients are thread safe once created, but creating them is
+        # not; make sure concurrent downloads share a single client
         if self._s3_client is None:
-            s3_config = Config(signature_version=UNSIGNED)
-            self._s3_client = boto3.client('s3',
-                                           config=s3_config)
+            with self._s3_client_lock:
+                if self._s3_client is None:
+                    s3_config = Config(
+                        signature_version=UNSIGNED,
+                        max_pool_connections=self.max_pool_connections)
+                    self._s3_client = boto3.client('s3',
+                                                   config=s3_config)
         return self._s3_client
 
     def _list_all_manifests(self) -> list:
@@ -1144,46 +1234,162 @@ class S3CloudCache(CloudCacheBase):
 
         pbar = None
         if not self._file_exists(file_attributes):
-            response = self.s3_client.list_object_versions(Bucket=bucket_name,
-                                                           Prefix=str(obj_key))
-            object_info = [i for i in response["Versions"]
-                           if i["VersionId"] == version_id][0]
-            pbar = tqdm.tqdm(desc=object_info["Key"].split("/")[-1],
-                             total=object_info["Size"],
+            object_info = self.s3_client.head_object(Bucket=bucket_name,
+                                                     Key=str(obj_key),
+                                                     VersionId=version_id)
+            object_size = object_info['ContentLength']
+            pbar = tqdm.tqdm(desc=str(obj_key).split("/")[-1],
+                             total=object_size,
                              unit_scale=True,
                              unit_divisor=1000.,
                              unit="MB")
 
+        # the object is streamed into partial_path, hashing it as it is
+        # written; if the transfer is interrupted, the next attempt
+        # resumes from the end of partial_path
+        # (if local_path is a symlink whose target was removed, the target
+        # is downloaded so that the symlink is preserved)
+        local_path = pathlib.Path(os.path.realpath(local_path))
+        os.makedirs(local_path.parent, exist_ok=True)
+        partial_path = local_path.with_name(f'{local_path.name}.partial')
+        hasher = None
+        hashed_size = 0
+
         while not self._file_exists(file_attributes):
             was_downloaded = True
-            response = self.s3_client.get_object(Bucket=bucket_name,
-                                                 Key=str(obj_key),
-                                                 VersionId=version_id)
-
-            if 'Body' in response:
-                with open(local_path, 'wb') as out_file:
-                    for chunk in response['Body'].iter_chunks():
-                        out_file.write(chunk)
-                        pbar.update(len(chunk))
-
-            # Verify the hash of the downloaded file
-            full_path = file_attributes.local_path.resolve()
-            test_checksum = file_hash_from_path(full_path)
-            if test_checksum != file_attributes.file_hash:
-                file_attributes.local_path.exists()
-                file_attributes.local_path.unlink()
 
             n_iter += 1
             if n_iter > max_iter:
                 pbar.close()
                 raise RuntimeError("Could not download\n"
                                    f"{file_attributes}\n"
-                                   "In {max_iter} iterations")
+                                   f"In {max_iter} iterations")
+
+            if not partial_path.is_file():
+                hasher = None
+            elif hasher is None:
+                # left over from an earlier session; hash what is there
+                hasher = file_hasher_from_path(partial_path)
+                hashed_size = partial_path.stat().st_size
+                pbar.update(hashed_size)
+
+            if hasher is None:
+                partial_path.write_bytes(b'')
+                hasher = hashlib.blake2b()
+                hashed_size = 0
+            else:
+                # discard anything written past the hashed bytes
+                os.truncate(partial_path, hashed_size)
+
+            if hashed_size > object_size:
+                partial_path.unlink()
+                pbar.reset()
+                hasher = None
+                continue
+
+            try:
+                with open(partial_path, 'ab') as out_file:
+                    for chunk in self._iter_object_chunks(
+                            bucket_name=bucket_name,
+                            obj_key=str(obj_key),
+                            version_id=version_id,
+                            start=hashed_size,
+                            object_size=object_size):
+                        out_file.write(chunk)
+                        hasher.update(chunk)
+                        hashed_size += len(chunk)
+                        pbar.update(len(chunk))
+            except (BotoCoreError, ConnectionError, HTTPError):
+                # keep what was received and resume from there
+                continue
+
+            # Verify the hash of the downloaded file
+            if hasher.hexdigest() == file_attributes.file_hash:
+                os.replace(partial_path, local_path)
+            else:
+                partial_path.unlink()
+                pbar.reset()
+                hasher = None
+
         if pbar is not None:
             pbar.close()
 
         return was_downloaded
 
+    def _iter_object_chunks(self,
+                            bucket_name: str,
+                            obj_key: str,
+                            version_id: str,
+                            start: int,
+                            object_size: int) -> Iterator[bytes]:
+        """
+        Yield, in order, the bytes of one version of an S3 object from
+        the offset start to its end.
+
+        If at least multipart_threshold bytes remain, they are fetched as
+        concurrent ranged GETs of multipart_chunksize bytes, with at most
+        max_part_workers parts held in memory at a time.
+
+        Parameters
+        ----------
+        bucket_name: str
+            The bucket containing the object
+
+        obj_key: str
+            The key of the object within the bucket
+
+        version_id: str
+            The version of the object to download
+
+        start: int
+            The offset of the first byte to yield
+
+        object_size: int
+            The size of the object in bytes
+        """
+        if start >= object_size:
+            return
+
+        if object_size - start < self.multipart_threshold:
+            kwargs = dict()
+            if start > 0:
+                kwargs['Range'] = f'bytes={start}-'
+            response = self.s3_client.get_object(Bucket=bucket_name,
+                                                 Key=obj_key,
+                                                 VersionId=version_id,
+                                                 **kwargs)
+            if 'Body' in response:
+                yield from response['Body'].iter_chunks()
+            return
+
+        def _download_part(part_start):
+            stop = min(part_start + self.multipart_chunksize,
+                       object_size) - 1
+            response = self.s3_client.get_object(
+                Bucket=bucket_name,
+                Key=obj_key,
+                VersionId=version_id,
+                Range=f'bytes={part_start}-{stop}')
+            return response['Body'].read()
+
+        part_starts = iter(range(start, object_size,
+                                 self.multipart_chunksize))
+        with ThreadPoolExecutor(max_workers=self.max_part_workers) as executor:
+            pending = deque(executor.submit(_download_part, part_start)
+                            for part_start in itertools.islice(
+                                part_starts, self.max_part_workers))
+            try:
+                while len(pending) > 0:
+                    data = pending.popleft().result()
+                    part_start = next(part_starts, None)
+                    if part_start is not None:
+                        pending.append(
+                            executor.submit(_download_part, part_start))
+                    yield data
+            finally:
+                for future in pending:
+                    future.cancel()
+
 
 class LocalCache(CloudCacheBase):
     """A class to handle accessing of data that has already been downloaded
@@ -0,0 +1,245 @@
+from typing import Dict, List, Optional, Union
+import json
+import os
+import pathlib
+import threading
+
+
+class DownloadedDataIndex(object):
+    """
+    A persistent index mapping the absolute paths of downloaded files to
+    their file hashes (and file hashes back to the paths holding them).
+
+    The index is kept in memory and backed by an append-only log in which
+    each line is a JSON record {"path": ..., "file_hash": ...}; later
+    records supersede earlier records for the same path. Recording a
+    download therefore appends one line rather than rewriting the whole
+    index, and looking up a file hash is a dict access rather than a scan
+    of every downloaded file.
+
+    Records appended to the log by other processes sharing the cache
+    directory are picked up incrementally by reading only the bytes
+    added since the log was last read.
+
+    Parameters
+    ----------
+    log_path: Union[str, pathlib.Path]
+        The path to the append-only log backing the index
+
+    legacy_json_path: Optional[Union[str, pathlib.Path]]
+        The path to a JSON file holding a single dict mapping absolute
+        paths to file hashes (the format used by earlier versions of the
+        cache). If log_path does not exist but this file does, its
+        contents are copied to log_path. The JSON file is not modified.
+    """
+
+    # rewrite the log once it holds this many superseded records
+    _max_stale_records = 10000
+
+    def __init__(self,
+                 log_path: Union[str, pathlib.Path],
+                 legacy_json_path: Optional[Union[str, pathlib.Path]] = None):
+        self._log_path = pathlib.Path(log_path)
+        self._lock = threading.RLock()
+        self._reset()
+
+        if legacy_json_path is not None:
+            legacy_json_path = pathlib.Path(legacy_json_path)
+            if not self._log_path.exists():
+                self._migrate(legacy_json_path)
+
+        self._refresh()
+
+    @property
+    def log_path(self) -> pathlib.Path:
+        return self._log_path
+
+    def _reset(self) -> None:
+        """
+        Forget everything read from the log
+        """
+        self._path_to_hash: Dict[str, str] = dict()
+
+        # dicts are used as insertion-ordered sets of paths
+        self._hash_to_paths: Dict[str, Dict[str, None]] = dict()
+
+        self._n_records = 0
+        self._offset = 0
+        self._log_id = None
+
+    def _migrate(self, legacy_json_path: pathlib.Path) -> None:
+        """
+        Copy a legacy JSON dict of path->file_hash into the log.
+
+        The JSON file is left in place for earlier versions of the cache
+        sharing the same directory. The log is only ever created by the
+        atomic replace in _write_log, so a concurrent migration by
+        another process produces the same complete log.
+        """
+        try:
+            with open(legacy_json_path, 'rb') as in_file:
+                legacy_data = json.load(in_file)
+        except FileNotFoundError:
+            # removed since it was found; nothing to migrate
+            return
+        except json.JSONDecodeError:
+            legacy_data = dict()
+
+        if not isinstance(legacy_data, dict):
+            legacy_data = dict()
+        self._write_log(legacy_data)
+
+    def _write_log(self, path_to_hash: Dict[str, str]) -> None:
+        """
+        Atomically replace the log with one record per entry
+        in path_to_hash
+        """
+        tmp_path = self._log_path.with_name(
+            f'{self._log_path.name}.{os.getpid()}.'
+            f'{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w') as out_file:
+            for path, file_hash in path_to_hash.items():
+                out_file.write(_format_record(path, file_hash))
+        os.replace(tmp_path, self._log_path)
+
+    def _set(self, path: str, file_hash: str) -> None:
+        """
+        Record path->file_hash in memory only
+        """
+        old_hash = self._path_to_hash.get(path)
+        if old_hash is not None:
+            old_paths = self._hash_to_paths[old_hash]
+            old_paths.pop(path, None)
+            if len(old_paths) == 0:
+                self._hash_to_paths.pop(old_hash)
+        self._path_to_hash[path] = file_hash
+        self._hash_to_paths.setdefault(file_hash, dict())[path] = None
+
+    def _refresh(self) -> None:
+        """
+        Read any records appended to the log since it was last read.
+        If the log has been replaced or removed, re-read it from scratch.
+        """
+        try:
+            stat = os.stat(self._log_path)
+        except FileNotFoundError:
+            self._reset()
+            return
+
+        log_id = (stat.st_dev, stat.st_ino)
+        if log_id != self._log_id or stat.st_size < self._offset:
+            self._reset()
+            self._log_id = log_id
+
+        if stat.st_size == self._offset:
+            return
+
+        with open(self._log_path, 'rb') as in_file:
+            in_file.seek(self._offset)
+            new_data = in_file.read()
+
+        # only consume complete lines; a partially written record
+        # will be read once its writer finishes it
+        last_newline = new_data.rfind(b'\n')
+        if last_newline < 0:
+            return
+        self._offset += last_newline + 1
+
+        for line in new_data[:last_newline].splitlines():
+            try:
+                record = json.loads(line)
+                path = record['path']
+                file_hash = record['file_hash']
+            except (ValueError, KeyError, TypeError):
+                # skip records that were corrupted
+                continue
+            self._set(path, file_hash)
+            self._n_records += 1
+
+    def add(self, path: Union[str, pathlib.Path], file_hash: str) -> None:
+        """
+        Record that the file at path has the hash file_hash
+
+        Parameters
+        ----------
+        path: Union[str, pathlib.Path]
+            The absolute path to the file
+
+        file_hash: str
+            The (hexadecimal) hash of the file
+        """
+        path = str(path)
+        with self._lock:
+            self._refresh()
+            if self._path_to_hash.get(path) == file_hash:
+                return
+
+            with open(self._log_path, 'a') as out_file:
+                out_file.write(_format_record(path, file_hash))
+
+            # read back the new record along with anything appended
+            # concurrently by another process
+            self._refresh()
+            if self._path_to_hash.get(path) != file_hash:
+                self._set(path, file_hash)
+
+            n_stale = self._n_records - len(self._path_to_hash)
+            if n_stale > self._max_stale_records:
+                self.replace(self._path_to_hash)
+
+    def replace(self, path_to_hash: Dict[str, str]) -> None:
+        """
+        Replace the whole contents of the index
+
+        Parameters
+        ----------
+        path_to_hash: Dict[str, str]
+            Maps the absolute paths of files to their hashes
+        """
+        with self._lock:
+            path_to_hash = {str(path): file_hash
+                            for path, file_hash in path_to_hash.items()}
+            self._write_log(path_to_hash)
+            self._reset()
+            self._refresh()
+
+    def paths_for_hash(self, file_hash: str) -> List[pathlib.Path]:
+        """
+        Return the paths of all of the recorded files with a given hash,
+        in the order in which they were recorded
+
+        Parameters
+        ----------
+        file_hash: str
+            The (hexadecimal) hash of the file
+
+        Returns
+        -------
+        List[pathlib.Path]
+        """
+        with self._lock:
+            self._refresh()
+            paths = self._hash_to_paths.get(file_hash, dict())
+            return [pathlib.Path(path) for path in paths]
+
+    def get(self, path: Union[str, pathlib.Path]) -> Optional[str]:
+        """
+        Return the recorded hash of the file at path (None if the file
+        has not been recorded)
+        """
+        with self._lock:
+            self._refresh()
+            return self._path_to_hash.get(str(path))
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Return a dict mapping the absolute path of every recorded file
+        to its hash
+        """
+        with self._lock:
+            self._refresh()
+            return dict(self._path_to_hash)
+
+
+def _format_record(path: str, file_hash: str) -> str:
+    return json.dumps({'path': path, 'file_hash': file_hash}) + '\n'
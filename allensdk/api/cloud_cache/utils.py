@@ -66,9 +66,10 @@ def relative_path_from_url(url: str) -> str:
     return url_params.path[1:]
 
 
-def file_hash_from_path(file_path: Union[str, Path]) -> str:
+def file_hasher_from_path(file_path: Union[str, Path]):
     """
-    Return the hexadecimal file hash for a file
+    Return a hasher (Blake2b) that has consumed the contents of a file,
+    so that more data can be appended to the hash
 
     Parameters
     ----------
@@ -77,8 +78,7 @@ def file_hash_from_path(file_path: Union[str, Path]) -> str:
 
     Returns
     -------
-    str:
-        The file hash (Blake2b; hexadecimal) of the file
+    hashlib.blake2b
     """
     hasher = hashlib.blake2b()
     with open(file_path, 'rb') as in_file:
@@ -86,4 +86,21 @@ def file_hash_from_path(file_path: Union[str, Path]) -> str:
         while len(chunk) > 0:
             hasher.update(chunk)
             chunk = in_file.read(1000000)
-    return hasher.hexdigest()
+    return hasher
+
+
+def file_hash_from_path(file_path: Union[str, Path]) -> str:
+    """
+    Return the hexadecimal file hash for a file
+
+    Parameters
+    ----------
+    file_path: Union[str, Path]
+        path to a file
+
+    Returns
+    -------
+    str:
+        The file hash (Blake2b; hexadecimal) of the file
+    """
+    return file_hasher_from_path(file_path).hexdigest()
@@ -7,6 +7,7 @@ from allensdk.brain_observatory.behavior.data_files import SyncFile
 from allensdk.brain_observatory.behavior.data_files.rigid_motion_transform_file import RigidMotionTransformFile  # NOQA
 from allensdk.brain_observatory.behavior.data_objects import BehaviorSessionId
 from allensdk.brain_observatory.behavior.data_objects.cell_specimens.cell_specimens import CellSpecimens, EventsParams  # NOQA
+from allensdk.brain_observatory.behavior.data_objects.cell_specimens.traces.trace_array import TraceArray  # NOQA
 from allensdk.brain_observatory.behavior.data_objects.metadata.behavior_metadata.date_of_acquisition import DateOfAcquisition, DateOfAcquisitionOphys  # NOQA
 from allensdk.brain_observatory.behavior.data_objects.metadata.behavior_ophys_metadata import BehaviorOphysMetadata  # NOQA
 from allensdk.brain_observatory.behavior.data_objects.metadata.ophys_experiment_metadata.multi_plane_metadata.imaging_plane_group import ImagingPlaneGroup  # NOQA
@@ -94,6 +95,9 @@ class BehaviorOphysExperiment(BehaviorSession):
             See `BehaviorOphysExperiment.from_nwb`
         exclude_invalid_rois
             Whether to exclude invalid rois
+        load_traces
+            Whether to read the cell traces now. If False, they are read
+            from nwbfile when first needed, so it must remain open
         """
         def _is_multi_plane_session():
             imaging_plane_group_meta = ImagingPlaneGroup.from_lims(
@@ -159,7 +163,8 @@ class BehaviorOphysExperiment(BehaviorSession):
             events_params=EventsParams(
                 filter_scale_seconds=events_filter_scale_seconds,
                 filter_n_time_steps=events_filter_n_time_steps),
-            exclude_invalid_rois=exclude_invalid_rois
+            exclude_invalid_rois=exclude_invalid_rois,
+            load_traces=load_traces
         )
         motion_correction = _get_motion_correction()
 
@@ -179,7 +184,8 @@ class BehaviorOphysExperiment(BehaviorSession):
                  eye_tracking_dilation_frames: int = 2,
                  events_filter_scale_seconds: float = 2.0/31.0,
                  events_filter_n_time_steps: int = 20,
-                 exclude_invalid_rois=True
+                 exclude_invalid_rois=True,
+                 load_traces=True
                  ) -> "BehaviorOphysExperiment":
         """
 
@@ -203,6 +209,9 @@ class BehaviorOphysExperiment(BehaviorSession):
             Number of time steps to use for convolution of ophys events
         exclude_invalid_rois
             Whether to exclude invalid rois
+        load_traces
+            Whether to read the cell traces now. If False, they are read
+            from nwbfile when first needed, so it must remain open
         """
         def _is_multi_plane_session():
             imaging_plane_group_meta = ImagingPlaneGroup.from_nwb(
@@ -219,7 +228,8 @@ class BehaviorOphysExperiment(BehaviorSession):
                 filter_scale_seconds=events_filter_scale_seconds,
                 filter_n_time_steps=events_filter_n_time_steps
             ),
-            exclude_invalid_rois=exclude_invalid_rois
+            exclude_invalid_rois=exclude_invalid_rois,
+            load_traces=load_traces
         )
         motion_correction = MotionCorrection.from_nwb(nwbfile=nwbfile)
         is_multiplane_session = _is_multi_plane_session()
@@ -313,7 +323,8 @@ class BehaviorOphysExperiment(BehaviorSession):
             events_params=EventsParams(
                 filter_scale_seconds=events_filter_scale_seconds,
                 filter_n_time_steps=events_filter_n_time_steps),
-            exclude_invalid_rois=exclude_invalid_rois
+            exclude_invalid_rois=exclude_invalid_rois,
+            load_traces=load_traces
         )
         motion_correction = _get_motion_correction()
 
@@ -340,18 +351,33 @@ class BehaviorOphysExperiment(BehaviorSession):
         """
         return self._cell_specimens.segmentation_mask_image
 
+    def get_trace_array(self, trace_type: str = 'dff_traces') -> TraceArray:
+        """traces as a rois x timepoints matrix indexed by cell_roi_id, in
+        the order of the cell specimen table. Prefer this to the dataframe
+        properties (e.g. `dff_traces`) for population analyses.
+
+        Parameters
+        ----------
+        trace_type
+            One of 'dff_traces', 'demixed_traces', 'neuropil_traces',
+            'corrected_fluorescence_traces', 'events' or 'filtered_events'
+
+        Returns
+        ----------
+        TraceArray
+        """
+        return self._cell_specimens.get_trace_array(trace_type=trace_type)
+
     @legacy('Consider using "dff_traces" instead.')
     def get_dff_traces(self, cell_specimen_ids=None):
 
         if cell_specimen_ids is None:
             cell_specimen_ids = self.get_cell_specimen_ids()
 
-        csid_table = \
-            self.cell_specimen_table.reset_index()[['cell_specimen_id']]
-        csid_subtable = csid_table[csid_table['cell_specimen_id'].isin(
-            cell_specimen_ids)].set_index('cell_specimen_id')
-        dff_table = csid_subtable.join(self.dff_traces, how='left')
-        dff_traces = np.vstack(dff_table['dff'].values)
+        cell_specimen_table = self.cell_specimen_table
+        cell_roi_ids = cell_specimen_table.loc[
+            cell_specimen_table.index.isin(cell_specimen_ids), 'cell_roi_id']
+        dff_traces = self.get_trace_array().get(cell_roi_ids=cell_roi_ids)
         timestamps = self.ophys_timestamps
 
         assert (len(cell_specimen_ids), len(timestamps)) == dff_traces.shape
@@ -32,6 +32,8 @@ from allensdk.brain_observatory.behavior.data_objects.cell_specimens.traces\
     .neuropil_traces import NeuropilTraces
 from allensdk.brain_observatory.behavior.data_objects.cell_specimens.traces\
     .dff_traces import DFFTraces
+from allensdk.brain_observatory.behavior.data_objects.cell_specimens.traces\
+    .trace_array import TraceArray
 from allensdk.brain_observatory.behavior.data_objects.metadata\
     .ophys_experiment_metadata.field_of_view_shape import FieldOfViewShape
 from allensdk.brain_observatory.behavior.data_objects.metadata\
@@ -39,7 +41,7 @@ from allensdk.brain_observatory.behavior.data_objects.metadata\
 from allensdk.brain_observatory.behavior.data_objects.timestamps\
     .ophys_timestamps import OphysTimestamps
 from allensdk.brain_observatory.behavior.image_api import Image
-from allensdk.brain_observatory.nwb import CELL_SPECIMEN_COL_DESCRIPTIONS
+from allensdk.brain_observatory.nwb import create_plane_segmentation
 from allensdk.brain_observatory.nwb.nwb_utils import add_image_to_nwb
 from allensdk.internal.api import PostgresQueryMixin
 
@@ -382,6 +384,43 @@ class CellSpecimens(
         df = df.set_index("cell_specimen_id")
         return df
 
+    def get_trace_array(self, trace_type: str = "dff_traces") -> TraceArray:
+        """Returns traces as a rois x timepoints matrix, in the order of
+        the cell specimen table, rather than as a dataframe holding one
+        list per roi
+
+        Parameters
+        ----------
+        trace_type
+            One of "dff_traces", "demixed_traces", "neuropil_traces",
+            "corrected_fluorescence_traces", "events" or
+            "filtered_events"
+
+        Returns
+        -------
+        TraceArray
+            indexed by cell_roi_id
+        """
+        trace_types = {
+            "dff_traces": (self._dff_traces, None),
+            "demixed_traces": (self._demixed_traces, None),
+            "neuropil_traces": (self._neuropil_traces, None),
+            "corrected_fluorescence_traces": (
+                self._corrected_fluorescence_traces, None),
+            "events": (self._events, "events"),
+            "filtered_events": (self._events, "filtered_events"),
+        }
+        if trace_type not in trace_types:
+            raise ValueError(f"trace_type must be one of "
+                             f"{sorted(trace_types)}, got {trace_type}")
+        traces, column = trace_types[trace_type]
+        if traces is None:
+            return None
+        trace_array = traces.get_trace_array(column)
+        positions = trace_array.cell_roi_ids.get_indexer(
+            self.table["cell_roi_id"])
+        return trace_array.take(positions[positions >= 0])
+
     @property
     def segmentation_mask_image(self) -> Image:
         return self._segmentation_mask_image
@@ -585,7 +624,21 @@ class CellSpecimens(
         segmentation_mask_image_spacing: Tuple,
         events_params: EventsParams,
         exclude_invalid_rois=True,
+        load_traces=True,
     ) -> "CellSpecimens":
+        """
+        Parameters
+        ----------
+        nwbfile
+        segmentation_mask_image_spacing
+        events_params
+        exclude_invalid_rois
+        load_traces
+            Whether to read the dff, demixed, neuropil and corrected
+            fluorescence traces now. If False, each is read when first
+            needed (only the requested rois/timepoints for
+            `get_trace_array(...).get`), so nwbfile must remain open.
+        """
         # NOTE: ROI masks are stored in full frame width and height arrays
         ophys_module = nwbfile.processing["ophys"]
         image_seg = ophys_module.data_interfaces["image_segmentation"]
@@ -616,11 +669,14 @@ class CellSpecimens(
 
         df = _read_table(cell_specimen_table=cell_specimen_table)
         meta = CellSpecimenMeta.from_nwb(nwbfile=nwbfile)
-        dff_traces = DFFTraces.from_nwb(nwbfile=nwbfile)
-        demixed_traces = DemixedTraces.from_nwb(nwbfile=nwbfile)
-        neuropil_traces = NeuropilTraces.from_nwb(nwbfile=nwbfile)
+        dff_traces = DFFTraces.from_nwb(
+            nwbfile=nwbfile, load_traces=load_traces)
+        demixed_traces = DemixedTraces.from_nwb(
+            nwbfile=nwbfile, load_traces=load_traces)
+        neuropil_traces = NeuropilTraces.from_nwb(
+            nwbfile=nwbfile, load_traces=load_traces)
         corrected_fluorescence_traces = CorrectedFluorescenceTraces.from_nwb(
-            nwbfile=nwbfile
+            nwbfile=nwbfile, load_traces=load_traces
         )
 
         def _get_events():
@@ -705,47 +761,21 @@ class CellSpecimens(
         ophys_module.add_data_interface(image_segmentation)
 
         # Plane Segmentation:
-        plane_segmentation = image_segmentation.create_plane_segmentation(
+        # NOTE: The 'roi_mask' in this cell_roi_table has already been
+        # processing by the function from
+        # allensdk.brain_observatory.behavior.session_apis.data_io
+        # .ophys_lims_api
+        # get_cell_specimen_table() method. As a result, the ROI is
+        # stored in
+        # an array that is the same shape as the FULL field of view of the
+        # experiment (e.g. 512 x 512).
+        plane_segmentation = create_plane_segmentation(
+            cell_roi_table=cell_roi_table,
             name="cell_specimen_table",
             description="Segmented rois",
             imaging_plane=imaging_plane,
         )
-
-        for col_name in cell_roi_table.columns:
-            # the columns 'roi_mask', 'pixel_mask', and 'voxel_mask' are
-            # already defined in the nwb.ophys::PlaneSegmentation Object
-            if col_name not in [
-                "id",
-                "mask_matrix",
-                "roi_mask",
-                "pixel_mask",
-                "voxel_mask",
-            ]:
-                # This builds the columns with name of column and description
-                # of column both equal to the column name in the cell_roi_table
-                plane_segmentation.add_column(
-                    col_name,
-                    CELL_SPECIMEN_COL_DESCRIPTIONS.get(
-                        col_name, "No Description Available"
-                    ),
-                )
-
-        # go through each roi and add it to the plan segmentation object
-        for cell_roi_id, table_row in cell_roi_table.iterrows():
-            # NOTE: The 'roi_mask' in this cell_roi_table has already been
-            # processing by the function from
-            # allensdk.brain_observatory.behavior.session_apis.data_io
-            # .ophys_lims_api
-            # get_cell_specimen_table() method. As a result, the ROI is
-            # stored in
-            # an array that is the same shape as the FULL field of view of the
-            # experiment (e.g. 512 x 512).
-            mask = table_row.pop("roi_mask")
-
-            csid = table_row.pop("cell_specimen_id")
-            table_row["cell_specimen_id"] = -1 if csid is None else csid
-            table_row["id"] = cell_roi_id
-            plane_segmentation.add_roi(image_mask=mask, **table_row.to_dict())
+        image_segmentation.add_plane_segmentation(plane_segmentation)
 
         # 2. Add DFF traces
         self._dff_traces.to_nwb(
@@ -842,12 +872,6 @@ class CellSpecimens(
         cell_roi_ids: np.ndarray,
     ):
         """validates traces"""
-        trace_col_map = {
-            "dff_traces": "dff",
-            "demixed_traces": "demixed_trace",
-            "neuropil_traces": "neuropil_trace",
-            "corrected_fluorescence_traces": "corrected_fluorescence",
-        }
         for traces in (
             dff_traces,
             demixed_traces,
@@ -856,23 +880,22 @@ class CellSpecimens(
         ):
             if traces is None:
                 continue
+            trace_array = traces.get_trace_array()
             # validate traces contain expected roi ids
-            if not np.in1d(traces.value.index, cell_roi_ids).all():
+            if not np.in1d(trace_array.cell_roi_ids, cell_roi_ids).all():
                 raise RuntimeError(
                     f"{traces.name} contains ROI IDs that "
                     f"are not in "
                     f"cell_specimen_table.cell_roi_id"
                 )
-            if not np.in1d(cell_roi_ids, traces.value.index).all():
+            if not np.in1d(cell_roi_ids, trace_array.cell_roi_ids).all():
                 raise RuntimeError(
                     f"cell_specimen_table contains ROI IDs "
                     f"that are not in {traces.name}"
                 )
 
             # validate traces contain expected timepoints
-            num_trace_timepoints = len(
-                traces.value.iloc[0][trace_col_map[traces.name]]
-            )
+            num_trace_timepoints = trace_array.shape[1]
             num_ophys_timestamps = ophys_timestamps.value.shape[0]
             if num_trace_timepoints != num_ophys_timestamps:
                 raise RuntimeError(
@@ -13,8 +13,8 @@ from allensdk.core import \
 from allensdk.core import \
     NwbWritableInterface
 from allensdk.brain_observatory.behavior.data_objects.cell_specimens\
-    .rois_mixin import \
-    RoisMixin
+    .traces.trace_array import \
+    TraceArray, TracesMixin
 from allensdk.brain_observatory.behavior.event_detection import \
     filter_events_array
 from allensdk.brain_observatory.behavior.write_nwb.extensions\
@@ -22,7 +22,7 @@ from allensdk.brain_observatory.behavior.write_nwb.extensions\
     OphysEventDetection
 
 
-class Events(DataObject, RoisMixin, DataFileReadableInterface,
+class Events(DataObject, TracesMixin, DataFileReadableInterface,
              NwbReadableInterface, NwbWritableInterface):
     """Events
     columns:
@@ -31,6 +31,8 @@ class Events(DataObject, RoisMixin, DataFileReadableInterface,
         noise_std: float
         cell_roi_id: int
     """
+    _trace_columns = ('events', 'filtered_events')
+
     def __init__(self,
                  events: np.ndarray,
                  events_meta: pd.DataFrame,
@@ -59,19 +61,22 @@ class Events(DataObject, RoisMixin, DataFileReadableInterface,
             scale=filter_scale_seconds*frame_rate_hz,
             n_time_steps=filter_n_time_steps)
 
-        # Convert matrix to list of 1d arrays so that it can be stored
-        # in a single column of the dataframe
-        events = [x for x in events]
-        filtered_events = [x for x in filtered_events]
-
-        df = pd.DataFrame({
-            'events': events,
-            'filtered_events': filtered_events,
-            'lambda': events_meta['lambda'],
-            'noise_std': events_meta['noise_std'],
-            'cell_roi_id': events_meta['cell_roi_id']
-        })
-        super().__init__(name='events', value=df)
+        cell_roi_ids = events_meta['cell_roi_id'].values
+        super().__init__(name='events', value=None)
+        self._set_traces(
+            traces={
+                'events': TraceArray(data=np.asarray(events),
+                                     cell_roi_ids=cell_roi_ids),
+                'filtered_events': TraceArray(data=filtered_events,
+                                              cell_roi_ids=cell_roi_ids)
+            },
+            rois=pd.DataFrame({
+                'lambda': events_meta['lambda'],
+                'noise_std': events_meta['noise_std'],
+                'cell_roi_id': events_meta['cell_roi_id']
+            }),
+            columns=['events', 'filtered_events', 'lambda', 'noise_std',
+                     'cell_roi_id'])
 
     @classmethod
     def from_data_file(cls,
@@ -113,7 +118,7 @@ class Events(DataObject, RoisMixin, DataFileReadableInterface,
                    frame_rate_hz=frame_rate_hz)
 
     def to_nwb(self, nwbfile: NWBFile) -> NWBFile:
-        events = self.value.set_index('cell_roi_id')
+        events = self._rois.set_index('cell_roi_id')
 
         ophys_module = nwbfile.processing['ophys']
         dff_interface = ophys_module.data_interfaces['dff']
@@ -131,7 +136,7 @@ class Events(DataObject, RoisMixin, DataFileReadableInterface,
             description="Cells with detected events",
             region=rois_with_events_indices)
 
-        events_data = np.vstack(events['events'])
+        events_data = self.get_trace_array('events').data
         events = OphysEventDetection(
             # time x rois instead of rois x time
             # store using compression since sparse
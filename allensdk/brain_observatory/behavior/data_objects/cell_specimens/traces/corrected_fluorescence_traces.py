@@ -1,4 +1,5 @@
-import numpy as np
+from typing import Union
+
 import pandas as pd
 from pynwb import NWBFile
 from pynwb.ophys import Fluorescence
@@ -9,12 +10,13 @@ from allensdk.core import DataObject
 from allensdk.core import DataFileReadableInterface, NwbReadableInterface
 from allensdk.core import NwbWritableInterface
 from allensdk.brain_observatory.behavior.data_objects.cell_specimens\
-    .rois_mixin import RoisMixin
+    .traces.trace_array import \
+    TraceArray, TracesMixin, traces_from_roi_response_series
 
 
 class CorrectedFluorescenceTraces(
     DataObject,
-    RoisMixin,
+    TracesMixin,
     DataFileReadableInterface,
     NwbReadableInterface,
     NwbWritableInterface,
@@ -24,7 +26,9 @@ class CorrectedFluorescenceTraces(
     are neuropil corrected and demixed.
     """
 
-    def __init__(self, traces: pd.DataFrame):
+    _trace_columns = ("corrected_fluorescence",)
+
+    def __init__(self, traces: Union[pd.DataFrame, TraceArray]):
         """
 
         Parameters
@@ -38,39 +42,43 @@ class CorrectedFluorescenceTraces(
                     error values (arbitrary units)
                 r:
                     r values (arbitrary units)
+            or a TraceArray of corrected fluorescence traces
         """
         super().__init__(name="corrected_fluorescence_traces", value=traces)
 
     @classmethod
-    def from_nwb(cls, nwbfile: NWBFile) -> "CorrectedFluorescenceTraces":
+    def from_nwb(cls, nwbfile: NWBFile,
+                 load_traces: bool = True) -> "CorrectedFluorescenceTraces":
+        """
+        Parameters
+        ----------
+        nwbfile
+        load_traces
+            Whether to read the traces now. If False, they are read from
+            the NWB file when first needed, so it must remain open.
+        """
         corr_fluorescence_traces_nwb = (
             nwbfile.processing["ophys"]
             .data_interfaces["corrected_fluorescence"]
         )
         # f traces stored as timepoints x rois in NWB
-        # We want rois x timepoints, hence the transpose
-        f_traces = corr_fluorescence_traces_nwb.roi_response_series["traces"]\
-            .data[:].T.copy()
-        roi_ids = corr_fluorescence_traces_nwb.roi_response_series["traces"]\
-            .rois.table.id[:].copy()
+        f_traces = traces_from_roi_response_series(
+            corr_fluorescence_traces_nwb.roi_response_series["traces"],
+            load=load_traces)
+        traces = cls(traces=f_traces)
         # TODO: Remove try/except once VBO released.
         try:
             r_values = corr_fluorescence_traces_nwb.roi_response_series["r"]\
                 .data[:].copy()
             rmse = corr_fluorescence_traces_nwb.roi_response_series["RMSE"]\
                 .data[:].copy()
-            data_dict = {
-                "corrected_fluorescence": [x for x in f_traces],
-                "r": r_values,
-                "RMSE": rmse,
-            }
+            traces._set_traces(
+                traces=traces._traces,
+                rois=pd.DataFrame({"r": r_values, "RMSE": rmse},
+                                  index=f_traces.cell_roi_ids))
         except KeyError:
-            data_dict = {"corrected_fluorescence": [x for x in f_traces]}
-        df = pd.DataFrame(
-            data=data_dict,
-            index=pd.Index(data=roi_ids, name="cell_roi_id"),
-        )
-        return CorrectedFluorescenceTraces(traces=df)
+            pass
+        return traces
 
     @classmethod
     def from_data_file(
@@ -82,12 +90,10 @@ class CorrectedFluorescenceTraces(
         return cls(traces=corrected_fluorescence_traces)
 
     def to_nwb(self, nwbfile: NWBFile) -> NWBFile:
-        corrected_fluorescence_traces = self.value["corrected_fluorescence"]
-        rmse = self.value["RMSE"].values
-        r_values = self.value["r"].values
-        # Convert from Series of lists to numpy array
-        # of shape ROIs x timepoints
-        traces = np.stack([x for x in corrected_fluorescence_traces])
+        rmse = self._rois["RMSE"].values
+        r_values = self._rois["r"].values
+        # traces of shape ROIs x timepoints
+        traces = self.get_trace_array().data
 
         # Create/Add corrected_fluorescence_traces modules and interfaces:
         ophys_module = nwbfile.processing["ophys"]
@@ -1,4 +1,5 @@
-import numpy as np
+from typing import Union
+
 import pandas as pd
 from pynwb import NWBFile
 from pynwb.ophys import Fluorescence
@@ -10,13 +11,13 @@ from allensdk.core import \
 from allensdk.core import \
     NwbWritableInterface
 from allensdk.brain_observatory.behavior.data_objects.cell_specimens\
-    .rois_mixin import \
-    RoisMixin
+    .traces.trace_array import \
+    TraceArray, TracesMixin, traces_from_roi_response_series
 
 
 class DemixedTraces(
     DataObject,
-    RoisMixin,
+    TracesMixin,
     DataFileReadableInterface,
     NwbReadableInterface,
     NwbWritableInterface,
@@ -26,7 +27,9 @@ class DemixedTraces(
     overlapping ROIs.
     """
 
-    def __init__(self, traces: pd.DataFrame):
+    _trace_columns = ("demixed_trace",)
+
+    def __init__(self, traces: Union[pd.DataFrame, TraceArray]):
         """
         Parameters
         ----------
@@ -35,11 +38,21 @@ class DemixedTraces(
             columns:
             - demixed_traces
                 list of float
+            or a TraceArray of demixed traces
         """
         super().__init__(name="demixed_traces", value=traces)
 
     @classmethod
-    def from_nwb(cls, nwbfile: NWBFile) -> "DemixedTraces":
+    def from_nwb(cls, nwbfile: NWBFile,
+                 load_traces: bool = True) -> "DemixedTraces":
+        """
+        Parameters
+        ----------
+        nwbfile
+        load_traces
+            Whether to read the traces now. If False, they are read from
+            the NWB file when first needed, so it must remain open.
+        """
         # TODO Remove try/except once VBO released.
         try:
             demixed_traces_nwb = (
@@ -48,14 +61,8 @@ class DemixedTraces(
                 .roi_response_series["traces"]
             )
             # f traces stored as timepoints x rois in NWB
-            # We want rois x timepoints, hence the transpose
-            f_traces = demixed_traces_nwb.data[:].T.copy()
-            roi_ids = demixed_traces_nwb.rois.table.id[:].copy()
-            df = pd.DataFrame(
-                {"demixed_trace": [x for x in f_traces]},
-                index=pd.Index(data=roi_ids, name="cell_roi_id"),
-            )
-            return DemixedTraces(traces=df)
+            return DemixedTraces(traces=traces_from_roi_response_series(
+                demixed_traces_nwb, load=load_traces))
         except KeyError:
             return None
 
@@ -65,11 +72,8 @@ class DemixedTraces(
         return cls(traces=demixed_traces)
 
     def to_nwb(self, nwbfile: NWBFile) -> NWBFile:
-        demixed_traces = self.value["demixed_trace"]
-
-        # Convert from Series of lists to numpy array
-        # of shape ROIs x timepoints
-        traces = np.stack([x for x in demixed_traces])
+        # traces of shape ROIs x timepoints
+        traces = self.get_trace_array().data
 
         # Create/Add demixed_traces modules and interfaces:
         ophys_module = nwbfile.processing["ophys"]
@@ -1,4 +1,5 @@
-import numpy as np
+from typing import Union
+
 import pandas as pd
 from pynwb import NWBFile
 from pynwb.ophys import Fluorescence
@@ -12,13 +13,13 @@ from allensdk.core import \
 from allensdk.core import \
     NwbWritableInterface
 from allensdk.brain_observatory.behavior.data_objects.cell_specimens\
-    .rois_mixin import \
-    RoisMixin
+    .traces.trace_array import \
+    TraceArray, TracesMixin, traces_from_roi_response_series
 
 
 class NeuropilTraces(
     DataObject,
-    RoisMixin,
+    TracesMixin,
     DataFileReadableInterface,
     NwbReadableInterface,
     NwbWritableInterface,
@@ -28,7 +29,9 @@ class NeuropilTraces(
     measured from the neuropil_masks.
     """
 
-    def __init__(self, traces: pd.DataFrame):
+    _trace_columns = ("neuropil_trace",)
+
+    def __init__(self, traces: Union[pd.DataFrame, TraceArray]):
         """
         Parameters
         ----------
@@ -37,11 +40,21 @@ class NeuropilTraces(
             columns:
             - neuropil_traces
                 list of float
+            or a TraceArray of neuropil traces
         """
         super().__init__(name="neuropil_traces", value=traces)
 
     @classmethod
-    def from_nwb(cls, nwbfile: NWBFile) -> "NeuropilTraces":
+    def from_nwb(cls, nwbfile: NWBFile,
+                 load_traces: bool = True) -> "NeuropilTraces":
+        """
+        Parameters
+        ----------
+        nwbfile
+        load_traces
+            Whether to read the traces now. If False, they are read from
+            the NWB file when first needed, so it must remain open.
+        """
         # TODO Remove try/except once VBO released.
         try:
             neuropil_traces_nwb = (
@@ -50,14 +63,8 @@ class NeuropilTraces(
                 .roi_response_series["traces"]
             )
             # f traces stored as timepoints x rois in NWB
-            # We want rois x timepoints, hence the transpose
-            f_traces = neuropil_traces_nwb.data[:].T.copy()
-            roi_ids = neuropil_traces_nwb.rois.table.id[:].copy()
-            df = pd.DataFrame(
-                {"neuropil_trace": [x for x in f_traces]},
-                index=pd.Index(data=roi_ids, name="cell_roi_id"),
-            )
-            return NeuropilTraces(traces=df)
+            return NeuropilTraces(traces=traces_from_roi_response_series(
+                neuropil_traces_nwb, load=load_traces))
         except KeyError:
             return None
 
@@ -67,11 +74,8 @@ class NeuropilTraces(
         return cls(traces=neuropil_traces)
 
     def to_nwb(self, nwbfile: NWBFile) -> NWBFile:
-        neuropil_traces = self.value["neuropil_trace"]
-
-        # Convert from Series of lists to numpy array
-        # of shape ROIs x timepoints
-        traces = np.stack([x for x in neuropil_traces])
+        # traces of shape ROIs x timepoints
+        traces = self.get_trace_array().data
 
         # Create/Add neuropil_traces modules and interfaces:
         ophys_module = nwbfile.processing["ophys"]
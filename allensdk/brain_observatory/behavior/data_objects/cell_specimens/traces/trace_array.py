@@ -0,0 +1,318 @@
+import warnings
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from allensdk.brain_observatory.behavior.data_objects.cell_specimens\
+    .rois_mixin import \
+    RoisMixin
+
+
+class TraceArray:
+    """A contiguous rois x frames matrix of traces, indexed by cell_roi_id.
+
+    The matrix may be backed by an array-like which is only read when
+    needed (e.g. the timepoints x rois dataset of an NWB
+    RoiResponseSeries). Until then, `get` reads just the requested
+    hyperslab from it.
+    """
+
+    def __init__(self,
+                 data,
+                 cell_roi_ids: Iterable[int],
+                 time_major: bool = False):
+        """
+        Parameters
+        ----------
+        data
+            2d array-like of traces. np.ndarray, h5py.Dataset or anything
+            else supporting numpy-style slicing
+        cell_roi_ids
+            The roi id of each trace
+        time_major
+            Whether data is stored timepoints x rois (as in NWB files)
+            rather than rois x timepoints
+        """
+        self._cell_roi_ids = pd.Index(cell_roi_ids, name='cell_roi_id')
+        self._source = data
+        self._time_major = time_major
+
+        # rows of the source backing each trace; None means all, in order
+        self._source_rows: Optional[np.ndarray] = None
+
+        if isinstance(data, np.ndarray) and not time_major:
+            self._data = data
+        else:
+            self._data = None
+
+        n_rows = data.shape[1] if time_major else data.shape[0]
+        if n_rows != len(self._cell_roi_ids):
+            raise ValueError(f'Got {n_rows} traces but '
+                             f'{len(self._cell_roi_ids)} cell_roi_ids')
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Iterable[float]],
+                  cell_roi_ids: Iterable[int]) -> "TraceArray":
+        """Stack a sequence of 1d traces (e.g. a dataframe column holding
+        one list or array per roi) into a TraceArray"""
+        rows = list(rows)
+        if len(rows) == 0:
+            data = np.zeros((0, 0))
+        else:
+            data = np.stack([np.asarray(row) for row in rows])
+        return cls(data=data, cell_roi_ids=cell_roi_ids)
+
+    @property
+    def cell_roi_ids(self) -> pd.Index:
+        return self._cell_roi_ids
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        if self._data is not None:
+            return self._data.shape
+        n_frames = self._source.shape[0 if self._time_major else 1]
+        return len(self._cell_roi_ids), n_frames
+
+    def __len__(self) -> int:
+        return len(self._cell_roi_ids)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> np.ndarray:
+        """The rois x timepoints matrix (read on first access)"""
+        if self._data is None:
+            data = self._read(self._source_rows, slice(None))
+            self._data = np.ascontiguousarray(data)
+            self._source = None
+            self._source_rows = None
+        return self._data
+
+    def _read(self, rows: Optional[np.ndarray], frames: slice) -> np.ndarray:
+        """Read rows (all if None) and frames of the source. Rows are read
+        in increasing order, as h5py requires, and then put back in the
+        requested order."""
+        if rows is None:
+            if self._time_major:
+                return self._source[frames, :].T
+            return self._source[:, frames]
+
+        if len(rows) == 0:
+            n_frames = self._source.shape[0 if self._time_major else 1]
+            return np.zeros((0, len(range(*frames.indices(n_frames)))),
+                            dtype=self._source.dtype)
+
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        if len(unique_rows) > 0 and \
+                unique_rows[-1] - unique_rows[0] + 1 == len(unique_rows):
+            selection = slice(int(unique_rows[0]), int(unique_rows[-1]) + 1)
+        else:
+            selection = unique_rows.tolist()
+
+        if self._time_major:
+            data = self._source[frames, selection].T
+        else:
+            data = self._source[selection, frames]
+
+        if not np.array_equal(unique_rows, rows):
+            data = data[inverse]
+        return data
+
+    def _positions(self, cell_roi_ids: Iterable[int]) -> np.ndarray:
+        positions = self._cell_roi_ids.get_indexer(
+            np.asarray(cell_roi_ids).reshape(-1))
+        if np.any(positions < 0):
+            raise KeyError('cell_roi_ids not found in traces')
+        return positions
+
+    def get(self,
+            cell_roi_ids: Optional[Iterable[int]] = None,
+            frames: Optional[slice] = None) -> np.ndarray:
+        """Returns traces for a subset of rois and/or timepoints.
+
+        Parameters
+        ----------
+        cell_roi_ids
+            The rois to return traces for, in order. All rois if None
+        frames
+            Slice of timepoints to return. All timepoints if None
+
+        Returns
+        -------
+        np.ndarray
+            rois x timepoints. A view of the underlying matrix if
+            cell_roi_ids is None and the traces have been loaded
+        """
+        frames = slice(None) if frames is None else frames
+
+        if self._data is not None:
+            if cell_roi_ids is None:
+                return self._data[:, frames]
+            return self._data[self._positions(cell_roi_ids), frames]
+
+        if cell_roi_ids is None:
+            rows = self._source_rows
+        else:
+            rows = self._positions(cell_roi_ids)
+            if self._source_rows is not None:
+                rows = self._source_rows[rows]
+        return np.asarray(self._read(rows, frames))
+
+    def take(self, positions: np.ndarray) -> "TraceArray":
+        """Returns a TraceArray holding the traces at the given positions,
+        in order. Traces that have not been read yet are not read."""
+        positions = np.asarray(positions, dtype=int)
+        if np.array_equal(positions, np.arange(len(self))):
+            return self
+
+        cell_roi_ids = self._cell_roi_ids[positions]
+        if self._data is not None:
+            return TraceArray(data=self._data[positions],
+                              cell_roi_ids=cell_roi_ids)
+
+        taken = TraceArray.__new__(TraceArray)
+        taken._cell_roi_ids = cell_roi_ids
+        taken._source = self._source
+        taken._time_major = self._time_major
+        taken._data = None
+        taken._source_rows = positions if self._source_rows is None else \
+            self._source_rows[positions]
+        return taken
+
+    def rows(self) -> List[np.ndarray]:
+        """The traces as a list of 1d views of the matrix"""
+        return list(self.data)
+
+
+class TracesMixin(RoisMixin):
+    """A mixin for a collection of rois whose value is a dataframe with
+    one or more columns holding a trace (list of float) per roi.
+
+    The traces are stored as TraceArrays (rois x timepoints matrices),
+    and the remaining columns in a dataframe of per-roi values. The
+    dataframe `value` is assembled from them on demand, for
+    compatibility.
+    """
+    _trace_columns: Tuple[str, ...]
+
+    def _set_traces(self,
+                    traces: Dict[str, TraceArray],
+                    rois: pd.DataFrame,
+                    columns: Optional[List[str]] = None):
+        """
+        Parameters
+        ----------
+        traces
+            Maps each trace column to its TraceArray
+        rois
+            The remaining (non-trace) columns, one row per roi in the
+            same order as the traces
+        columns
+            Order of the columns in value. Defaults to the trace columns
+            followed by the columns of rois
+        """
+        self._traces = traces
+        self._rois = rois
+        if columns is None:
+            columns = list(traces) + list(rois.columns)
+        self._columns = columns
+        self._value_view = None
+
+    @property
+    def _value(self) -> pd.DataFrame:
+        if self._value_view is None:
+            df = self._rois.copy()
+            for column, trace_array in self._traces.items():
+                df[column] = trace_array.rows() if len(df) else []
+            self._value_view = df[self._columns]
+        return self._value_view
+
+    @_value.setter
+    def _value(self, value: Union[pd.DataFrame, TraceArray, None]):
+        if value is None:
+            # the traces are set with _set_traces instead
+            return
+
+        if isinstance(value, TraceArray):
+            self._set_traces(traces={self._trace_columns[0]: value},
+                             rois=pd.DataFrame(index=value.cell_roi_ids))
+            return
+
+        cell_roi_ids = value.index if value.index.name == 'cell_roi_id' \
+            else value['cell_roi_id']
+        traces = {column: TraceArray.from_rows(value[column],
+                                               cell_roi_ids=cell_roi_ids)
+                  for column in self._trace_columns}
+        rois = value.drop(columns=list(self._trace_columns))
+        self._set_traces(traces=traces, rois=rois,
+                         columns=list(value.columns))
+
+    def get_trace_array(self, column: Optional[str] = None) -> TraceArray:
+        """Returns the rois x timepoints matrix of traces held in column
+        (defaults to the first trace column)"""
+        if column is None:
+            column = self._trace_columns[0]
+        return self._traces[column]
+
+    def get_number_of_frames(self) -> int:
+        """Returns the number of frames in the movie"""
+        if len(self._rois) == 0:
+            raise RuntimeError('Cannot determine number of frames')
+        return self.get_trace_array().shape[1]
+
+    def filter_and_reorder(self, roi_ids: np.ndarray,
+                           raise_if_rois_missing=True):
+        """Orders traces according to input roi_ids.
+        Will also filter traces to contain only rois given by roi_ids.
+
+        See RoisMixin.filter_and_reorder. The traces are reordered as
+        matrices rather than through the dataframe.
+        """
+        current_roi_ids = pd.Index(
+            self._rois.index if self._rois.index.name == 'cell_roi_id'
+            else self._rois['cell_roi_id'])
+        positions = current_roi_ids.get_indexer(roi_ids)
+
+        if np.any(positions < 0):
+            msg = f'Input contains roi ids not in ' \
+                  f'{type(self).__name__}.'
+            if raise_if_rois_missing:
+                raise RuntimeError(msg)
+            warnings.warn(msg)
+            positions = positions[positions >= 0]
+
+        self._set_traces(
+            traces={column: trace_array.take(positions)
+                    for column, trace_array in self._traces.items()},
+            rois=self._rois.iloc[positions],
+            columns=self._columns)
+
+
+def traces_from_roi_response_series(roi_response_series,
+                                    load: bool = True) -> TraceArray:
+    """Build a TraceArray from an NWB RoiResponseSeries (stored
+    timepoints x rois).
+
+    Parameters
+    ----------
+    roi_response_series
+        The series to read
+    load
+        Whether to read the traces now. If False, they are read from the
+        series' (lazily loaded) data when needed, so the NWB file must
+        remain open.
+
+    Returns
+    -------
+    TraceArray
+        Traces indexed by cell_roi_id
+    """
+    roi_ids = roi_response_series.rois.table.id[:].copy()
+    data = roi_response_series.data
+    if load:
+        return TraceArray(data=np.ascontiguousarray(data[:].T),
+                          cell_roi_ids=roi_ids)
+    return TraceArray(data=data, cell_roi_ids=roi_ids, time_major=True)
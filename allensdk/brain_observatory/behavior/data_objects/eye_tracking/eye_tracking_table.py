@@ -20,7 +20,7 @@ from allensdk.core import \
 from allensdk.core import \
     NwbWritableInterface
 from allensdk.brain_observatory.behavior.eye_tracking_processing import \
-    process_eye_tracking_data, determine_outliers, determine_likely_blinks, \
+    process_eye_tracking_data, determine_likely_blinks_from_areas, \
     filter_on_blinks, EyeTrackingError
 from allensdk.brain_observatory.nwb.eye_tracking.ndx_ellipse_eye_tracking \
     import \
@@ -179,12 +179,10 @@ class EyeTrackingTable(DataObject, DataFileReadableInterface,
         eye_tracking_data.index = eye_tracking_data.index.rename('frame')
 
         # re-calculate likely blinks for new z_threshold and dilate_frames
-        area_df = eye_tracking_data[['eye_area_raw', 'pupil_area_raw']]
-        outliers = determine_outliers(area_df, z_threshold=z_threshold)
-        likely_blinks = determine_likely_blinks(
-            eye_tracking_data['eye_area_raw'],
-            eye_tracking_data['pupil_area_raw'],
-            outliers,
+        likely_blinks = determine_likely_blinks_from_areas(
+            eye_tracking_data['eye_area_raw'].to_numpy(),
+            eye_tracking_data['pupil_area_raw'].to_numpy(),
+            z_threshold=z_threshold,
             dilation_frames=dilation_frames)
 
         eye_tracking_data["likely_blink"] = likely_blinks
@@ -3,15 +3,14 @@ from typing import List, Tuple, Optional
 import numpy as np
 import pandas as pd
 from pynwb import NWBFile
+from pynwb.epoch import TimeIntervals
 
-from allensdk.brain_observatory import dict_to_indexed_array
 from allensdk.brain_observatory.behavior.data_files import (
     BehaviorStimulusFile, SyncFile)
 from allensdk.brain_observatory.behavior.data_objects.task_parameters import \
     TaskParameters
-from allensdk.brain_observatory.behavior.dprime import get_hit_rate, \
-    get_trial_count_corrected_hit_rate, get_false_alarm_rate, \
-    get_trial_count_corrected_false_alarm_rate, get_rolling_dprime
+from allensdk.brain_observatory.behavior.dprime import \
+    get_reward_rate, get_rolling_performance
 from allensdk.core import DataObject
 from allensdk.brain_observatory.behavior.data_objects import StimulusTimestamps
 from allensdk.core import \
@@ -23,6 +22,8 @@ from allensdk.core import \
 from allensdk.brain_observatory.behavior.data_objects.licks import Licks
 from allensdk.brain_observatory.behavior.data_objects.rewards import Rewards
 from allensdk.brain_observatory.behavior.data_objects.trials.trial import Trial, DynamicGatingTrial
+from allensdk.brain_observatory.nwb.dynamic_table import \
+    dataframe_to_dynamic_table
 
 from functools import partial
 
@@ -100,31 +101,16 @@ class Trials(DataObject, StimulusFileReadableInterface,
 
     def to_nwb(self, nwbfile: NWBFile) -> NWBFile:
         trials = self.data
-        order = list(trials.index)
-        for _, row in trials[['start_time', 'stop_time']].iterrows():
-            row_dict = row.to_dict()
-            nwbfile.add_trial(**row_dict)
-
-        for c in trials.columns:
-            if c in ['start_time', 'stop_time']:
-                continue
-            index, data = dict_to_indexed_array(trials[c].to_dict(), order)
-            if data.dtype == '<U1':  # data type is composed of unicode
-                # characters
-                data = trials[c].tolist()
-            if not len(data) == len(order):
-                if len(data) == 0:
-                    data = ['']
-                nwbfile.add_trial_column(
-                    name=c,
-                    description='NOT IMPLEMENTED: %s' % c,
-                    data=data,
-                    index=index)
-            else:
-                nwbfile.add_trial_column(
-                    name=c,
-                    description='NOT IMPLEMENTED: %s' % c,
-                    data=data)
+        trials = trials[['start_time', 'stop_time'] + [
+            c for c in trials.columns if c not in ['start_time', 'stop_time']]]
+        nwbfile.trials = dataframe_to_dynamic_table(
+            df=trials,
+            table_type=TimeIntervals,
+            column_descriptions={
+                c: 'NOT IMPLEMENTED: %s' % c for c in trials.columns
+                if c not in ['start_time', 'stop_time']},
+            name='trials',
+            description='experimental trials')
         return nwbfile
 
     @classmethod
@@ -321,53 +307,15 @@ class Trials(DataObject, StimulusFileReadableInterface,
                     rolling false_alarm _rate.
 
         """
-        reward_rate = self.calculate_reward_rate()
-
-        # Indices to build trial metrics dataframe:
-        trials_index = self.data.index
-        not_aborted_index = \
-            self.data[np.logical_not(self.aborted)].index
-
-        # Initialize dataframe:
-        performance_metrics_df = pd.DataFrame(index=trials_index)
-
-        # Reward rate:
-        performance_metrics_df['reward_rate'] = \
-            pd.Series(reward_rate, index=self.data.index)
-
-        # Hit rate raw:
-        hit_rate_raw = get_hit_rate(
+        performance_metrics_df = get_rolling_performance(
             hit=self.hit,
             miss=self.miss,
-            aborted=self.aborted)
-        performance_metrics_df['hit_rate_raw'] = \
-            pd.Series(hit_rate_raw, index=not_aborted_index)
-
-        # Hit rate with trial count correction:
-        hit_rate = get_trial_count_corrected_hit_rate(
-                hit=self.hit,
-                miss=self.miss,
-                aborted=self.aborted)
-        performance_metrics_df['hit_rate'] = \
-            pd.Series(hit_rate, index=not_aborted_index)
-
-        # False-alarm rate raw:
-        false_alarm_rate_raw = \
-            get_false_alarm_rate(
-                    false_alarm=self.false_alarm,
-                    correct_reject=self.correct_reject,
-                    aborted=self.aborted)
-        performance_metrics_df['false_alarm_rate_raw'] = \
-            pd.Series(false_alarm_rate_raw, index=not_aborted_index)
-
-        # False-alarm rate with trial count correction:
-        false_alarm_rate = \
-            get_trial_count_corrected_false_alarm_rate(
-                    false_alarm=self.false_alarm,
-                    correct_reject=self.correct_reject,
-                    aborted=self.aborted)
-        performance_metrics_df['false_alarm_rate'] = \
-            pd.Series(false_alarm_rate, index=not_aborted_index)
+            false_alarm=self.false_alarm,
+            correct_reject=self.correct_reject,
+            aborted=self.aborted,
+            response_latency=self._calculate_response_latency_list(),
+            starttime=self.start_time.values)
+        performance_metrics_df.index = self.data.index
 
         # Rolling-dprime:
         is_passive_session = (
@@ -377,11 +325,8 @@ class Trials(DataObject, StimulusFileReadableInterface,
         if is_passive_session:
             # It does not make sense to calculate d' for a passive session
             # So just set it to zeros
-            rolling_dprime = np.zeros(len(hit_rate))
-        else:
-            rolling_dprime = get_rolling_dprime(hit_rate, false_alarm_rate)
-        performance_metrics_df['rolling_dprime'] = \
-            pd.Series(rolling_dprime, index=not_aborted_index)
+            performance_metrics_df.loc[
+                np.logical_not(self.aborted.values), 'rolling_dprime'] = 0.0
 
         return performance_metrics_df
 
@@ -408,18 +353,23 @@ class Trials(DataObject, StimulusFileReadableInterface,
         (the two instance of monitor delay cancel out in the
         difference).
         """
-        df = pd.DataFrame({'lick_times': self.lick_times,
-                           'change_time': self.change_time})
-        df['valid_response_licks'] = df.apply(
-            lambda trial: [lt for lt in trial['lick_times']
-                           if lt - trial['change_time'] >
-                           self._response_window_start],
-            axis=1)
-        response_latency = df.apply(
-            lambda trial: trial['valid_response_licks'][0] -
-            trial['change_time']
-            if len(trial['valid_response_licks']) > 0 else float('inf'),
-            axis=1)
+        lick_times = [np.asarray(x, dtype=float) for x in self.lick_times]
+        change_time = np.asarray(self.change_time, dtype=float)
+        response_latency = np.full(len(lick_times), float('inf'))
+        if len(lick_times) == 0:
+            return response_latency.tolist()
+
+        # the trial of each lick
+        trial_index = np.repeat(np.arange(len(lick_times)),
+                                [len(x) for x in lick_times])
+        licks = np.concatenate(lick_times)
+        latency = licks - change_time[trial_index]
+
+        # first valid response lick of each trial
+        is_valid = latency > self._response_window_start
+        responded, first_valid = np.unique(trial_index[is_valid],
+                                           return_index=True)
+        response_latency[responded] = latency[is_valid][first_valid]
         return response_latency.tolist()
 
     def calculate_reward_rate(
@@ -428,46 +378,16 @@ class Trials(DataObject, StimulusFileReadableInterface,
             trial_window=25,
             initial_trials=10
     ):
-        response_latency = self._calculate_response_latency_list()
-        starttime = self.start_time.values
-        assert len(response_latency) == len(starttime)
-
-        df = pd.DataFrame({'response_latency': response_latency,
-                           'starttime': starttime})
-
-        # adds a column called reward_rate to the input dataframe
-        # the reward_rate column contains a rolling average of rewards/min
+        # the reward_rate contains a rolling average of rewards/min
         # window sets the window in which a response is considered correct,
         # so a window of 1.0 means licks before 1.0 second are considered
         # correct
-
-        # Reorganized into this unit-testable form by Nick Cain April 25 2019
-
-        reward_rate = np.zeros(len(df))
-        # make the initial reward rate infinite,
-        # so that you include the first trials automatically.
-        reward_rate[:initial_trials] = np.inf
-
-        for trial_number in range(initial_trials, len(df)):
-
-            min_index = np.max((0, trial_number - trial_window))
-            max_index = np.min((trial_number + trial_window, len(df)))
-            df_roll = df.iloc[min_index:max_index]
-
-            # get a rolling number of correct trials
-            correct = len(df_roll[df_roll.response_latency < window])
-
-            # get the time elapsed over the trials
-            time_elapsed = df_roll.starttime.iloc[-1] - \
-                df_roll.starttime.iloc[0]
-
-            # calculate the reward rate, rewards/min
-            reward_rate_on_this_lap = correct / time_elapsed * 60
-
-            reward_rate[trial_number] = reward_rate_on_this_lap
-
-        reward_rate[np.isinf(reward_rate)] = float('nan')
-        return reward_rate
+        return get_reward_rate(
+            response_latency=self._calculate_response_latency_list(),
+            starttime=self.start_time.values,
+            window=window,
+            trial_window=trial_window,
+            initial_trials=initial_trials)
 
     def _get_engaged_trials(
         self,
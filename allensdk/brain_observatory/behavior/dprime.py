@@ -9,42 +9,67 @@ SLIDING_WINDOW = 100
 
 def get_go_responses(hit=None, miss=None, aborted=None):
     assert len(hit) == len(miss) == len(aborted)
-    not_aborted = np.logical_not(np.array(aborted, dtype=np.bool))
-    hit = np.array(hit, dtype=np.bool)[not_aborted]
-    miss = np.array(miss, dtype=np.bool)[not_aborted]
+    not_aborted = np.logical_not(np.array(aborted, dtype=bool))
+    hit = np.array(hit, dtype=bool)[not_aborted]
+    miss = np.array(miss, dtype=bool)[not_aborted]
 
     # Go responses are nan when catch (aborted are masked out); 0 for miss, 1 for hit
     # This allows pd.Series.rolling to ignore non-go trial data
-    go_responses = np.empty_like(hit, dtype=np.float)
+    go_responses = np.empty_like(hit, dtype=float)
     go_responses.fill(float('nan'))
     go_responses[hit] = 1
     go_responses[miss] = 0
     return go_responses
 
 
+def _rolling_sum(values, sliding_window=SLIDING_WINDOW):
+    """Sum of values over a window of sliding_window elements ending at
+    (and including) each element, from the difference of cumulative sums.
+    Integer values give exact sums."""
+    cumulative = np.concatenate(([0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - sliding_window, 0)
+    return cumulative[ends] - cumulative[starts]
+
+
+def _rolling_rate(responses, sliding_window=SLIDING_WINDOW):
+    """Rolling mean and count of the non-nan responses (equivalent to
+    pd.Series(responses).rolling(window=sliding_window, min_periods=0))"""
+    responses = np.asarray(responses, dtype=float)
+    is_response = ~np.isnan(responses)
+    count = _rolling_sum(is_response.astype(np.int64),
+                         sliding_window=sliding_window)
+    total = _rolling_sum((responses == 1).astype(np.int64),
+                         sliding_window=sliding_window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = total / count
+    return rate, count
+
+
 def get_hit_rate(hit=None, miss=None, aborted=None, sliding_window=SLIDING_WINDOW):
     go_responses = get_go_responses(hit=hit, miss=miss, aborted=aborted)
-    hit_rate = pd.Series(go_responses).rolling(window=sliding_window, min_periods=0).mean().values
+    hit_rate, _ = _rolling_rate(go_responses, sliding_window=sliding_window)
     return hit_rate
 
 
 def get_trial_count_corrected_hit_rate(hit=None, miss=None, aborted=None, sliding_window=SLIDING_WINDOW):
     go_responses = get_go_responses(hit=hit, miss=miss, aborted=aborted)
-    go_responses_count = pd.Series(go_responses).rolling(window=sliding_window, min_periods=0).count()
-    hit_rate = pd.Series(go_responses).rolling(window=sliding_window, min_periods=0).mean().values
-    trial_count_corrected_hit_rate = np.vectorize(trial_number_limit)(hit_rate, go_responses_count)
+    hit_rate, go_responses_count = _rolling_rate(
+        go_responses, sliding_window=sliding_window)
+    trial_count_corrected_hit_rate = _trial_number_limit(
+        hit_rate, go_responses_count)
     return trial_count_corrected_hit_rate
 
 
 def get_catch_responses(correct_reject=None, false_alarm=None, aborted=None):
     assert len(correct_reject) == len(false_alarm) == len(aborted)
-    not_aborted = np.logical_not(np.array(aborted, dtype=np.bool))
-    correct_reject = np.array(correct_reject, dtype=np.bool)[not_aborted]
-    false_alarm = np.array(false_alarm, dtype=np.bool)[not_aborted]
+    not_aborted = np.logical_not(np.array(aborted, dtype=bool))
+    correct_reject = np.array(correct_reject, dtype=bool)[not_aborted]
+    false_alarm = np.array(false_alarm, dtype=bool)[not_aborted]
 
     # Catch responses are nan when go (aborted are masked out); 0 for correct-rejection, 1 for false-alarm
     # This allows pd.Series.rolling to ignore non-catch trial data
-    catch_responses = np.empty_like(correct_reject, dtype=np.float)
+    catch_responses = np.empty_like(correct_reject, dtype=float)
     catch_responses.fill(float('nan'))
     catch_responses[false_alarm] = 1
     catch_responses[correct_reject] = 0
@@ -53,20 +78,23 @@ def get_catch_responses(correct_reject=None, false_alarm=None, aborted=None):
 
 def get_false_alarm_rate(correct_reject=None, false_alarm=None, aborted=None, sliding_window=SLIDING_WINDOW):
     catch_responses = get_catch_responses(correct_reject=correct_reject, false_alarm=false_alarm, aborted=aborted)
-    false_alarm_rate = pd.Series(catch_responses).rolling(window=sliding_window, min_periods=0).mean().values
+    false_alarm_rate, _ = _rolling_rate(
+        catch_responses, sliding_window=sliding_window)
     return false_alarm_rate
 
 
 def get_trial_count_corrected_false_alarm_rate(correct_reject=None, false_alarm=None, aborted=None, sliding_window=SLIDING_WINDOW):
     catch_responses = get_catch_responses(correct_reject=correct_reject, false_alarm=false_alarm, aborted=aborted)
-    catch_responses_count = pd.Series(catch_responses).rolling(window=sliding_window, min_periods=0).count()
-    false_alarm_rate = pd.Series(catch_responses).rolling(window=sliding_window, min_periods=0).mean().values
-    trial_count_corrected_false_alarm_rate = np.vectorize(trial_number_limit)(false_alarm_rate, catch_responses_count)
+    false_alarm_rate, catch_responses_count = _rolling_rate(
+        catch_responses, sliding_window=sliding_window)
+    trial_count_corrected_false_alarm_rate = _trial_number_limit(
+        false_alarm_rate, catch_responses_count)
     return trial_count_corrected_false_alarm_rate
 
 
 def get_rolling_dprime(rolling_hit_rate, rolling_fa_rate, sliding_window=SLIDING_WINDOW):
-    return np.array([get_dprime(hr, far, sliding_window=SLIDING_WINDOW) for hr, far in zip(rolling_hit_rate, rolling_fa_rate)])
+    return _dprime(np.asarray(rolling_hit_rate, dtype=float),
+                   np.asarray(rolling_fa_rate, dtype=float))
 
 
 def get_dprime(hit_rate, fa_rate, sliding_window=SLIDING_WINDOW):
@@ -84,7 +112,14 @@ def get_dprime(hit_rate, fa_rate, sliding_window=SLIDING_WINDOW):
     -------
     d_prime
     """
+    d_prime = _dprime(np.array([hit_rate], dtype=float),
+                      np.array([fa_rate], dtype=float))
+    return one(d_prime)
 
+
+def _dprime(hit_rate, fa_rate):
+    """d-prime of arrays of hit rates and false alarm rates (see
+    get_dprime)"""
     limits = (1/SLIDING_WINDOW, 1 - 1/SLIDING_WINDOW)
     assert limits[0] > 0.0, 'limits[0] must be greater than 0.0'
     assert limits[1] < 1.0, 'limits[1] must be less than 1.0'
@@ -93,8 +128,8 @@ def get_dprime(hit_rate, fa_rate, sliding_window=SLIDING_WINDOW):
     # Limit values in order to avoid d' infinity
     hit_rate = np.clip(hit_rate, limits[0], limits[1])
     fa_rate = np.clip(fa_rate, limits[0], limits[1])
-    d_prime = Z(pd.Series(hit_rate)) - Z(pd.Series(fa_rate))
-    return one(d_prime)
+    d_prime = Z(hit_rate) - Z(fa_rate)
+    return d_prime
 
 
 def trial_number_limit(p, N):
@@ -104,3 +139,126 @@ def trial_number_limit(p, N):
         p = np.max((p, 1. / (2 * N)))
         p = np.min((p, 1 - 1. / (2 * N)))
     return p
+
+
+def _trial_number_limit(p, N):
+    """trial_number_limit applied to arrays of rates and trial counts"""
+    with np.errstate(divide='ignore'):
+        limit = 1. / (2 * np.asarray(N))
+    p = np.minimum(np.maximum(p, limit), 1 - limit)
+    return np.where(np.asarray(N) == 0, np.nan, p)
+
+
+def get_reward_rate(response_latency, starttime, window=0.75,
+                    trial_window=25, initial_trials=10):
+    """Rolling reward rate (rewards/minute) of each trial: the number of
+    trials responded to within `window` seconds, over the trials less
+    than `trial_window` trials before or after it, divided by the time
+    elapsed over those trials. The first `initial_trials` trials, and any
+    trial where no time elapsed, have a reward rate of nan.
+
+    Parameters
+    ----------
+    response_latency : array-like
+        Response latency of each trial (inf or nan if no response)
+    starttime : array-like
+        Start time of each trial
+    window : float
+        Responses with a latency below this are rewarded
+    trial_window : int
+        Number of trials on either side of a trial to average over
+    initial_trials : int
+        Number of trials at the start without a reward rate
+
+    Returns
+    -------
+    np.ndarray
+    """
+    response_latency = np.asarray(response_latency, dtype=float)
+    starttime = np.asarray(starttime, dtype=float)
+    assert len(response_latency) == len(starttime)
+    n_trials = len(starttime)
+
+    reward_rate = np.zeros(n_trials)
+    # make the initial reward rate infinite,
+    # so that you include the first trials automatically.
+    reward_rate[:initial_trials] = np.inf
+
+    trial_number = np.arange(min(initial_trials, n_trials), n_trials)
+    min_index = np.maximum(0, trial_number - trial_window)
+    max_index = np.minimum(trial_number + trial_window, n_trials)
+
+    # get a rolling number of correct trials
+    cumulative_correct = np.concatenate(
+        ([0], np.cumsum(response_latency < window)))
+    correct = cumulative_correct[max_index] - cumulative_correct[min_index]
+
+    # get the time elapsed over the trials
+    time_elapsed = starttime[max_index - 1] - starttime[min_index]
+
+    # calculate the reward rate, rewards/min
+    with np.errstate(invalid='ignore', divide='ignore'):
+        reward_rate[trial_number] = correct / time_elapsed * 60
+
+    reward_rate[np.isinf(reward_rate)] = float('nan')
+    return reward_rate
+
+
+def get_rolling_performance(hit, miss, false_alarm, correct_reject, aborted,
+                            response_latency, starttime,
+                            sliding_window=SLIDING_WINDOW,
+                            reward_rate_kwargs=None):
+    """Computes the rolling behavior performance metrics of a session
+    together
+
+    Parameters
+    ----------
+    hit, miss, false_alarm, correct_reject, aborted : array-like of bool
+        Outcome of each trial
+    response_latency : array-like
+        Response latency of each trial (inf or nan if no response)
+    starttime : array-like
+        Start time of each trial
+    sliding_window : int
+        Number of non-aborted trials to compute hit and false alarm rates
+        over
+    reward_rate_kwargs : dict, optional
+        Passed to get_reward_rate
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per trial, with columns reward_rate, hit_rate_raw,
+        hit_rate, false_alarm_rate_raw, false_alarm_rate and
+        rolling_dprime. All but reward_rate are nan for aborted trials.
+    """
+    if reward_rate_kwargs is None:
+        reward_rate_kwargs = dict()
+    not_aborted = np.logical_not(np.array(aborted, dtype=bool))
+
+    go_responses = get_go_responses(hit=hit, miss=miss, aborted=aborted)
+    hit_rate_raw, go_count = _rolling_rate(
+        go_responses, sliding_window=sliding_window)
+    hit_rate = _trial_number_limit(hit_rate_raw, go_count)
+
+    catch_responses = get_catch_responses(
+        correct_reject=correct_reject, false_alarm=false_alarm,
+        aborted=aborted)
+    false_alarm_rate_raw, catch_count = _rolling_rate(
+        catch_responses, sliding_window=sliding_window)
+    false_alarm_rate = _trial_number_limit(false_alarm_rate_raw, catch_count)
+
+    performance = pd.DataFrame({
+        'reward_rate': get_reward_rate(
+            response_latency=response_latency, starttime=starttime,
+            **reward_rate_kwargs)})
+    for name, values in [
+            ('hit_rate_raw', hit_rate_raw),
+            ('hit_rate', hit_rate),
+            ('false_alarm_rate_raw', false_alarm_rate_raw),
+            ('false_alarm_rate', false_alarm_rate),
+            ('rolling_dprime', _dprime(hit_rate, false_alarm_rate))]:
+        column = np.full(len(not_aborted), np.nan)
+        column[not_aborted] = values
+        performance[name] = column
+    return performance
@@ -1,16 +1,29 @@
+import warnings
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 
-from scipy import ndimage, stats
+from scipy import ndimage
 
 
 class EyeTrackingError(Exception):
     pass
 
 
-def load_eye_tracking_hdf(eye_tracking_file: Path) -> pd.DataFrame:
+def _hdf_nrows(store: pd.HDFStore, key: str) -> int:
+    """Number of rows of the dataframe stored under key, in either the
+    'fixed' or 'table' HDF5 format"""
+    storer = store.get_storer(key)
+    nrows = getattr(storer, 'nrows', None)
+    if nrows is None:
+        nrows = storer.shape[0]
+    return int(nrows)
+
+
+def load_eye_tracking_hdf(eye_tracking_file: Path,
+                          chunk_size: Optional[int] = None) -> pd.DataFrame:
     """Load a DeepLabCut hdf5 file containing eye tracking data into a
     dataframe.
 
@@ -25,6 +38,10 @@ def load_eye_tracking_hdf(eye_tracking_file: Path) -> pd.DataFrame:
         The hdf5 file will contain the following keys: "cr", "eye", "pupil".
         Each key has an associated dataframe with the following
         columns: "center_x", "center_y", "height", "width", "phi".
+    chunk_size : Optional[int]
+        If given, read each dataframe this many rows (frames) at a time, so
+        that only one chunk of the raw (possibly complex) data is in memory
+        at once. By default each dataframe is read whole.
 
     Returns
     -------
@@ -32,25 +49,55 @@ def load_eye_tracking_hdf(eye_tracking_file: Path) -> pd.DataFrame:
         A dataframe containing combined corneal reflection (cr), eyelid (eye),
         and pupil data. Column names for each field will be renamed by
         prepending the field name. (e.g. center_x -> eye_center_x)
+        If the fields do not share the same frames, their rows are aligned
+        on the union of their frames, with NaN for missing values.
     """
     eye_tracking_fields = ["cr", "eye", "pupil"]
 
-    eye_tracking_dfs = []
-    for field_name in eye_tracking_fields:
-        field_data = pd.read_hdf(eye_tracking_file, key=field_name)
-        new_col_name_map = {col_name: f"{field_name}_{col_name}"
-                            for col_name in field_data.columns}
-        field_data.rename(new_col_name_map, axis=1, inplace=True)
-        eye_tracking_dfs.append(field_data)
-
-    eye_tracking_data = pd.concat(eye_tracking_dfs, axis=1)
+    field_columns = []
+    field_arrays = []
+    field_indexes = []
+    with pd.HDFStore(eye_tracking_file, mode='r') as store:
+        for field_name in eye_tracking_fields:
+            n_rows = _hdf_nrows(store, field_name)
+            step = max(n_rows if chunk_size is None else chunk_size, 1)
+
+            field_array = None
+            field_index = []
+            # read at least once, for the columns of an empty dataframe
+            for start in range(0, max(n_rows, 1), step):
+                chunk = store.select(field_name, start=start,
+                                     stop=start + step)
+                if field_array is None:
+                    field_array = np.empty((n_rows, len(chunk.columns)))
+                    field_columns.append([f"{field_name}_{col_name}"
+                                          for col_name in chunk.columns])
+                # Values in the hdf5 may be complex (likely an artifact of
+                # the ellipse fitting process). Take only the real component.
+                field_array[start:start + len(chunk)] = \
+                    np.real(chunk.to_numpy())
+                field_index.append(chunk.index)
+
+            # n_rows is an upper bound (an empty 'fixed' dataframe is
+            # stored with a placeholder row)
+            n_read = sum(len(index) for index in field_index)
+            field_arrays.append(field_array[:n_read])
+            field_indexes.append(field_index[0].append(field_index[1:]))
+
+    if all(index.equals(field_indexes[0]) for index in field_indexes[1:]):
+        eye_tracking_data = pd.DataFrame(np.hstack(field_arrays),
+                                         columns=sum(field_columns, []),
+                                         index=field_indexes[0])
+    else:
+        # align the rows of the fields on their frames
+        eye_tracking_data = pd.concat(
+            [pd.DataFrame(array, columns=columns, index=index)
+             for array, columns, index
+             in zip(field_arrays, field_columns, field_indexes)],
+            axis=1)
     eye_tracking_data.index.name = 'frame'
 
-    # Values in the hdf5 may be complex (likely an artifact of the ellipse
-    # fitting process). Take only the real component.
-    eye_tracking_data = eye_tracking_data.apply(lambda x: np.real(x.to_numpy()))  # noqa: E501
-
-    return eye_tracking_data.astype(float)
+    return eye_tracking_data
 
 
 def determine_outliers(data_df: pd.DataFrame,
@@ -74,9 +121,22 @@ def determine_outliers(data_df: pd.DataFrame,
         True denotes that a row in the data_df contains at least one outlier.
     """
 
-    outliers = data_df.apply(stats.zscore,
-                             nan_policy='omit').apply(np.abs) > z_threshold
-    return pd.Series(outliers.any(axis=1))
+    outliers = _determine_outliers(data_df.to_numpy(dtype=float),
+                                   z_threshold=z_threshold)
+    return pd.Series(outliers, index=data_df.index)
+
+
+def _determine_outliers(data: np.ndarray, z_threshold: float) -> np.ndarray:
+    """determine_outliers for a (frames x features) array. NaN values are
+    ignored when computing the z-scores and are never outliers."""
+    with warnings.catch_warnings():
+        # all-nan columns have no outliers
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        mean = np.nanmean(data, axis=0)
+        std = np.nanstd(data, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_scores = np.abs(data - mean) / std
+    return (z_scores > z_threshold).any(axis=1)
 
 
 def compute_circular_area(df_row: pd.Series) -> float:
@@ -122,6 +182,58 @@ def compute_elliptical_area(df_row: pd.Series) -> float:
     return np.pi * df_row.iloc[0] * df_row.iloc[1]
 
 
+def compute_circular_areas(widths: np.ndarray,
+                           heights: np.ndarray) -> np.ndarray:
+    """Vectorized compute_circular_area: the circular area of the pupil in
+    each frame.
+
+    Parameters
+    ----------
+    widths : np.ndarray
+        "pupil_width" of each frame
+    heights : np.ndarray
+        "pupil_height" of each frame
+
+    Returns
+    -------
+    np.ndarray
+        The circular area of the pupil in pixels^2.
+    """
+    widths = np.asarray(widths, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    # same as max(width, height), including when either is nan
+    max_dims = np.where(heights > widths, heights, widths)
+    return np.pi * max_dims * max_dims
+
+
+def compute_elliptical_areas(widths: np.ndarray,
+                             heights: np.ndarray) -> np.ndarray:
+    """Vectorized compute_elliptical_area: the elliptical area of the cr or
+    eye in each frame.
+
+    Parameters
+    ----------
+    widths : np.ndarray
+        "cr_width" or "eye_width" of each frame
+    heights : np.ndarray
+        "cr_height" or "eye_height" of each frame
+
+    Returns
+    -------
+    np.ndarray
+        The elliptical area of the eye or cr in pixels^2
+    """
+    widths = np.asarray(widths, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    return np.pi * widths * heights
+
+
+def _dilate_blinks(blinks: np.ndarray, dilation_frames: int) -> np.ndarray:
+    if dilation_frames > 0:
+        return ndimage.binary_dilation(blinks, iterations=dilation_frames)
+    return blinks
+
+
 def determine_likely_blinks(eye_areas: pd.Series,
                             pupil_areas: pd.Series,
                             outliers: pd.Series,
@@ -146,15 +258,47 @@ def determine_likely_blinks(eye_areas: pd.Series,
         A pandas series of bool values that has the same length as the number
         of eye tracking dataframe rows (frames).
     """
-    blinks = pd.isnull(eye_areas) | pd.isnull(pupil_areas) | outliers
-    if dilation_frames > 0:
-        likely_blinks = ndimage.binary_dilation(blinks,
-                                                iterations=dilation_frames)
-    else:
-        likely_blinks = blinks
+    blinks = pd.isnull(np.asarray(eye_areas)) | \
+        pd.isnull(np.asarray(pupil_areas)) | \
+        np.asarray(outliers, dtype=bool)
+    likely_blinks = _dilate_blinks(blinks, dilation_frames)
     return pd.Series(likely_blinks, index=eye_areas.index)
 
 
+def determine_likely_blinks_from_areas(eye_areas: np.ndarray,
+                                       pupil_areas: np.ndarray,
+                                       z_threshold: float = 3.0,
+                                       dilation_frames: int = 2
+                                       ) -> np.ndarray:
+    """Determine eye tracking frames which contain likely blinks or outliers
+    directly from the eye and pupil areas, in a single pass over arrays.
+    Equivalent to determine_outliers followed by determine_likely_blinks.
+
+    Parameters
+    ----------
+    eye_areas : np.ndarray
+        The eye area of each frame.
+    pupil_areas : np.ndarray
+        The pupil area of each frame.
+    z_threshold : float
+        z-score values higher than the z_threshold will be considered
+        outliers, by default 3.0.
+    dilation_frames : int, optional
+        Determines the number of additional adjacent frames to mark as
+        'likely_blink', by default 2.
+
+    Returns
+    -------
+    np.ndarray
+        bool array, True for frames with likely blinks.
+    """
+    areas = np.column_stack([np.asarray(eye_areas, dtype=float),
+                             np.asarray(pupil_areas, dtype=float)])
+    blinks = np.isnan(areas).any(axis=1) | \
+        _determine_outliers(areas, z_threshold=z_threshold)
+    return _dilate_blinks(blinks, dilation_frames)
+
+
 def process_eye_tracking_data(eye_data: pd.DataFrame,
                               frame_times: pd.Series,
                               z_threshold: float = 3.0,
@@ -210,21 +354,17 @@ def process_eye_tracking_data(eye_data: pd.DataFrame,
                                f"number of eye tracking frames "
                                f"({len(eye_data.index)})!")
 
-    cr_areas = (eye_data[["cr_width", "cr_height"]]
-                .apply(compute_elliptical_area, axis=1))
-    eye_areas = (eye_data[["eye_width", "eye_height"]]
-                 .apply(compute_elliptical_area, axis=1))
-    pupil_areas = (eye_data[["pupil_width", "pupil_height"]]
-                   .apply(compute_circular_area, axis=1))
+    cr_areas = compute_elliptical_areas(eye_data["cr_width"].to_numpy(),
+                                        eye_data["cr_height"].to_numpy())
+    eye_areas = compute_elliptical_areas(eye_data["eye_width"].to_numpy(),
+                                         eye_data["eye_height"].to_numpy())
+    pupil_areas = compute_circular_areas(eye_data["pupil_width"].to_numpy(),
+                                         eye_data["pupil_height"].to_numpy())
 
     # only use eye and pupil areas for outlier detection
-    area_df = pd.concat([eye_areas, pupil_areas], axis=1)
-    outliers = determine_outliers(area_df, z_threshold=z_threshold)
-
-    likely_blinks = determine_likely_blinks(eye_areas,
-                                            pupil_areas,
-                                            outliers,
-                                            dilation_frames=dilation_frames)
+    likely_blinks = determine_likely_blinks_from_areas(
+        eye_areas, pupil_areas, z_threshold=z_threshold,
+        dilation_frames=dilation_frames)
 
     # remove outliers/likely blinks `pupil_area`, `cr_area`, `eye_area`
     pupil_areas_raw = pupil_areas.copy()
@@ -256,15 +396,8 @@ def filter_on_blinks(eye_tracking_data: pd.DataFrame):
     eye_tracking_data : pandas.DataFrame
         Data frame containing eye tracking data.
     """
-    likely_blinks = eye_tracking_data["likely_blink"]
-    eye_tracking_data.loc[likely_blinks, "eye_area"] = np.nan
-    eye_tracking_data.loc[likely_blinks, "pupil_area"] = np.nan
-    eye_tracking_data.loc[likely_blinks, "cr_area"] = np.nan
-
-    eye_tracking_data.loc[likely_blinks, "eye_width"] = np.nan
-    eye_tracking_data.loc[likely_blinks, "eye_height"] = np.nan
-    eye_tracking_data.loc[likely_blinks, "eye_phi"] = np.nan
-
-    eye_tracking_data.loc[likely_blinks, "pupil_width"] = np.nan
-    eye_tracking_data.loc[likely_blinks, "pupil_height"] = np.nan
-    eye_tracking_data.loc[likely_blinks, "pupil_phi"] = np.nan
+    likely_blinks = eye_tracking_data["likely_blink"].to_numpy(dtype=bool)
+    eye_tracking_data.loc[likely_blinks, ["eye_area", "pupil_area", "cr_area",
+                                          "eye_width", "eye_height", "eye_phi",
+                                          "pupil_width", "pupil_height",
+                                          "pupil_phi"]] = np.nan
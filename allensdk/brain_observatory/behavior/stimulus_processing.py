@@ -588,22 +588,30 @@ def get_flashes_since_change(
     flashes_since_change : pandas.Series
         Number of times the same image is flashed between image changes.
     """
-    flashes_since_change = pd.Series(data=np.zeros(len(stimulus_presentations),
-                                                   dtype=float),
-                                     index=stimulus_presentations.index,
-                                     name='flashes_since_change')
-    for idx, (pd_index, row) in enumerate(stimulus_presentations.iterrows()):
-        omitted = row['omitted']
-        if pd.isna(row['omitted']):
-            omitted = False
-        if row['image_name'] == 'omitted' or omitted:
-            flashes_since_change.iloc[idx] = flashes_since_change.iloc[idx - 1]
-        else:
-            if row['is_change'] or idx == 0:
-                flashes_since_change.iloc[idx] = 0
-            else:
-                flashes_since_change.iloc[idx] = \
-                    flashes_since_change.iloc[idx - 1] + 1
+    omitted = stimulus_presentations['omitted'].fillna(False) \
+        .to_numpy().astype(bool)
+    omitted |= (stimulus_presentations['image_name'] == 'omitted') \
+        .to_numpy(dtype=bool)
+    is_change = stimulus_presentations['is_change'].to_numpy().astype(bool)
+
+    # Omissions repeat the previous count. Every other presentation
+    # increments it, except at a change (and the first presentation)
+    # where it is reset to 0.
+    is_flash = ~omitted
+    is_reset = is_flash & is_change
+    is_reset[:1] = is_flash[:1]
+
+    # Number of (non omitted) flashes up to and including each presentation
+    n_flashes = np.cumsum(is_flash)
+
+    # ... and up to the most recent reset
+    n_flashes_at_reset = np.maximum.accumulate(
+        np.where(is_reset, n_flashes, 0))
+
+    flashes_since_change = pd.Series(
+        data=(n_flashes - n_flashes_at_reset).astype(float),
+        index=stimulus_presentations.index,
+        name='flashes_since_change')
     return flashes_since_change
 
 
@@ -650,13 +658,38 @@ def compute_trials_id_for_stimulus(
             name='active')
 
     # Find stimulus blocks that start within a trial. Copy the trial_id
-    # into our new trials_ids series.
-    for idx, trial in trials_sorted.iterrows():
-        stim_mask = (stim_pres_sorted.start_time > trial.start_time) \
-                    & (stim_pres_sorted.start_time < trial.stop_time)
-        trials_ids[stim_mask] = idx
-        if not has_active:
-            active_sorted[stim_mask] = True
+    # into our new trials_ids series. Where trials overlap, the
+    # presentation is assigned to the latest starting trial containing it.
+    trial_ids = trials_sorted.index.values
+    trial_starts = trials_sorted.start_time.values
+    trial_stops = trials_sorted.stop_time.values
+    stim_starts = stim_pres_sorted.start_time.values
+
+    # Index of the last trial (in start time order) starting before
+    # each presentation
+    trial_idx = np.searchsorted(trial_starts, stim_starts, side='left') - 1
+    has_trial = trial_idx >= 0
+    trial_idx = np.where(has_trial, trial_idx, 0)
+
+    in_trial = has_trial
+    if len(trial_ids) > 0:
+        in_trial = has_trial & (stim_starts < trial_stops[trial_idx])
+
+        # When trials overlap, a presentation can be outside of the last
+        # trial starting before it but inside an earlier, longer trial
+        latest_stop = np.fmax.accumulate(trial_stops)
+        in_earlier_trial = has_trial & ~in_trial & \
+            (stim_starts < latest_stop[trial_idx])
+        for stim_idx in np.flatnonzero(in_earlier_trial):
+            trial_idx[stim_idx] = np.flatnonzero(
+                (trial_starts[:trial_idx[stim_idx]] < stim_starts[stim_idx])
+                & (stim_starts[stim_idx] < trial_stops[:trial_idx[stim_idx]])
+            )[-1]
+        in_trial |= in_earlier_trial
+
+        trials_ids[in_trial] = trial_ids[trial_idx[in_trial]]
+    if not has_active:
+        active_sorted[in_trial] = True
 
     # The code below finds all stimulus blocks that contain images/trials
     # and attempts to detect blocks that are identical to copy the associated
@@ -674,15 +707,22 @@ def compute_trials_id_for_stimulus(
 
     # Copy the trials_id into the passive block if it exists.
     if len(passive_stim_blocks) > 0:
+        # Positions of the presentations in each block
+        block_positions = stim_blocks.groupby(stim_blocks.values).indices
+        no_positions = np.array([], dtype=int)
+        image_names = stim_image_names.values
+        ids = trials_ids.to_numpy(copy=True)
         for active_stim_block in active_stim_blocks:
-            active_block_mask = stim_blocks == active_stim_block
-            active_images = stim_image_names[active_block_mask].values
+            active_positions = block_positions.get(active_stim_block,
+                                                   no_positions)
+            active_images = image_names[active_positions]
             for passive_stim_block in passive_stim_blocks:
-                passive_block_mask = stim_blocks == passive_stim_block
+                passive_positions = block_positions.get(passive_stim_block,
+                                                        no_positions)
                 if np.array_equal(active_images,
-                                  stim_image_names[passive_block_mask].values):
-                    trials_ids.loc[passive_block_mask] = \
-                        trials_ids[active_block_mask].values
+                                  image_names[passive_positions]):
+                    ids[passive_positions] = ids[active_positions]
+        trials_ids[:] = ids
 
     return trials_ids.sort_index()
 
@@ -39,12 +39,15 @@ import logging
 
 import numpy as np
 import scipy.sparse as sparse
+import scipy.sparse.csgraph as csgraph
 import scipy.linalg as linalg
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 
 import allensdk.internal.brain_observatory.mask_set as mask_set
 from allensdk.config.manifest import Manifest
+from allensdk.core.multiprocessing_utils import imap_with_shared, \
+    shareable_array
 
 
 def identify_valid_masks(mask_array):
@@ -110,9 +113,141 @@ def _demix_point(source_frame: np.ndarray, mask_traces: np.ndarray,
     return demix_traces
 
 
+def _overlap_groups(flat_masks: sparse.csr_matrix) -> list:
+    """
+    Helper function to find the structure of the demixing systems
+    shared by every frame. Masks that do not overlap (directly or through
+    other masks) form independent systems, which are grouped by size so
+    that systems of the same size can be solved together.
+
+    Parameters
+    ==========
+    flat_masks: 2d-array of masks unraveled in the x-y dimension
+
+    Returns
+    =======
+    List of (components, pair_pixels, pair_index) for each system size,
+    where `components` is a 2d array of the mask indices in each system
+    (one system per row), `pair_pixels` is a sparse matrix whose product
+    with a frame gives the (unnormalized) overlap matrix entry for each
+    pair of overlapping masks in these systems, and `pair_index` is a
+    tuple of (system, row, column, mask of column) for each pair.
+    """
+    N = flat_masks.shape[0]
+    overlaps = flat_masks.dot(flat_masks.T).tocoo()
+    num_components, labels = csgraph.connected_components(
+        overlaps, directed=False)
+
+    # position of each mask within its system
+    order = np.argsort(labels, kind="stable")
+    sizes = np.bincount(labels, minlength=num_components)
+    starts = np.cumsum(sizes) - sizes
+    position = np.empty(N, dtype=int)
+    position[order] = np.arange(N) - starts[labels[order]]
+
+    groups = []
+    for size in np.unique(sizes):
+        group_labels = np.flatnonzero(sizes == size)
+        slot = np.full(num_components, -1)
+        slot[group_labels] = np.arange(len(group_labels))
+
+        components = np.empty((len(group_labels), size), dtype=int)
+        in_group = slot[labels] >= 0
+        components[slot[labels[in_group]], position[in_group]] = \
+            np.flatnonzero(in_group)
+
+        pairs = in_group[overlaps.row]
+        rows = overlaps.row[pairs]
+        cols = overlaps.col[pairs]
+        pair_pixels = flat_masks[rows].multiply(flat_masks[cols]).tocsr()
+        pair_index = (slot[labels[rows]], position[rows], position[cols],
+                      cols)
+        groups.append((components, pair_pixels, pair_index))
+
+    return groups
+
+
+def _demix_block(stack_block: np.ndarray, mask_traces: np.ndarray,
+                 groups: list,
+                 pixels_per_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Helper function to run demixing for a block of frames, solving the
+    systems of all frames (and of all independent groups of masks of the
+    same size) with one call to the linear solver.
+
+    Parameters
+    ==========
+    stack_block: values of the movie source for each frame in the block,
+    unraveled in the x-y dimension (2d array of shape (t, HxW))
+    mask_traces: values of the mask traces for each frame in the block
+        (2d array of shape (n, t))
+    groups: output of _overlap_groups for the masks
+    pixels_per_mask: Number of pixels for each mask associated with
+        trace (1d-array of length `n`)
+
+    Returns
+    =======
+    Tuple of demixed traces (2d array of shape (n, t), zero for dropped
+    frames) and whether each frame was dropped because of zero signal
+    in one of its traces.
+    """
+    mask_weighted_traces = mask_traces.T * pixels_per_mask
+    drop_frames = (mask_weighted_traces == 0).any(axis=1)
+    keep = np.flatnonzero(~drop_frames)
+
+    demix_traces = np.zeros(mask_traces.shape)
+    if len(keep) == 0:
+        return demix_traces, drop_frames
+
+    mask_weighted_traces = mask_weighted_traces[keep]
+    norm = pixels_per_mask / mask_weighted_traces
+    frames = np.ascontiguousarray(stack_block[keep].T, dtype=float)
+
+    for components, pair_pixels, pair_index in groups:
+        system, row, col, mask_col = pair_index
+        num_systems, size = components.shape
+
+        overlap = np.zeros((len(keep), num_systems, size, size))
+        overlap[:, system, row, col] = \
+            pair_pixels.dot(frames).T * norm[:, mask_col]
+        rhs = mask_weighted_traces[:, components]
+
+        try:
+            solution = np.linalg.solve(overlap, rhs[..., np.newaxis])[..., 0]
+        except np.linalg.LinAlgError:
+            solution = np.empty(rhs.shape)
+            for t, s in np.ndindex(rhs.shape[:2]):
+                try:
+                    solution[t, s] = linalg.solve(overlap[t, s], rhs[t, s])
+                except linalg.LinAlgError:
+                    logging.warning(
+                        "Singular matrix, using least squares to solve.")
+                    solution[t, s], _, _, _ = linalg.lstsq(overlap[t, s],
+                                                           rhs[t, s])
+
+        demix_traces[components, keep[:, np.newaxis, np.newaxis]] = solution
+
+    return demix_traces, drop_frames
+
+
+def _shared_demix_block(shared, t):
+    stack, raw_traces, groups, pixels_per_mask, max_block_size = shared
+    return (t,) + _demix_stack_block(t, stack, raw_traces, groups,
+                                     pixels_per_mask, max_block_size)
+
+
+def _demix_stack_block(t, stack, raw_traces, groups, pixels_per_mask,
+                       max_block_size):
+    block_T = min(raw_traces.shape[1] - t, max_block_size)
+    stack_block = stack[t:t + block_T].reshape(block_T, -1)
+    return _demix_block(stack_block, raw_traces[:, t:t + block_T], groups,
+                        pixels_per_mask)
+
+
 def demix_time_dep_masks(raw_traces: np.ndarray, stack: np.ndarray,
                          masks: np.ndarray,
-                         max_block_size: int = 1000) -> Tuple[np.ndarray, list]:
+                         max_block_size: int = 1000,
+                         n_workers: int = 1) -> Tuple[np.ndarray, list]:
     """
     Demix traces of potentially overlapping masks extraced from a single
     2p recording.
@@ -127,6 +262,8 @@ def demix_time_dep_masks(raw_traces: np.ndarray, stack: np.ndarray,
         an individual frame in the movie `stack`.
     :max_block_size: int representing maximum number of movie frames to read
         at a time (-1 for full length `t` of `stack`) (the default is 1000)
+    :n_workers: int representing the number of worker processes demixing
+        separate blocks of frames (the default is 1)
     :return: Tuple of demixed traces and whether each frame was skipped
         in the demixing calculation.
     """
@@ -146,25 +283,27 @@ def demix_time_dep_masks(raw_traces: np.ndarray, stack: np.ndarray,
     flat_masks = masks.reshape(N, P)
     flat_masks = sparse.csr_matrix(flat_masks)
 
-    drop_frames = []
-    demix_traces = np.zeros((N, T))
-
-    for t in range(T):
+    # the overlap structure of the masks is the same for every frame
+    groups = _overlap_groups(flat_masks)
 
-        block_t = t % max_block_size
-        if block_t == 0:  # load next block into memory and reshape
-            block_T = np.min([(T - t), max_block_size])
-            stack_block = stack[t : t+block_T].reshape(block_T, P)
-
-        demixed_point = _demix_point(
-            stack_block[block_t], raw_traces[:, t], flat_masks,
-            num_pixels_in_mask)
-        if demixed_point is not None:
-            demix_traces[:, t] = demixed_point
-            drop_frames.append(False)
-        else:
-            drop_frames.append(True)
-    return demix_traces, drop_frames
+    drop_frames = np.zeros(T, dtype=bool)
+    demix_traces = np.zeros((N, T))
+    block_starts = range(0, T, max_block_size)
+
+    if n_workers > 1 and len(block_starts) > 1:
+        # an h5py dataset is replaced by a reference that the workers
+        # can unpickle
+        stack = shareable_array(stack)
+    shared = (stack, raw_traces, groups, num_pixels_in_mask, max_block_size)
+    blocks = imap_with_shared(_shared_demix_block, block_starts,
+                              shared=shared, n_workers=n_workers,
+                              ordered=False)
+
+    for t, block_traces, block_drop_frames in blocks:
+        demix_traces[:, t:t + max_block_size] = block_traces
+        drop_frames[t:t + max_block_size] = block_drop_frames
+
+    return demix_traces, drop_frames.tolist()
 
 
 def plot_traces(raw_trace, demix_trace, roi_id, roi_ind, save_file):
@@ -43,6 +43,7 @@ from scipy.ndimage.filters import median_filter
 
 from allensdk.core.brain_observatory_nwb_data_set import \
     BrainObservatoryNwbDataSet
+from allensdk.core.multiprocessing_utils import imap_with_shared
 
 GAUSSIAN_MAD_STD_SCALE = 1.4826
 
@@ -154,6 +155,136 @@ def movingaverage(x, kernelsize, y):
     return 0
 
 
+def movingmode_traces(traces, kernelsize, y):
+    """Compute the windowed mode of each row of a 2D array.  The result for
+    each row is identical to that of :func:`movingmode_fast`, but the running
+    histograms of all rows are updated together, one sample at a time.
+
+    Parameters
+    ----------
+    traces : np.ndarray
+        2D array of traces to be analyzed
+    kernelsize : int
+        Size of the moving window
+    y : np.ndarray
+        2D output array to store the results
+    """
+
+    n, length = traces.shape
+    if n == 0:
+        return 0
+
+    # offset so that each trace is non-negative
+    minval = np.minimum(traces.min(axis=1), 0)
+    x = traces - minval[:, np.newaxis]
+
+    # the histograms of all traces are stored end to end, with enough bins
+    # for the largest trace
+    nbins = int(x.max() + 2)
+    offsets = np.arange(n) * nbins
+    bins = np.rint(x).astype(np.intp).T + offsets
+
+    # compute a histogram of a half kernel
+    halfsize = int(kernelsize / 2)
+    histo = np.bincount(bins[:halfsize].ravel(), minlength=n * nbins)
+    histo_rows = histo.reshape(n, nbins)
+
+    # find the mode of the first half kernel
+    mode = histo_rows.argmax(axis=1) + offsets
+
+    for m in range(length):
+        if m >= halfsize:
+            p = bins[m - halfsize]
+            histo[p] -= 1
+
+            # need to find possibly new mode value
+            changed = np.flatnonzero(p == mode)
+            if len(changed) > 0:
+                mode[changed] = histo_rows[changed].argmax(axis=1) + \
+                    offsets[changed]
+
+        if m + halfsize < length:
+            q = bins[m + halfsize]
+            histo[q] += 1
+            mode = np.where(histo[q] > histo[mode], q, mode)
+
+        y[:, m] = mode - offsets
+
+    # undo the offset
+    y += minval[:, np.newaxis]
+
+    return 0
+
+
+def movingaverage_traces(x, kernelsize, y):
+    """Compute the windowed average of each row of a 2D array.  The result
+    for each row is identical to that of :func:`movingaverage`.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        2D array to be analyzed
+    kernelsize : int
+        Size of the moving window
+    y : np.ndarray
+        2D output array to store the results
+    """
+
+    length = x.shape[1]
+    halfsize = int(kernelsize / 2)
+    sumkernel = np.sum(x[:, 0:halfsize], axis=1)
+    for m in range(0, halfsize):
+        sumkernel = sumkernel + x[:, m + halfsize]
+        y[:, m] = sumkernel / (halfsize + m)
+
+    sumkernel = np.sum(x[:, 0:kernelsize], axis=1)
+    for m in range(halfsize, length - halfsize):
+        sumkernel = sumkernel - x[:, m - halfsize] + x[:, m + halfsize]
+        y[:, m] = sumkernel / kernelsize
+
+    for m in range(length - halfsize, length):
+        sumkernel = sumkernel - x[:, m - halfsize]
+        y[:, m] = sumkernel / (halfsize - 1 + (length - m))
+
+    return 0
+
+
+def _apply_to_block(shared, bounds):
+    traces, func, kwargs = shared
+    start, stop = bounds
+    return func(traces[start:stop], **kwargs)
+
+
+def _map_trace_blocks(func, traces, n_workers=1, **kwargs):
+    """Apply a function to blocks of rows of a 2D array of traces, in a
+    process pool if n_workers > 1.
+
+    Parameters
+    ----------
+    func : function
+        Function taking a 2D array of traces and the keyword arguments
+    traces : np.ndarray
+        2D array of traces
+    n_workers : int
+        Number of worker processes, each given one block of rows
+
+    Returns
+    -------
+    list
+        The result of func for each block, in order
+    """
+    n_blocks = max(min(n_workers, traces.shape[0]), 1)
+    edges = np.linspace(0, traces.shape[0], n_blocks + 1).astype(int)
+    bounds = list(zip(edges[:-1], edges[1:]))
+
+    if n_blocks == 1:
+        return [func(traces, **kwargs)]
+
+    return list(imap_with_shared(_apply_to_block, bounds,
+                                 shared=(traces, func, kwargs),
+                                 n_workers=n_blocks))
+
+
 def plot_onetrace(dff, fc):
     """Debug plotting function"""
     qs = np.rint(np.linspace(0, len(dff), 5)).astype(int)
@@ -185,7 +316,8 @@ def plot_onetrace(dff, fc):
 
 def compute_dff_windowed_mode(traces,
                               mode_kernelsize=5400,
-                              mean_kernelsize=3000):
+                              mean_kernelsize=3000,
+                              n_workers=1):
     """Compute dF/F of a set of traces using a low-pass windowed-mode operator.
 
     The operation is basically:
@@ -202,6 +334,8 @@ def compute_dff_windowed_mode(traces,
         Window size to use for windowed_mode.
     mean_kernelsize : int
         Window size to use for windowed_mean.
+    n_workers : int
+        Number of worker processes, each processing a block of traces.
 
     Returns
     -------
@@ -222,33 +356,42 @@ def compute_dff_windowed_mode(traces,
     logging.debug("trace matrix shape: %d %d" %
                   (traces.shape[0], traces.shape[1]))
 
-    modeline = np.zeros(traces.shape[1])
-    modelineLP = np.zeros(traces.shape[1])
     dff = np.zeros((traces.shape[0], traces.shape[1]))
 
     logging.debug("computing df/f")
 
-    for n in range(0, traces.shape[0]):
-        if np.any(np.isnan(traces[n])):
-            logging.warning(
-                "trace for roi %d contains NaNs, setting to NaN", n)
-            dff[n, :] = np.nan
-            continue
-
-        movingmode_fast(traces[n, :], mode_kernelsize, modeline[:])
-        movingaverage(modeline[:], mean_kernelsize, modelineLP[:])
-        dff[n, :] = (traces[n, :] - modelineLP[:]) / modelineLP[:]
+    has_nans = np.isnan(traces).any(axis=1)
+    for n in np.flatnonzero(has_nans):
+        logging.warning(
+            "trace for roi %d contains NaNs, setting to NaN", n)
+        dff[n, :] = np.nan
 
-        logging.debug("finished trace %d/%d" % (n + 1, traces.shape[0]))
+    valid = np.flatnonzero(~has_nans)
+    if len(valid) > 0:
+        dff[valid] = np.concatenate(_map_trace_blocks(
+            _windowed_mode_dff, traces[valid], n_workers,
+            mode_kernelsize=mode_kernelsize,
+            mean_kernelsize=mean_kernelsize))
 
     return dff
 
 
+def _windowed_mode_dff(traces, mode_kernelsize, mean_kernelsize):
+    modeline = np.zeros(traces.shape)
+    modelineLP = np.zeros(traces.shape)
+
+    movingmode_traces(traces, mode_kernelsize, modeline)
+    movingaverage_traces(modeline, mean_kernelsize, modelineLP)
+
+    return (traces - modelineLP) / modelineLP
+
+
 def compute_dff_windowed_median(traces,
                                 median_kernel_long=5401,
                                 median_kernel_short=101,
                                 noise_stds=None,
                                 n_small_baseline_frames=None,
+                                n_workers=1,
                                 **kwargs):
     """Compute dF/F of a set of traces with median filter detrending.
 
@@ -277,6 +420,8 @@ def compute_dff_windowed_median(traces,
         List that will contain the number of frames for each trace where
         the long-timescale median window is less than noise_std(T). The
         value for each trace will be appended to the list if provided.
+    n_workers : int
+        Number of worker processes, each processing a block of traces.
     kwargs:
         Additional keyword arguments are passed to :func:`noise_std` .
 
@@ -288,7 +433,25 @@ def compute_dff_windowed_median(traces,
     _check_kernel(median_kernel_long, traces.shape[1])
     _check_kernel(median_kernel_short, traces.shape[1])
 
+    blocks = _map_trace_blocks(_windowed_median_dff, traces, n_workers,
+                               median_kernel_long=median_kernel_long,
+                               median_kernel_short=median_kernel_short,
+                               **kwargs)
+
+    for _, block_noise_stds, block_n_small_baseline_frames in blocks:
+        if noise_stds is not None:
+            noise_stds.extend(block_noise_stds)
+        if n_small_baseline_frames is not None:
+            n_small_baseline_frames.extend(block_n_small_baseline_frames)
+
+    return np.concatenate([dff_traces for dff_traces, _, _ in blocks])
+
+
+def _windowed_median_dff(traces, median_kernel_long, median_kernel_short,
+                         **kwargs):
     dff_traces = np.copy(traces)
+    noise_stds = []
+    n_small_baseline_frames = []
 
     for dff in dff_traces:
         sigma_f = noise_std(dff, **kwargs)
@@ -298,19 +461,17 @@ def compute_dff_windowed_median(traces,
         dff -= tf
         dff /= np.maximum(tf, sigma_f)
 
-        if n_small_baseline_frames is not None:
-            n_small_baseline_frames.append(np.sum(tf <= sigma_f))
+        n_small_baseline_frames.append(np.sum(tf <= sigma_f))
 
         sigma_dff = noise_std(dff, **kwargs)
-        if noise_stds is not None:
-            noise_stds.append(sigma_dff)
+        noise_stds.append(sigma_dff)
 
         # short timescale detrending
         tf = median_filter(dff, median_kernel_short, mode='constant')
         tf = np.minimum(tf, 2.5*sigma_dff)
         dff -= tf
 
-    return dff_traces
+    return dff_traces, noise_stds, n_small_baseline_frames
 
 
 def _check_kernel(kernel_size, data_size):
@@ -1,3 +1,4 @@
+import functools
 import numpy as np
 import requests
 import logging
@@ -126,8 +127,10 @@ def run_csd(args: dict) -> dict:
         else:
             lfp_channels = np.arange(0, probe['total_channels'])
 
-        lfp_referenced = remove_lfp_noise(
-            lfp=lfp_raw,
+        # referencing is applied to the samples surrounding each trial
+        # window as they are read, rather than to the whole recording
+        reference_lfp = functools.partial(
+            remove_lfp_noise,
             surface_channel=probe['surface_channel'],
             channel_numbers=lfp_channels,
             max_out_of_brain_channels=args['max_out_of_brain_channels']
@@ -136,10 +139,11 @@ def run_csd(args: dict) -> dict:
         logging.info('Accumulating LFP data')
         accumulated_lfp_data = accumulate_lfp_data(
             timestamps=timestamps,
-            lfp_raw=lfp_referenced,
+            lfp_raw=lfp_raw,
             lfp_channels=lfp_channels,
             trial_windows=trial_windows,
-            volts_per_bit=args['volts_per_bit']
+            volts_per_bit=args['volts_per_bit'],
+            reference_function=reference_lfp
         )
 
         logging.info('Removing noisy and reference channels')
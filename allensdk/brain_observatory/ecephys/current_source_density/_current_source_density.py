@@ -95,7 +95,10 @@ def accumulate_lfp_data(timestamps: np.ndarray, lfp_raw: np.ndarray,
                         trial_windows: List[np.ndarray],
                         volts_per_bit: float = 1.0,
                         extractor_factory: Callable = (
-                            regular_grid_extractor_factory)
+                            regular_grid_extractor_factory),
+                        reference_function: Optional[
+                            Callable[[np.ndarray], np.ndarray]] = None,
+                        chunk_size: int = 2 ** 15
                         ) -> np.ndarray:
     ''' Extracts slices of LFP data at defined channels and times.
 
@@ -104,7 +107,8 @@ def accumulate_lfp_data(timestamps: np.ndarray, lfp_raw: np.ndarray,
     timestamps : numpy.ndarray
         Associates LFP sample indices with times in seconds.
     lfp_raw : numpy.ndarray
-        Dimensions are samples X channels.
+        Dimensions are samples X channels. May be a memory map; only the
+        samples surrounding the trial windows are read.
     lfp_channels : numpy.ndarray
         Indices of channels to be used in accumulation
     trial_windows : List[numpy.ndarray]
@@ -115,6 +119,14 @@ def accumulate_lfp_data(timestamps: np.ndarray, lfp_raw: np.ndarray,
     extractor_factory: Callable
         The LFP extractor function to use, defaults to
         regular_grid_extractor_factory
+    reference_function: Callable, optional
+        Applied to blocks of samples (all channels) read from lfp_raw
+        before extraction, e.g. to re-reference the data. Must operate
+        on each sample independently. Only supported with the default
+        extractor_factory.
+    chunk_size: int, optional
+        Maximum number of window samples extracted at once. Bounds the
+        amount of LFP data read into memory at a time.
 
     Returns
     -------
@@ -123,6 +135,30 @@ def accumulate_lfp_data(timestamps: np.ndarray, lfp_raw: np.ndarray,
 
     '''
 
+    if extractor_factory is not regular_grid_extractor_factory:
+        if reference_function is not None:
+            lfp_raw = reference_function(lfp_raw)
+        accumulated = _accumulate_with_extractor(
+            timestamps, lfp_raw, lfp_channels, trial_windows,
+            extractor_factory)
+    else:
+        accumulated = _accumulate_linear(
+            timestamps, lfp_raw, lfp_channels, trial_windows,
+            reference_function, chunk_size)
+
+    msg = 'extracted lfp data for {} trials, {} channels, and {} samples'
+    logging.info(msg.format(*accumulated.shape))
+    return accumulated * volts_per_bit
+
+
+def _accumulate_with_extractor(timestamps: np.ndarray, lfp_raw: np.ndarray,
+                               lfp_channels: np.ndarray,
+                               trial_windows: List[np.ndarray],
+                               extractor_factory: Callable) -> np.ndarray:
+    ''' Extracts trial windows one channel and trial at a time, using an
+    extractor built by extractor_factory for each channel.
+    '''
+
     num_samples = min(len(tw) for tw in trial_windows)
     num_trials = len(trial_windows)
     num_channels = len(lfp_channels)
@@ -141,9 +177,78 @@ def accumulate_lfp_data(timestamps: np.ndarray, lfp_raw: np.ndarray,
                 current = np.around(current).astype(accumulated.dtype)
             accumulated[trial_index, channel_idx, :] = current
 
-    msg = 'extracted lfp data for {} trials, {} channels, and {} samples'
-    logging.info(msg.format(*accumulated.shape))
-    return accumulated * volts_per_bit
+    return accumulated
+
+
+def _accumulate_linear(timestamps: np.ndarray, lfp_raw: np.ndarray,
+                       lfp_channels: np.ndarray,
+                       trial_windows: List[np.ndarray],
+                       reference_function: Optional[Callable],
+                       chunk_size: int) -> np.ndarray:
+    ''' Linearly interpolates all channels at all trial window times,
+    matching regular_grid_extractor_factory (samples with negative
+    timestamps are ignored and times outside of the remaining samples
+    are NaN).
+
+    The fractional sample position of every window time is found with a
+    single search. Trials are then processed in chunks: the samples on
+    either side of each window time are gathered from lfp_raw for all
+    channels at once and blended.
+    '''
+
+    num_samples = min(len(tw) for tw in trial_windows)
+    num_trials = len(trial_windows)
+    lfp_channels = np.asarray(lfp_channels)
+
+    windows = np.array([np.asarray(tw, dtype=float)[:num_samples]
+                        for tw in trial_windows]).reshape(num_trials,
+                                                          num_samples)
+
+    valid_rows = np.flatnonzero(timestamps >= 0)
+    grid = timestamps[valid_rows].astype(float)
+
+    position = np.searchsorted(grid, windows, side='right') - 1
+    position = np.clip(position, 0, max(len(grid) - 2, 0))
+    next_position = np.minimum(position + 1, len(grid) - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = (windows - grid[position]) / \
+            (grid[next_position] - grid[position])
+    out_of_bounds = ~((windows >= grid[0]) & (windows <= grid[-1]))
+
+    trials_per_chunk = max(1, chunk_size // max(num_samples, 1))
+    accumulated = None
+
+    for chunk_start in range(0, num_trials, trials_per_chunk):
+        chunk = slice(chunk_start, chunk_start + trials_per_chunk)
+
+        # read each needed sample once, in increasing order
+        rows, inverse = np.unique(
+            np.stack([position[chunk], next_position[chunk]]),
+            return_inverse=True)
+        inverse = inverse.reshape((2,) + position[chunk].shape)
+
+        block = np.asarray(lfp_raw[valid_rows[rows]])
+        if reference_function is not None:
+            block = reference_function(block)
+        block = block[:, lfp_channels]
+
+        if accumulated is None:
+            accumulated = np.zeros(
+                (num_trials, len(lfp_channels), num_samples),
+                dtype=block.dtype)
+
+        # same arithmetic as scipy's RegularGridInterpolator
+        weight = fraction[chunk][:, :, np.newaxis]
+        current = block[inverse[0]].astype(float) * (1 - weight) + \
+            block[inverse[1]].astype(float) * weight
+        current[out_of_bounds[chunk]] = np.nan
+        current = current.transpose(0, 2, 1)
+
+        if np.issubdtype(accumulated.dtype, np.integer):
+            current = np.around(current).astype(accumulated.dtype)
+        accumulated[chunk] = current
+
+    return accumulated
 
 
 def compute_csd(trial_mean_lfp: np.ndarray,
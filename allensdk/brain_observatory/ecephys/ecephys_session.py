@@ -5,7 +5,6 @@ from typing import Optional
 
 import numpy as np
 import pandas as pd
-import scipy.stats
 import xarray as xr
 
 from allensdk.core.utilities import literal_col_eval, df_list_to_tuple
@@ -30,6 +29,10 @@ NON_STIMULUS_PARAMETERS = tuple([
     "stimulus_condition_id"
 ])
 
+# approximate number of (row, bin, unit) counts computed at once when
+# building spike histograms
+SPIKE_HISTOGRAM_CHUNK_ELEMENTS = 2 ** 22
+
 
 class EcephysSession(LazyPropertyMixin):
     ''' Represents data from a single EcephysSession
@@ -367,7 +370,8 @@ class EcephysSession(LazyPropertyMixin):
 
         return self.api.get_current_source_density(probe_id)
 
-    def get_lfp(self, probe_id, mask_invalid_intervals=True):
+    def get_lfp(self, probe_id, mask_invalid_intervals=True,
+                time_ranges=None, channel_ids=None):
         ''' Load an xarray DataArray with LFP data from channels on a
          single probe
 
@@ -378,6 +382,16 @@ class EcephysSession(LazyPropertyMixin):
         mask_invalid_intervals : bool
             if True (default) will mask data in the invalid intervals with
             np.nan
+        time_ranges : tuple or list of tuples, optional
+            (start_time, stop_time) in seconds, or a list of such pairs.
+            If provided, only samples with start_time <= time < stop_time
+            in one of the ranges are read from the file. Overlapping
+            ranges are merged. If None (default), the whole session is
+            loaded.
+        channel_ids : array-like, optional
+            If provided, only these channels are read from the file, in
+            the order given. If None (default), all channels are loaded.
+
         Returns
         -------
         xr.DataArray :
@@ -388,43 +402,61 @@ class EcephysSession(LazyPropertyMixin):
         -----
         Unlike many other data access methods on this class. This one does not
         cache the loaded data in memory due to the large size of the LFP data.
+        Use time_ranges and channel_ids to avoid loading the whole probe.
 
         '''
 
+        if time_ranges is None and channel_ids is None:
+            lfp = self.api.get_lfp(probe_id)
+        else:
+            lfp = self.api.get_lfp(probe_id, time_ranges=time_ranges,
+                                   channel_ids=channel_ids)
+
         if mask_invalid_intervals:
             probe_name = self.probes.loc[probe_id]["description"]
             fail_tags = ["all_probes", probe_name]
             invalid_time_intervals = \
                 self._filter_invalid_times_by_tags(fail_tags)
-            lfp = self.api.get_lfp(probe_id)
             time_points = lfp.time
             valid_time_points = \
                 self._get_valid_time_points(time_points,
                                             invalid_time_intervals)
             return lfp.where(cond=valid_time_points)
         else:
-            return self.api.get_lfp(probe_id)
+            return lfp
 
     def _get_valid_time_points(self, time_points, invalid_time_intevals):
+        """ Flag the time points which fall outside of every (closed)
+        invalid interval.
 
-        all_time_points = xr.DataArray(
+        The intervals are sorted by start time once. Each time point is
+        then matched to the last interval starting at or before it with a
+        binary search. It is invalid if it is no later than the latest
+        stop time among the intervals up to and including that one.
+        """
+        time_values = np.asarray(time_points)
+        valid = np.ones(len(time_values), dtype=bool)
+
+        if len(invalid_time_intevals) > 0:
+            order = np.argsort(
+                invalid_time_intevals['start_time'].values, kind='stable')
+            starts = invalid_time_intevals['start_time'].values[order]
+            stops = np.maximum.accumulate(
+                invalid_time_intevals['stop_time'].values[order])
+
+            last_start = np.searchsorted(starts, time_values,
+                                         side='right') - 1
+            started = last_start >= 0
+            valid[started] = \
+                time_values[started] > stops[last_start[started]]
+
+        return xr.DataArray(
             name="time_points",
-            data=[True] * len(time_points),
+            data=valid,
             dims=['time'],
-            coords=[time_points]
+            coords=[time_values]
         )
 
-        valid_time_points = all_time_points
-        for ix, invalid_time_interval in invalid_time_intevals.iterrows():
-            invalid_time_points = \
-                ((time_points >= invalid_time_interval['start_time'])
-                 & (time_points <= invalid_time_interval['stop_time']))
-            valid_time_points = \
-                np.logical_and(valid_time_points,
-                               np.logical_not(invalid_time_points))
-
-        return valid_time_points
-
     def _filter_invalid_times_by_tags(self, tags):
         """
         Parameters
@@ -688,7 +720,9 @@ class EcephysSession(LazyPropertyMixin):
         binarize=False,
         dtype=None,
         large_bin_size_threshold=0.001,
-        time_domain_callback=None
+        time_domain_callback=None,
+        out=None,
+        chunk_size=None
     ):
         ''' Build an array of spike counts surrounding stimulus onset per
         unit and stimulus frame.
@@ -713,12 +747,21 @@ class EcephysSession(LazyPropertyMixin):
             The time domain is a numpy array whose values are trial-aligned bin
             edges (each row is aligned to a different trial). This optional
             function will be applied to the time domain before counting spikes.
+        out : numpy.ndarray, optional
+            A preallocated (presentations x time bins x units) array, such as
+            a numpy.memmap, into which spike counts will be written. Use this
+            to build very large count tensors without holding them in memory.
+            If provided, dtype is ignored.
+        chunk_size : int, optional
+            Number of stimulus presentations whose spikes are counted at once.
+            By default this is chosen to bound intermediate memory use.
 
         Returns
         -------
         xarray.DataArray :
             Data array whose dimensions are stimulus presentation, unit,
-            and time bin and whose values are spike counts.
+            and time bin and whose values are spike counts. If out was
+            provided, the data array wraps it.
 
         '''
 
@@ -771,7 +814,9 @@ class EcephysSession(LazyPropertyMixin):
             self.spike_times,
             units.index.values,
             dtype=dtype,
-            binarize=binarize
+            binarize=binarize,
+            out=out,
+            chunk_size=chunk_size
         )
 
         stim_presentation_id = stimulus_presentations.index.values
@@ -824,43 +869,10 @@ class EcephysSession(LazyPropertyMixin):
                                   ids=stimulus_presentation_ids)
         units = self._filter_owned_df('units', ids=unit_ids)
 
-        presentation_times = np.zeros([stimulus_presentations.shape[0] * 2])
-        presentation_times[::2] = \
-            np.array(stimulus_presentations['start_time'])
-        presentation_times[1::2] = \
-            np.array(stimulus_presentations['stop_time'])
-        all_presentation_ids = np.array(stimulus_presentations.index.values)
-
-        presentation_ids = []
-        unit_ids = []
-        spike_times = []
-
-        for ii, unit_id in enumerate(units.index.values):
-            data = self.spike_times[unit_id]
-            indices = np.searchsorted(presentation_times, data) - 1
+        spikes = _assign_spikes_to_presentations(
+            stimulus_presentations, self.spike_times, units.index.values)
 
-            index_valid = indices % 2 == 0
-            presentations = \
-                all_presentation_ids[np.floor(indices / 2).astype(int)]
-
-            sorder = np.argsort(presentations)
-            presentations = presentations[sorder]
-            index_valid = index_valid[sorder]
-            data = data[sorder]
-
-            changes = \
-                np.where(np.ediff1d(presentations, to_begin=1, to_end=1))[0]
-            for ii, jj in zip(changes[:-1], changes[1:]):
-                values = data[ii:jj][index_valid[ii:jj]]
-                if values.size == 0:
-                    continue
-
-                unit_ids.append(np.zeros([values.size]) + unit_id)
-                presentation_ids.append(np.zeros([values.size]) +
-                                        presentations[ii])
-                spike_times.append(values)
-
-        if not spike_times:
+        if spikes.empty:
             # If there are no units firing during the given stimulus return an
             # empty dataframe
             return pd.DataFrame(columns=[
@@ -869,24 +881,50 @@ class EcephysSession(LazyPropertyMixin):
                  'unit_id',
                  'time_since_stimulus_presentation_onset'])
 
-        pres_ids = np.concatenate(presentation_ids).astype(int)
+        return spikes
 
-        spike_df = pd.DataFrame({
-            'stimulus_presentation_id': pres_ids,
-            'unit_id': np.concatenate(unit_ids).astype(int)
-        }, index=pd.Index(np.concatenate(spike_times), name='spike_time'))
+    def iter_presentationwise_spike_times(
+            self,
+            stimulus_presentation_ids=None,
+            unit_ids=None,
+            units_per_block=1):
+        ''' Lazily produce the table built by presentationwise_spike_times,
+        one block of units at a time. Use this to process the spikes of a
+        whole session without holding all of them in memory at once.
 
-        # Add time since stimulus presentation onset
-        onset_times = self._filter_owned_df(
-            "stimulus_presentations", ids=all_presentation_ids)["start_time"]
-        spikes_with_onset = spike_df.join(onset_times,
-                                          on=["stimulus_presentation_id"])
-        spikes_with_onset["time_since_stimulus_presentation_onset"] = (
-            spikes_with_onset.index - spikes_with_onset["start_time"]
-        )
-        spikes_with_onset.sort_values('spike_time', axis=0, inplace=True)
-        spikes_with_onset.drop(columns=["start_time"], inplace=True)
-        return spikes_with_onset
+        Parameters
+        ----------
+        stimulus_presentation_ids : array-like
+            Filter to these stimulus presentations
+        unit_ids : array-like
+            Filter to these units
+        units_per_block : int, optional
+            Number of units whose spikes are included in each yielded table.
+            Defaults to one unit per table.
+
+        Yields
+        ------
+        pandas.DataFrame :
+            Formatted as the output of presentationwise_spike_times, but
+            restricted to a block of units. Blocks without any spikes during
+            the selected presentations are skipped. Concatenating the yielded
+            tables and sorting by spike time reproduces the output of
+            presentationwise_spike_times.
+        '''
+
+        stimulus_presentations = \
+            self._filter_owned_df('stimulus_presentations',
+                                  ids=stimulus_presentation_ids)
+        units = self._filter_owned_df('units', ids=unit_ids)
+        unit_ids = units.index.values
+
+        for start in range(0, unit_ids.size, units_per_block):
+            spikes = _assign_spikes_to_presentations(
+                stimulus_presentations,
+                self.spike_times,
+                unit_ids[start: start + units_per_block])
+            if not spikes.empty:
+                yield spikes
 
     def conditionwise_spike_statistics(
             self,
@@ -921,61 +959,36 @@ class EcephysSession(LazyPropertyMixin):
             stimulus_presentation_ids if stimulus_presentation_ids is not None
             else self.stimulus_presentations.index.values)  # In case
         presentations = self.stimulus_presentations.loc[
-            stimulus_presentation_ids, ["stimulus_condition_id", "duration"]
+            stimulus_presentation_ids,
+            ["start_time", "stop_time", "stimulus_condition_id", "duration"]
             ]
+        units = self._filter_owned_df('units', ids=unit_ids)
 
-        spikes = self.presentationwise_spike_times(
-            stimulus_presentation_ids=stimulus_presentation_ids,
-            unit_ids=unit_ids
-        )
-
-        if spikes.empty:
-            # In the case there are no spikes
-            spike_counts = pd.DataFrame(
-                {'spike_count': 0},
-                index=pd.MultiIndex.from_product([
-                    stimulus_presentation_ids,
-                    unit_ids],
-                    names=['stimulus_presentation_id', 'unit_id']))
+        spike_counts = _presentationwise_unit_spike_counts(
+            presentations, self.spike_times, units.index.values)
 
+        if unit_ids is None:
+            # If not explicity stated only report units which spiked during
+            # these presentations.
+            spiked = spike_counts.sum(axis=0) > 0
+            spike_counts = spike_counts[:, spiked]
+            unit_ids = units.index.values[spiked]
         else:
-            spike_counts = spikes.copy()
-            spike_counts["spike_count"] = np.zeros(spike_counts.shape[0])
-            spike_counts = \
-                spike_counts.groupby(["stimulus_presentation_id",
-                                      "unit_id"]).count()
-
-            # If not explicity stated get unit ids from spikes table.
-            unit_ids = unit_ids if unit_ids is not None \
-                else spikes['unit_id'].unique()
-            spike_counts = \
-                spike_counts.reindex(
-                    pd.MultiIndex.from_product(
-                        [stimulus_presentation_ids,
-                         unit_ids],
-                        names=['stimulus_presentation_id',
-                               'unit_id']), fill_value=0)
-
-        sp = pd.merge(spike_counts,
-                      presentations,
-                      left_on="stimulus_presentation_id",
-                      right_index=True,
-                      how="left")
-        sp.reset_index(inplace=True)
+            unit_ids = units.index.values
 
         if use_rates:
-            sp["spike_rate"] = sp["spike_count"] / sp["duration"]
-            sp.drop(columns=["spike_count"], inplace=True)
-            extractor = _extract_summary_rate_statistics
+            summary = _conditionwise_statistics(
+                spike_counts / presentations["duration"].values[:, None],
+                presentations["stimulus_condition_id"].values,
+                unit_ids,
+                include_sum=False)
         else:
-            sp.drop(columns=["duration"])
-            extractor = _extract_summary_count_statistics
+            summary = _conditionwise_statistics(
+                spike_counts,
+                presentations["stimulus_condition_id"].values,
+                unit_ids)
 
-        summary = []
-        for ind, gr in sp.groupby(["stimulus_condition_id", "unit_id"]):
-            summary.append(extractor(ind, gr))
-
-        return pd.DataFrame(summary).set_index(keys=[
+        return summary.set_index(keys=[
                 "unit_id",
                 "stimulus_condition_id"])
 
@@ -1378,29 +1391,341 @@ def build_spike_histogram(time_domain,
                           spike_times,
                           unit_ids,
                           dtype=None,
-                          binarize=False):
+                          binarize=False,
+                          out=None,
+                          chunk_size=None):
+    """ Count spikes from many units into many trial-aligned time bins.
+
+    All units are counted together: spike times are concatenated into a
+    single time-ordered array (labeled by unit) and each chunk of rows of the
+    time domain is resolved with a single pass over the spikes falling inside
+    of it.
+
+    Parameters
+    ----------
+    time_domain : array-like
+        (num_rows x num_bins + 1) bin edges. Each row is counted
+        independently. Bins are closed on both sides.
+    spike_times : dict-like
+        maps unit ids to sorted arrays of spike times
+    unit_ids : array-like
+        units whose spikes will be counted. Determines the order of the last
+        axis of the output.
+    dtype : numpy.dtype, optional
+        of the output. Defaults to uint8 if binarizing, uint16 otherwise.
+        Ignored if out is provided.
+    binarize : bool, optional
+        If True, all counts greater than 0 will be treated as 1.
+    out : numpy.ndarray, optional
+        A preallocated (num_rows x num_bins x num_units) array (e.g. a
+        numpy.memmap) into which counts will be written chunk by chunk.
+    chunk_size : int, optional
+        Number of rows of the time domain to process at once. Defaults to a
+        value which bounds intermediate memory use.
+
+    Returns
+    -------
+    numpy.ndarray :
+        (num_rows x num_bins x num_units) spike counts. If out was
+        provided, this is out.
+
+    """
 
     time_domain = np.array(time_domain)
     unit_ids = np.array(unit_ids)
 
-    tiled_data = np.zeros(
-        (time_domain.shape[0], time_domain.shape[1] - 1, unit_ids.size),
-        dtype=(np.uint8 if binarize else np.uint16) if dtype is None else dtype
+    shape = (time_domain.shape[0], time_domain.shape[1] - 1, unit_ids.size)
+    if out is None:
+        tiled_data = np.zeros(
+            shape,
+            dtype=(
+                (np.uint8 if binarize else np.uint16)
+                if dtype is None else dtype
+            )
+        )
+    else:
+        if tuple(out.shape) != shape:
+            raise ValueError(
+                f"output array has shape {tuple(out.shape)}, but counts "
+                f"have shape {shape}"
+            )
+        tiled_data = out
+
+    if tiled_data.size == 0:
+        return tiled_data
+
+    times, unit_indices = concatenate_spike_times(spike_times, unit_ids)
+
+    # The batched engine relies on each unit's spikes being sorted in time.
+    # Any unit whose spikes are not is counted on its own by binary search,
+    # as this function historically did for all units.
+    unsorted_units = [
+        ii for ii, unit_id in enumerate(unit_ids)
+        if np.any(np.diff(spike_times[unit_id]) < 0)
+    ]
+
+    if chunk_size is None:
+        chunk_size = max(1, SPIKE_HISTOGRAM_CHUNK_ELEMENTS
+                         // (time_domain.shape[1] * unit_ids.size))
+
+    for start in range(0, time_domain.shape[0], chunk_size):
+        stop = min(start + chunk_size, time_domain.shape[0])
+        counts = _count_spikes_in_domain(
+            time_domain[start: stop], times, unit_indices, unit_ids.size)
+
+        for ii in unsorted_units:
+            data = np.array(spike_times[unit_ids[ii]])
+            counts[:, :, ii] = (
+                np.searchsorted(data, time_domain[start: stop, 1:],
+                                side="right")
+                - np.searchsorted(data, time_domain[start: stop, :-1])
+            )
+
+        tiled_data[start: stop] = counts > 0 if binarize else counts
+
+    return tiled_data
+
+
+def concatenate_spike_times(spike_times, unit_ids):
+    """ Merge the spike trains of several units into a single, time-ordered
+    array.
+
+    Parameters
+    ----------
+    spike_times : dict-like
+        maps unit ids to sorted arrays of spike times
+    unit_ids : array-like
+        units whose spikes will be included
+
+    Returns
+    -------
+    times : numpy.ndarray
+        all spike times from the selected units, in ascending order.
+    unit_indices : numpy.ndarray
+        for each spike, the position in unit_ids of the unit which emitted
+        it.
+
+    """
+
+    times, unit_indices = _unit_ordered_spike_times(spike_times, unit_ids)
+
+    # each unit's spikes are already sorted, so a stable (run-merging) sort
+    # is cheap and preserves within-unit order
+    order = np.argsort(times, kind="stable")
+    return times[order], unit_indices[order]
+
+
+def _unit_ordered_spike_times(spike_times, unit_ids):
+    unit_spike_times = [
+        np.asarray(spike_times[unit_id], dtype=float).ravel()
+        for unit_id in unit_ids
+    ]
+    if len(unit_spike_times) == 0:
+        return np.array([], dtype=float), np.array([], dtype=int)
+
+    times = np.concatenate(unit_spike_times)
+    unit_indices = np.repeat(
+        np.arange(len(unit_spike_times)),
+        [len(unit_times) for unit_times in unit_spike_times]
     )
+    return times, unit_indices
 
-    starts = time_domain[:, :-1]
-    ends = time_domain[:, 1:]
 
-    for ii, unit_id in enumerate(unit_ids):
-        data = np.array(spike_times[unit_id])
+def _assign_spikes_to_presentations(stimulus_presentations, spike_times,
+                                    unit_ids):
+    """ Build a table of the spikes emitted by some units during some
+    stimulus presentations (see EcephysSession.presentationwise_spike_times).
+    """
 
-        start_positions = np.searchsorted(data, starts.flat)
-        end_positions = np.searchsorted(data, ends.flat, side="right")
-        counts = (end_positions - start_positions)
+    times, unit_indices, presentation_indices = _spike_presentation_indices(
+        stimulus_presentations, spike_times, unit_ids)
+
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+    unit_indices = unit_indices[order]
+    presentation_indices = presentation_indices[order]
+
+    return pd.DataFrame({
+        'stimulus_presentation_id': np.array(
+            stimulus_presentations.index.values[presentation_indices]
+        ).astype(int),
+        'unit_id': np.array(unit_ids)[unit_indices].astype(int),
+        'time_since_stimulus_presentation_onset': (
+            times
+            - stimulus_presentations['start_time'].values[
+                presentation_indices]
+        )
+    }, index=pd.Index(times, name='spike_time'))
 
-        tiled_data[:, :, ii].flat = counts > 0 if binarize else counts
 
-    return tiled_data
+def _presentationwise_unit_spike_counts(stimulus_presentations, spike_times,
+                                        unit_ids, units_per_block=64):
+    """ Count the spikes emitted by each of some units during each of some
+    stimulus presentations. Spikes are assigned to presentations as in
+    EcephysSession.presentationwise_spike_times, but no per-spike table is
+    built. Returns a (num_presentations x num_units) integer array.
+    """
+
+    unit_ids = np.array(unit_ids)
+    num_presentations = stimulus_presentations.shape[0]
+    counts = np.zeros((num_presentations, unit_ids.size), dtype=int)
+
+    for start in range(0, unit_ids.size, units_per_block):
+        block_unit_ids = unit_ids[start: start + units_per_block]
+        _, unit_indices, presentation_indices = _spike_presentation_indices(
+            stimulus_presentations, spike_times, block_unit_ids)
+
+        counts[:, start: start + block_unit_ids.size] = np.bincount(
+            presentation_indices * block_unit_ids.size + unit_indices,
+            minlength=num_presentations * block_unit_ids.size
+        ).reshape(num_presentations, block_unit_ids.size)
+
+    return counts
+
+
+def _spike_presentation_indices(stimulus_presentations, spike_times,
+                                unit_ids):
+    """ Find the spikes emitted by some units during some stimulus
+    presentations. Each spike is assigned to the presentation whose
+    (start_time, stop_time] interval contains it using a single lookup over
+    all units.
+
+    Returns
+    -------
+    times : numpy.ndarray
+        of spikes falling within a presentation, grouped by unit
+    unit_indices : numpy.ndarray
+        position in unit_ids of each spike's unit
+    presentation_indices : numpy.ndarray
+        row of stimulus_presentations containing each spike
+
+    """
+
+    presentation_times = np.zeros([stimulus_presentations.shape[0] * 2])
+    presentation_times[::2] = \
+        np.array(stimulus_presentations['start_time'])
+    presentation_times[1::2] = \
+        np.array(stimulus_presentations['stop_time'])
+
+    times, unit_indices = _unit_ordered_spike_times(spike_times, unit_ids)
+
+    if np.all(np.diff(presentation_times) >= 0):
+        indices = np.searchsorted(presentation_times, times) - 1
+    else:
+        # Overlapping presentations leave presentation_times unsorted, in
+        # which case binary search results depend on the order of the
+        # queries. Search unit by unit to reproduce historical assignments.
+        unit_bounds = np.searchsorted(unit_indices, np.arange(len(unit_ids)))
+        indices = np.concatenate([
+            np.searchsorted(presentation_times, unit_times) - 1
+            for unit_times in np.split(times, unit_bounds[1:])
+        ]) if times.size > 0 else np.array([], dtype=int)
+
+    valid = indices % 2 == 0
+    return times[valid], unit_indices[valid], indices[valid] // 2
+
+
+def _conditionwise_statistics(values, condition_ids, unit_ids,
+                              include_sum=True):
+    """ Summarize a (num_presentations x num_units) array of per-presentation
+    spike counts or rates within each stimulus condition, using segment
+    reductions over presentations sorted by condition. Presentations whose
+    condition is null are ignored.
+
+    Returns
+    -------
+    pd.DataFrame :
+        one row per (stimulus condition, unit), sorted by condition and then
+        by unit id. Columns are stimulus_condition_id, unit_id, (spike_count),
+        stimulus_presentation_count, spike_mean, spike_std and spike_sem.
+
+    """
+
+    codes, conditions = pd.factorize(condition_ids, sort=True)
+    unit_order = np.argsort(unit_ids, kind="stable")
+    unit_ids = np.array(unit_ids)[unit_order]
+
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    values = values[order][:, unit_order].astype(float)
+    codes = codes[order]
+
+    num_conditions = len(conditions)
+    if values.shape[0] > 0:
+        bounds = np.flatnonzero(np.diff(codes, prepend=-1))
+        present = codes[bounds]
+        sums = np.zeros((num_conditions, unit_ids.size))
+        sums[present] = np.add.reduceat(values, bounds, axis=0)
+    else:
+        sums = np.zeros((num_conditions, unit_ids.size))
+    presentation_counts = np.bincount(codes, minlength=num_conditions)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / presentation_counts[:, None]
+        squared_deviations = (values - means[codes]) ** 2
+        sum_squared_deviations = np.zeros_like(sums)
+        if values.shape[0] > 0:
+            sum_squared_deviations[present] = np.add.reduceat(
+                squared_deviations, bounds, axis=0)
+        stds = np.sqrt(
+            sum_squared_deviations / (presentation_counts[:, None] - 1))
+        stds[presentation_counts < 2] = np.nan
+        sems = stds / np.sqrt(presentation_counts[:, None])
+
+    # conditions with no (non-null) presentations are not reported
+    observed = presentation_counts > 0
+    num_observed = np.count_nonzero(observed)
+
+    summary = {
+        "stimulus_condition_id": np.repeat(
+            np.array(conditions)[observed], unit_ids.size),
+        "unit_id": np.tile(unit_ids, num_observed)
+    }
+    if include_sum:
+        summary["spike_count"] = sums[observed].ravel().astype(int)
+    summary["stimulus_presentation_count"] = np.repeat(
+        presentation_counts[observed], unit_ids.size)
+    summary["spike_mean"] = means[observed].ravel()
+    summary["spike_std"] = stds[observed].ravel()
+    summary["spike_sem"] = sems[observed].ravel()
+
+    return pd.DataFrame(summary)
+
+
+def _count_spikes_in_domain(time_domain, times, unit_indices, num_units):
+    """ Count time-ordered, unit-labeled spikes into the closed bins of a
+    trial-aligned time domain. Returns a (num_rows x num_bins x num_units)
+    integer array.
+    """
+
+    edges = np.unique(time_domain)
+
+    lower = np.searchsorted(times, edges[0], side="left")
+    upper = np.searchsorted(times, edges[-1], side="right")
+    window_times = times[lower: upper]
+    window_units = unit_indices[lower: upper]
+
+    # row j: number of spikes per unit at or before / strictly before edge j
+    at_or_before = _cumulative_unit_counts(
+        np.searchsorted(edges, window_times, side="left"),
+        window_units, num_units, edges.size)
+    before = _cumulative_unit_counts(
+        np.searchsorted(edges, window_times, side="right"),
+        window_units, num_units, edges.size)
+
+    start_indices = np.searchsorted(edges, time_domain[:, :-1])
+    end_indices = np.searchsorted(edges, time_domain[:, 1:])
+
+    return at_or_before[end_indices] - before[start_indices]
+
+
+def _cumulative_unit_counts(ranks, unit_indices, num_units, num_edges):
+    dtype = np.int32 if ranks.size < np.iinfo(np.int32).max else np.int64
+    counts = np.bincount(
+        ranks * num_units + unit_indices,
+        minlength=(num_edges + 1) * num_units
+    ).reshape(num_edges + 1, num_units).astype(dtype)
+    return np.cumsum(counts, axis=0, out=counts)[:num_edges]
 
 
 def build_time_window_domain(bin_edges, offsets, callback=None):
@@ -1488,29 +1813,6 @@ def coerce_scalar(value, message, warn=False):
     return value
 
 
-def _extract_summary_count_statistics(index, group):
-    return {
-        "stimulus_condition_id": index[0],
-        "unit_id": index[1],
-        "spike_count": group["spike_count"].sum(),
-        "stimulus_presentation_count": group.shape[0],
-        "spike_mean": np.mean(group["spike_count"].values),
-        "spike_std": np.std(group["spike_count"].values, ddof=1),
-        "spike_sem": scipy.stats.sem(group["spike_count"].values)
-    }
-
-
-def _extract_summary_rate_statistics(index, group):
-    return {
-        "stimulus_condition_id": index[0],
-        "unit_id": index[1],
-        "stimulus_presentation_count": group.shape[0],
-        "spike_mean": np.mean(group["spike_rate"].values),
-        "spike_std": np.std(group["spike_rate"].values, ddof=1),
-        "spike_sem": scipy.stats.sem(group["spike_rate"].values)
-    }
-
-
 def _overlap(a, b):
     """Check if the two intervals overlap
 
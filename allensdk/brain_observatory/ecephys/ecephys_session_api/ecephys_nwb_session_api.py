@@ -1,6 +1,7 @@
 from typing import Dict, Union, List, Optional, Callable
 import re
 import ast
+import bisect
 
 import pandas as pd
 import numpy as np
@@ -163,21 +164,49 @@ class EcephysNwbSessionApi(NwbApi, EcephysSessionApi):
             isi_violations_maximum=self.isi_violations_maximum
         )
 
-    def get_lfp(self, probe_id: int) -> xr.DataArray:
+    def get_lfp(self, probe_id: int, time_ranges=None,
+                channel_ids=None) -> xr.DataArray:
+        """ Load LFP data for a probe. If time_ranges or channel_ids are
+        given, only the corresponding hyperslabs are read from the file.
+
+        Parameters
+        ----------
+        probe_id : int
+            identify the probe whose LFP data ought to be loaded
+        time_ranges : tuple or list of tuples, optional
+            (start_time, stop_time) in seconds, or a list of such pairs.
+            Samples with start_time <= time < stop_time are loaded.
+            Overlapping ranges are merged. If None, all samples are loaded.
+        channel_ids : array-like, optional
+            Ids of the channels to load, in the order in which they should
+            appear. If None, all channels are loaded.
+
+        Returns
+        -------
+        xr.DataArray :
+            dimensions are time (seconds) and channel (id)
+        """
         lfp_file = self._probe_nwbfile(probe_id)
         lfp = lfp_file.get_acquisition(f'probe_{probe_id}_lfp')
         series = lfp.get_electrical_series(f'probe_{probe_id}_lfp_data')
 
         electrodes = lfp_file.electrodes.to_dataframe()
 
-        data = series.data[:]
-        timestamps = series.timestamps[:]
+        if time_ranges is None and channel_ids is None:
+            data = series.data[:]
+            timestamps = series.timestamps[:]
+            channels = electrodes.index.values
+        else:
+            rows = _time_ranges_to_slices(series.timestamps, time_ranges)
+            columns, channels = _channel_ids_to_columns(
+                electrodes.index, channel_ids, probe_id)
+            data, timestamps = _read_lfp_windows(series, rows, columns)
 
         return xr.DataArray(
             name="LFP",
             data=data,
             dims=['time', 'channel'],
-            coords=[timestamps, electrodes.index.values]
+            coords=[timestamps, channels]
         )
 
     def get_running_speed(self, include_rotation=False) -> pd.DataFrame:
@@ -397,3 +426,83 @@ class EcephysNwbSessionApi(NwbApi, EcephysSessionApi):
             "species": nwb_subject.species
         }
         return metadata
+
+
+def _time_ranges_to_slices(timestamps, time_ranges) -> List[slice]:
+    """ Convert (start_time, stop_time) pairs into sorted, disjoint
+    slices of sample indices. The sample times are searched in place, so
+    a timestamps dataset on disk is not read in full.
+    """
+    if time_ranges is None:
+        return [slice(0, len(timestamps))]
+
+    time_ranges = np.asarray(time_ranges, dtype=float).reshape(-1, 2)
+    time_ranges = time_ranges[np.argsort(time_ranges[:, 0], kind='stable')]
+
+    slices: List[slice] = []
+    for start_time, stop_time in time_ranges:
+        start = bisect.bisect_left(timestamps, start_time)
+        stop = bisect.bisect_left(timestamps, stop_time)
+        if stop <= start:
+            continue
+        if slices and start <= slices[-1].stop:
+            slices[-1] = slice(slices[-1].start, max(stop, slices[-1].stop))
+        else:
+            slices.append(slice(start, stop))
+
+    return slices
+
+
+def _channel_ids_to_columns(channel_index: pd.Index, channel_ids,
+                            probe_id: int):
+    """ Find the columns of the LFP data holding channel_ids. Returns the
+    columns (a slice if channel_ids is None) and the ids of the channels
+    they hold.
+    """
+    if channel_ids is None:
+        return slice(None), channel_index.values
+
+    channel_ids = np.asarray(channel_ids).reshape(-1)
+    columns = channel_index.get_indexer(channel_ids)
+    if np.any(columns < 0):
+        raise KeyError(
+            f"channels {channel_ids[columns < 0].tolist()} are not "
+            f"recorded in the LFP of probe {probe_id}")
+
+    return columns, channel_ids
+
+
+def _read_lfp_windows(series, rows: List[slice], columns):
+    """ Read the given row slices and columns of an LFP electrical series.
+    Each window is read as a single hyperslab; channels are read in
+    increasing order and then put into the requested order.
+    """
+    if isinstance(columns, slice):
+        unique_columns, inverse = columns, None
+    else:
+        unique_columns, inverse = np.unique(columns, return_inverse=True)
+        if len(unique_columns) > 0 and \
+                unique_columns[-1] - unique_columns[0] + 1 == \
+                len(unique_columns):
+            unique_columns = slice(int(unique_columns[0]),
+                                   int(unique_columns[-1]) + 1)
+        else:
+            unique_columns = unique_columns.tolist()
+
+    if len(rows) == 0 or (inverse is not None and len(inverse) == 0):
+        n_rows = sum(r.stop - r.start for r in rows)
+        n_columns = series.data.shape[1] if inverse is None \
+            else len(inverse)
+        data = np.zeros((n_rows, n_columns), dtype=series.data.dtype)
+        timestamps = np.concatenate(
+            [np.zeros(0)] + [series.timestamps[r] for r in rows])
+        return data, timestamps
+
+    data = np.concatenate([series.data[r, unique_columns] for r in rows])
+    timestamps = np.concatenate([series.timestamps[r] for r in rows])
+
+    if inverse is not None and not np.array_equal(inverse,
+                                                  np.arange(len(inverse))):
+        data = data[:, inverse]
+
+    return data, timestamps
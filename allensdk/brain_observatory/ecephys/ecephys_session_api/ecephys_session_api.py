@@ -50,7 +50,8 @@ class EcephysSessionApi:
     def get_ecephys_session_id(self) -> int:
         raise NotImplementedError
 
-    def get_lfp(self, probe_id: int) -> xr.DataArray:
+    def get_lfp(self, probe_id: int, time_ranges=None,
+                channel_ids=None) -> xr.DataArray:
         raise NotImplementedError
 
     def get_optogenetic_stimulation(self) -> pd.DataFrame:
@@ -116,6 +116,7 @@ def calculate_stimulus_metrics_ondisk(args):
     for sc_name, stim_class, tmp_csv in relevant_stim_class[
                                         MPI_rank::MPI_size]:
         analysis_obj = load_session(input_session_nwb, stim_class,
+                                    n_workers=args['n_workers'],
                                     **args[sc_name])
         # analysis_obj = stim_class(input_session_nwb, **args[sc_name])
         analysis_obj.metrics.to_csv(tmp_csv)
@@ -167,6 +168,7 @@ def calculate_stimulus_metrics_gather(args):
     if MPI_rank < len(relevant_stim_class):
         for sc_name, stim_class in relevant_stim_class[MPI_rank::MPI_size]:
             analysis_obj = load_session(input_session_nwb, stim_class,
+                                        n_workers=args['n_workers'],
                                         **args[sc_name])
             analysis_df = analysis_obj.metrics
 
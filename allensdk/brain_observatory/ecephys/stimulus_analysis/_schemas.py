@@ -71,6 +71,7 @@ class InputParameters(ArgSchema):
 
     input_session_nwb = String(required=True, help='Ecephys spiking nwb file for session')
     output_file = String(required=True, help='Location for saving output file')
+    n_workers = Int(default=1, help='Number of processes used to compute the per-unit metrics of each stimulus')
 
 
 class OutputSchema(DefaultSchema):
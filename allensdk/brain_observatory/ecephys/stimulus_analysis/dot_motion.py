@@ -113,24 +113,16 @@ class DotMotion(StimulusAnalysis):
             metrics_df = self.empty_metrics_table()
 
             if len(self.stim_table) > 0:
-                metrics_df['pref_speed_dm'] = [self._get_pref_speed(unit) for unit in unit_ids]
-                metrics_df['pref_speed_multi_dm'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_speed, self.speeds) for unit_id in unit_ids
-                ]
-                metrics_df['pref_dir_dm'] = [self._get_pref_dir(unit) for unit in unit_ids]
-                metrics_df['pref_dir_multi_dm'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_dir, self.directions) for unit_id in unit_ids
-                ]
-                metrics_df['firing_rate_dm'] = [self._get_overall_firing_rate(unit) for unit in unit_ids]
-                metrics_df['fano_dm'] = [self._get_fano_factor(unit, self._get_preferred_condition(unit))
-                                         for unit in unit_ids]
+                metrics_df['pref_speed_dm'] = self._get_preferred_values(self._col_speed, self.speeds).values
+                metrics_df['pref_speed_multi_dm'] = self._get_multiple_pref_conditions(self._col_speed, self.speeds)
+                metrics_df['pref_dir_dm'] = self._get_preferred_values(self._col_dir, self.directions).values
+                metrics_df['pref_dir_multi_dm'] = self._get_multiple_pref_conditions(self._col_dir, self.directions)
+                metrics_df['firing_rate_dm'] = self._get_overall_firing_rates(unit_ids)
+                metrics_df['fano_dm'] = self._get_fano_factors(unit_ids)
                 # metrics_df['speed_tuning_idx_dm'] = [self._get_speed_tuning_index(unit) for unit in unit_ids]
-                metrics_df['time_to_peak_dm'] = [self._get_time_to_peak(unit, self._get_preferred_condition(unit)) for
-                                                 unit in unit_ids]
-                metrics_df['lifetime_sparseness_dm'] = [self._get_lifetime_sparseness(unit) for unit in unit_ids]
-                metrics_df.loc[:, ['run_pval_dm', 'run_mod_dm']] = \
-                        [self._get_running_modulation(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
-
+                metrics_df['time_to_peak_dm'] = self._get_times_to_peak(unit_ids)
+                metrics_df['lifetime_sparseness_dm'] = self._get_lifetime_sparsenesses(unit_ids)
+                metrics_df['run_pval_dm'], metrics_df['run_mod_dm'] = self._get_running_modulations(unit_ids)
 
             self._metrics = metrics_df
 
@@ -191,31 +191,25 @@ class DriftingGratings(StimulusAnalysis):
             metrics_df = self.empty_metrics_table()
 
             if len(self.stim_table) > 0:
-                metrics_df['pref_ori_dg'] = [self._get_pref_ori(unit) for unit in unit_ids]
-                metrics_df['pref_ori_multi_dg'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_ori, self.orivals) for unit_id in unit_ids
-                ]
-                metrics_df['pref_tf_dg'] = [self._get_pref_tf(unit) for unit in unit_ids]
-                metrics_df['pref_tf_multi_dg'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_tf, self.tfvals) for unit_id in unit_ids
-                ]
-                metrics_df['f1_f0_dg'] = [self._get_f1_f0(unit, self._get_preferred_condition(unit))
-                                          for unit in unit_ids]
-                metrics_df['mod_idx_dg'] = [self._get_modulation_index(unit, self._get_preferred_condition(unit))
-                                            for unit in unit_ids]
-                metrics_df['g_osi_dg'] = [self._get_selectivity(unit, metrics_df.loc[unit]['pref_tf_dg'], 'osi')
-                                          for unit in unit_ids]
-                metrics_df['g_dsi_dg'] = [self._get_selectivity(unit, metrics_df.loc[unit]['pref_tf_dg'], 'dsi')
-                                          for unit in unit_ids]
-                metrics_df['firing_rate_dg'] = [self._get_overall_firing_rate(unit) for unit in unit_ids]
-                metrics_df['fano_dg'] = [self._get_fano_factor(unit, self._get_preferred_condition(unit))
-                                         for unit in unit_ids]
-                metrics_df['lifetime_sparseness_dg'] = [self._get_lifetime_sparseness(unit) for unit in unit_ids]
-                metrics_df.loc[:, ['run_pval_dg', 'run_mod_dg']] = [
-                    self._get_running_modulation(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
+                preferred_conditions = self.preferred_conditions.loc[unit_ids].values
+                metrics_df['pref_ori_dg'] = self._get_preferred_values(self._col_ori, self.orivals).values
+                metrics_df['pref_ori_multi_dg'] = self._get_multiple_pref_conditions(self._col_ori, self.orivals)
+                metrics_df['pref_tf_dg'] = self._get_preferred_values(self._col_tf, self.tfvals).values
+                metrics_df['pref_tf_multi_dg'] = self._get_multiple_pref_conditions(self._col_tf, self.tfvals)
+                metrics_df['f1_f0_dg'] = self._map_units('_get_f1_f0', zip(unit_ids, preferred_conditions))
+                metrics_df['mod_idx_dg'] = self._map_units('_get_modulation_index',
+                                                           zip(unit_ids, preferred_conditions))
+                metrics_df['g_osi_dg'] = self._map_units(
+                    '_get_selectivity', [(unit, pref_tf, 'osi') for unit, pref_tf in metrics_df['pref_tf_dg'].items()])
+                metrics_df['g_dsi_dg'] = self._map_units(
+                    '_get_selectivity', [(unit, pref_tf, 'dsi') for unit, pref_tf in metrics_df['pref_tf_dg'].items()])
+                metrics_df['firing_rate_dg'] = self._get_overall_firing_rates(unit_ids)
+                metrics_df['fano_dg'] = self._get_fano_factors(unit_ids)
+                metrics_df['lifetime_sparseness_dg'] = self._get_lifetime_sparsenesses(unit_ids)
+                metrics_df['run_pval_dg'], metrics_df['run_mod_dg'] = self._get_running_modulations(unit_ids)
 
             if len(self.stim_table_contrast) > 0:
-                metrics_df['c50_dg'] = [self._get_c50(unit) for unit in unit_ids]
+                metrics_df['c50_dg'] = self._map_units('_get_c50', zip(unit_ids))
 
 
             self._metrics = metrics_df
@@ -287,6 +281,12 @@ class DriftingGratings(StimulusAnalysis):
 
         return df.idxmax().iloc[0]
 
+    def _prepare_metrics(self):
+        super(DriftingGratings, self)._prepare_metrics()
+        if len(self.stim_table_contrast) > 0:
+            _ = self.stimulus_conditions_contrast
+            _ = self.conditionwise_statistics_contrast
+
     def _get_selectivity(self, unit_id, pref_tf, selectivity_type='osi'):
         """ Calculate the orientation or direction selectivity for a given unit
 
@@ -95,17 +95,13 @@ class Flashes(StimulusAnalysis):
             metrics_df = self.empty_metrics_table()
 
             if len(self. stim_table) > 0:
-                metrics_df['on_off_ratio_fl'] = [self._get_on_off_ratio(unit) for unit in unit_ids]
-                metrics_df['sustained_idx_fl'] = [self._get_sustained_index(unit, self._get_preferred_condition(unit))
-                                                  for unit in unit_ids]
-                metrics_df['firing_rate_fl'] = [self._get_overall_firing_rate(unit) for unit in unit_ids]
-                metrics_df['time_to_peak_fl'] = [self._get_time_to_peak(unit, self._get_preferred_condition(unit))
-                                                 for unit in unit_ids]
-                metrics_df['fano_fl'] = [self._get_fano_factor(unit, self._get_preferred_condition(unit))
-                                         for unit in unit_ids]
-                metrics_df['lifetime_sparseness_fl'] = [self._get_lifetime_sparseness(unit) for unit in unit_ids]
-                metrics_df.loc[:, ['run_pval_fl', 'run_mod_fl']] = [
-                    self._get_running_modulation(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
+                metrics_df['on_off_ratio_fl'] = self._get_on_off_ratios(unit_ids)
+                metrics_df['sustained_idx_fl'] = self._get_sustained_indices(unit_ids)
+                metrics_df['firing_rate_fl'] = self._get_overall_firing_rates(unit_ids)
+                metrics_df['time_to_peak_fl'] = self._get_times_to_peak(unit_ids)
+                metrics_df['fano_fl'] = self._get_fano_factors(unit_ids)
+                metrics_df['lifetime_sparseness_fl'] = self._get_lifetime_sparsenesses(unit_ids)
+                metrics_df['run_pval_fl'], metrics_df['run_mod_fl'] = self._get_running_modulations(unit_ids)
 
             self._metrics = metrics_df
 
@@ -181,6 +177,28 @@ class Flashes(StimulusAnalysis):
         else:
             return np.nan
 
+    def _get_sustained_indices(self, unit_ids):
+        """ Vectorized _get_sustained_index, at the preferred condition of every unit """
+        psths = self._get_preferred_psths(unit_ids)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.mean(psths, axis=1) / np.amax(psths, axis=1)
+
+    def _get_on_off_ratios(self, unit_ids):
+        """ Vectorized _get_on_off_ratio for every unit """
+        on_condition_id = self.stimulus_conditions[self.stimulus_conditions[self._col_color] == 1.0].index.values
+        off_condition_id = self.stimulus_conditions[self.stimulus_conditions[self._col_color] == -1.0].index.values
+
+        spike_means = self.condition_spike_means.loc[unit_ids]
+        on_condition_id = on_condition_id[np.isin(on_condition_id, spike_means.columns)]
+        off_condition_id = off_condition_id[np.isin(off_condition_id, spike_means.columns)]
+        if len(on_condition_id) == 0 or len(off_condition_id) == 0:
+            return np.full(len(unit_ids), np.nan)
+
+        on_mean_spikes = spike_means[on_condition_id[0]].values
+        off_mean_spikes = spike_means[off_condition_id[0]].values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(off_mean_spikes > 0, on_mean_spikes / off_mean_spikes, np.nan)
+
     ## VISUALIZATION ##
     def plot_raster(self, stimulus_condition_id, unit_id):
     
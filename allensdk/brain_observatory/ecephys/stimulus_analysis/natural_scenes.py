@@ -119,20 +119,15 @@ class NaturalScenes(StimulusAnalysis):
             if len(self.stim_table) > 0:
                 logger.info('Calculating metrics for ' + self.name)
 
-                metrics_df['pref_image_ns'] = [self._get_preferred_condition(unit) for unit in unit_ids]
-                metrics_df['pref_images_multi_ns'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_image, self.images_nonblank)
-                    for unit_id in unit_ids
-                ]
-                metrics_df['image_selectivity_ns'] = [self._get_image_selectivity(unit) for unit in unit_ids]
-                metrics_df['firing_rate_ns'] = [self._get_overall_firing_rate(unit) for unit in unit_ids]
-                metrics_df['fano_ns'] = [self._get_fano_factor(unit, self._get_preferred_condition(unit))
-                                         for unit in unit_ids]
-                metrics_df['time_to_peak_ns'] = [self._get_time_to_peak(unit, self._get_preferred_condition(unit))
-                                                 for unit in unit_ids]
-                metrics_df['lifetime_sparseness_ns'] = [self._get_lifetime_sparseness(unit) for unit in unit_ids]
-                metrics_df.loc[:, ['run_pval_ns', 'run_mod_ns']] = [
-                    self._get_running_modulation(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
+                metrics_df['pref_image_ns'] = self.preferred_conditions.loc[unit_ids].values
+                metrics_df['pref_images_multi_ns'] = self._get_multiple_pref_conditions(self._col_image,
+                                                                                        self.images_nonblank)
+                metrics_df['image_selectivity_ns'] = self._map_units('_get_image_selectivity', zip(unit_ids))
+                metrics_df['firing_rate_ns'] = self._get_overall_firing_rates(unit_ids)
+                metrics_df['fano_ns'] = self._get_fano_factors(unit_ids)
+                metrics_df['time_to_peak_ns'] = self._get_times_to_peak(unit_ids)
+                metrics_df['lifetime_sparseness_ns'] = self._get_lifetime_sparsenesses(unit_ids)
+                metrics_df['run_pval_ns'], metrics_df['run_mod_ns'] = self._get_running_modulations(unit_ids)
 
             self._metrics = metrics_df
 
@@ -146,15 +146,12 @@ class ReceptiveFieldMapping(StimulusAnalysis):
                                    'area_rf',
                                    'p_value_rf',
                                    'on_screen_rf',
-                                   ]] = [self._get_rf_stats(unit) for unit in unit_ids]
-                metrics_df['firing_rate_rf'] = [self._get_overall_firing_rate(unit) for unit in unit_ids]
-                metrics_df['fano_rf'] = [self._get_fano_factor(unit, self._get_preferred_condition(unit))
-                                         for unit in unit_ids]
-                metrics_df['time_to_peak_rf'] = [self._get_time_to_peak(unit, self._get_preferred_condition(unit))
-                                                 for unit in unit_ids]
-                metrics_df['lifetime_sparseness_rf'] = [self._get_lifetime_sparseness(unit) for unit in unit_ids]
-                metrics_df.loc[:, ['run_pval_rf', 'run_mod_rf']] = \
-                        [self._get_running_modulation(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
+                                   ]] = self._map_units('_get_rf_stats', zip(unit_ids))
+                metrics_df['firing_rate_rf'] = self._get_overall_firing_rates(unit_ids)
+                metrics_df['fano_rf'] = self._get_fano_factors(unit_ids)
+                metrics_df['time_to_peak_rf'] = self._get_times_to_peak(unit_ids)
+                metrics_df['lifetime_sparseness_rf'] = self._get_lifetime_sparsenesses(unit_ids)
+                metrics_df['run_pval_rf'], metrics_df['run_mod_rf'] = self._get_running_modulations(unit_ids)
 
             self._metrics = metrics_df
 
@@ -204,6 +201,9 @@ class ReceptiveFieldMapping(StimulusAnalysis):
         """
         return self.receptive_fields['spike_counts'].sel(unit_id=unit_id).data
 
+    def _prepare_metrics(self):
+        super(ReceptiveFieldMapping, self)._prepare_metrics()
+        _ = self.receptive_fields
 
     def _response_by_stimulus_position(self, dataset, presentations, row_key=None, column_key=None, unit_key='unit_id',
                                        time_key='time_relative_to_stimulus_onset', spike_count_key='spike_count'):
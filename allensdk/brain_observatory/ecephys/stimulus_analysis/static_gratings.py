@@ -146,25 +146,20 @@ class StaticGratings(StimulusAnalysis):
             metrics_df = self.empty_metrics_table()
 
             if len(self.stim_table) > 0:
-                metrics_df['pref_sf_sg'] = [self._get_pref_sf(unit) for unit in unit_ids]
-                metrics_df['pref_sf_multi_sg'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_sf, self.sfvals) for unit_id in unit_ids
-                ]
-                metrics_df['pref_ori_sg'] = [self._get_pref_ori(unit) for unit in unit_ids]
-                metrics_df['pref_ori_multi_sg'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_ori, self.orivals) for unit_id in unit_ids
-                ]
-                metrics_df['pref_phase_sg'] = [self._get_pref_phase(unit) for unit in unit_ids]
-                metrics_df['pref_phase_multi_sg'] = [
-                    self._check_multiple_pref_conditions(unit_id, self._col_phase, self.phasevals) for unit_id in unit_ids
-                ]
-                metrics_df['g_osi_sg'] = [self._get_osi(unit, metrics_df.loc[unit]['pref_sf_sg'], metrics_df.loc[unit]['pref_phase_sg']) for unit in unit_ids]
-                metrics_df['time_to_peak_sg'] = [self._get_time_to_peak(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
-                metrics_df['firing_rate_sg'] = [self._get_overall_firing_rate(unit) for unit in unit_ids]
-                metrics_df['fano_sg'] = [self._get_fano_factor(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
-                metrics_df['lifetime_sparseness_sg'] = [self._get_lifetime_sparseness(unit) for unit in unit_ids]
-                metrics_df.loc[:, ['run_pval_sg', 'run_mod_sg']] = \
-                        [self._get_running_modulation(unit, self._get_preferred_condition(unit)) for unit in unit_ids]
+                metrics_df['pref_sf_sg'] = self._get_preferred_values(self._col_sf, self.sfvals).values
+                metrics_df['pref_sf_multi_sg'] = self._get_multiple_pref_conditions(self._col_sf, self.sfvals)
+                metrics_df['pref_ori_sg'] = self._get_preferred_values(self._col_ori, self.orivals).values
+                metrics_df['pref_ori_multi_sg'] = self._get_multiple_pref_conditions(self._col_ori, self.orivals)
+                metrics_df['pref_phase_sg'] = self._get_preferred_values(self._col_phase, self.phasevals).values
+                metrics_df['pref_phase_multi_sg'] = self._get_multiple_pref_conditions(self._col_phase,
+                                                                                       self.phasevals)
+                metrics_df['g_osi_sg'] = self._map_units(
+                    '_get_osi', zip(unit_ids, metrics_df['pref_sf_sg'], metrics_df['pref_phase_sg']))
+                metrics_df['time_to_peak_sg'] = self._get_times_to_peak(unit_ids)
+                metrics_df['firing_rate_sg'] = self._get_overall_firing_rates(unit_ids)
+                metrics_df['fano_sg'] = self._get_fano_factors(unit_ids)
+                metrics_df['lifetime_sparseness_sg'] = self._get_lifetime_sparsenesses(unit_ids)
+                metrics_df['run_pval_sg'], metrics_df['run_mod_sg'] = self._get_running_modulations(unit_ids)
 
             self._metrics = metrics_df
 
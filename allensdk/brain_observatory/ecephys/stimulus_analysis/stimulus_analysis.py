@@ -10,6 +10,7 @@ from scipy.ndimage import gaussian_filter
 from ..ecephys_session import EcephysSession
 from allensdk.brain_observatory.ecephys.ecephys_session_api import \
     EcephysNwbSessionApi
+from allensdk.core.multiprocessing_utils import imap_with_shared
 
 import warnings
 
@@ -78,6 +79,12 @@ class StimulusAnalysis(object):
 
         # Keeps track of preferred stimulus_condition_id for each unit
         self._preferred_condition = {}
+        self._preferred_conditions = None
+        self._condition_spike_means = None
+
+        # Number of processes used for the unit-by-unit parts of the
+        # metrics (tuning curve fits etc). 1 runs everything in-process.
+        self._n_workers = kwargs.get('n_workers', 1)
 
     @property
     def ecephys_session(self):
@@ -410,27 +417,83 @@ class StimulusAnalysis(object):
 
         """
         if self._running_speed is None:
-            def get_velocity(presentation_id):
-                """Helper function for getting avg. velocities for a given
-                presenation_id"""
-                pres_row = self.stim_table.loc[presentation_id]
-                mask = \
-                    ((self.ecephys_session.running_speed['start_time'] >=
-                        pres_row['start_time']) &
-                     (self.ecephys_session.running_speed['start_time'] <
-                        pres_row['stop_time']))
-
-                return self.ecephys_session.running_speed[mask][
-                    'velocity'].mean()
-
-            self._running_speed = pd.DataFrame(
-                index=self.stim_table.index.values,
-                data={'running_speed': [get_velocity(i) for i in
-                                        self.stim_table.index.values]
-                      }).rename_axis('stimulus_presentation_id')
+            running_speed = self.ecephys_session.running_speed
+            self._running_speed = self._align_to_presentations(
+                running_speed['start_time'].values,
+                running_speed[['velocity']].rename(
+                    columns={'velocity': 'running_speed'})
+            )
 
         return self._running_speed
 
+    def get_pupil_data(self, reducer='mean'):
+        """Summarize the session's eye tracking ellipse fits over each
+        stimulus presentation.
+
+        Parameters
+        ----------
+        reducer : str, optional
+            How to summarize the samples within each presentation. One of
+            'mean' (default), 'median' or 'max'.
+
+        Returns
+        -------
+        pd.DataFrame or None :
+            Indexed by stimulus_presentation_id, with the columns of
+            EcephysSession.get_pupil_data. None if the session has no eye
+            tracking data.
+
+        """
+        pupil_data = self.ecephys_session.get_pupil_data()
+        if pupil_data is None:
+            return None
+        return self._align_to_presentations(
+            pupil_data.index.values, pupil_data, reducer=reducer)
+
+    def get_screen_gaze_data(self, reducer='mean',
+                             include_filtered_data=False):
+        """Summarize the session's estimated on-screen gaze position over
+        each stimulus presentation.
+
+        Parameters
+        ----------
+        reducer : str, optional
+            How to summarize the samples within each presentation. One of
+            'mean' (default), 'median' or 'max'.
+        include_filtered_data : bool, optional
+            Passed to EcephysSession.get_screen_gaze_data.
+
+        Returns
+        -------
+        pd.DataFrame or None :
+            Indexed by stimulus_presentation_id, with the columns of
+            EcephysSession.get_screen_gaze_data. None if the session has no
+            gaze data.
+
+        """
+        gaze_data = self.ecephys_session.get_screen_gaze_data(
+            include_filtered_data=include_filtered_data)
+        if gaze_data is None:
+            return None
+        return self._align_to_presentations(
+            gaze_data.index.values, gaze_data, reducer=reducer)
+
+    def _align_to_presentations(self, sample_times, data, reducer='mean'):
+        """Summarize each column of a time series table over the
+        [start_time, stop_time) interval of every stimulus presentation."""
+        aggregated = aggregate_over_intervals(
+            sample_times,
+            data.values,
+            self.stim_table['start_time'].values,
+            self.stim_table['stop_time'].values,
+            reducer=reducer
+        )
+        return pd.DataFrame(
+            aggregated,
+            index=self.stim_table.index.values,
+            columns=data.columns
+        ).rename_axis('stimulus_presentation_id')
+
     @property
     def metrics(self):
         """Returns a pandas DataFrame of the stimulus response metrics for
@@ -453,28 +516,90 @@ class StimulusAnalysis(object):
     ############
     # Helper functions for calling metrics of individual units.
     ############
-    def _get_preferred_condition(self, unit_id):
-        """Determines and caches the prefered stimulus_condition_id based on
-        mean spikes, ignoring null conditions."""
-        # TODO: Should probably be renamed to preferred_condition_id so
-        #  there is no confusion.
-        if unit_id not in self._preferred_condition:
-            # Use conditionwise_statistics 'spike_mean' column to find
-            # stimulus_condition_id that gives the highest
-            # value.
+    @property
+    def preferred_conditions(self):
+        """Preferred stimulus_condition_id of every unit, the (first)
+        non-null condition with the highest mean spike count.
+
+        Returns
+        -------
+        preferred_conditions : pd.Series
+            indexed by unit_id. NaN for units without any valid condition.
+        """
+        if self._preferred_conditions is None:
             try:
                 df = self.conditionwise_statistics.drop(
                     index=self.null_condition, level=1)
             except (IndexError, NotImplementedError, KeyError):
                 df = self.conditionwise_statistics
 
-            # TODO: Calculated preferred condition_id once for all units and
-            #  store in a table.
-            self._preferred_condition[unit_id] = df.loc[unit_id][
-                'spike_mean'].idxmax()
+            spike_means = df['spike_mean'].unstack('stimulus_condition_id')
+            spike_means = spike_means.dropna(how='all')
+            self._preferred_conditions = spike_means.idxmax(axis=1).reindex(
+                self.unit_ids).rename_axis('unit_id')
+
+        return self._preferred_conditions
+
+    @property
+    def condition_spike_means(self):
+        """Mean spike count of every unit (rows) for every stimulus
+        condition (columns), including the null condition."""
+        if self._condition_spike_means is None:
+            self._condition_spike_means = self.conditionwise_statistics[
+                'spike_mean'].unstack('stimulus_condition_id').reindex(
+                self.unit_ids)
+
+        return self._condition_spike_means
+
+    def _get_preferred_condition(self, unit_id):
+        """Determines and caches the prefered stimulus_condition_id based on
+        mean spikes, ignoring null conditions."""
+        # TODO: Should probably be renamed to preferred_condition_id so
+        #  there is no confusion.
+        if unit_id not in self._preferred_condition:
+            self._preferred_condition[unit_id] = \
+                self.preferred_conditions.loc[unit_id]
 
         return self._preferred_condition[unit_id]
 
+    def _get_parameter_spike_means(self, stim_cond_col, valid_values):
+        """Average the condition spike means of every unit over all the
+        conditions that share a value of stim_cond_col (eg. TF, ORI)
+
+        Returns
+        -------
+        spike_means : pd.DataFrame
+            units x valid_values
+        """
+        condition_values = self.stimulus_conditions[stim_cond_col].reindex(
+            self.condition_spike_means.columns)
+        spike_means = self.condition_spike_means.T.groupby(
+            condition_values.values).mean().T
+
+        return spike_means.reindex(columns=valid_values)
+
+    def _get_preferred_values(self, stim_cond_col, valid_values):
+        """For every unit the value of stim_cond_col (eg. TF, ORI) which,
+        averaged over all the other stimulus parameters, drives the largest
+        response."""
+        spike_means = self._get_parameter_spike_means(stim_cond_col,
+                                                      valid_values)
+        responsive = spike_means.notna().any(axis=1)
+        preferred = pd.Series(np.nan, index=spike_means.index, dtype=object)
+        preferred[responsive] = spike_means[responsive].idxmax(axis=1)
+
+        return preferred.infer_objects()
+
+    def _get_multiple_pref_conditions(self, stim_cond_col, valid_values):
+        """Vectorized _check_multiple_pref_conditions for all units"""
+        spike_means = self._get_parameter_spike_means(
+            stim_cond_col, valid_values).values
+        with np.errstate(invalid='ignore'):
+            is_max = spike_means == np.amax(spike_means, axis=1,
+                                            keepdims=True)
+
+        return np.count_nonzero(is_max, axis=1) > 1
+
     def _check_multiple_pref_conditions(self, unit_id, stim_cond_col,
                                         valid_conditions):
         # find all stimulus_condition which share the same 'stim_cond_col' (
@@ -541,6 +666,15 @@ class StimulusAnalysis(object):
 
     def _get_overall_firing_rate(self, unit_id):
         """ Average firing rate over the entire stimulus interval"""
+        block_starts, block_stops = self._get_stimulus_blocks()
+
+        return overall_firing_rate(
+            start_times=block_starts,
+            stop_times=block_stops,
+            spike_times=self.ecephys_session.spike_times[unit_id])
+
+    def _get_stimulus_blocks(self):
+        """ Start and stop times of the blocks of trials of the stimulus"""
         if self._block_starts is None:
             # For the stimulus, create a list of start and stop times for
             # the given block of trials. Only needs to be
@@ -563,10 +697,222 @@ class StimulusAnalysis(object):
                 'stop_time'].values
             # TODO: Check start and start times that differences are positive
 
-        return overall_firing_rate(
-            start_times=self._block_starts,
-            stop_times=self._block_stops,
-            spike_times=self.ecephys_session.spike_times[unit_id])
+        return self._block_starts, self._block_stops
+
+    ############
+    # Vectorized versions of the above, computed for many units at once.
+    ############
+    def _preferred_presentation_counts(self, unit_ids):
+        """Spike counts and running speeds of every presentation of each
+        unit's preferred condition.
+
+        Returns
+        -------
+        spike_counts, running_speeds : array
+            concatenated over units
+        unit_index : array of int
+            position in unit_ids of each entry
+        """
+        stats = self.presentationwise_statistics
+        stats_units = stats.index.get_level_values('unit_id')
+        preferred = self.preferred_conditions.reindex(stats_units).values
+        mask = (stats['stimulus_condition_id'].values == preferred)
+        mask &= np.isin(stats_units, unit_ids)
+
+        unit_index = pd.Index(unit_ids).get_indexer(stats_units[mask])
+        spike_counts = stats['spike_counts'].values[mask].astype(float)
+        if 'running_speed' in stats.columns:
+            running_speeds = stats['running_speed'].values[mask]
+        else:
+            running_speeds = np.full(spike_counts.shape, np.nan)
+
+        return spike_counts, running_speeds, unit_index
+
+    def _get_fano_factors(self, unit_ids):
+        """Fano factor of every unit at its preferred condition"""
+        spike_counts, _, unit_index = \
+            self._preferred_presentation_counts(unit_ids)
+        num_units = len(unit_ids)
+
+        counts = np.bincount(unit_index, minlength=num_units)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.bincount(unit_index, spike_counts,
+                                minlength=num_units) / counts
+            variances = np.bincount(
+                unit_index, (spike_counts - means[unit_index]) ** 2,
+                minlength=num_units) / counts
+
+            return np.where(means == 0, np.nan, variances / means)
+
+    def _get_lifetime_sparsenesses(self, unit_ids):
+        """Lifetime sparseness of every unit, over all non-null conditions"""
+        df = self.conditionwise_statistics.drop(index=self.null_condition,
+                                                level=1, errors='ignore')
+        responses = df['spike_count'].astype(float).groupby(level='unit_id')
+        num_responses = responses.count().reindex(unit_ids).fillna(0).values
+        if np.any(num_responses <= 1):
+            warnings.warn(
+                'responses array must contain at least two or more values to '
+                'calculate.')
+
+        sums = responses.sum().reindex(unit_ids).values
+        sums_of_squares = (df['spike_count'].astype(float) ** 2).groupby(
+            level='unit_id').sum().reindex(unit_ids).values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            coeff = 1.0 / num_responses
+            sparseness = (1.0 - coeff * (sums ** 2 / sums_of_squares)) \
+                / (1.0 - coeff)
+
+        return np.where(num_responses <= 1, np.nan, sparseness)
+
+    def _get_running_modulations(self, unit_ids, threshold=1.0):
+        """Running modulation p-values and indices of every unit at its
+        preferred condition.
+
+        Returns
+        -------
+        p_values, run_mods : array
+        """
+        spike_counts, running_speeds, unit_index = \
+            self._preferred_presentation_counts(unit_ids)
+        num_units = len(unit_ids)
+        with np.errstate(invalid='ignore'):
+            is_running = running_speeds >= threshold
+
+        def _group_stats(selected):
+            index = unit_index[selected]
+            values = spike_counts[selected]
+            n = np.bincount(index, minlength=num_units)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.bincount(index, values, minlength=num_units) / n
+                var = np.bincount(index, (values - mean[index]) ** 2,
+                                  minlength=num_units) / (n - 1)
+            return n, mean, var
+
+        n_run, run_mean, run_var = _group_stats(is_running)
+        n_stat, stat_mean, stat_var = _group_stats(~is_running)
+
+        valid = (1 < n_run) & (n_run < n_run + n_stat - 1)
+        valid &= ~((run_mean == 0) & (stat_mean == 0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            run_mods = np.where(run_mean > stat_mean,
+                                (run_mean - stat_mean) / run_mean,
+                                -1 * (stat_mean - run_mean) / stat_mean)
+            _, p_values = st.ttest_ind_from_stats(
+                run_mean, np.sqrt(run_var), n_run,
+                stat_mean, np.sqrt(stat_var), n_stat, equal_var=False)
+
+        return (np.where(valid, p_values, np.nan),
+                np.where(valid, run_mods, np.nan))
+
+    def _get_preferred_psths(self, unit_ids):
+        """The conditionwise PSTH of every unit at its preferred condition.
+
+        Returns
+        -------
+        psths : array
+            units x time bins, NaN for units without a preferred condition.
+        """
+        psth = self.conditionwise_psth.transpose(
+            'stimulus_condition_id', 'time_relative_to_stimulus_onset',
+            'unit_id')
+        condition_index = pd.Index(
+            psth['stimulus_condition_id'].values).get_indexer(
+            self.preferred_conditions.reindex(unit_ids).values)
+        unit_index = pd.Index(psth['unit_id'].values).get_indexer(unit_ids)
+
+        found = (condition_index >= 0) & (unit_index >= 0)
+        psths = np.full((len(unit_ids), psth.shape[1]), np.nan)
+        psths[found] = psth.values[condition_index[found], :,
+                                   unit_index[found]]
+
+        return psths
+
+    def _get_times_to_peak(self, unit_ids):
+        """Time of the PSTH peak at the preferred condition of every unit"""
+        psths = self._get_preferred_psths(unit_ids)
+        times = self.conditionwise_psth[
+            'time_relative_to_stimulus_onset'].values
+
+        has_peak = np.any(~np.isnan(psths), axis=1)
+        peak_index = np.argmax(
+            np.where(np.isnan(psths), -np.inf, psths), axis=1)
+
+        return np.where(has_peak, times[peak_index], np.nan)
+
+    def _get_overall_firing_rates(self, unit_ids):
+        """Average firing rate of every unit over the stimulus blocks"""
+        if len(unit_ids) == 0:
+            return np.zeros(0)
+
+        block_starts, block_stops = self._get_stimulus_blocks()
+        spike_times = [self.ecephys_session.spike_times[unit_id]
+                       for unit_id in unit_ids]
+        n_spikes = np.array([len(times) for times in spike_times], dtype=int)
+
+        # the number of blocks containing each spike is the number of
+        # blocks started minus the number of blocks stopped by its time
+        all_spikes = np.concatenate(spike_times)
+        started = np.searchsorted(np.sort(block_starts), all_spikes,
+                                  side='right')
+        stopped = np.searchsorted(np.sort(block_stops), all_spikes,
+                                  side='right')
+        spike_counts = np.bincount(
+            np.repeat(np.arange(len(unit_ids)), n_spikes),
+            weights=started - stopped, minlength=len(unit_ids))
+
+        total_time = np.sum(block_stops - block_starts)
+        if total_time <= 0:
+            # Probably start and stop times got inverted.
+            warnings.warn(f'The total duration was {total_time} seconds.')
+            rates = np.full(len(unit_ids), np.nan)
+        else:
+            rates = spike_counts / total_time
+
+        # no spikes, firing rate 0
+        rates[n_spikes == 0] = 0.0
+        return rates
+
+    def _prepare_metrics(self):
+        """Compute the tables shared by all the unit metrics, so that they
+        exist before the work is fanned out to worker processes."""
+        _ = self.stim_table
+        _ = self.conditionwise_statistics
+        _ = self.presentationwise_statistics
+        _ = self.conditionwise_psth
+        _ = self.preferred_conditions
+        _ = self.ecephys_session.spike_times
+
+    def _map_units(self, method_name, unit_args):
+        """Call a per-unit method once for each tuple of arguments in
+        unit_args, using a pool of n_workers processes if requested.
+
+        Parameters
+        ----------
+        method_name : str
+            name of a method of this object, eg. '_get_f1_f0'
+        unit_args : iterable of tuples
+            arguments of each call, usually starting with the unit_id
+
+        Returns
+        -------
+        list :
+            the return value of each call, in order
+        """
+        unit_args = [tuple(args) for args in unit_args]
+        n_workers = min(self._n_workers or 1, len(unit_args))
+        if n_workers > 1:
+            self._prepare_metrics()
+
+        # workers are forked so that they inherit the (unpicklable) session
+        # along with all of the intermediate tables computed so far. Where
+        # processes cannot be forked, the units are processed here.
+        chunksize = max(1, len(unit_args) // (4 * n_workers))
+        return list(imap_with_shared(
+            _call_analysis_method,
+            [(method_name, args) for args in unit_args],
+            shared=self, n_workers=n_workers, chunksize=chunksize,
+            start_method='fork'))
 
     def get_intrinsic_timescale(self, unit_ids):
         """Calculates the intrinsic timescale for a subset of units"""
@@ -602,6 +948,11 @@ class StimulusAnalysis(object):
         raise NotImplementedError()
 
 
+def _call_analysis_method(analysis, call):
+    method_name, args = call
+    return getattr(analysis, method_name)(*args)
+
+
 def running_modulation(spike_counts, running_speeds, speed_threshold=1.0):
     """Given a series of trials that include the spike-counts and (averaged)
     running-speed, does a statistical
@@ -662,6 +1013,104 @@ def running_modulation(spike_counts, running_speeds, speed_threshold=1.0):
         return np.NaN, np.NaN
 
 
+def aggregate_over_intervals(sample_times, values, start_times, stop_times,
+                             reducer='mean'):
+    """Summarize a (possibly multi-column) time series over each of a set of
+    time intervals, such as stimulus presentations. The samples belonging to
+    every interval are found with a single sorted lookup, so the cost does not
+    scale with (intervals x samples).
+
+    Parameters
+    ----------
+    sample_times : array of N floats
+        Time of each sample.
+    values : array of N floats, or (N x M) array
+        The sampled values. NaN samples are ignored.
+    start_times : array of K floats
+        Start of each interval (inclusive)
+    stop_times : array of K floats
+        End of each interval (exclusive)
+    reducer : str
+        One of 'mean' (default), 'median' or 'max'.
+
+    Returns
+    -------
+    aggregated : array of K floats, or (K x M) array
+        NaN for intervals which contain no (non-NaN) samples.
+    """
+    if reducer not in ('mean', 'median', 'max'):
+        raise ValueError(f'unknown reducer: {reducer}')
+
+    sample_times = np.asarray(sample_times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+
+    if values.shape[0] == 0:
+        aggregated = np.full((len(start_times), values.shape[1]), np.nan)
+        return aggregated[:, 0] if squeeze else aggregated
+
+    if np.any(np.diff(sample_times) < 0):
+        order = np.argsort(sample_times, kind='stable')
+        sample_times = sample_times[order]
+        values = values[order]
+
+    lower = np.searchsorted(sample_times, start_times, side='left')
+    upper = np.searchsorted(sample_times, stop_times, side='left')
+    upper = np.maximum(upper, lower)
+
+    missing = np.isnan(values)
+    num_valid = np.concatenate([
+        np.zeros((1, values.shape[1]), dtype=int),
+        np.cumsum(~missing, axis=0)
+    ])
+    num_valid = num_valid[upper] - num_valid[lower]
+
+    if reducer == 'mean':
+        sums = np.concatenate([
+            np.zeros((1, values.shape[1])),
+            np.cumsum(np.where(missing, 0.0, values), axis=0)
+        ])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            aggregated = (sums[upper] - sums[lower]) / num_valid
+
+    elif reducer == 'max':
+        # reduceat over (lower, upper) pairs; a trailing row of NaN keeps
+        # upper a valid index when an interval runs to the last sample
+        padded = np.concatenate(
+            [values, np.full((1, values.shape[1]), np.nan)])
+        bounds = np.stack([lower, upper], axis=1).ravel()
+        aggregated = np.fmax.reduceat(padded, bounds, axis=0)[::2]
+
+    else:
+        # gather the samples of each interval (so memory scales with the
+        # total length of the intervals), sort them within their interval
+        # (NaN last) and take the middle of the valid samples
+        lengths = upper - lower
+        interval_starts = np.cumsum(lengths) - lengths
+        interval = np.repeat(np.arange(len(lengths)), lengths)
+        positions = np.arange(lengths.sum()) \
+            - interval_starts[interval] + lower[interval]
+        gathered = values[positions]
+
+        aggregated = np.full(num_valid.shape, np.nan)
+        if len(gathered) > 0:
+            first_middle = interval_starts[:, None] + (num_valid - 1) // 2
+            second_middle = interval_starts[:, None] + num_valid // 2
+            first_middle = np.clip(first_middle, 0, len(gathered) - 1)
+            second_middle = np.clip(second_middle, 0, len(gathered) - 1)
+            for column in range(values.shape[1]):
+                order = np.lexsort((gathered[:, column], interval))
+                ordered = gathered[order, column]
+                middle = ordered[first_middle[:, column]] + \
+                    ordered[second_middle[:, column]]
+                aggregated[:, column] = middle / 2
+
+    aggregated = np.where(num_valid > 0, aggregated, np.nan)
+    return aggregated[:, 0] if squeeze else aggregated
+
+
 def lifetime_sparseness(responses):
     """Computes the lifetime sparseness for one unit. See Olsen & Wilson 2008.
 
@@ -774,6 +1223,62 @@ def get_fr(spikes, num_timestep_second=30, sweep_length=3.1, filter_width=0.1):
     return fr
 
 
+def get_frs(sweeps, num_timestep_second=30, sweep_length=3.1,
+            filter_width=0.1):
+    """Same as get_fr but for many sweeps at once. Each sweep is binned into
+    its own row and all the rows are smoothed in a single filtering pass.
+
+    Parameters
+    ----------
+    sweeps : list of arrays
+        The spike times of each sweep (shifted to start at 0)
+    num_timestep_second : float
+        The sampling frequency
+    sweep_length : float
+        The lenght of each firing rate series
+    filter_width: float
+        The window of the gaussian method
+
+    Returns
+    -------
+    firing_rates : array
+        A (number of sweeps) x (num_timestep_second*sweep_length) array of
+        the smoothed firing rates of every sweep.
+    """
+    spike_trains = np.zeros((len(sweeps),
+                             int(sweep_length * num_timestep_second)))
+    for spike_train, spikes in zip(spike_trains, sweeps):
+        spikes = np.asarray(spikes).astype(float)
+        spike_train[(spikes * num_timestep_second).astype(int)] = 1
+
+    filter_width = int(filter_width * num_timestep_second)
+    return ndi.gaussian_filter(spike_trains, (0, filter_width))
+
+
+def pearson_matrix(series):
+    """Pearson correlation coefficient between every pair of rows, computed
+    as one normalized matrix product. Like scipy.stats.pearsonr the
+    correlation of a constant row is NaN.
+
+    Parameters
+    ----------
+    series : (N x M) array
+        N series of M samples each
+
+    Returns
+    -------
+    corr_matrix : (N x N) array
+    """
+    series = np.asarray(series, dtype=float)
+    deviations = series - series.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(deviations, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        normalized = deviations / norms[:, None]
+    normalized[norms == 0] = np.nan
+
+    return np.clip(normalized @ normalized.T, -1.0, 1.0)
+
+
 def reliability(unit_sweeps, padding=1.0, num_timestep_second=30,
                 filter_width=0.1, window_beg=0, window_end=None):
     """Computes the trial-to-trial reliability for a set of sweeps for a
@@ -783,26 +1288,20 @@ def reliability(unit_sweeps, padding=1.0, num_timestep_second=30,
     :param padding:
     :return:
     """
-    if isinstance(unit_sweeps, (list, tuple)):
-        unit_sweeps = np.array([np.array(x) for x in unit_sweeps])
-
-    # DO NOT use the += as for python arrays that will do in-place modification
-    unit_sweeps = unit_sweeps + padding
+    # sweeps usually have different numbers of spikes, so keep them as a
+    # list of arrays. DO NOT use the += as for python arrays that will do
+    # in-place modification
+    unit_sweeps = [np.asarray(sweep) + padding for sweep in unit_sweeps]
 
-    corr_matrix = np.empty((len(unit_sweeps), len(unit_sweeps)))
+    frs = get_frs(unit_sweeps, num_timestep_second=num_timestep_second,
+                  filter_width=filter_width)
     fr_window = slice(window_beg, window_end)
-    for i in range(len(unit_sweeps)):
-        fri = get_fr(unit_sweeps[i], num_timestep_second=num_timestep_second,
-                     filter_width=filter_width)
-        for j in range(len(unit_sweeps)):
-            frj = get_fr(unit_sweeps[j],
-                         num_timestep_second=num_timestep_second,
-                         filter_width=filter_width)
-            # Warning: the pearson coefficient is likely to have a
-            # denominator of 0 for some cells/stimulus and give
-            # a divide by 0 warning.
-            r, p = st.pearsonr(fri[fr_window], frj[fr_window])
-            corr_matrix[i, j] = r
+    if len(frs) > 0 and frs[:, fr_window].shape[1] < 2:
+        raise ValueError('`x` and `y` must have length at least 2.')
+
+    # Warning: the pearson coefficient is likely to be undefined (NaN) for
+    # some cells/stimulus, as a sweep without spikes has no variance.
+    corr_matrix = pearson_matrix(frs[:, fr_window])
 
     inds = np.triu_indices(len(unit_sweeps), k=1)
     upper = corr_matrix[inds[0], inds[1]]
@@ -896,23 +1395,48 @@ def fit_exp(rsc_time_matrix):
 
 
 def calculate_time_delayed_correlation(dataset):
-    nbins = dataset.time_relative_to_stimulus_onset.size
-    num_units = dataset.unit_id.size
+    """For every unit, the correlation across trials between the spike counts
+    of each pair of time bins (i < j). Only trials where the unit spiked in
+    both bins are used; pairs with fewer than two such trials, or with no
+    variance, are NaN.
 
-    rsc_time_matrix = np.zeros((num_units, nbins, nbins)) * np.nan
-
-    for unit_idx, unit in enumerate(dataset.unit_id):
-
-        spikes_for_unit = dataset.sel(unit_id=unit).data
+    Parameters
+    ----------
+    dataset : xarray.DataArray
+        presentationwise spike counts, with dimensions stimulus presentation,
+        time_relative_to_stimulus_onset and unit_id
 
-        for i in np.arange(nbins - 1):
-            for j in np.arange(i + 1, nbins):
-                # remove zero spike count bins
-                good_trials = \
-                    (spikes_for_unit[:, i] * spikes_for_unit[:, j]) > 0
+    Returns
+    -------
+    rsc_time_matrix : array
+        (units x bins x bins), NaN on and below the diagonal
+    """
+    nbins = dataset.time_relative_to_stimulus_onset.size
 
-                r, p = st.pearsonr(spikes_for_unit[good_trials, i],
-                                   spikes_for_unit[good_trials, j])
-                rsc_time_matrix[unit_idx, i, j] = r
+    # (units x trials x bins). Counts are integers, so every sum below is
+    # exact and a zero variance is exactly zero.
+    counts = np.moveaxis(dataset.data, dataset.get_axis_num('unit_id'),
+                         0).astype(np.float64)
+    counts_t = np.swapaxes(counts, 1, 2)
+    # remove zero spike count bins
+    spiked = (counts > 0).astype(np.float64)
+
+    num_trials = np.swapaxes(spiked, 1, 2) @ spiked
+    sum_i = counts_t @ spiked
+    sum_j = np.swapaxes(sum_i, 1, 2)
+    sum_sq_i = (counts_t ** 2) @ spiked
+    sum_sq_j = np.swapaxes(sum_sq_i, 1, 2)
+    sum_ij = counts_t @ counts
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = num_trials * sum_ij - sum_i * sum_j
+        variance_i = num_trials * sum_sq_i - sum_i ** 2
+        variance_j = num_trials * sum_sq_j - sum_j ** 2
+        rsc_time_matrix = covariance / np.sqrt(variance_i * variance_j)
+    rsc_time_matrix = np.clip(rsc_time_matrix, -1.0, 1.0)
+
+    undefined = (num_trials < 2) | (variance_i <= 0) | (variance_j <= 0)
+    undefined |= ~np.triu(np.ones((nbins, nbins), dtype=bool), k=1)
+    rsc_time_matrix[undefined] = np.nan
 
     return rsc_time_matrix
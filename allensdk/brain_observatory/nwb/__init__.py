@@ -11,13 +11,14 @@ import datetime
 import uuid
 import SimpleITK as sitk
 import pynwb
+from hdmf.common.table import VectorData
 from pynwb.base import TimeSeries, Images
 from pynwb import ProcessingModule, NWBFile
 from pynwb.image import GrayscaleImage
 from pynwb.ophys import (
-    DfOverF, ImageSegmentation, OpticalChannel, Fluorescence)
+    DfOverF, ImageSegmentation, OpticalChannel, Fluorescence,
+    PlaneSegmentation)
 
-from allensdk.brain_observatory import dict_to_indexed_array
 from allensdk.brain_observatory.behavior.image_api import Image
 from allensdk.brain_observatory.behavior.image_api import ImageApi
 from allensdk.brain_observatory.behavior.schemas import (
@@ -25,6 +26,8 @@ from allensdk.brain_observatory.behavior.schemas import (
     BehaviorMetadataSchema, OphysBehaviorMetadataSchema,
     BehaviorTaskParametersSchema, SubjectMetadataSchema
 )
+from allensdk.brain_observatory.nwb.dynamic_table import \
+    dataframe_to_dynamic_table
 from allensdk.brain_observatory.nwb.metadata import load_pynwb_extension
 
 
@@ -577,32 +580,16 @@ def add_stimulus_timestamps(nwbfile, stimulus_timestamps,
 
 
 def add_trials(nwbfile, trials, description_dict={}):
-    order = list(trials.index)
-    for _, row in trials[['start_time', 'stop_time']].iterrows():
-        row_dict = row.to_dict()
-        nwbfile.add_trial(**row_dict)
-
-    for c in trials.columns:
-        if c in ['start_time', 'stop_time']:
-            continue
-        index, data = dict_to_indexed_array(trials[c].to_dict(), order)
-        if data.dtype == '<U1':  # data type is composed of unicode characters
-            data = trials[c].tolist()
-        if not len(data) == len(order):
-            if len(data) == 0:
-                data = ['']
-            nwbfile.add_trial_column(
-                    name=c,
-                    description=description_dict.get(
-                        c, 'NOT IMPLEMENTED: %s' % c),
-                    data=data,
-                    index=index)
-        else:
-            nwbfile.add_trial_column(
-                    name=c,
-                    description=description_dict.get(
-                        c, 'NOT IMPLEMENTED: %s' % c),
-                    data=data)
+    trials = trials[['start_time', 'stop_time'] + [
+        c for c in trials.columns if c not in ['start_time', 'stop_time']]]
+    nwbfile.trials = dataframe_to_dynamic_table(
+        df=trials,
+        table_type=pynwb.epoch.TimeIntervals,
+        column_descriptions={
+            c: description_dict.get(c, 'NOT IMPLEMENTED: %s' % c)
+            for c in trials.columns if c not in ['start_time', 'stop_time']},
+        name='trials',
+        description='experimental trials')
 
 
 def add_licks(nwbfile, licks):
@@ -895,43 +882,66 @@ def add_cell_specimen_table(nwbfile: NWBFile,
     ophys_module.add_data_interface(image_segmentation)
 
     # Plane Segmentation:
-    plane_segmentation = image_segmentation.create_plane_segmentation(
+    # NOTE: The 'roi_mask' in this cell_roi_table has already been
+    # processing by the function from
+    # allensdk.brain_observatory.behavior.session_apis.data_io.ophys_lims_api
+    # get_cell_specimen_table() method. As a result, the ROI is stored in
+    # an array that is the same shape as the FULL field of view of the
+    # experiment (e.g. 512 x 512).
+    plane_segmentation = create_plane_segmentation(
+        cell_roi_table=cell_roi_table,
         name='cell_specimen_table',
         description="Segmented rois",
         imaging_plane=imaging_plane)
-
-    for col_name in cell_roi_table.columns:
-        # the columns 'roi_mask', 'pixel_mask', and 'voxel_mask' are
-        # already defined in the nwb.ophys::PlaneSegmentation Object
-        if col_name not in ['id', 'mask_matrix', 'roi_mask',
-                            'pixel_mask', 'voxel_mask']:
-            # This builds the columns with name of column and description
-            # of column both equal to the column name in the cell_roi_table
-            plane_segmentation.add_column(
-                    col_name,
-                    CELL_SPECIMEN_COL_DESCRIPTIONS.get(
-                        col_name,
-                        "No Description Available"))
-
-    # go through each roi and add it to the plan segmentation object
-    for cell_roi_id, table_row in cell_roi_table.iterrows():
-
-        # NOTE: The 'roi_mask' in this cell_roi_table has already been
-        # processing by the function from
-        # allensdk.brain_observatory.behavior.session_apis.data_io.ophys_lims_api
-        # get_cell_specimen_table() method. As a result, the ROI is stored in
-        # an array that is the same shape as the FULL field of view of the
-        # experiment (e.g. 512 x 512).
-        mask = table_row.pop('roi_mask')
-
-        csid = table_row.pop('cell_specimen_id')
-        table_row['cell_specimen_id'] = -1 if csid is None else csid
-        table_row['id'] = cell_roi_id
-        plane_segmentation.add_roi(image_mask=mask, **table_row.to_dict())
+    image_segmentation.add_plane_segmentation(plane_segmentation)
 
     return nwbfile
 
 
+def create_plane_segmentation(cell_roi_table: pd.DataFrame,
+                              **kwargs) -> PlaneSegmentation:
+    """
+    Builds a PlaneSegmentation holding every ROI of a cell roi table
+
+    Parameters
+    ----------
+    cell_roi_table: pd.DataFrame
+        One row per ROI, indexed by cell_roi_id. The 'roi_mask' column
+        holds each ROI's image mask. A cell_specimen_id of None is
+        written as -1.
+    kwargs
+        Passed to PlaneSegmentation (e.g. name, description,
+        imaging_plane)
+
+    Returns
+    -------
+    PlaneSegmentation
+    """
+    # the columns 'roi_mask', 'pixel_mask', and 'voxel_mask' are
+    # already defined in the nwb.ophys::PlaneSegmentation Object
+    columns = [col_name for col_name in cell_roi_table.columns
+               if col_name not in ['id', 'mask_matrix', 'roi_mask',
+                                   'pixel_mask', 'voxel_mask']]
+    roi_table = cell_roi_table[columns].copy()
+    if 'cell_specimen_id' in roi_table:
+        roi_table['cell_specimen_id'] = [
+            -1 if csid is None else csid
+            for csid in roi_table['cell_specimen_id']]
+
+    image_mask = VectorData(
+        name='image_mask',
+        description='Image masks for each ROI',
+        data=list(cell_roi_table['roi_mask']))
+
+    return dataframe_to_dynamic_table(
+        df=roi_table,
+        table_type=PlaneSegmentation,
+        column_descriptions=CELL_SPECIMEN_COL_DESCRIPTIONS,
+        id=cell_roi_table.index.values,
+        columns=[image_mask],
+        **kwargs)
+
+
 def add_dff_traces(nwbfile, dff_traces, ophys_timestamps):
     dff_traces = dff_traces.reset_index().set_index('cell_roi_id')[['dff']]
 
@@ -0,0 +1,141 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Type, Union
+
+import numpy as np
+import pandas as pd
+from hdmf.common.table import DynamicTable, VectorData, VectorIndex
+
+
+def _column_data(
+        values: pd.Series
+) -> Tuple[Union[np.ndarray, list], Optional[np.ndarray]]:
+    """ Converts a dataframe column into the data (and, for ragged
+    columns, the index) of a DynamicTable column
+
+    Parameters
+    ----------
+    values : pd.Series
+        The column. Elements which are lists, tuples or arrays make it a
+        ragged column; any other elements of a ragged column are treated
+        as holding a single value.
+
+    Returns
+    -------
+    data : Union[np.ndarray, list]
+        The column data. Strings are kept as a list
+    index : Optional[np.ndarray]
+        For a ragged column, the (exclusive) end of each row in data.
+        None otherwise
+    """
+    if values.dtype != object:
+        return values.to_numpy(), None
+
+    elements = values.tolist()
+    is_sequence = [isinstance(x, (list, tuple, np.ndarray)) for x in elements]
+
+    if any(is_sequence):
+        rows = [x if seq else [x] for x, seq in zip(elements, is_sequence)]
+        index = np.cumsum([len(row) for row in rows])
+        data = np.concatenate(rows)
+        if len(data) == 0:
+            # an empty dataset cannot be written
+            data = ['']
+        return data, index
+
+    data = np.array(elements)
+    if data.dtype.kind == 'U':
+        return elements, None
+    return data, None
+
+
+def dataframe_to_columns(
+        df: pd.DataFrame,
+        column_descriptions: Optional[Dict[str, str]] = None,
+        default_description: str = 'No Description Available'
+) -> List[VectorData]:
+    """ Builds the columns of a DynamicTable from whole dataframe columns,
+    rather than adding the table one row at a time
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        one row per table row
+    column_descriptions : Optional[Dict[str, str]]
+        maps column names to descriptions
+    default_description : str
+        description of columns not in column_descriptions
+
+    Returns
+    -------
+    List[VectorData]
+        a VectorData per column, each preceded by its VectorIndex if it is
+        ragged (see `_column_data`)
+    """
+    if column_descriptions is None:
+        column_descriptions = dict()
+
+    columns = []
+    for name in df.columns:
+        data, index = _column_data(df[name])
+        column = VectorData(
+            name=name,
+            description=column_descriptions.get(name, default_description),
+            data=data)
+        if index is not None:
+            columns.append(VectorIndex(name=f'{name}_index', data=index,
+                                       target=column))
+        columns.append(column)
+    return columns
+
+
+def dataframe_to_dynamic_table(
+        df: pd.DataFrame,
+        table_type: Type[DynamicTable] = DynamicTable,
+        column_descriptions: Optional[Dict[str, str]] = None,
+        default_description: str = 'No Description Available',
+        id: Optional[Iterable[int]] = None,
+        columns: Iterable[VectorData] = (),
+        **table_kwargs
+) -> DynamicTable:
+    """ Builds a DynamicTable (or subclass, e.g. TimeIntervals,
+    PlaneSegmentation) from a dataframe in one pass
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        one row per table row. Columns holding lists or arrays are written
+        as ragged (indexed) columns
+    table_type : Type[DynamicTable]
+        the class of table to build
+    column_descriptions : Optional[Dict[str, str]]
+        maps column names to descriptions. Columns predefined by
+        table_type default to their predefined descriptions
+    default_description : str
+        description of any other column
+    id : Optional[Iterable[int]]
+        the id of each row. Defaults to 0, 1, ..., len(df) - 1
+    columns : Iterable[VectorData]
+        prebuilt columns to put after the columns of df, e.g. where the
+        representation of a column is not the default one
+    table_kwargs
+        passed to table_type (e.g. name, description)
+
+    Returns
+    -------
+    DynamicTable
+    """
+    descriptions = {
+        spec['name']: spec['description']
+        for spec in getattr(table_type, '__columns__', ())}
+    if column_descriptions is not None:
+        descriptions.update(column_descriptions)
+
+    if id is None:
+        id = np.arange(len(df))
+
+    columns = dataframe_to_columns(
+        df=df, column_descriptions=descriptions,
+        default_description=default_description) + list(columns)
+
+    if len(columns) == 0:
+        return table_type(id=list(id), **table_kwargs)
+    return table_type(id=np.asarray(id), columns=columns, **table_kwargs)
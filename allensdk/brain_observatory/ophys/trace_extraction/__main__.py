@@ -88,7 +88,8 @@ def write_trace_file(data, names, path):
         fil.create_dataset("roi_names", data=np.array(names).astype(np.string_), dtype=utf_dtype)
 
 
-def extract_traces(motion_corrected_stack, motion_border, storage_directory, rois, log_0, **kwargs):
+def extract_traces(motion_corrected_stack, motion_border, storage_directory,
+                   rois, log_0, n_workers=1, **kwargs):
 
     # find width and height of movie
     with h5py.File(motion_corrected_stack, "r") as f:
@@ -109,9 +110,10 @@ def extract_traces(motion_corrected_stack, motion_border, storage_directory, roi
     roi_names = [ roi.label for roi in roi_mask_list ]
 
     # extract traces
-    roi_traces, neuropil_traces, exclusions = roi_masks.calculate_roi_and_neuropil_traces(
-        motion_corrected_stack, roi_mask_list, border
-    )
+    roi_traces, neuropil_traces, exclusions = \
+        roi_masks.calculate_roi_and_neuropil_traces(
+            motion_corrected_stack, roi_mask_list, border,
+            n_workers=n_workers)
 
     roi_file = os.path.abspath(os.path.join(storage_directory, "roi_traces.h5"))
     write_trace_file(roi_traces, roi_names, roi_file)
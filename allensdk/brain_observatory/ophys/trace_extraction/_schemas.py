@@ -58,6 +58,9 @@ class InputSchema(ArgSchema):
     log_0 = String(required=True,
                    description='path to motion correction output csv')  #
     # TODO: is this redundant with motion border?
+    n_workers = Integer(default=1,
+                        description='number of worker processes used to '
+                                    'extract traces')
 
 
 class OutputSchema(RaisingSchema):
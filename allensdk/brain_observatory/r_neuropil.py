@@ -176,6 +176,167 @@ def synthesize_F(T, af1, af2, p1=0.05, p2=0.1):
     return F_M, F_N, F_C, r
 
 
+def grid_search_r(estimate_errors, r_range=[0.0, 2.0], iterations=3, dr=0.1,
+                  dr_factor=0.1):
+    """ Estimate error values for a range of r values.  Identify a new r range
+    around the minimum error values and repeat multiple times.
+
+    Parameters
+    ----------
+    estimate_errors: function
+        Takes an array of r values and returns the error for each
+    r_range: list
+        Initial [min, max) range of r values
+    iterations: int
+        Number of times the range is narrowed
+    dr: float
+        Initial spacing of r values
+    dr_factor: float
+        Factor by which the spacing is reduced on each iteration
+
+    Returns
+    -------
+    tuple: (r values, error values, r with minimum error, minimum error)
+    """
+    global_min_error = None
+    global_min_r = None
+
+    r_vals = []
+    error_vals = []
+
+    it_range = r_range
+    it = 0
+
+    it_dr = dr
+    while it < iterations:
+        # build a set of r values evenly distributed in a current range
+        rs = np.arange(it_range[0], it_range[1], it_dr)
+
+        # estimate error for each r
+        it_errors = list(estimate_errors(rs))
+
+        r_vals.extend(rs)
+        error_vals.extend(it_errors)
+
+        # find the minimum in this range and update the global minimum
+        min_i = np.argmin(it_errors)
+        min_error = it_errors[min_i]
+
+        if global_min_error is None or min_error < global_min_error:
+            global_min_error = min_error
+            global_min_r = rs[min_i]
+
+        logging.debug("iteration %d, r=%0.4f, e=%.6e",
+                      it, global_min_r, global_min_error)
+
+        # if the minimum error is on the upper boundary,
+        # extend the boundary and redo this iteration
+        if min_i == len(it_errors) - 1:
+            logging.debug(
+                "minimum error found on upper r bound, extending range")
+            it_range = [rs[-1], rs[-1] + (rs[-1] - rs[0])]
+        else:
+            # error is somewhere on either side of the minimum error index
+            it_range = [rs[max(min_i - 1, 0)],
+                        rs[min(min_i + 1, len(rs) - 1)]]
+            it_dr *= dr_factor
+            it += 1
+
+    return r_vals, error_vals, global_min_r, global_min_error
+
+
+def fold_residual_moments(F_M, F_N, lam=0.05, dt=1.0, folds=4):
+    """ Compute the quantities needed to evaluate the cross-validation error
+    of any contamination ratio for many ROIs at once.
+
+    The smoothed trace solve_banded(ab, F_M - r * F_N) is linear in r, so the
+    residual F_C - (F_M - r * F_N) of each fold is a - r * b, where a and b
+    are the residuals of smoothing F_M and F_N.  The smoothing system is the
+    same for every ROI and fold, so it is solved once for all of the traces.
+
+    Parameters
+    ----------
+    F_M: np.ndarray
+        2D array of ROI traces (ROIs x time)
+    F_N: np.ndarray
+        2D array of neuropil traces (ROIs x time)
+    lam: float
+        Smoothing weight
+    dt: float
+        Time step
+    folds: int
+        Number of cross-validation folds
+
+    Returns
+    -------
+    dictionary: arrays of shape (ROIs x folds)
+        * 'aa', 'ab', 'bb': dot products of the residuals a and b
+        * 'mean_F_M': the mean of F_M in each fold
+        * 'T_f': the length of each fold
+    """
+    F_M = np.atleast_2d(F_M)
+    F_N = np.atleast_2d(F_N)
+
+    if F_M.shape != F_N.shape:
+        raise Exception(
+            "F_M and F_N must have the same shape (%s vs %s)" %
+            (F_M.shape, F_N.shape))
+
+    n = F_M.shape[0]
+    T_f = int(F_M.shape[1] / folds)
+    ab = ab_from_T(T_f, lam, dt)
+
+    moments = {k: np.zeros((n, folds)) for k in ['aa', 'ab', 'bb', 'mean_F_M']}
+    moments['T_f'] = T_f
+
+    for fi in range(folds):
+        F_M_f = F_M[:, fi * T_f:(fi + 1) * T_f]
+        F_N_f = F_N[:, fi * T_f:(fi + 1) * T_f]
+
+        F_C = solve_banded((1, 1), ab, np.concatenate([F_M_f, F_N_f]).T)
+        a = F_C[:, :n].T - F_M_f
+        b = F_C[:, n:].T - F_N_f
+
+        moments['aa'][:, fi] = np.einsum('ij,ij->i', a, a)
+        moments['ab'][:, fi] = np.einsum('ij,ij->i', a, b)
+        moments['bb'][:, fi] = np.einsum('ij,ij->i', b, b)
+        moments['mean_F_M'][:, fi] = np.mean(F_M_f, axis=1)
+
+    return moments
+
+
+def error_from_moments(moments, rs, index=slice(None)):
+    """ Evaluate the cross-validation error (see
+    NeuropilSubtract.estimate_error) of contamination ratios from the output
+    of fold_residual_moments.
+
+    Parameters
+    ----------
+    moments: dictionary
+        Output of fold_residual_moments
+    rs: np.ndarray
+        1D array of contamination ratios
+    index: int or slice
+        The ROIs to evaluate
+
+    Returns
+    -------
+    np.ndarray: errors of shape (ROIs, r values), or (r values,) if index is
+    an int
+    """
+    rs = np.asarray(rs, dtype=float)
+    aa = moments['aa'][index][..., np.newaxis]
+    ab = moments['ab'][index][..., np.newaxis]
+    bb = moments['bb'][index][..., np.newaxis]
+    mean_F_M = moments['mean_F_M'][index][..., np.newaxis]
+
+    mean_square = (aa - 2.0 * rs * ab + np.square(rs) * bb) / moments['T_f']
+    errors = np.abs(np.sqrt(np.maximum(mean_square, 0.0)) / mean_F_M)
+
+    # mean over folds
+    return np.mean(errors, axis=-2)
+
+
 class NeuropilSubtract(object):
     """ TODO: docs
     """
@@ -260,58 +421,11 @@ class NeuropilSubtract(object):
         around the minimum error values and repeat multiple times.
         TODO: docs
         """
-        global_min_error = None
-        global_min_r = None
+        def estimate_errors(rs):
+            return [self.estimate_error(r) for r in rs]
 
-        r_vals = []
-        error_vals = []
-
-        it_range = r_range
-        it = 0
-
-        it_dr = dr
-        while it < iterations:
-            it_errors = []
-
-            # build a set of r values evenly distributed in a current range
-            rs = np.arange(it_range[0], it_range[1], it_dr)
-
-            # estimate error for each r
-            for r in rs:
-                error = self.estimate_error(r)
-                it_errors.append(error)
-
-                r_vals.append(r)
-                error_vals.append(error)
-
-            # find the minimum in this range and update the global minimum
-            min_i = np.argmin(it_errors)
-            min_error = it_errors[min_i]
-
-            if global_min_error is None or min_error < global_min_error:
-                global_min_error = min_error
-                global_min_r = rs[min_i]
-
-            logging.debug("iteration %d, r=%0.4f, e=%.6e",
-                          it, global_min_r, global_min_error)
-
-            # if the minimum error is on the upper boundary,
-            # extend the boundary and redo this iteration
-            if min_i == len(it_errors) - 1:
-                logging.debug(
-                    "minimum error found on upper r bound, extending range")
-                it_range = [rs[-1], rs[-1] + (rs[-1] - rs[0])]
-            else:
-                # error is somewhere on either side of the minimum error index
-                it_range = [rs[max(min_i - 1, 0)],
-                            rs[min(min_i + 1, len(rs) - 1)]]
-                it_dr *= dr_factor
-                it += 1
-
-        self.r_vals = r_vals
-        self.error_vals = error_vals
-        self.r = global_min_r
-        self.error = global_min_error
+        self.r_vals, self.error_vals, self.r, self.error = grid_search_r(
+            estimate_errors, r_range, iterations, dr, dr_factor)
 
     def estimate_error(self, r):
         """ Estimate error values for a given r for each fold and return the mean. """
@@ -368,3 +482,47 @@ def estimate_contamination_ratios(F_M, F_N,
         "min_error": ns.error,
         "it": len(ns.r_vals)
     }
+
+
+def estimate_contamination_ratios_batch(F_M, F_N,
+                                        lam=0.05, folds=4, iterations=3,
+                                        r_range=[0.0, 2.0], dr=0.1,
+                                        dr_factor=0.1):
+    ''' Calculates neuropil contamination of many ROIs together.  The result
+    for each ROI is that of estimate_contamination_ratios, up to floating
+    point rounding of the errors.
+
+    Parameters
+    ----------
+       F_M: 2D array of ROI traces (ROIs x time)
+       F_N: 2D array of neuropil traces (ROIs x time)
+
+    Returns
+    -------
+    list: a dictionary for each ROI (see estimate_contamination_ratios)
+    '''
+
+    moments = fold_residual_moments(F_M, F_N, lam=lam, folds=folds)
+
+    results = []
+    for i in range(moments['aa'].shape[0]):
+        def estimate_errors(rs):
+            return error_from_moments(moments, rs, i)
+
+        r_vals, error_vals, r, error = grid_search_r(
+            estimate_errors, r_range, iterations, dr, dr_factor)
+
+        if r < 0:
+            logging.warning("r is negative (%f). return 0.0.", r)
+            r = 0
+
+        results.append({
+            "r": r,
+            "r_vals": r_vals,
+            "err": error,
+            "err_vals": error_vals,
+            "min_error": error,
+            "it": len(r_vals)
+        })
+
+    return results
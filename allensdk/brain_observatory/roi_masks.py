@@ -36,8 +36,13 @@
 import numpy as np
 import math
 import scipy.ndimage.morphology as morphology
+import scipy.sparse
 import logging
 import h5py
+from concurrent.futures import ThreadPoolExecutor
+
+from allensdk.core.multiprocessing_utils import imap_with_shared, \
+    shareable_array
 
 # constants used for accessing border array
 RIGHT_SHIFT = 0
@@ -406,7 +411,148 @@ def validate_mask(mask):
     return exclusions
     
 
-def calculate_traces(stack, mask_list, block_size=1000):
+def mask_weight_matrix(mask_list, image_shape):
+    '''
+    Compiles masks into a sparse (number masks x number pixels) matrix
+    whose product with a flattened image frame gives the sum of the
+    frame over each mask.
+
+    Parameters
+    ----------
+    mask_list: list<Mask>
+        List of masks
+
+    image_shape: tuple
+        (image height, image width) of the frames the masks are
+        applied to
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Within each row, the column indices of the mask's pixels are in
+        row-major order
+    '''
+
+    height, width = image_shape
+    indices = []
+    indptr = np.zeros(len(mask_list) + 1, dtype=np.int64)
+
+    for i, mask in enumerate(mask_list):
+        if mask is not None:
+            rows, cols = np.nonzero(mask.mask)
+            indices.append((rows + mask.y) * width + (cols + mask.x))
+            indptr[i + 1] = len(indices[-1])
+
+    indptr = np.cumsum(indptr)
+    if len(indices) > 0:
+        indices = np.concatenate(indices)
+    else:
+        indices = np.zeros(0, dtype=np.int64)
+
+    return scipy.sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float64), indices, indptr),
+        shape=(len(mask_list), height * width))
+
+
+_TRANSPOSE_FRAMES = 16
+
+
+def _exact_matrix_sum(dtype):
+    ''' Whether sums of values of this dtype over a mask are exact when
+    computed as float64 matrix products (as they are when computed by
+    numpy, which sums integers as 64-bit integers).
+    '''
+    dtype = np.dtype(dtype)
+    return dtype == bool or (np.issubdtype(dtype, np.integer) and
+                             dtype.itemsize <= 4)
+
+
+def _block_traces(frames, weights, mask_areas):
+    '''
+    Calculates the average response of each mask over a block of frames
+
+    Parameters
+    ----------
+    frames: float[number frames][image height][image width]
+        Block of frames
+
+    weights: scipy.sparse.csr_matrix
+        See mask_weight_matrix
+
+    mask_areas: float[number masks]
+        Number of pixels in each mask
+
+    Returns
+    -------
+    float[number masks][number frames]
+    '''
+
+    flat = frames.reshape(frames.shape[0], -1)
+
+    if _exact_matrix_sum(flat.dtype):
+        # the sparse product needs the frames as (pixels x frames); a few
+        # frames at a time are transposed, which stays in cache
+        totals = np.empty((weights.shape[0], flat.shape[0]), dtype=float)
+        for start in range(0, flat.shape[0], _TRANSPOSE_FRAMES):
+            stop = start + _TRANSPOSE_FRAMES
+            totals[:, start:stop] = weights.dot(
+                np.ascontiguousarray(flat[start:stop].T, dtype=np.float64))
+        return totals / mask_areas[:, np.newaxis]
+
+    # floating point sums depend on the order of summation, so reduce each
+    # mask the way numpy does to keep the traces unchanged
+    traces = np.zeros((weights.shape[0], flat.shape[0]), dtype=float)
+    for i in range(weights.shape[0]):
+        pixels = weights.indices[weights.indptr[i]:weights.indptr[i + 1]]
+        if len(pixels) > 0:
+            traces[i] = flat[:, pixels].sum(axis=1) / mask_areas[i]
+
+    return traces
+
+
+def _shared_block_traces(shared, frame_num):
+    stack, weights, mask_areas, block_size = shared
+    frames = stack[frame_num:frame_num + block_size]
+    return frame_num, _block_traces(frames, weights, mask_areas)
+
+
+def _iter_block_traces(stack, weights, mask_areas, block_size, n_workers):
+    '''
+    Yields (first frame number, traces) for each block of frames in the
+    stack, in no particular order.
+    '''
+
+    num_frames = stack.shape[0]
+    frame_nums = range(0, num_frames, block_size)
+
+    if n_workers > 1 and len(frame_nums) > 1:
+        shared = (shareable_array(stack), weights, mask_areas, block_size)
+        for frame_num, traces in imap_with_shared(
+                _shared_block_traces, frame_nums, shared=shared,
+                n_workers=n_workers, ordered=False):
+            logging.debug("frame " + str(frame_num) + " of " +
+                          str(num_frames))
+            yield frame_num, traces
+        return
+
+    # read the next block while the current one is processed
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        def read(frame_num):
+            return reader.submit(
+                lambda: stack[frame_num:frame_num + block_size])
+
+        pending = read(0) if len(frame_nums) > 0 else None
+        for frame_num in frame_nums:
+            logging.debug("frame " + str(frame_num) + " of " +
+                          str(num_frames))
+            frames = pending.result()
+            if frame_num + block_size < num_frames:
+                pending = read(frame_num + block_size)
+
+            yield frame_num, _block_traces(frames, weights, mask_areas)
+
+
+def calculate_traces(stack, mask_list, block_size=1000, n_workers=1):
     '''
     Calculates the average response of the specified masks in the
     image stack
@@ -419,6 +565,14 @@ def calculate_traces(stack, mask_list, block_size=1000):
     mask_list: list<Mask>
         List of masks
 
+    block_size: int
+        Number of frames read from the stack at a time
+
+    n_workers: int
+        Number of worker processes, each reading and processing
+        separate blocks of frames. If 1, blocks are processed in this
+        process while the next block is read.
+
     Returns
     -------
     float[number masks][number frames]
@@ -426,7 +580,6 @@ def calculate_traces(stack, mask_list, block_size=1000):
     '''
 
     traces = np.zeros((len(mask_list), stack.shape[0]), dtype=float)
-    num_frames = stack.shape[0]
 
     mask_areas = np.zeros(len(mask_list), dtype=float)
     valid_masks = np.ones(len(mask_list), dtype=bool)
@@ -448,26 +601,19 @@ def calculate_traces(stack, mask_list, block_size=1000):
             mask.mask = np.array(mask.mask)
         mask_areas[i] = mask.mask.sum()
 
-    # calculate traces
-    for frame_num in range(0, num_frames, block_size):
-        if frame_num % block_size == 0:
-            logging.debug("frame " + str(frame_num) + " of " + str(num_frames))
-        frames = stack[frame_num:frame_num+block_size]
-
-        for i in range(len(mask_list)):
-            if not valid_masks[i]:
-                continue
+    valid_list = [mask_list[i] for i in np.flatnonzero(valid_masks)]
+    weights = mask_weight_matrix(valid_list, stack.shape[1:])
 
-            mask = mask_list[i]
-            subframe = frames[:,mask.y:mask.y + mask.height, 
-                                mask.x:mask.x + mask.width]
-
-            total = subframe[:, mask.mask].sum(axis=1)
-            traces[i, frame_num:frame_num+block_size] = total / mask_areas[i]
+    # calculate traces
+    for frame_num, block_traces in _iter_block_traces(
+            stack, weights, mask_areas[valid_masks], block_size, n_workers):
+        traces[valid_masks, frame_num:frame_num + block_size] = block_traces
 
     return traces, exclusions
 
-def calculate_roi_and_neuropil_traces(movie_h5, roi_mask_list, motion_border):
+
+def calculate_roi_and_neuropil_traces(movie_h5, roi_mask_list, motion_border,
+                                      n_workers=1):
     """ get roi and neuropil masks """
 
     # a combined binary mask for all ROIs (this is used to 
@@ -489,8 +635,10 @@ def calculate_roi_and_neuropil_traces(movie_h5, roi_mask_list, motion_border):
     with h5py.File(movie_h5, "r") as movie_f:
         stack_frames = movie_f["data"]
 
-        logging.info("Calculating %d traces (neuropil + ROI) over %d frames" % (len(combined_list), len(stack_frames)))
-        traces, exclusions = calculate_traces(stack_frames, combined_list)
+        logging.info("Calculating %d traces (neuropil + ROI) over %d frames"
+                     % (len(combined_list), len(stack_frames)))
+        traces, exclusions = calculate_traces(stack_frames, combined_list,
+                                              n_workers=n_workers)
 
         roi_traces = traces[:num_rois]
         neuropil_traces = traces[num_rois:]
@@ -48,11 +48,56 @@ from allensdk.brain_observatory.brain_observatory_exceptions \
 from . import brain_observatory_plotting as cp
 import argparse
 import logging
+import multiprocessing
 import os
 
+import h5py
+import pandas as pd
+
+from allensdk.core.multiprocessing_utils import imap_with_shared
 from allensdk.deprecated import deprecated
 
 
+#: the stimulus analyses run for each session type, named by the short
+#: stimulus names that suffix their outputs.  For each session, the peak
+#: response tables are merged in this order.
+SESSION_ANALYSES = {
+    stimulus_info.THREE_SESSION_A: (
+        stimulus_info.DRIFTING_GRATINGS_SHORT,
+        stimulus_info.NATURAL_MOVIE_ONE_SHORT,
+        stimulus_info.NATURAL_MOVIE_THREE_SHORT),
+    stimulus_info.THREE_SESSION_B: (
+        stimulus_info.STATIC_GRATINGS_SHORT,
+        stimulus_info.NATURAL_SCENES_SHORT,
+        stimulus_info.NATURAL_MOVIE_ONE_SHORT),
+    stimulus_info.THREE_SESSION_C: (
+        stimulus_info.NATURAL_MOVIE_ONE_SHORT,
+        stimulus_info.NATURAL_MOVIE_TWO_SHORT,
+        stimulus_info.LOCALLY_SPARSE_NOISE_SHORT),
+    stimulus_info.THREE_SESSION_C2: (
+        stimulus_info.NATURAL_MOVIE_ONE_SHORT,
+        stimulus_info.NATURAL_MOVIE_TWO_SHORT,
+        stimulus_info.LOCALLY_SPARSE_NOISE_4DEG_SHORT,
+        stimulus_info.LOCALLY_SPARSE_NOISE_8DEG_SHORT)
+}
+
+_NATURAL_MOVIES = {
+    stimulus_info.NATURAL_MOVIE_ONE_SHORT: stimulus_info.NATURAL_MOVIE_ONE,
+    stimulus_info.NATURAL_MOVIE_TWO_SHORT: stimulus_info.NATURAL_MOVIE_TWO,
+    stimulus_info.NATURAL_MOVIE_THREE_SHORT: stimulus_info.NATURAL_MOVIE_THREE
+}
+
+_LOCALLY_SPARSE_NOISES = {
+    stimulus_info.LOCALLY_SPARSE_NOISE_SHORT:
+        stimulus_info.LOCALLY_SPARSE_NOISE,
+    stimulus_info.LOCALLY_SPARSE_NOISE_4DEG_SHORT:
+        stimulus_info.LOCALLY_SPARSE_NOISE_4DEG,
+    stimulus_info.LOCALLY_SPARSE_NOISE_8DEG_SHORT:
+        stimulus_info.LOCALLY_SPARSE_NOISE_8DEG
+}
+
+CHECKPOINT_GROUP = 'analysis/checkpoints'
+
 
 def multi_dataframe_merge(dfs):
     """ merge a number of pd.DataFrames into a single dataframe on their index columns. 
@@ -123,26 +168,13 @@ class SessionAnalysis(object):
 
         nwb = BrainObservatoryNwbDataSet(self.save_path)
 
-        nwb.save_analysis_dataframes(
-            ('stim_table_dg', dg.stim_table),
-            ('sweep_response_dg', dg.sweep_response),
-            ('mean_sweep_response_dg', dg.mean_sweep_response),
-            ('peak', peak),
-            ('sweep_response_nm1', nm1.sweep_response),
-            ('stim_table_nm1', nm1.stim_table),
-            ('sweep_response_nm3', nm3.sweep_response))
-
-        nwb.save_analysis_arrays(
-            ('response_dg', dg.response),
-            ('binned_cells_sp', nm1.binned_cells_sp),
-            ('binned_cells_vis', nm1.binned_cells_vis),
-            ('binned_dx_sp', nm1.binned_dx_sp),
-            ('binned_dx_vis', nm1.binned_dx_vis),
-            ('noise_corr_dg', dg.noise_correlation),
-            ('signal_corr_dg', dg.signal_correlation),
-            ('rep_similarity_dg', dg.representational_similarity)
-            )
+        for name, analysis in [(stimulus_info.DRIFTING_GRATINGS_SHORT, dg),
+                               (stimulus_info.NATURAL_MOVIE_ONE_SHORT, nm1),
+                               (stimulus_info.NATURAL_MOVIE_THREE_SHORT, nm3)]:
+            self.save_stimulus_outputs(nwb, self.stimulus_outputs(
+                name, analysis, stimulus_info.THREE_SESSION_A))
 
+        nwb.save_analysis_dataframes(('peak', peak))
 
     def save_session_b(self, sg, nm1, ns, peak):
         """ Save the output of session B analysis to self.save_path.  
@@ -163,31 +195,13 @@ class SessionAnalysis(object):
 
         nwb = BrainObservatoryNwbDataSet(self.save_path)
 
-        nwb.save_analysis_dataframes(
-            ('stim_table_sg', sg.stim_table),
-            ('sweep_response_sg', sg.sweep_response),
-            ('mean_sweep_response_sg', sg.mean_sweep_response),
-            ('sweep_response_nm1', nm1.sweep_response),
-            ('stim_table_nm1', nm1.stim_table),
-            ('sweep_response_ns', ns.sweep_response),
-            ('stim_table_ns', ns.stim_table),
-            ('mean_sweep_response_ns', ns.mean_sweep_response),
-            ('peak', peak))
+        for name, analysis in [(stimulus_info.STATIC_GRATINGS_SHORT, sg),
+                               (stimulus_info.NATURAL_MOVIE_ONE_SHORT, nm1),
+                               (stimulus_info.NATURAL_SCENES_SHORT, ns)]:
+            self.save_stimulus_outputs(nwb, self.stimulus_outputs(
+                name, analysis, stimulus_info.THREE_SESSION_B))
 
-        nwb.save_analysis_arrays(
-            ('response_sg', sg.response),
-            ('response_ns', ns.response),
-            ('binned_cells_sp', nm1.binned_cells_sp),
-            ('binned_cells_vis', nm1.binned_cells_vis),
-            ('binned_dx_sp', nm1.binned_dx_sp),
-            ('binned_dx_vis', nm1.binned_dx_vis),
-            ('noise_corr_sg', sg.noise_correlation),
-            ('signal_corr_sg', sg.signal_correlation),
-            ('rep_similarity_sg', sg.representational_similarity),
-            ('noise_corr_ns', ns.noise_correlation),
-            ('signal_corr_ns', ns.signal_correlation),
-            ('rep_similarity_ns', ns.representational_similarity)
-            )
+        nwb.save_analysis_dataframes(('peak', peak))
 
     def save_session_c(self, lsn, nm1, nm2, peak):
         """ Save the output of session C analysis to self.save_path.  
@@ -210,23 +224,13 @@ class SessionAnalysis(object):
 
         nwb = BrainObservatoryNwbDataSet(self.save_path)
 
-        nwb.save_analysis_dataframes(
-            ('stim_table_lsn', lsn.stim_table),
-            ('sweep_response_nm1', nm1.sweep_response),
-            ('peak', peak),
-            ('sweep_response_nm2', nm2.sweep_response),
-            ('sweep_response_lsn', lsn.sweep_response),
-            ('mean_sweep_response_lsn', lsn.mean_sweep_response))
-
-        nwb.save_analysis_arrays(
-            ('receptive_field_lsn', lsn.receptive_field),
-            ('mean_response_lsn', lsn.mean_response),
-            ('binned_dx_sp', nm1.binned_dx_sp),
-            ('binned_dx_vis', nm1.binned_dx_vis),
-            ('binned_cells_sp', nm1.binned_cells_sp),
-            ('binned_cells_vis', nm1.binned_cells_vis))
+        for name, analysis in [(stimulus_info.LOCALLY_SPARSE_NOISE_SHORT, lsn),
+                               (stimulus_info.NATURAL_MOVIE_ONE_SHORT, nm1),
+                               (stimulus_info.NATURAL_MOVIE_TWO_SHORT, nm2)]:
+            self.save_stimulus_outputs(nwb, self.stimulus_outputs(
+                name, analysis, stimulus_info.THREE_SESSION_C))
 
-        LocallySparseNoise.save_cell_index_receptive_field_analysis(lsn.cell_index_receptive_field_analysis_data, nwb, stimulus_info.LOCALLY_SPARSE_NOISE)
+        nwb.save_analysis_dataframes(('peak', peak))
 
     def save_session_c2(self, lsn4, lsn8, nm1, nm2, peak):        
         """ Save the output of session C2 analysis to self.save_path. 
@@ -255,34 +259,21 @@ class SessionAnalysis(object):
 
         nwb = BrainObservatoryNwbDataSet(self.save_path)
 
-        nwb.save_analysis_dataframes(
-            ('stim_table_lsn4', lsn4.stim_table),
-            ('stim_table_lsn8', lsn8.stim_table),
-            ('sweep_response_nm1', nm1.sweep_response),
-            ('peak', peak),
-            ('sweep_response_nm2', nm2.sweep_response),
-            ('sweep_response_lsn4', lsn4.sweep_response),
-            ('sweep_response_lsn8', lsn8.sweep_response),
-            ('mean_sweep_response_lsn4', lsn4.mean_sweep_response),
-            ('mean_sweep_response_lsn8', lsn8.mean_sweep_response))
+        for name, analysis in [
+                (stimulus_info.LOCALLY_SPARSE_NOISE_4DEG_SHORT, lsn4),
+                (stimulus_info.LOCALLY_SPARSE_NOISE_8DEG_SHORT, lsn8),
+                (stimulus_info.NATURAL_MOVIE_ONE_SHORT, nm1),
+                (stimulus_info.NATURAL_MOVIE_TWO_SHORT, nm2)]:
+            self.save_stimulus_outputs(nwb, self.stimulus_outputs(
+                name, analysis, stimulus_info.THREE_SESSION_C2))
 
         merge_mean_response = LocallySparseNoise.merge_mean_response(
             lsn4.mean_response,
             lsn8.mean_response)
 
+        nwb.save_analysis_dataframes(('peak', peak))
         nwb.save_analysis_arrays(
-            ('mean_response_lsn4', lsn4.mean_response),
-            ('mean_response_lsn8', lsn8.mean_response),
-            ('receptive_field_lsn4', lsn4.receptive_field),
-            ('receptive_field_lsn8', lsn8.receptive_field),
-            ('merge_mean_response', merge_mean_response),
-            ('binned_dx_sp', nm1.binned_dx_sp),
-            ('binned_dx_vis', nm1.binned_dx_vis),
-            ('binned_cells_sp', nm1.binned_cells_sp),
-            ('binned_cells_vis', nm1.binned_cells_vis))
-
-        LocallySparseNoise.save_cell_index_receptive_field_analysis(lsn4.cell_index_receptive_field_analysis_data, nwb, stimulus_info.LOCALLY_SPARSE_NOISE_4DEG)
-        LocallySparseNoise.save_cell_index_receptive_field_analysis(lsn8.cell_index_receptive_field_analysis_data, nwb, stimulus_info.LOCALLY_SPARSE_NOISE_8DEG)
+            ('merge_mean_response', merge_mean_response))
 
     def append_metrics_drifting_grating(self, metrics, dg):
         """ Extract metrics from the DriftingGratings peak response table into a dictionary. """
@@ -373,6 +364,160 @@ class SessionAnalysis(object):
                 raise BrainObservatoryAnalysisException(
                     "Error -- ROI lists have different entries")
 
+    def create_stimulus_analysis(self, name):
+        """ Create the analysis of a single stimulus.  For gratings and
+        natural scenes, the noise and signal correlations and the
+        representational similarity that are saved with the analysis are
+        computed.
+
+        Parameters
+        ----------
+        name: string
+            The short name of the stimulus
+            (e.g. stimulus_info.DRIFTING_GRATINGS_SHORT).
+
+        Returns
+        -------
+        StimulusAnalysis instance
+        """
+
+        if name in _NATURAL_MOVIES:
+            return NaturalMovie(self.nwb, _NATURAL_MOVIES[name])
+        elif name in _LOCALLY_SPARSE_NOISES:
+            return LocallySparseNoise(self.nwb, _LOCALLY_SPARSE_NOISES[name])
+        elif name == stimulus_info.DRIFTING_GRATINGS_SHORT:
+            analysis = DriftingGratings(self.nwb)
+            analysis.noise_correlation, _, _, _ = \
+                analysis.get_noise_correlation()
+        elif name == stimulus_info.STATIC_GRATINGS_SHORT:
+            analysis = StaticGratings(self.nwb)
+            analysis.noise_correlation, _, _, _ = \
+                analysis.get_noise_correlation()
+        elif name == stimulus_info.NATURAL_SCENES_SHORT:
+            analysis = NaturalScenes(self.nwb)
+            analysis.noise_correlation, _ = analysis.get_noise_correlation()
+        else:
+            raise BrainObservatoryAnalysisException(
+                "Unknown stimulus analysis: %s" % name)
+
+        analysis.signal_correlation, _ = analysis.get_signal_correlation()
+        analysis.representational_similarity, _ = \
+            analysis.get_representational_similarity()
+
+        return analysis
+
+    def append_stimulus_metrics(self, metrics, name, analysis):
+        """ Extract the metrics of a single stimulus analysis into a
+        dictionary, with the append_metrics_* method for that stimulus. """
+
+        if name == stimulus_info.DRIFTING_GRATINGS_SHORT:
+            self.append_metrics_drifting_grating(metrics, analysis)
+        elif name == stimulus_info.STATIC_GRATINGS_SHORT:
+            self.append_metrics_static_grating(metrics, analysis)
+        elif name == stimulus_info.NATURAL_SCENES_SHORT:
+            self.append_metrics_natural_scene(metrics, analysis)
+        elif name == stimulus_info.NATURAL_MOVIE_ONE_SHORT:
+            self.append_metrics_natural_movie_one(metrics, analysis)
+        elif name == stimulus_info.NATURAL_MOVIE_TWO_SHORT:
+            self.append_metrics_natural_movie_two(metrics, analysis)
+        elif name == stimulus_info.NATURAL_MOVIE_THREE_SHORT:
+            self.append_metrics_natural_movie_three(metrics, analysis)
+        elif name in _LOCALLY_SPARSE_NOISES:
+            self.append_metrics_locally_sparse_noise(metrics, analysis)
+        else:
+            raise BrainObservatoryAnalysisException(
+                "Unknown stimulus analysis: %s" % name)
+
+    def stimulus_outputs(self, name, analysis, session):
+        """ Collect the outputs of a single stimulus analysis that are saved
+        to self.save_path.
+
+        Parameters
+        ----------
+        name: string
+            The short name of the stimulus.
+
+        analysis: StimulusAnalysis instance
+            The analysis created by self.create_stimulus_analysis(name).
+
+        session: string
+            The session type, one of the keys of SESSION_ANALYSES.  Only
+            sessions A and B save the natural movie one stimulus table.
+
+        Returns
+        -------
+        dict with the keys:
+            * dataframes: list of (key, pd.DataFrame) to save under analysis/
+            * arrays: list of (key, np.ndarray) to save under analysis/
+            * receptive_field: (prefix, dict) of receptive field analysis
+              data, or None
+        """
+
+        receptive_field = None
+
+        if name in _NATURAL_MOVIES:
+            dataframes = [('sweep_response_%s' % name,
+                           analysis.sweep_response)]
+            arrays = []
+
+            if name == stimulus_info.NATURAL_MOVIE_ONE_SHORT:
+                if session in (stimulus_info.THREE_SESSION_A,
+                               stimulus_info.THREE_SESSION_B):
+                    dataframes.append(('stim_table_nm1', analysis.stim_table))
+                arrays = [
+                    ('binned_cells_sp', analysis.binned_cells_sp),
+                    ('binned_cells_vis', analysis.binned_cells_vis),
+                    ('binned_dx_sp', analysis.binned_dx_sp),
+                    ('binned_dx_vis', analysis.binned_dx_vis)]
+
+        elif name in _LOCALLY_SPARSE_NOISES:
+            dataframes = [
+                ('stim_table_%s' % name, analysis.stim_table),
+                ('sweep_response_%s' % name, analysis.sweep_response),
+                ('mean_sweep_response_%s' % name,
+                 analysis.mean_sweep_response)]
+            arrays = [
+                ('receptive_field_%s' % name, analysis.receptive_field),
+                ('mean_response_%s' % name, analysis.mean_response)]
+            receptive_field = (
+                _LOCALLY_SPARSE_NOISES[name],
+                analysis.cell_index_receptive_field_analysis_data)
+
+        elif name in (stimulus_info.DRIFTING_GRATINGS_SHORT,
+                      stimulus_info.STATIC_GRATINGS_SHORT,
+                      stimulus_info.NATURAL_SCENES_SHORT):
+            dataframes = [
+                ('stim_table_%s' % name, analysis.stim_table),
+                ('sweep_response_%s' % name, analysis.sweep_response),
+                ('mean_sweep_response_%s' % name,
+                 analysis.mean_sweep_response)]
+            arrays = [
+                ('response_%s' % name, analysis.response),
+                ('noise_corr_%s' % name, analysis.noise_correlation),
+                ('signal_corr_%s' % name, analysis.signal_correlation),
+                ('rep_similarity_%s' % name,
+                 analysis.representational_similarity)]
+
+        else:
+            raise BrainObservatoryAnalysisException(
+                "Unknown stimulus analysis: %s" % name)
+
+        return dict(dataframes=dataframes,
+                    arrays=arrays,
+                    receptive_field=receptive_field)
+
+    def save_stimulus_outputs(self, nwb, outputs):
+        """ Save the outputs of a single stimulus analysis (see
+        self.stimulus_outputs) with a BrainObservatoryNwbDataSet. """
+
+        nwb.save_analysis_dataframes(*outputs['dataframes'])
+        nwb.save_analysis_arrays(*outputs['arrays'])
+
+        if outputs['receptive_field'] is not None:
+            prefix, data = outputs['receptive_field']
+            LocallySparseNoise.save_cell_index_receptive_field_analysis(
+                data, nwb, prefix)
+
     def session_a(self, plot_flag=False, save_flag=True):
         """ Run stimulus-specific analysis for natural movie one, natural movie three, and drifting gratings.
         The input NWB be for a stimulus_info.THREE_SESSION_A experiment.
@@ -386,13 +531,12 @@ class SessionAnalysis(object):
             Whether to save the output of analysis to self.save_path upon completion.
         """
 
-        nm1 = NaturalMovie(self.nwb, 'natural_movie_one')
-        nm3 = NaturalMovie(self.nwb, 'natural_movie_three')
-        dg = DriftingGratings(self.nwb)
-
-        dg.noise_correlation, _, _, _ = dg.get_noise_correlation()
-        dg.signal_correlation, _ = dg.get_signal_correlation()
-        dg.representational_similarity, _ = dg.get_representational_similarity()
+        nm1 = self.create_stimulus_analysis(
+            stimulus_info.NATURAL_MOVIE_ONE_SHORT)
+        nm3 = self.create_stimulus_analysis(
+            stimulus_info.NATURAL_MOVIE_THREE_SHORT)
+        dg = self.create_stimulus_analysis(
+            stimulus_info.DRIFTING_GRATINGS_SHORT)
 
         SessionAnalysis._log.info("Session A analyzed")
         peak = multi_dataframe_merge(
@@ -426,9 +570,11 @@ class SessionAnalysis(object):
             Whether to save the output of analysis to self.save_path upon completion.
         """
 
-        ns = NaturalScenes(self.nwb)
-        sg = StaticGratings(self.nwb)
-        nm1 = NaturalMovie(self.nwb, 'natural_movie_one')
+        ns = self.create_stimulus_analysis(stimulus_info.NATURAL_SCENES_SHORT)
+        sg = self.create_stimulus_analysis(
+            stimulus_info.STATIC_GRATINGS_SHORT)
+        nm1 = self.create_stimulus_analysis(
+            stimulus_info.NATURAL_MOVIE_ONE_SHORT)
         SessionAnalysis._log.info("Session B analyzed")
         peak = multi_dataframe_merge(
             [nm1.peak_run, sg.peak, ns.peak, nm1.peak])
@@ -441,14 +587,6 @@ class SessionAnalysis(object):
         self.verify_roi_lists_equal(sg.roi_id, ns.roi_id)
         self.metrics_b['cell']['roi_id'] = sg.roi_id
 
-        sg.noise_correlation, _, _, _ = sg.get_noise_correlation()
-        sg.signal_correlation, _ = sg.get_signal_correlation()
-        sg.representational_similarity, _ = sg.get_representational_similarity()
-
-        ns.noise_correlation, _ = ns.get_noise_correlation()
-        ns.signal_correlation, _ = ns.get_signal_correlation()
-        ns.representational_similarity, _ = ns.get_representational_similarity()
-
         if save_flag:
             self.save_session_b(sg, nm1, ns, peak)
 
@@ -470,9 +608,12 @@ class SessionAnalysis(object):
             Whether to save the output of analysis to self.save_path upon completion.
         """
 
-        lsn = LocallySparseNoise(self.nwb, stimulus_info.LOCALLY_SPARSE_NOISE)
-        nm2 = NaturalMovie(self.nwb, 'natural_movie_two')
-        nm1 = NaturalMovie(self.nwb, 'natural_movie_one')
+        lsn = self.create_stimulus_analysis(
+            stimulus_info.LOCALLY_SPARSE_NOISE_SHORT)
+        nm2 = self.create_stimulus_analysis(
+            stimulus_info.NATURAL_MOVIE_TWO_SHORT)
+        nm1 = self.create_stimulus_analysis(
+            stimulus_info.NATURAL_MOVIE_ONE_SHORT)
         SessionAnalysis._log.info("Session C analyzed")
         peak = multi_dataframe_merge([nm1.peak_run, nm1.peak, nm2.peak, lsn.peak])
         self.append_metadata(peak)
@@ -503,11 +644,15 @@ class SessionAnalysis(object):
             Whether to save the output of analysis to self.save_path upon completion.
         """
 
-        lsn4 = LocallySparseNoise(self.nwb, stimulus_info.LOCALLY_SPARSE_NOISE_4DEG)
-        lsn8 = LocallySparseNoise(self.nwb, stimulus_info.LOCALLY_SPARSE_NOISE_8DEG)
+        lsn4 = self.create_stimulus_analysis(
+            stimulus_info.LOCALLY_SPARSE_NOISE_4DEG_SHORT)
+        lsn8 = self.create_stimulus_analysis(
+            stimulus_info.LOCALLY_SPARSE_NOISE_8DEG_SHORT)
 
-        nm2 = NaturalMovie(self.nwb, 'natural_movie_two')
-        nm1 = NaturalMovie(self.nwb, 'natural_movie_one')
+        nm2 = self.create_stimulus_analysis(
+            stimulus_info.NATURAL_MOVIE_TWO_SHORT)
+        nm1 = self.create_stimulus_analysis(
+            stimulus_info.NATURAL_MOVIE_ONE_SHORT)
         SessionAnalysis._log.info("Session C2 analyzed")
 
         if self.nwb.get_metadata()['targeted_structure'] == 'VISp':
@@ -533,6 +678,241 @@ class SessionAnalysis(object):
             cp.plot_lsn_traces(lsn4, self.save_dir, '_4deg')
             cp.plot_lsn_traces(lsn4, self.save_dir, '_8deg')
 
+    def analyze_stimulus(self, name):
+        """ Run the analysis of a single stimulus and collect everything that
+        needs to be saved for it.
+
+        Parameters
+        ----------
+        name: string
+            The short name of the stimulus
+            (e.g. stimulus_info.DRIFTING_GRATINGS_SHORT).
+
+        Returns
+        -------
+        dict with the keys of self.stimulus_outputs and:
+            * peak: pd.DataFrame of peak response properties
+            * peak_run: pd.DataFrame of running modulation properties, or
+              None
+            * metrics: dict of cell metrics, as extracted by the
+              append_metrics_* methods
+        """
+
+        analysis = self.create_stimulus_analysis(name)
+
+        metrics = {}
+        self.append_stimulus_metrics(metrics, name, analysis)
+
+        results = self.stimulus_outputs(
+            name, analysis, self.nwb.get_session_type())
+        results.update(
+            peak=analysis.peak,
+            peak_run=(analysis.peak_run
+                      if name == stimulus_info.NATURAL_MOVIE_ONE_SHORT
+                      else None),
+            metrics=metrics)
+
+        return results
+
+    def save_checkpoint(self, name, results):
+        """ Save the results of a single stimulus analysis to
+        self.save_path and mark the analysis complete.  The completion mark
+        is written last, so an analysis interrupted while saving will be
+        run again.
+
+        Parameters
+        ----------
+        name: string
+            The short name of the stimulus.
+
+        results: dict
+            The output of self.analyze_stimulus(name).
+        """
+
+        nwb = BrainObservatoryNwbDataSet(self.save_path)
+        checkpoint = '%s/%s' % (CHECKPOINT_GROUP, name)
+
+        with h5py.File(self.save_path, 'a') as f:
+            if checkpoint in f:
+                del f[checkpoint]
+            f.require_group('analysis')
+
+        # metrics are saved as one table.  The metrics that are pd.Series
+        # (rather than lists) are recorded with their names, so that
+        # load_checkpoint can return every metric with its original type.
+        metrics = results['metrics']
+        series_metrics = [(k, v.name) for k, v in metrics.items()
+                          if isinstance(v, pd.Series)]
+
+        tables = [('checkpoints/%s/peak' % name, results['peak']),
+                  ('checkpoints/%s/metrics' % name, pd.DataFrame(metrics))]
+        if results['peak_run'] is not None:
+            tables.append(('checkpoints/%s/peak_run' % name,
+                           results['peak_run']))
+
+        self.save_stimulus_outputs(nwb, results)
+        nwb.save_analysis_dataframes(*tables)
+
+        with h5py.File(self.save_path, 'a') as f:
+            f[checkpoint].attrs['series_metrics'] = np.array(
+                series_metrics, dtype=h5py.string_dtype()).reshape(-1, 2)
+            f[checkpoint].attrs['complete'] = True
+
+    def load_checkpoint(self, name):
+        """ Load the peak response tables and cell metrics of a completed
+        stimulus analysis from self.save_path.
+
+        Parameters
+        ----------
+        name: string
+            The short name of the stimulus.
+
+        Returns
+        -------
+        dict with the keys 'peak', 'peak_run' and 'metrics', of the same
+        types as returned by self.analyze_stimulus
+        """
+
+        checkpoint = '%s/%s' % (CHECKPOINT_GROUP, name)
+
+        with h5py.File(self.save_path, 'r') as f:
+            has_peak_run = '%s/peak_run' % checkpoint in f
+            series_metrics = dict(f[checkpoint].attrs['series_metrics'])
+
+        metrics = {}
+        for k, v in pd.read_hdf(self.save_path,
+                                '%s/metrics' % checkpoint).items():
+            if k in series_metrics:
+                metrics[k] = v.rename(series_metrics[k])
+            else:
+                metrics[k] = v.tolist()
+
+        return dict(
+            peak=pd.read_hdf(self.save_path, '%s/peak' % checkpoint),
+            peak_run=(pd.read_hdf(self.save_path,
+                                  '%s/peak_run' % checkpoint)
+                      if has_peak_run else None),
+            metrics=metrics)
+
+    def completed_analyses(self):
+        """ Return the set of short stimulus names whose analyses have been
+        checkpointed to self.save_path. """
+
+        if not os.path.exists(self.save_path):
+            return set()
+
+        with h5py.File(self.save_path, 'r') as f:
+            if CHECKPOINT_GROUP not in f:
+                return set()
+
+            return set(name for name, group in f[CHECKPOINT_GROUP].items()
+                       if group.attrs.get('complete', False))
+
+    def run_session(self, n_workers=None):
+        """ Run all of the stimulus-specific analyses for this session as
+        independent tasks in a process pool, saving each analysis to
+        self.save_path as soon as it finishes.  Analyses already saved by an
+        earlier (possibly interrupted) run are not repeated.  Once every
+        analysis is complete, the combined peak response table is saved.
+
+        Parameters
+        ----------
+        n_workers: int
+            Number of worker processes.  Defaults to one per analysis to
+            run, up to the number of CPUs.  If 1, analyses are run in this
+            process.
+
+        Returns
+        -------
+        dict of cell and experiment metrics (see run_session_analysis)
+        """
+
+        session = self.nwb.get_session_type()
+        if session not in SESSION_ANALYSES:
+            raise IndexError("Unknown session: %s" % session)
+
+        completed = self.completed_analyses()
+        pending = [name for name in SESSION_ANALYSES[session]
+                   if name not in completed]
+        for name in completed:
+            SessionAnalysis._log.info("Skipping completed analysis: %s", name)
+
+        if n_workers is None:
+            n_workers = min(len(pending), multiprocessing.cpu_count())
+
+        # the pool workers share this instance (and its loaded
+        # BrainObservatoryNwbDataSet); results are sent back to be
+        # saved from this process, so only one process writes
+        # to self.save_path
+        for name, results in imap_with_shared(
+                _analyze_stimulus, pending, shared=self,
+                n_workers=min(n_workers, len(pending)), ordered=False):
+            self.save_checkpoint(name, results)
+            SessionAnalysis._log.info("Analysis saved: %s", name)
+
+        return self.save_session(session)
+
+    def save_session(self, session):
+        """ Combine the checkpointed stimulus analyses of a session into the
+        peak response table and metrics, and save the peak response table
+        (and, for stimulus_info.THREE_SESSION_C2, the merged locally sparse
+        noise mean response) to self.save_path.
+
+        Parameters
+        ----------
+        session: string
+            The session type, one of the keys of SESSION_ANALYSES.
+
+        Returns
+        -------
+        dict of cell and experiment metrics (see run_session_analysis)
+        """
+
+        names = list(SESSION_ANALYSES[session])
+
+        if session == stimulus_info.THREE_SESSION_C2:
+            # only one of the locally sparse noise analyses contributes to
+            # the peak table
+            if self.metadata['targeted_structure'] == 'VISp':
+                names.remove(stimulus_info.LOCALLY_SPARSE_NOISE_8DEG_SHORT)
+            else:
+                names.remove(stimulus_info.LOCALLY_SPARSE_NOISE_4DEG_SHORT)
+
+        checkpoints = dict((name, self.load_checkpoint(name))
+                           for name in names)
+        nm1 = checkpoints[stimulus_info.NATURAL_MOVIE_ONE_SHORT]
+
+        peak = multi_dataframe_merge(
+            [nm1['peak_run']] + [checkpoints[name]['peak'] for name in names])
+        self.append_metadata(peak)
+
+        if session == stimulus_info.THREE_SESSION_A:
+            metrics = self.metrics_a
+        elif session == stimulus_info.THREE_SESSION_B:
+            metrics = self.metrics_b
+        else:
+            metrics = self.metrics_c
+
+        for name in names:
+            for k, v in checkpoints[name]['metrics'].items():
+                metrics['cell'][k] = v
+        self.append_experiment_metrics(metrics['experiment'])
+        metrics['cell']['roi_id'] = self.nwb.get_roi_ids()
+
+        nwb = BrainObservatoryNwbDataSet(self.save_path)
+        nwb.save_analysis_dataframes(('peak', peak))
+
+        if session == stimulus_info.THREE_SESSION_C2:
+            with h5py.File(self.save_path, 'r') as f:
+                mean_response_lsn4 = f['analysis/mean_response_lsn4'][()]
+                mean_response_lsn8 = f['analysis/mean_response_lsn8'][()]
+
+            nwb.save_analysis_arrays(
+                ('merge_mean_response', LocallySparseNoise.merge_mean_response(
+                    mean_response_lsn4, mean_response_lsn8)))
+
+        return metrics
+
 
 def run_session_analysis(nwb_path, save_path, plot_flag=False, save_flag=True):
     """ Inspect an NWB file to determine which experiment session was run
@@ -580,6 +960,38 @@ def run_session_analysis(nwb_path, save_path, plot_flag=False, save_flag=True):
     return metrics
 
 
+def _analyze_stimulus(session_analysis, name):
+    return name, session_analysis.analyze_stimulus(name)
+
+
+def run_session_analysis_parallel(nwb_path, save_path, n_workers=None):
+    """ Inspect an NWB file to determine which experiment session was run
+    and compute all stimulus-specific analyses in a process pool, saving
+    each analysis to save_path as soon as it finishes.  If an earlier run
+    was interrupted, the analyses it saved are not repeated.
+
+    Parameters
+    ----------
+    nwb_path: string
+        Path to NWB file.
+
+    save_path: string
+        path to save results. Recommended NOT to use NWB file.
+
+    n_workers: int
+        Number of worker processes (see SessionAnalysis.run_session).
+    """
+
+    save_dir = os.path.abspath(os.path.dirname(save_path))
+
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    session_analysis = SessionAnalysis(nwb_path, save_path)
+
+    return session_analysis.run_session(n_workers=n_workers)
+
+
 @deprecated('use the standalone version in bin/brain_observatory')
 def main():
     parser = argparse.ArgumentParser()
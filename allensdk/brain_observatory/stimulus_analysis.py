@@ -39,6 +39,7 @@ import scipy
 import numpy as np
 import pandas as pd
 import logging
+from allensdk.core.multiprocessing_utils import imap_with_shared
 from .findlevel import findlevel
 from .brain_observatory_exceptions import BrainObservatoryAnalysisException
 from . import observatory_plots as oplots
@@ -85,6 +86,7 @@ class StimulusAnalysis(object):
         self._stim_table = StimulusAnalysis._PRELOAD
         self._response = StimulusAnalysis._PRELOAD
         self._sweep_response = StimulusAnalysis._PRELOAD
+        self._sweep_response_tensor = StimulusAnalysis._PRELOAD
         self._mean_sweep_response = StimulusAnalysis._PRELOAD
         self._pval = StimulusAnalysis._PRELOAD
         self._peak = StimulusAnalysis._PRELOAD
@@ -108,19 +110,27 @@ class StimulusAnalysis(object):
 
         return self._sweep_response
 
+    @property
+    def sweep_response_tensor(self):
+        if self._sweep_response_tensor is StimulusAnalysis._PRELOAD:
+            (self._sweep_response_tensor, self._mean_sweep_response,
+             self._pval) = self.get_sweep_response_tensor()
+
+        return self._sweep_response_tensor
+
     @property
     def mean_sweep_response(self):
         if self._mean_sweep_response is StimulusAnalysis._PRELOAD:
-            self._sweep_response, self._mean_sweep_response, self._pval = \
-                self.get_sweep_response()
+            (self._sweep_response_tensor, self._mean_sweep_response,
+             self._pval) = self.get_sweep_response_tensor()
 
         return self._mean_sweep_response
 
     @property
     def pval(self):
         if self._pval is StimulusAnalysis._PRELOAD:
-            self._sweep_response, self._mean_sweep_response, self._pval = \
-                self.get_sweep_response()
+            (self._sweep_response_tensor, self._mean_sweep_response,
+             self._pval) = self.get_sweep_response_tensor()
 
         return self._pval
 
@@ -266,7 +276,7 @@ class StimulusAnalysis(object):
         """ Implemented by subclasses. """
         raise BrainObservatoryAnalysisException("get_peak not implemented")
 
-    def get_speed_tuning(self, binsize):
+    def get_speed_tuning(self, binsize, random_state=None, n_workers=1):
         """ Calculates speed tuning, spontaneous versus visually driven.
         The return is a 5-tuple
         of speed and dF/F histograms.
@@ -297,6 +307,22 @@ class StimulusAnalysis(object):
 
             peak_run: pd.DataFrame of speed-related properties of a cell.
 
+        Whether a cell is modulated by running is assessed by comparing the
+        variance of its binned fluorescence against the variance after
+        shuffling its trace 200 times.
+
+        Parameters
+        ----------
+        binsize: int
+            Number of timestamps in each speed bin after the first
+
+        random_state: None, int, or np.random.RandomState
+            Source of the shuffles. If None (default), the global numpy
+            random state is used. If an int, it seeds a new RandomState.
+
+        n_workers: int
+            Number of processes used to compute the shuffles
+
         Returns
         -------
         tuple: binned_dx_sp, binned_cells_sp, binned_dx_vis,
@@ -349,145 +375,26 @@ class StimulusAnalysis(object):
         celltraces_vis = celltraces_vis[:, ~np.isnan(dx_vis)]
         dx_vis = dx_vis[~np.isnan(dx_vis)]
 
-        nbins = 1 + len(np.where(dx_sp >= 1)[0]) // binsize
-        dx_sorted = dx_sp[np.argsort(dx_sp)]
-        celltraces_sorted_sp = celltraces_sp[:, np.argsort(dx_sp)]
-        binned_cells_sp = np.zeros((self.numbercells, nbins, 2))
-        binned_dx_sp = np.zeros((nbins, 2))
-        for i in range(nbins):
-            if np.all(np.isnan(dx_sorted)):
-                raise BrainObservatoryAnalysisException(
-                    "dx is filled with NaNs")
-
-            offset = findlevel(dx_sorted, 1, 'up')
-
-            if offset is None:
-                StimulusAnalysis._log.info(
-                    "dx never crosses 1, all speed data going into single bin")
-                offset = len(dx_sorted)
-
-            if i == 0:
-                binned_dx_sp[i, 0] = np.mean(dx_sorted[:offset])
-                binned_dx_sp[i, 1] = np.std(
-                    dx_sorted[:offset]) / np.sqrt(offset)
-                binned_cells_sp[:, i, 0] = np.mean(
-                    celltraces_sorted_sp[:, :offset], axis=1)
-                binned_cells_sp[:, i, 1] = np.std(
-                    celltraces_sorted_sp[:, :offset], axis=1) / np.sqrt(offset)
-            else:
-                start = offset + (i - 1) * binsize
-                binned_dx_sp[i, 0] = np.mean(dx_sorted[start:start + binsize])
-                binned_dx_sp[i, 1] = np.std(
-                    dx_sorted[start:start + binsize]) / np.sqrt(binsize)
-                binned_cells_sp[:, i, 0] = np.mean(
-                    celltraces_sorted_sp[:, start:start + binsize], axis=1)
-                binned_cells_sp[:, i, 1] = np.std(
-                    celltraces_sorted_sp[:, start:start + binsize],
-                    axis=1) / np.sqrt(binsize)
-
-        binned_cells_shuffled_sp = np.empty((self.numbercells, nbins, 2, 200))
-        for shuf in range(200):
-            celltraces_shuffled = \
-                celltraces_sp[:,
-                              np.random.permutation(np.size(celltraces_sp, 1))]
-            celltraces_shuffled_sorted = celltraces_shuffled[
-                                         :, np.argsort(dx_sp)]
-            for i in range(nbins):
-                offset = findlevel(dx_sorted, 1, 'up')
-
-                if offset is None:
-                    StimulusAnalysis._log.info(
-                        "dx never crosses 1, all speed data going into "
-                        "single bin")
-                    offset = celltraces_shuffled_sorted.shape[1]
-
-                if i == 0:
-                    binned_cells_shuffled_sp[:, i, 0, shuf] = np.mean(
-                        celltraces_shuffled_sorted[:, :offset], axis=1)
-                    binned_cells_shuffled_sp[:, i, 1, shuf] = np.std(
-                        celltraces_shuffled_sorted[:, :offset], axis=1)
-                else:
-                    start = offset + (i - 1) * binsize
-                    binned_cells_shuffled_sp[:, i, 0, shuf] = np.mean(
-                        celltraces_shuffled_sorted[:, start:start + binsize],
-                        axis=1)
-                    binned_cells_shuffled_sp[:, i, 1, shuf] = np.std(
-                        celltraces_shuffled_sorted[:, start:start + binsize],
-                        axis=1)
-
-        nbins = 1 + len(np.where(dx_vis >= 1)[0]) // binsize
-        dx_sorted = dx_vis[np.argsort(dx_vis)]
-        celltraces_sorted_vis = celltraces_vis[:, np.argsort(dx_vis)]
-        binned_cells_vis = np.zeros((self.numbercells, nbins, 2))
-        binned_dx_vis = np.zeros((nbins, 2))
-        for i in range(nbins):
-            offset = findlevel(dx_sorted, 1, 'up')
-
-            if offset is None:
-                StimulusAnalysis._log.info(
-                    "dx never crosses 1, all speed data going into single bin")
-                offset = len(dx_sorted)
-
-            if i == 0:
-                binned_dx_vis[i, 0] = np.mean(dx_sorted[:offset])
-                binned_dx_vis[i, 1] = np.std(
-                    dx_sorted[:offset]) / np.sqrt(offset)
-                binned_cells_vis[:, i, 0] = np.mean(
-                    celltraces_sorted_vis[:, :offset], axis=1)
-                binned_cells_vis[:, i, 1] = (
-                        np.std(celltraces_sorted_vis[:, :offset], axis=1) /
-                        np.sqrt(offset))
-            else:
-                # TODO 9 lines of repeated code!!!!!!!!!!!!
-                start = offset + (i - 1) * binsize
-                binned_dx_vis[i, 0] = np.mean(dx_sorted[start:start + binsize])
-                binned_dx_vis[i, 1] = np.std(
-                    dx_sorted[start:start + binsize]) / np.sqrt(binsize)
-                binned_cells_vis[:, i, 0] = np.mean(
-                    celltraces_sorted_vis[:, start:start + binsize], axis=1)
-                binned_cells_vis[:, i, 1] = np.std(
-                    celltraces_sorted_vis[:, start:start + binsize],
-                    axis=1) / np.sqrt(binsize)
-
-        binned_cells_shuffled_vis = np.empty((self.numbercells, nbins, 2, 200))
-        for shuf in range(200):
-            celltraces_shuffled = \
-                celltraces_vis[:,
-                               np.random.permutation(
-                                   np.size(celltraces_vis, 1))]
-            celltraces_shuffled_sorted = celltraces_shuffled[
-                                         :, np.argsort(dx_vis)]
-            for i in range(nbins):
-                offset = findlevel(dx_sorted, 1, 'up')
-
-                if offset is None:
-                    StimulusAnalysis._log.info(
-                        "dx never crosses 1, all speed data going into "
-                        "single bin")
-                    offset = len(dx_sorted)
-
-                if i == 0:
-                    binned_cells_shuffled_vis[:, i, 0, shuf] = np.mean(
-                        celltraces_shuffled_sorted[:, :offset], axis=1)
-                    binned_cells_shuffled_vis[:, i, 1, shuf] = np.std(
-                        celltraces_shuffled_sorted[:, :offset], axis=1)
-                else:
-                    start = offset + (i - 1) * binsize
-                    binned_cells_shuffled_vis[:, i, 0, shuf] = np.mean(
-                        celltraces_shuffled_sorted[:, start:start + binsize],
-                        axis=1)
-                    binned_cells_shuffled_vis[:, i, 1, shuf] = np.std(
-                        celltraces_shuffled_sorted[:, start:start + binsize],
-                        axis=1)
-
-        shuffled_variance_sp = binned_cells_shuffled_sp[
-                               :, :, 0, :].std(axis=1) ** 2
+        if np.all(np.isnan(dx_sp)):
+            raise BrainObservatoryAnalysisException("dx is filled with NaNs")
+
+        # draw the spontaneous and visual shuffles from the same stream
+        random_state = _get_random_state(random_state)
+
+        binned_dx_sp, binned_cells_sp, celltraces_sorted_sp, shuffled_sp = \
+            self._bin_speed_tuning(dx_sp, celltraces_sp, binsize,
+                                   random_state, n_workers)
+        binned_dx_vis, binned_cells_vis, celltraces_sorted_vis, \
+            shuffled_vis = self._bin_speed_tuning(dx_vis, celltraces_vis,
+                                                  binsize, random_state,
+                                                  n_workers)
+
+        shuffled_variance_sp = shuffled_sp.std(axis=1) ** 2
         variance_threshold_sp = np.percentile(
             shuffled_variance_sp, 99.9, axis=1)
         response_variance_sp = binned_cells_sp[:, :, 0].std(axis=1) ** 2
 
-        shuffled_variance_vis = binned_cells_shuffled_vis[
-                                :, :, 0, :].std(axis=1) ** 2
+        shuffled_variance_vis = shuffled_vis.std(axis=1) ** 2
         variance_threshold_vis = np.percentile(
             shuffled_variance_vis, 99.9, axis=1)
         response_variance_vis = binned_cells_vis[:, :, 0].std(axis=1) ** 2
@@ -547,13 +454,163 @@ class StimulusAnalysis(object):
         return binned_dx_sp, binned_cells_sp, binned_dx_vis, \
             binned_cells_vis, peak_run
 
+    def _bin_speed_tuning(self, dx, celltraces, binsize, random_state,
+                          n_workers):
+        """ Bin fluorescence by running speed for get_speed_tuning.
+
+        Parameters
+        ----------
+        dx: np.ndarray
+            running speed at each timestamp
+
+        celltraces: np.ndarray
+            (cells, timestamps) fluorescence traces
+
+        binsize: int
+            number of timestamps in each bin after the first
+
+        random_state: None, int, or np.random.RandomState
+            source of the shuffles (see shuffled_bin_means)
+
+        n_workers: int
+            number of processes used to compute the shuffles
+
+        Returns
+        -------
+        binned_dx: (bins, 2) np.ndarray of mean running speed in each bin
+        and its standard error
+
+        binned_cells: (cells, bins, 2) np.ndarray of mean fluorescence in
+        each bin and its standard error
+
+        celltraces_sorted: (cells, timestamps) np.ndarray of the traces
+        sorted by running speed
+
+        shuffled_means: (cells, bins, shuffles) np.ndarray of the mean
+        fluorescence in each bin after shuffling the traces
+        """
+        nbins = 1 + len(np.where(dx >= 1)[0]) // binsize
+        order = np.argsort(dx)
+        dx_sorted = dx[order]
+        celltraces_sorted = celltraces[:, order]
+
+        offset = findlevel(dx_sorted, 1, 'up')
+        if offset is None:
+            StimulusAnalysis._log.info(
+                "dx never crosses 1, all speed data going into single bin")
+            offset = len(dx_sorted)
+        bin_starts, bin_ends = speed_bin_edges(offset, nbins, binsize,
+                                               len(dx_sorted))
+
+        binned_cells = np.zeros((self.numbercells, nbins, 2))
+        binned_dx = np.zeros((nbins, 2))
+        for i in range(nbins):
+            # the first bin holds all speeds below 1 cm/s
+            count = offset if i == 0 else binsize
+            in_bin = slice(bin_starts[i], bin_ends[i])
+            binned_dx[i, 0] = np.mean(dx_sorted[in_bin])
+            binned_dx[i, 1] = np.std(dx_sorted[in_bin]) / np.sqrt(count)
+            binned_cells[:, i, 0] = np.mean(
+                celltraces_sorted[:, in_bin], axis=1)
+            binned_cells[:, i, 1] = np.std(
+                celltraces_sorted[:, in_bin], axis=1) / np.sqrt(count)
+
+        shuffled_means = shuffled_bin_means(celltraces, order,
+                                            bin_starts, bin_ends,
+                                            random_state=random_state,
+                                            n_workers=n_workers)
+
+        return binned_dx, binned_cells, celltraces_sorted, shuffled_means
+
+    def get_sweep_response_tensor(self, dtype=np.float32):
+        """ Calculates the response to each sweep in the stimulus table for
+        each cell, as well as the mean response and the p value of each
+        response, without building a DataFrame of traces.
+        The return is a 3-tuple of:
+
+            * sweep_response_tensor: (sweeps, cells + 1, frames) np.ndarray
+            of response dF/F traces, of the given dtype (float32 by default,
+            to halve its size). The last entry along the second axis holds
+            the running speed during each sweep. Frames past the end of the
+            recording are NaN.
+
+            * mean_sweep_response: pd.DataFrame of the mean values of the
+            traces during each sweep, organized by cell (column) and sweep
+            (row)
+
+            * pval: pd.DataFrame of p values from 1-way ANOVA comparing
+            response during sweep to response prior to sweep
+
+        Parameters
+        ----------
+        dtype: np.dtype
+            The dtype of sweep_response_tensor. Means and p values are
+            always computed in double precision.
+
+        Returns
+        -------
+        3-tuple: sweep_response_tensor, mean_sweep_response, pval
+        """
+        StimulusAnalysis._log.info('Calculating responses for each sweep')
+
+        sweep_starts = self.stim_table['start'].values
+        starts = (sweep_starts - self.interlength).astype(int)
+        ends = (sweep_starts + self.sweeplength +
+                self.interlength).astype(int)
+        n_frames = self.sweeplength + 2 * self.interlength
+        response_end = self.interlength + self.sweeplength + self.extralength
+
+        n_sweeps = len(starts)
+        tensor = np.empty((n_sweeps, self.numbercells + 1, n_frames),
+                          dtype=dtype)
+        means = np.empty((n_sweeps, self.numbercells + 1))
+        pvals = np.empty((n_sweeps, self.numbercells + 1))
+
+        # gather the cells in blocks to bound the size of the
+        # double precision intermediates
+        block_size = 64
+        for block_start in range(0, self.numbercells, block_size):
+            block = slice(block_start,
+                          min(block_start + block_size, self.numbercells))
+            windows, valid = sweep_windows(self.celltraces[block],
+                                           starts, ends, n_frames)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                baseline = (np.where(valid[:, :self.interlength],
+                                     windows[:, :, :self.interlength],
+                                     0).sum(axis=2) /
+                            valid[:, :self.interlength].sum(axis=1))
+                windows = 100 * ((windows / baseline[:, :, np.newaxis]) - 1)
+            block_means, block_pvals = sweep_statistics(
+                windows, valid, self.interlength, response_end)
+            means[:, block] = block_means.T
+            pvals[:, block] = block_pvals.T
+            tensor[:, block] = windows.transpose(1, 0, 2)
+
+        windows, valid = sweep_windows(np.asarray(self.dxcm)[np.newaxis],
+                                       starts, ends, n_frames)
+        dx_means, dx_pvals = sweep_statistics(
+            windows, valid, self.interlength, response_end)
+        means[:, -1] = dx_means[0]
+        pvals[:, -1] = dx_pvals[0]
+        tensor[:, -1] = windows[0]
+
+        columns = list(map(str, range(self.numbercells))) + ['dx']
+        mean_sweep_response = pd.DataFrame(
+            means, index=self.stim_table.index.values, columns=columns)
+        pval = pd.DataFrame(
+            pvals, index=self.stim_table.index.values, columns=columns)
+
+        return tensor, mean_sweep_response, pval
+
     def get_sweep_response(self):
         """ Calculates the response to each sweep in the stimulus table for
         each cell and the mean response.
         The return is a 3-tuple of:
 
             * sweep_response: pd.DataFrame of response dF/F traces organized
-            by cell (column) and sweep (row)
+            by cell (column) and sweep (row). Each trace is a float32 view
+            into sweep_response_tensor, so building the DataFrame copies no
+            traces.
 
             * mean_sweep_response: mean values of the traces returned in
             sweep_response
@@ -565,42 +622,28 @@ class StimulusAnalysis(object):
         -------
         3-tuple: sweep_response, mean_sweep_response, pval
         """
+        tensor = self.sweep_response_tensor
+        mean_sweep_response = self.mean_sweep_response
+        pval = self.pval
+
+        # traces are trimmed where the sweep window runs past the end of
+        # the recording
+        starts = (self.stim_table['start'].values -
+                  self.interlength).astype(int)
+        n_cell_frames = np.clip(np.size(self.celltraces, 1) - starts,
+                                0, tensor.shape[2])
+        n_dx_frames = np.clip(len(self.dxcm) - starts, 0, tensor.shape[2])
+
+        sweep_response = np.empty(tensor.shape[:2], dtype=object)
+        for index in range(tensor.shape[0]):
+            sweep_response[index, :-1] = list(
+                tensor[index, :-1, :n_cell_frames[index]])
+            sweep_response[index, -1] = tensor[index, -1,
+                                               :n_dx_frames[index]]
+        sweep_response = pd.DataFrame(sweep_response,
+                                      index=mean_sweep_response.index,
+                                      columns=mean_sweep_response.columns)
 
-        def do_mean(x):
-            # +1])
-            return np.mean(
-                x[self.interlength:
-                  self.interlength + self.sweeplength + self.extralength])
-
-        def do_p_value(x):
-            (_, p) = \
-                st.f_oneway(
-                    x[:self.interlength],
-                    x[self.interlength:
-                      self.interlength + self.sweeplength + self.extralength])
-            return p
-
-        StimulusAnalysis._log.info('Calculating responses for each sweep')
-        sweep_response = pd.DataFrame(index=self.stim_table.index.values,
-                                      columns=list(map(str, range(
-                                          self.numbercells + 1))))
-
-        sweep_response.rename(
-            columns={str(self.numbercells): 'dx'}, inplace=True)
-
-        for index, row in self.stim_table.iterrows():
-            start = int(row['start'] - self.interlength)
-            end = int(row['start'] + self.sweeplength + self.interlength)
-
-            for nc in range(self.numbercells):
-                temp = self.celltraces[int(nc), start:end]
-                sweep_response[str(nc)][index] = \
-                    100 * ((temp / np.mean(temp[:self.interlength])) - 1)
-            sweep_response['dx'][index] = self.dxcm[start:end]
-
-        mean_sweep_response = sweep_response.applymap(do_mean)
-
-        pval = sweep_response.applymap(do_p_value)
         return sweep_response, mean_sweep_response, pval
 
     def plot_representational_similarity(self, repsim, stimulus=False):
@@ -658,3 +701,244 @@ def nonraising_ks_2samp(data1, data2, **kwargs):
     if min(len(data1), len(data2)) == 0:
         return (np.nan, np.nan)
     return st.ks_2samp(data1, data2, **kwargs)
+
+
+def sweep_windows(traces, starts, ends, n_frames):
+    """ Gather a window of frames from each of a set of traces for each
+    sweep of a stimulus.
+
+    Parameters
+    ----------
+    traces: np.ndarray
+        (traces, timestamps) array
+
+    starts: np.ndarray
+        Index of the first frame of each sweep's window
+
+    ends: np.ndarray
+        Index one past the last frame of each sweep's window
+
+    n_frames: int
+        Number of frames in the longest window
+
+    Returns
+    -------
+    windows: np.ndarray
+        (traces, sweeps, n_frames) array of the frames in each window.
+        Frames outside of a window or the traces are NaN.
+
+    valid: np.ndarray
+        (sweeps, n_frames) boolean array; True for frames inside both
+        the window and the traces
+    """
+    n_timestamps = np.size(traces, 1)
+    frames = starts[:, np.newaxis] + np.arange(n_frames)
+    valid = ((frames >= 0) &
+             (frames < np.minimum(ends, n_timestamps)[:, np.newaxis]))
+
+    windows = np.asarray(traces, dtype=float)[:, np.where(valid, frames, 0)]
+    windows[:, ~valid] = np.nan
+    return windows, valid
+
+
+def sweep_statistics(windows, valid, interlength, response_end):
+    """ Compute the mean response of each trace to each sweep, along with
+    the p value from a 1-way ANOVA comparing the response during the sweep
+    (frames interlength to response_end of the window) to the response
+    prior to the sweep (the first interlength frames of the window).
+
+    This matches scipy.stats.f_oneway applied to each window in turn.
+
+    Parameters
+    ----------
+    windows: np.ndarray
+        (traces, sweeps, frames) array of responses
+
+    valid: np.ndarray
+        (sweeps, frames) boolean array of the frames in each window to use
+
+    interlength: int
+        Number of frames preceding each sweep
+
+    response_end: int
+        Index (into each window) one past the last frame of the response
+
+    Returns
+    -------
+    means: np.ndarray
+        (traces, sweeps) array of mean responses
+
+    pvals: np.ndarray
+        (traces, sweeps) array of p values
+    """
+    frame_index = np.arange(windows.shape[2])
+    prior = valid & (frame_index < interlength)
+    during = valid & (frame_index >= interlength) & \
+        (frame_index < response_end)
+
+    group_stats = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for group in (prior, during):
+            count = group.sum(axis=1)
+            mean = np.where(group, windows, 0).sum(axis=2) / count
+            sum_squares = np.where(
+                group, windows - mean[:, :, np.newaxis], 0) ** 2
+            sum_squares = sum_squares.sum(axis=2)
+            group_max = np.where(group, windows, -np.inf).max(axis=2)
+            is_constant = (
+                group_max == np.where(group, windows, np.inf).min(axis=2))
+            group_stats.append(
+                (count, mean, sum_squares, is_constant, group_max))
+
+        ((n_prior, mean_prior, ss_prior, const_prior, max_prior),
+         (n_during, mean_during, ss_during, const_during, max_during)) = \
+            group_stats
+
+        grand_mean = ((n_prior * mean_prior + n_during * mean_during) /
+                      (n_prior + n_during))
+        ss_between = (n_prior * (mean_prior - grand_mean) ** 2 +
+                      n_during * (mean_during - grand_mean) ** 2)
+        df_within = n_prior + n_during - 2
+        f_stat = ss_between / ((ss_prior + ss_during) / df_within)
+
+        # as in scipy.stats.f_oneway, if each group is constant the
+        # F statistic is infinite unless all of the values are equal
+        all_constant = const_prior & const_during
+        f_stat = np.where(all_constant,
+                          np.where(max_prior == max_during, np.nan, np.inf),
+                          f_stat)
+        pvals = st.f.sf(f_stat, 1, df_within)
+
+    pvals = np.where((n_prior > 0) & (n_during > 0) & (df_within > 0),
+                     pvals, np.nan)
+    return mean_during, pvals
+
+
+def speed_bin_edges(offset, nbins, binsize, length):
+    """ Compute the boundaries of the running speed bins used by
+    StimulusAnalysis.get_speed_tuning. The first bin holds the first offset
+    timestamps (those below 1 cm/s); each later bin holds binsize
+    timestamps.
+
+    Parameters
+    ----------
+    offset: int
+        Number of timestamps in the first bin
+
+    nbins: int
+        Number of bins
+
+    binsize: int
+        Number of timestamps in each bin after the first
+
+    length: int
+        Total number of timestamps
+
+    Returns
+    -------
+    bin_starts, bin_ends: np.ndarray
+        Index of the first timestamp in, and one past the last timestamp
+        in, each bin, clipped to length
+    """
+    bin_starts = np.append(0, offset + np.arange(nbins - 1) * binsize)
+    bin_ends = np.append(offset, offset + np.arange(1, nbins) * binsize)
+    return (np.minimum(bin_starts, length).astype(int),
+            np.minimum(bin_ends, length).astype(int))
+
+
+def _get_random_state(random_state):
+    if random_state is None:
+        return np.random
+    if isinstance(random_state, (int, np.integer)):
+        return np.random.RandomState(random_state)
+    return random_state
+
+
+def _bin_means(traces, permutations, bin_starts, bin_ends):
+    """ Mean of traces over each bin for each of a batch of permutations
+    of the traces' timestamps. Returns a (traces, bins, permutations)
+    array.
+    """
+    means = np.full((len(traces), len(bin_starts), len(permutations)),
+                    np.nan)
+    nonempty = bin_starts < bin_ends
+    if not nonempty.any():
+        return means
+
+    # a single gather of the permuted timestamps, followed by one pass
+    # summing each (contiguous, ordered) bin
+    permuted = traces[:, permutations[:, :bin_ends.max()]]
+    sums = np.add.reduceat(permuted, bin_starts[nonempty], axis=2,
+                           dtype=float)
+    means[:, nonempty, :] = (
+        sums / (bin_ends - bin_starts)[nonempty]).transpose(0, 2, 1)
+    return means
+
+
+def _shared_bin_means(shared, permutations):
+    traces, bin_starts, bin_ends = shared
+    return _bin_means(traces, permutations, bin_starts, bin_ends)
+
+
+def shuffled_bin_means(traces, order, bin_starts, bin_ends,
+                       n_shuffles=200, random_state=None, n_workers=1,
+                       max_batch_elements=2 ** 24):
+    """ Shuffle each trace's timestamps, sort them by order, and compute the
+    mean of each bin. This is equivalent to
+
+        shuffled = traces[:, random_state.permutation(traces.shape[1])]
+        shuffled[:, order][:, bin_starts[i]:bin_ends[i]].mean(axis=1)
+
+    for each shuffle and bin, but composes the permutation with the sort
+    so that each shuffle only gathers the traces once, computes all of the
+    bins with a single reduction, and handles many shuffles at a time.
+
+    Parameters
+    ----------
+    traces: np.ndarray
+        (traces, timestamps) array
+
+    order: np.ndarray
+        Order in which to sort the shuffled timestamps
+
+    bin_starts, bin_ends: np.ndarray
+        Index of the first timestamp in, and one past the last timestamp
+        in, each bin. Bins must be contiguous and in order.
+
+    n_shuffles: int
+        Number of shuffles
+
+    random_state: None, int, or np.random.RandomState
+        Source of the permutations. If None, the global numpy random state
+        is used. If an int, it seeds a new RandomState. The permutations
+        (and so the result) do not depend on n_workers.
+
+    n_workers: int
+        Number of processes used to compute the means
+
+    max_batch_elements: int
+        Shuffles are processed in batches of at most this many gathered
+        elements
+
+    Returns
+    -------
+    np.ndarray
+        (traces, bins, shuffles) array of mean values
+    """
+    random_state = _get_random_state(random_state)
+    n_traces, n_timestamps = traces.shape
+    covered = max(int(bin_ends.max()), 1)
+    batch_size = max(1, max_batch_elements // (n_traces * covered))
+
+    # permutations are drawn in order, one batch at a time
+    def batches():
+        for batch_start in range(0, n_shuffles, batch_size):
+            n_batch = min(batch_size, n_shuffles - batch_start)
+            yield np.stack([random_state.permutation(n_timestamps)[order]
+                            for _ in range(n_batch)])
+
+    means = list(imap_with_shared(_shared_bin_means, batches(),
+                                  shared=(traces, bin_starts, bin_ends),
+                                  n_workers=n_workers))
+
+    return np.concatenate(means, axis=2)
@@ -65,6 +65,31 @@ def get_bit(uint_array, bit):
     return np.bitwise_and(uint_array, 2 ** bit).astype(bool).astype(np.uint8)
 
 
+def memory_map_dataset(dataset):
+    """
+    Returns a read-only numpy.memmap of an HDF5 dataset, or None if the
+        dataset's storage can't be mapped (chunked, compressed, empty or
+        not backed by a regular file).
+
+    Parameters
+    ----------
+    dataset : (h5py.Dataset)
+        The dataset to map.
+
+    """
+    if dataset.chunks is not None or dataset.size == 0:
+        return None
+    try:
+        offset = dataset.id.get_offset()
+        if offset is None:
+            return None
+        return np.memmap(dataset.file.filename, mode='r',
+                         dtype=dataset.dtype, shape=dataset.shape,
+                         offset=offset)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
 class Dataset(object):
     """
     A sync dataset.  Contains methods for loading
@@ -139,14 +164,21 @@ class Dataset(object):
         """
         times = self.get_all_events()[:, 0:1].astype(np.int64)
 
+        # every sample after a rollover is offset by 2**32 once per rollover
         intervals = np.ediff1d(times, to_begin=0)
-        rollovers = np.where(intervals < 0)[0]
-
-        for i in rollovers:
-            times[i:] += 4294967296
+        rollovers = np.cumsum(intervals < 0, dtype=np.int64)
+        times += 4294967296 * rollovers.reshape(times.shape)
 
         return times
 
+    def _reset_cache(self):
+        """
+        Drops the cached event table and edge indices.
+
+        """
+        self._events = None
+        self._edge_indices = {}
+
     def load(self, path):
         """
         Loads an hdf5 sync dataset.
@@ -159,6 +191,7 @@ class Dataset(object):
         """
         self.dfile = h5.File(
             path, 'r')  # MG edit 3/15 removed 'r' because some sync files were unable to load  # NOQA E501
+        self._reset_cache()
         self.meta_data = eval(self.dfile['meta'][()])
         self.line_labels = self.meta_data['line_labels']
         self.times = self._process_times()
@@ -228,7 +261,7 @@ class Dataset(object):
         Returns the data for all bits.
 
         """
-        return self.dfile['data'][()][:, -1]
+        return self.get_all_events()[:, -1]
 
     def get_all_times(self, units='samples'):
         """
@@ -256,8 +289,43 @@ class Dataset(object):
     def get_all_events(self):
         """
         Returns all counter values and their cooresponding IO state.
+
+        The event table is read (memory-mapped when the file layout allows)
+            the first time it is needed and shared by every later call, so
+            the returned array is read-only.
+        """
+        events = getattr(self, '_events', None)
+        if events is None:
+            data = self.dfile['data']
+            events = None
+            if isinstance(data, h5.Dataset):
+                events = memory_map_dataset(data)
+                if events is not None:
+                    events = np.asarray(events)
+            if events is None:
+                events = np.asarray(data[()])
+                events.setflags(write=False)
+            self._events = events
+        return events
+
+    def _get_edge_indices(self, bit):
+        """
+        Returns the indices of the rising and the falling edges of a bit,
+            computed on first use and cached.
+
+        Parameters
+        ----------
+        bit : int
+            Bit for which to return edge indices.
+
         """
-        return self.dfile['data'][()]
+        if getattr(self, '_edge_indices', None) is None:
+            self._edge_indices = {}
+        if bit not in self._edge_indices:
+            changes = self.get_bit_changes(bit)
+            self._edge_indices[bit] = (np.where(changes == 1)[0],
+                                       np.where(changes == 255)[0])
+        return self._edge_indices[bit]
 
     def get_events_by_bit(self, bit, units='samples'):
         """
@@ -328,8 +396,8 @@ class Dataset(object):
 
         """
         bit = self._line_to_bit(line)
-        changes = self.get_bit_changes(bit)
-        return self.get_all_times(units)[np.where(changes == 1)]
+        rising, _ = self._get_edge_indices(bit)
+        return self.get_all_times(units)[rising]
 
     def get_edges(
         self,
@@ -398,8 +466,8 @@ class Dataset(object):
 
         """
         bit = self._line_to_bit(line)
-        changes = self.get_bit_changes(bit)
-        return self.get_all_times(units)[np.where(changes == 255)]
+        _, falling = self._get_edge_indices(bit)
+        return self.get_all_times(units)[falling]
 
     def get_nearest(self,
                     source,
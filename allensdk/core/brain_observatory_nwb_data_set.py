@@ -33,6 +33,7 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 #
+import contextlib
 import functools
 import dateutil
 import re
@@ -62,6 +63,18 @@ _STIMULUS_PRESENTATION_PATH = 'stimulus/presentation'
 _STIMULUS_PRESENTATION_PATTERNS = ('{}', '{}_stimulus',)
 
 
+@functools.lru_cache(maxsize=32)
+def _read_cached_dataset(nwb_file, file_id, dataset_path):
+    ''' Read a dataset from an NWB file, caching the result. file_id
+    identifies the version of the file on disk, so that a rewritten file
+    is read again. The cached array is read-only; callers hand out copies.
+    '''
+    with h5py.File(nwb_file, 'r') as f:
+        data = f[dataset_path][()]
+    data.setflags(write=False)
+    return data
+
+
 def get_epoch_mask_list(st, threshold, max_cuts=2):
     '''Convenience function to cut a stim table into multiple epochs
 
@@ -136,6 +149,16 @@ class BrainObservatoryNwbDataSet(object):
     MOTION_CORRECTION_DATASETS = [ "MotionCorrection/2p_image_series/xy_translations",
                                    "MotionCorrection/2p_image_series/xy_translation" ]
 
+    _FLUORESCENCE_GROUP = \
+        'processing/%s/Fluorescence/imaging_plane_1' % PIPELINE_DATASET
+    _FLUORESCENCE_DATA = _FLUORESCENCE_GROUP + '/data'
+    _FLUORESCENCE_TIMESTAMPS = _FLUORESCENCE_GROUP + '/timestamps'
+    _NEUROPIL_RESPONSE = _FLUORESCENCE_GROUP + '_neuropil_response'
+    _DEMIXED_DATA = _FLUORESCENCE_GROUP + '_demixed_signal/data'
+    _DFF_GROUP = 'processing/%s/DfOverF/imaging_plane_1' % PIPELINE_DATASET
+    _CELL_SPECIMEN_IDS = \
+        'processing/%s/ImageSegmentation/cell_specimen_ids' % PIPELINE_DATASET
+
     def __init__(self, nwb_file):
 
         self.nwb_file = nwb_file
@@ -152,6 +175,7 @@ class BrainObservatoryNwbDataSet(object):
                                     " Please update your AllenSDK." % (nwb_file, pipeline_version_str, self.SUPPORTED_PIPELINE_VERSION))
 
         self._stimulus_search = None
+        self._h5 = None
 
     def get_stimulus_epoch_table(self):
         '''Returns a pandas dataframe that summarizes the stimulus epoch duration for each acquisition time index in
@@ -227,8 +251,112 @@ class BrainObservatoryNwbDataSet(object):
         interval_df.drop(['interval', 'duration'], axis=1, inplace=True)
         return interval_df
 
+    def open(self):
+        ''' Open a persistent read-only handle to the NWB file. Until
+        close() is called, the trace accessors reuse this handle instead
+        of reopening the file on every call. The data set may also be
+        used as a context manager:
+
+            with BrainObservatoryNwbDataSet(nwb_file) as data_set:
+                ...
 
-    def get_fluorescence_traces(self, cell_specimen_ids=None):
+        Returns
+        -------
+        self
+        '''
+        if self._h5 is None:
+            self._h5 = h5py.File(self.nwb_file, 'r')
+        return self
+
+    def close(self):
+        ''' Close the handle opened by open() (if any) '''
+        if self._h5 is not None:
+            self._h5.close()
+            self._h5 = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextlib.contextmanager
+    def _h5_file(self):
+        ''' Yield the persistent handle if there is one, otherwise a
+        handle that is closed on exit '''
+        if self._h5 is not None:
+            yield self._h5
+        else:
+            with h5py.File(self.nwb_file, 'r') as f:
+                yield f
+
+    def _get_cached_dataset(self, dataset_path):
+        ''' Read a (small) dataset through the module-level LRU cache '''
+        stat = os.stat(self.nwb_file)
+        file_id = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        return _read_cached_dataset(os.path.abspath(self.nwb_file),
+                                    file_id, dataset_path)
+
+    def _get_frame_slice(self, timestamps_path, time_range):
+        ''' Returns the timestamps falling within time_range and the
+        slice of frames they cover '''
+        timestamps = self._get_cached_dataset(timestamps_path)
+
+        if time_range is None:
+            return timestamps.copy(), slice(None)
+
+        start_time, end_time = time_range
+        start = 0 if start_time is None else \
+            np.searchsorted(timestamps, start_time, side='left')
+        end = len(timestamps) if end_time is None else \
+            np.searchsorted(timestamps, end_time, side='left')
+        frames = slice(int(start), int(max(start, end)))
+
+        return timestamps[frames].copy(), frames
+
+    def _get_cell_indices(self, f, cell_specimen_ids):
+        if cell_specimen_ids is None:
+            return None
+        return self._cell_specimen_indices(f, cell_specimen_ids)
+
+    def _read_cell_rows(self, f, dataset_path, inds, frames=None):
+        ''' Read the rows inds (all rows if None) of a per-cell dataset,
+        restricted to the columns selected by frames.
+
+        Rather than handing h5py a (possibly unsorted) fancy index, the
+        requested rows are sorted, coalesced into contiguous runs and
+        each run is read as a single hyperslab. The rows are then put
+        back into the requested order.
+        '''
+        ds = f[dataset_path]
+        columns = (frames,) if ds.ndim > 1 and frames is not None else ()
+
+        if inds is None:
+            return ds[(slice(None),) + columns]
+
+        inds = np.asarray(inds, dtype=int)
+        unique_inds, inverse = np.unique(inds, return_inverse=True)
+
+        if len(unique_inds) == 0:
+            return ds[(slice(0, 0),) + columns]
+
+        breaks = np.flatnonzero(np.diff(unique_inds) != 1) + 1
+        run_starts = unique_inds[np.r_[0, breaks]]
+        run_ends = unique_inds[np.r_[breaks - 1, len(unique_inds) - 1]] + 1
+
+        if len(run_starts) == 1:
+            rows = ds[(slice(run_starts[0], run_ends[0]),) + columns]
+        else:
+            rows = np.concatenate([ds[(slice(start, end),) + columns]
+                                   for start, end in zip(run_starts,
+                                                         run_ends)])
+
+        if np.array_equal(inds, unique_inds):
+            return rows
+        return rows[inverse]
+
+    def get_fluorescence_traces(self, cell_specimen_ids=None,
+                                time_range=None):
         ''' Returns an array of fluorescence traces for all ROI and
         the timestamps for each datapoint
 
@@ -238,6 +366,11 @@ class BrainObservatoryNwbDataSet(object):
             List of cell IDs to return traces for. If this is None (default)
             then all are returned
 
+        time_range: tuple (optional)
+            (start, end) time in seconds. Only samples with
+            start <= timestamp < end are returned. Either bound may be
+            None. If this is None (default) then all samples are returned
+
         Returns
         -------
         timestamps: 2D numpy array
@@ -246,28 +379,29 @@ class BrainObservatoryNwbDataSet(object):
         traces: 2D numpy array
             Fluorescence traces for each cell
         '''
-        timestamps = self.get_fluorescence_timestamps()
-        with h5py.File(self.nwb_file, 'r') as f:
-            ds = f['processing'][self.PIPELINE_DATASET][
-                'Fluorescence']['imaging_plane_1']['data']
+        timestamps, frames = self._get_frame_slice(
+            self._FLUORESCENCE_TIMESTAMPS, time_range)
 
-            if cell_specimen_ids is None:
-                cell_traces = ds[()]
-            else:
-                inds = self.get_cell_specimen_indices(cell_specimen_ids)
-                cell_traces = ds[inds, :]
+        with self._h5_file() as f:
+            inds = self._get_cell_indices(f, cell_specimen_ids)
+            cell_traces = self._read_cell_rows(
+                f, self._FLUORESCENCE_DATA, inds, frames)
 
         return timestamps, cell_traces
 
     def get_fluorescence_timestamps(self):
         ''' Returns an array of timestamps in seconds for the fluorescence traces '''
 
-        with h5py.File(self.nwb_file, 'r') as f:
-            timestamps = f['processing'][self.PIPELINE_DATASET][
-                'Fluorescence']['imaging_plane_1']['timestamps'][()]
-        return timestamps
+        return self._get_cached_dataset(self._FLUORESCENCE_TIMESTAMPS).copy()
+
+    def _get_neuropil_data_path(self, name):
+        if self.pipeline_version >= parse_version("2.0"):
+            return self._NEUROPIL_RESPONSE + '/' + name
+        else:
+            return self._FLUORESCENCE_GROUP + '/' + \
+                ('neuropil_traces' if name == 'data' else name)
 
-    def get_neuropil_traces(self, cell_specimen_ids=None):
+    def get_neuropil_traces(self, cell_specimen_ids=None, time_range=None):
         ''' Returns an array of neuropil fluorescence traces for all ROIs
         and the timestamps for each datapoint
 
@@ -277,6 +411,11 @@ class BrainObservatoryNwbDataSet(object):
             List of cell IDs to return traces for. If this is None (default)
             then all are returned
 
+        time_range: tuple (optional)
+            (start, end) time in seconds. Only samples with
+            start <= timestamp < end are returned. Either bound may be
+            None. If this is None (default) then all samples are returned
+
         Returns
         -------
         timestamps: 2D numpy array
@@ -286,21 +425,13 @@ class BrainObservatoryNwbDataSet(object):
             Neuropil fluorescence traces for each cell
         '''
 
-        timestamps = self.get_fluorescence_timestamps()
-
-        with h5py.File(self.nwb_file, 'r') as f:
-            if self.pipeline_version >= parse_version("2.0"):
-                ds = f['processing'][self.PIPELINE_DATASET][
-                    'Fluorescence']['imaging_plane_1_neuropil_response']['data']
-            else:
-                ds = f['processing'][self.PIPELINE_DATASET][
-                    'Fluorescence']['imaging_plane_1']['neuropil_traces']
+        timestamps, frames = self._get_frame_slice(
+            self._FLUORESCENCE_TIMESTAMPS, time_range)
 
-            if cell_specimen_ids is None:
-                np_traces = ds[()]
-            else:
-                inds = self.get_cell_specimen_indices(cell_specimen_ids)
-                np_traces = ds[inds, :]
+        with self._h5_file() as f:
+            inds = self._get_cell_indices(f, cell_specimen_ids)
+            np_traces = self._read_cell_rows(
+                f, self._get_neuropil_data_path('data'), inds, frames)
 
         return timestamps, np_traces
 
@@ -320,23 +451,14 @@ class BrainObservatoryNwbDataSet(object):
             Scalar for neuropil subtraction for each cell
         '''
 
-        with h5py.File(self.nwb_file, 'r') as f:
-            if self.pipeline_version >= parse_version("2.0"):
-                r_ds = f['processing'][self.PIPELINE_DATASET][
-                    'Fluorescence']['imaging_plane_1_neuropil_response']['r']
-            else:
-                r_ds = f['processing'][self.PIPELINE_DATASET][
-                    'Fluorescence']['imaging_plane_1']['r']
-
-            if cell_specimen_ids is None:
-                r = r_ds[()]
-            else:
-                inds = self.get_cell_specimen_indices(cell_specimen_ids)
-                r = r_ds[inds]
+        with self._h5_file() as f:
+            inds = self._get_cell_indices(f, cell_specimen_ids)
+            r = self._read_cell_rows(f, self._get_neuropil_data_path('r'),
+                                     inds)
 
         return r
 
-    def get_demixed_traces(self, cell_specimen_ids=None):
+    def get_demixed_traces(self, cell_specimen_ids=None, time_range=None):
         ''' Returns an array of demixed fluorescence traces for all ROIs
         and the timestamps for each datapoint
 
@@ -346,6 +468,11 @@ class BrainObservatoryNwbDataSet(object):
             List of cell IDs to return traces for. If this is None (default)
             then all are returned
 
+        time_range: tuple (optional)
+            (start, end) time in seconds. Only samples with
+            start <= timestamp < end are returned. Either bound may be
+            None. If this is None (default) then all samples are returned
+
         Returns
         -------
         timestamps: 2D numpy array
@@ -355,20 +482,18 @@ class BrainObservatoryNwbDataSet(object):
             Demixed fluorescence traces for each cell
         '''
 
-        timestamps = self.get_fluorescence_timestamps()
+        timestamps, frames = self._get_frame_slice(
+            self._FLUORESCENCE_TIMESTAMPS, time_range)
 
-        with h5py.File(self.nwb_file, 'r') as f:
-            ds = f['processing'][self.PIPELINE_DATASET][
-                'Fluorescence']['imaging_plane_1_demixed_signal']['data']
-            if cell_specimen_ids is None:
-                traces = ds[()]
-            else:
-                inds = self.get_cell_specimen_indices(cell_specimen_ids)
-                traces = ds[inds, :]
+        with self._h5_file() as f:
+            inds = self._get_cell_indices(f, cell_specimen_ids)
+            traces = self._read_cell_rows(f, self._DEMIXED_DATA, inds,
+                                          frames)
 
         return timestamps, traces
 
-    def get_corrected_fluorescence_traces(self, cell_specimen_ids=None):
+    def get_corrected_fluorescence_traces(self, cell_specimen_ids=None,
+                                          time_range=None):
         ''' Returns an array of demixed and neuropil-corrected fluorescence traces
         for all ROIs and the timestamps for each datapoint
 
@@ -378,6 +503,11 @@ class BrainObservatoryNwbDataSet(object):
             List of cell IDs to return traces for. If this is None (default)
             then all are returned
 
+        time_range: tuple (optional)
+            (start, end) time in seconds. Only samples with
+            start <= timestamp < end are returned. Either bound may be
+            None. If this is None (default) then all samples are returned
+
         Returns
         -------
         timestamps: 2D numpy array
@@ -387,20 +517,30 @@ class BrainObservatoryNwbDataSet(object):
             Corrected fluorescence traces for each cell
         '''
 
+        timestamps, frames = self._get_frame_slice(
+            self._FLUORESCENCE_TIMESTAMPS, time_range)
+
         # starting in version 2.0, neuropil correction follows trace demixing
         if self.pipeline_version >= parse_version("2.0"):
-            timestamps, cell_traces = self.get_demixed_traces(cell_specimen_ids)
+            cell_path = self._DEMIXED_DATA
         else:
-            timestamps, cell_traces = self.get_fluorescence_traces(cell_specimen_ids)
-
-        r = self.get_neuropil_r(cell_specimen_ids)
+            cell_path = self._FLUORESCENCE_DATA
 
-        _, neuropil_traces = self.get_neuropil_traces(cell_specimen_ids)
+        with self._h5_file() as f:
+            inds = self._get_cell_indices(f, cell_specimen_ids)
+            cell_traces = self._read_cell_rows(f, cell_path, inds, frames)
+            r = self._read_cell_rows(f, self._get_neuropil_data_path('r'),
+                                     inds)
+            neuropil_traces = self._read_cell_rows(
+                f, self._get_neuropil_data_path('data'), inds, frames)
 
         fc = cell_traces - neuropil_traces * r[:, np.newaxis]
 
         return timestamps, fc
 
+    def _all_cell_specimen_ids(self, f):
+        return f[self._CELL_SPECIMEN_IDS][()]
+
     def get_cell_specimen_indices(self, cell_specimen_ids):
         ''' Given a list of cell specimen ids, return their index based on their order in this file.
 
@@ -408,19 +548,45 @@ class BrainObservatoryNwbDataSet(object):
         ----------
         cell_specimen_ids: list of cell specimen ids
 
+        Raises
+        ------
+        TypeError
+            If cell_specimen_ids is not iterable.
+
+        ValueError
+            If a cell specimen id is not in this file.
         '''
 
-        all_cell_specimen_ids = list(self.get_cell_specimen_ids())
-        
+        with self._h5_file() as f:
+            return self._cell_specimen_indices(f, cell_specimen_ids)
+
+    def _cell_specimen_indices(self, f, cell_specimen_ids):
+        all_cell_specimen_ids = self._all_cell_specimen_ids(f)
+
+        # first occurrence wins, as with list.index
+        id_to_index = {}
+        for ii, cell_specimen_id in enumerate(all_cell_specimen_ids):
+            id_to_index.setdefault(cell_specimen_id, ii)
+
         try:
-            inds = [list(all_cell_specimen_ids).index(i)
-                    for i in cell_specimen_ids]
-        except ValueError as e:
-            raise ValueError("Cell specimen not found (%s)" % str(e))
+            cell_specimen_ids = iter(cell_specimen_ids)
+        except TypeError:
+            raise TypeError("cell_specimen_ids must be a list of cell "
+                            "specimen ids, not %s"
+                            % type(cell_specimen_ids).__name__)
+
+        inds = []
+        for cell_specimen_id in cell_specimen_ids:
+            try:
+                inds.append(id_to_index[cell_specimen_id])
+            except (KeyError, TypeError):
+                # unhashable ids cannot be in the file either
+                raise ValueError("Cell specimen not found (%r is not in list)"
+                                 % (cell_specimen_id,))
 
         return inds
 
-    def get_dff_traces(self, cell_specimen_ids=None):
+    def get_dff_traces(self, cell_specimen_ids=None, time_range=None):
         ''' Returns an array of dF/F traces for all ROIs and
         the timestamps for each datapoint
 
@@ -430,6 +596,11 @@ class BrainObservatoryNwbDataSet(object):
             List of cell IDs to return data for. If this is None (default)
             then all are returned
 
+        time_range: tuple (optional)
+            (start, end) time in seconds. Only samples with
+            start <= timestamp < end are returned. Either bound may be
+            None. If this is None (default) then all samples are returned
+
         Returns
         -------
         timestamps: 2D numpy array
@@ -438,17 +609,13 @@ class BrainObservatoryNwbDataSet(object):
         dF/F: 2D numpy array
             dF/F values for each cell
         '''
-        with h5py.File(self.nwb_file, 'r') as f:
-            dff_ds = f['processing'][self.PIPELINE_DATASET][
-                'DfOverF']['imaging_plane_1']
+        timestamps, frames = self._get_frame_slice(
+            self._DFF_GROUP + '/timestamps', time_range)
 
-            timestamps = dff_ds['timestamps'][()]
-
-            if cell_specimen_ids is None:
-                cell_traces = dff_ds['data'][()]
-            else:
-                inds = self.get_cell_specimen_indices(cell_specimen_ids)
-                cell_traces = dff_ds['data'][inds, :]
+        with self._h5_file() as f:
+            inds = self._get_cell_indices(f, cell_specimen_ids)
+            cell_traces = self._read_cell_rows(
+                f, self._DFF_GROUP + '/data', inds, frames)
 
         return timestamps, cell_traces
 
@@ -459,7 +626,7 @@ class BrainObservatoryNwbDataSet(object):
         -------
         ROI IDs: list
         '''
-        with h5py.File(self.nwb_file, 'r') as f:
+        with self._h5_file() as f:
             roi_id = f['processing'][self.PIPELINE_DATASET][
                 'ImageSegmentation']['roi_ids'][()]
         return roi_id
@@ -471,9 +638,8 @@ class BrainObservatoryNwbDataSet(object):
         -------
         cell specimen IDs: list
         '''
-        with h5py.File(self.nwb_file, 'r') as f:
-            cell_id = f['processing'][self.PIPELINE_DATASET][
-                'ImageSegmentation']['cell_specimen_ids'][()]
+        with self._h5_file() as f:
+            cell_id = self._all_cell_specimen_ids(f)
         return cell_id
 
     def get_session_type(self):
@@ -0,0 +1,124 @@
+import functools
+import multiprocessing
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import h5py
+
+
+# the state shared by every task run in a pool worker, set once per worker
+# by the pool initializer rather than sent along with each task
+_worker_shared = None
+
+
+def _set_worker_shared(shared: Any) -> None:
+    global _worker_shared
+    _worker_shared = shared
+
+
+def _call_with_worker_shared(func: Callable[[Any, Any], Any],
+                             item: Any) -> Any:
+    return func(_worker_shared, item)
+
+
+def imap_with_shared(func: Callable[[Any, Any], Any],
+                     items: Iterable,
+                     shared: Any = None,
+                     n_workers: int = 1,
+                     ordered: bool = True,
+                     chunksize: int = 1,
+                     start_method: Optional[str] = None) -> Iterator:
+    """
+    Call func(shared, item) for each item, in a pool of worker processes
+    if n_workers > 1.
+
+    shared (e.g. a large array, or an object holding intermediate
+    results) is sent to each worker once, when the worker starts, rather
+    than with every item.
+
+    Parameters
+    ----------
+    func: Callable[[Any, Any], Any]
+        A module-level function (so that workers can unpickle it) taking
+        the shared state and one item
+
+    items: Iterable
+        The items to call func on
+
+    shared: Any
+        Passed as the first argument of every call. Unless start_method
+        is 'fork', it must be picklable.
+
+    n_workers: int
+        Number of worker processes. If 1 or less, func is called in this
+        process.
+
+    ordered: bool
+        If True, results are yielded in the order of items. Otherwise
+        they are yielded as they complete.
+
+    chunksize: int
+        Number of items sent to a worker at a time
+
+    start_method: Optional[str]
+        The multiprocessing start method to use (the default start
+        method if None). If it is not available on this platform (e.g.
+        'fork' on Windows), func is called in this process instead.
+
+    Returns
+    -------
+    Iterator
+        The result of each call
+    """
+    if start_method is not None \
+            and start_method not in multiprocessing.get_all_start_methods():
+        n_workers = 1
+
+    if n_workers <= 1:
+        for item in items:
+            yield func(shared, item)
+        return
+
+    context = multiprocessing.get_context(start_method)
+    with context.Pool(n_workers,
+                      initializer=_set_worker_shared,
+                      initargs=(shared, )) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(functools.partial(_call_with_worker_shared, func),
+                        items, chunksize)
+
+
+class H5DatasetReference(object):
+    """
+    A picklable stand-in for an h5py.Dataset, so that a dataset can be
+    shared with worker processes (h5py objects cannot be pickled).
+    Each read opens the file for the duration of that read.
+
+    Parameters
+    ----------
+    dataset: h5py.Dataset
+        The dataset to refer to
+    """
+
+    def __init__(self, dataset: h5py.Dataset):
+        self.filename = dataset.file.filename
+        self.name = dataset.name
+        self.shape = dataset.shape
+        self.dtype = dataset.dtype
+
+    def __getitem__(self, key):
+        with h5py.File(self.filename, 'r') as h5_file:
+            return h5_file[self.name][key]
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+
+def shareable_array(array: Any) -> Any:
+    """
+    Return an array which can be shared with worker processes: an
+    H5DatasetReference for an h5py.Dataset, otherwise the array itself.
+    Must be called in the parent process, before the pool is started.
+    """
+    if isinstance(array, h5py.Dataset):
+        return H5DatasetReference(array)
+    return array
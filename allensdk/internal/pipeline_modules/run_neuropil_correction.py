@@ -1,10 +1,11 @@
 #!/usr/bin/python
+from allensdk.brain_observatory.r_neuropil import \
+    estimate_contamination_ratios_batch
 import matplotlib
 matplotlib.use('agg')
 import matplotlib.pyplot as plt
 import logging
 import numpy as np
-from allensdk.brain_observatory.r_neuropil import estimate_contamination_ratios
 import allensdk.internal.core.lims_utilities as lu
 import h5py
 import json
@@ -159,9 +160,19 @@ def main():
     corrected = np.zeros((num_traces, T_orig))
     r_vals = [ None ] * num_traces
 
+    roi_data = roi_traces['data'][()]
+    neuropil_data = neuropil_traces['data'][()]
+
+    # estimate r for all of the traces without NaNs at once
+    valid = ~np.isnan(roi_data).any(axis=1)
+    valid &= ~np.isnan(neuropil_data).any(axis=1)
+    valid_results = estimate_contamination_ratios_batch(
+        roi_data[valid], neuropil_data[valid])
+    all_results = dict(zip(np.flatnonzero(valid), valid_results))
+
     for n in range(num_traces):
-        roi = roi_traces['data'][n]
-        neuropil = neuropil_traces['data'][n]   
+        roi = roi_data[n]
+        neuropil = neuropil_data[n]
 
         if np.any(np.isnan(neuropil)):
             logging.warning("neuropil trace for roi %d contains NaNs, skipping", n)
@@ -174,7 +185,7 @@ def main():
         r = None
 
         logging.info("Correcting trace %d (roi %s)", n, str(n_id[n]))
-        results  = estimate_contamination_ratios(roi, neuropil)
+        results = all_results[n]
         logging.info("r=%f err=%f it=%d", results["r"], results["err"], results["it"])
 
         r = results["r"]
@@ -197,8 +208,8 @@ def main():
 
     # fill in empty r values
     for n in range(num_traces):        
-        roi = roi_traces['data'][n]
-        neuropil = neuropil_traces['data'][n]
+        roi = roi_data[n]
+        neuropil = neuropil_data[n]
 
         if r_list[n] is None:
             logging.warning("Error estimated r for trace %d. Setting to zero.", n)
@@ -1,5 +1,6 @@
 import pytest
 import json
+import warnings
 import hashlib
 import pathlib
 import pandas as pd
@@ -7,7 +8,9 @@ import io
 import boto3
 from moto import mock_s3
 from .utils import create_bucket
+from allensdk.api.cloud_cache import cloud_cache
 from allensdk.api.cloud_cache.cloud_cache import OutdatedManifestWarning
+from allensdk.api.cloud_cache.cloud_cache import MissingLocalManifestWarning
 from allensdk.api.cloud_cache.cloud_cache import S3CloudCache  # noqa: E501
 from allensdk.api.cloud_cache.file_attributes import CacheFileAttributes  # noqa: E501
 
@@ -810,3 +813,217 @@ def test_corrupted_load_last_manifest(tmpdir,
     with pytest.warns(UserWarning, match=expected):
         cache.load_last_manifest()
     assert cache.current_manifest == 'project-x_manifest_v15.0.0.json'
+
+
+@mock_s3
+def test_download_data_many(tmpdir):
+    """
+    Test that S3CloudCache.download_data_many() downloads several files
+    concurrently, only transferring files with identical contents once
+    """
+    bucket_name = 'download_many_bucket'
+    data_blobs = {'a.txt': {'data': b'abcdefg', 'file_id': 'a'},
+                  'b.txt': {'data': b'hijklmnop', 'file_id': 'b'},
+                  'c.txt': {'data': b'abcdefg', 'file_id': 'c'},
+                  'd.txt': {'data': b'qrstuv', 'file_id': 'd'}}
+    create_bucket(bucket_name, {'1.0.0': data_blobs})
+
+    cache_dir = pathlib.Path(tmpdir) / 'cache'
+    cache = S3CloudCache(cache_dir, bucket_name, 'project-x')
+    cache.load_manifest('project-x_manifest_v1.0.0.json')
+
+    paths = cache.download_data_many(['a', 'b', 'c', 'd'], max_workers=3)
+    assert set(paths.keys()) == {'a', 'b', 'c', 'd'}
+    for fname, blob in data_blobs.items():
+        local_path = paths[blob['file_id']]
+        assert local_path == cache.data_path(blob['file_id'])['local_path']
+        with open(local_path, 'rb') as in_file:
+            assert in_file.read() == blob['data']
+
+    # a and c have the same contents; one is a symlink to the other
+    assert paths['a'].is_symlink() != paths['c'].is_symlink()
+
+    downloaded = cache._downloaded_data_index.to_dict()
+    assert len(downloaded) == 3
+
+    # nothing left to fetch
+    cache.prefetch()
+    for file_id in paths:
+        assert cache.data_path(file_id)['exists']
+
+
+@mock_s3
+def test_download_file_ranges(tmpdir, monkeypatch):
+    """
+    Test that large objects are correctly downloaded as ranged GETs
+    """
+    bucket_name = 'download_ranges_bucket'
+    data = bytes(range(256)) * 41
+    data_blobs = {'big.nwb': {'data': data, 'file_id': 'big'}}
+    create_bucket(bucket_name, {'1.0.0': data_blobs})
+
+    monkeypatch.setattr(S3CloudCache, 'multipart_threshold', 1000)
+    monkeypatch.setattr(S3CloudCache, 'multipart_chunksize', 999)
+
+    cache_dir = pathlib.Path(tmpdir) / 'cache'
+    cache = S3CloudCache(cache_dir, bucket_name, 'project-x')
+    cache.load_manifest('project-x_manifest_v1.0.0.json')
+
+    get_object_calls = []
+    get_object = cache.s3_client.get_object
+
+    def logging_get_object(**kwargs):
+        get_object_calls.append(kwargs)
+        return get_object(**kwargs)
+
+    monkeypatch.setattr(cache.s3_client, 'get_object', logging_get_object)
+
+    local_path = cache.download_data('big')
+    with open(local_path, 'rb') as in_file:
+        assert in_file.read() == data
+
+    assert len(get_object_calls) == 11
+    assert all('Range' in kwargs for kwargs in get_object_calls)
+
+
+class _FlakyBody(object):
+    """
+    Wraps a streaming body, raising a ConnectionError after
+    n_chunks chunks have been read
+    """
+    def __init__(self, body, n_chunks):
+        self._body = body
+        self._n_chunks = n_chunks
+
+    def iter_chunks(self, chunk_size=1024):
+        for ii, chunk in enumerate(self._body.iter_chunks(chunk_size)):
+            if ii == self._n_chunks:
+                raise ConnectionError("connection dropped")
+            yield chunk
+
+    def read(self):
+        return b''.join(self.iter_chunks())
+
+
+def _patch_get_object(monkeypatch, cache, flaky_calls=()):
+    """
+    Patch cache.s3_client.get_object so that its calls are logged
+    and the calls whose indices are in flaky_calls fail after one chunk
+    """
+    get_object_calls = []
+    get_object = cache.s3_client.get_object
+
+    def logging_get_object(**kwargs):
+        get_object_calls.append(kwargs)
+        response = get_object(**kwargs)
+        if len(get_object_calls) - 1 in flaky_calls:
+            response['Body'] = _FlakyBody(response['Body'], 1)
+        return response
+
+    monkeypatch.setattr(cache.s3_client, 'get_object', logging_get_object)
+    return get_object_calls
+
+
+@pytest.mark.parametrize('multipart_threshold', [10**6, 1000])
+@mock_s3
+def test_download_file_resume(tmpdir, monkeypatch, multipart_threshold):
+    """
+    Test that S3CloudCache resumes interrupted downloads from the partial
+    file instead of starting over, and verifies the hash without
+    re-reading the downloaded file
+    """
+    bucket_name = 'download_resume_bucket'
+    data = bytes(range(256)) * 41
+    data_blobs = {'big.nwb': {'data': data, 'file_id': 'big'}}
+    create_bucket(bucket_name, {'1.0.0': data_blobs})
+
+    monkeypatch.setattr(S3CloudCache, 'multipart_threshold',
+                        multipart_threshold)
+    monkeypatch.setattr(S3CloudCache, 'multipart_chunksize', 2500)
+    monkeypatch.setattr(S3CloudCache, 'max_part_workers', 1)
+
+    def no_hash_from_path(file_path):
+        raise RuntimeError("should not re-read the downloaded file")
+
+    monkeypatch.setattr(cloud_cache, 'file_hash_from_path',
+                        no_hash_from_path)
+
+    cache_dir = pathlib.Path(tmpdir) / 'cache'
+    cache = S3CloudCache(cache_dir, bucket_name, 'project-x')
+    cache.load_manifest('project-x_manifest_v1.0.0.json')
+
+    # a partial file left over from an earlier session
+    local_path = cache.data_path('big')['local_path']
+    partial_path = local_path.with_name('big.nwb.partial')
+    partial_path.parent.mkdir(parents=True)
+    partial_path.write_bytes(data[:3000])
+
+    get_object_calls = _patch_get_object(monkeypatch, cache,
+                                         flaky_calls=(0,))
+
+    assert cache.download_data('big') == local_path
+    assert local_path.read_bytes() == data
+    assert not partial_path.exists()
+
+    # the first request was interrupted; no request started over
+    # from the beginning of the file
+    assert get_object_calls[0]['Range'].startswith('bytes=3000-')
+    assert len(get_object_calls) > 1
+    for kwargs in get_object_calls:
+        assert int(kwargs['Range'][6:].split('-')[0]) >= 3000
+
+
+@mock_s3
+def test_download_file_bad_partial(tmpdir, monkeypatch):
+    """
+    Test that S3CloudCache starts over when the data resumed from a
+    partial file fails hash verification
+    """
+    bucket_name = 'download_bad_partial_bucket'
+    data = b'11235813kjlssergwesvsdd'
+    data_blobs = {'f.txt': {'data': data, 'file_id': 'f'}}
+    create_bucket(bucket_name, {'1.0.0': data_blobs})
+
+    cache_dir = pathlib.Path(tmpdir) / 'cache'
+    cache = S3CloudCache(cache_dir, bucket_name, 'project-x')
+    cache.load_manifest('project-x_manifest_v1.0.0.json')
+
+    local_path = cache.data_path('f')['local_path']
+    partial_path = local_path.with_name('f.txt.partial')
+    partial_path.parent.mkdir(parents=True)
+    partial_path.write_bytes(b'abcde')
+
+    get_object_calls = _patch_get_object(monkeypatch, cache)
+
+    assert cache.download_data('f') == local_path
+    assert local_path.read_bytes() == data
+    assert not partial_path.exists()
+    assert get_object_calls[0]['Range'] == 'bytes=5-'
+    assert 'Range' not in get_object_calls[1]
+
+
+@mock_s3
+def test_partial_file_no_missing_manifest_warning(tmpdir):
+    """
+    Test that a cache directory holding only the partial file of an
+    interrupted download does not warn that its local manifest is
+    missing, while one holding a data file does
+    """
+    bucket_name = 'partial_warning_bucket'
+    data_blobs = {'f.txt': {'data': b'abcdef', 'file_id': 'f'}}
+    create_bucket(bucket_name, {'1.0.0': data_blobs})
+
+    cache_dir = pathlib.Path(tmpdir) / 'cache'
+    data_dir = cache_dir / 'project-x-1.0.0' / 'data'
+    data_dir.mkdir(parents=True)
+    (data_dir / 'f.txt.partial').write_bytes(b'abc')
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        S3CloudCache(cache_dir, bucket_name, 'project-x')
+    assert not any(issubclass(w.category, MissingLocalManifestWarning)
+                   for w in caught)
+
+    (data_dir / 'f.txt').write_bytes(b'abcdef')
+    with pytest.warns(MissingLocalManifestWarning):
+        S3CloudCache(cache_dir, bucket_name, 'project-x')
@@ -0,0 +1,138 @@
+import json
+import pathlib
+from allensdk.api.cloud_cache.downloaded_data_index import DownloadedDataIndex  # noqa: E501
+
+
+def test_add_and_lookup(tmpdir):
+    """
+    Test that DownloadedDataIndex maps paths to hashes and hashes
+    back to paths, with later records superseding earlier ones
+    """
+    log_path = pathlib.Path(tmpdir) / 'index.jsonl'
+    index = DownloadedDataIndex(log_path)
+    assert index.to_dict() == {}
+    assert index.paths_for_hash('abc') == []
+
+    index.add('/a/b.txt', 'abc')
+    index.add('/a/c.txt', 'abc')
+    index.add('/a/d.txt', 'def')
+    expected = [pathlib.Path('/a/b.txt'), pathlib.Path('/a/c.txt')]
+    assert index.paths_for_hash('abc') == expected
+    assert index.get('/a/d.txt') == 'def'
+
+    # adding an identical record does not grow the log
+    with open(log_path, 'r') as in_file:
+        n_lines = len(in_file.readlines())
+    index.add('/a/b.txt', 'abc')
+    with open(log_path, 'r') as in_file:
+        assert len(in_file.readlines()) == n_lines
+
+    index.add('/a/b.txt', 'ghi')
+    assert index.paths_for_hash('abc') == [pathlib.Path('/a/c.txt')]
+    assert index.paths_for_hash('ghi') == [pathlib.Path('/a/b.txt')]
+
+    # the log is persistent
+    other = DownloadedDataIndex(log_path)
+    assert other.to_dict() == {'/a/b.txt': 'ghi',
+                               '/a/c.txt': 'abc',
+                               '/a/d.txt': 'def'}
+
+
+def test_concurrent_writers(tmpdir):
+    """
+    Test that records appended through one index are seen by another
+    index backed by the same log, and that replacing or removing the
+    log is detected
+    """
+    log_path = pathlib.Path(tmpdir) / 'index.jsonl'
+    index_0 = DownloadedDataIndex(log_path)
+    index_1 = DownloadedDataIndex(log_path)
+
+    index_0.add('/a/b.txt', 'abc')
+    index_1.add('/a/c.txt', 'def')
+    assert index_0.to_dict() == index_1.to_dict()
+    assert index_0.get('/a/c.txt') == 'def'
+
+    index_1.replace({'/x/y.txt': 'xyz'})
+    assert index_0.to_dict() == {'/x/y.txt': 'xyz'}
+
+    log_path.unlink()
+    assert index_0.to_dict() == {}
+
+
+def test_corrupted_records(tmpdir):
+    """
+    Test that corrupted or partially written records are skipped
+    """
+    log_path = pathlib.Path(tmpdir) / 'index.jsonl'
+    with open(log_path, 'w') as out_file:
+        out_file.write(json.dumps({'path': '/a', 'file_hash': 'abc'}) + '\n')
+        out_file.write('babababa\n')
+        out_file.write(json.dumps({'path': '/b'}) + '\n')
+        out_file.write('{"path": "/c", "file_')
+
+    index = DownloadedDataIndex(log_path)
+    assert index.to_dict() == {'/a': 'abc'}
+
+    with open(log_path, 'a') as out_file:
+        out_file.write('hash": "def"}\n')
+    assert index.to_dict() == {'/a': 'abc', '/c': 'def'}
+
+
+def test_compaction(tmpdir, monkeypatch):
+    """
+    Test that the log is rewritten once it holds too many
+    superseded records
+    """
+    monkeypatch.setattr(DownloadedDataIndex, '_max_stale_records', 5)
+    log_path = pathlib.Path(tmpdir) / 'index.jsonl'
+    index = DownloadedDataIndex(log_path)
+    for ii in range(20):
+        index.add('/a/b.txt', f'{ii}')
+        index.add('/a/c.txt', f'{ii}')
+
+    with open(log_path, 'r') as in_file:
+        assert len(in_file.readlines()) <= 8
+    assert DownloadedDataIndex(log_path).to_dict() == {'/a/b.txt': '19',
+                                                       '/a/c.txt': '19'}
+
+
+def test_legacy_migration(tmpdir):
+    """
+    Test that the JSON dict written by earlier versions of the cache is
+    migrated into the log
+    """
+    tmpdir = pathlib.Path(tmpdir)
+    legacy = {'/a/b.txt': 'abc', '/a/c.txt': 'def'}
+    legacy_path = tmpdir / 'index.json'
+    with open(legacy_path, 'w') as out_file:
+        out_file.write(json.dumps(legacy, indent=2, sort_keys=True))
+
+    log_path = tmpdir / 'index.jsonl'
+    index = DownloadedDataIndex(log_path, legacy_json_path=legacy_path)
+    assert index.to_dict() == legacy
+    assert log_path.is_file()
+
+    # the legacy file is left for earlier versions of the cache
+    with open(legacy_path, 'r') as in_file:
+        assert json.load(in_file) == legacy
+
+    # once migrated, later changes to the legacy file are not re-read
+    index.add('/a/e.txt', 'ghi')
+    with open(legacy_path, 'w') as out_file:
+        out_file.write(json.dumps({'/a/x.txt': 'xyz'}))
+    index = DownloadedDataIndex(log_path, legacy_json_path=legacy_path)
+    assert index.to_dict() == {**legacy, '/a/e.txt': 'ghi'}
+
+
+def test_legacy_migration_missing_file(tmpdir):
+    """
+    Test that a legacy JSON file which does not exist (e.g. because
+    it was removed concurrently) is treated as nothing to migrate
+    """
+    tmpdir = pathlib.Path(tmpdir)
+    log_path = tmpdir / 'index.jsonl'
+    index = DownloadedDataIndex(log_path,
+                                legacy_json_path=tmpdir / 'index.json')
+    assert index.to_dict() == {}
+    assert not log_path.exists()
@@ -332,14 +332,14 @@ def test_corrupted_download_manifest(tmpdir, example_datasets):
         for file_id in file_id_list:
             cache.download_data(file_id)
 
-    with open(cache._downloaded_data_path, 'rb') as in_file:
-        src_data = json.load(in_file)
+    with open(cache._downloaded_data_path, 'r') as in_file:
+        src_data = [json.loads(line) for line in in_file]
 
     # write a corrupted downloaded_data_path
-    for k in src_data:
-        src_data[k] = ''
     with open(cache._downloaded_data_path, 'w') as out_file:
-        out_file.write(json.dumps(src_data, indent=2))
+        for record in src_data:
+            record['file_hash'] = ''
+            out_file.write(json.dumps(record) + '\n')
 
     hasher = hashlib.blake2b()
     hasher.update(b'4567890')
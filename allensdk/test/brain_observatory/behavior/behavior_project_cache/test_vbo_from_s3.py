@@ -10,7 +10,6 @@ from .utils import create_bucket, load_dataset
 import boto3
 from moto import mock_s3
 import pathlib
-import json
 import semver
 
 from allensdk.api.cloud_cache.cloud_cache import MissingLocalManifestWarning
@@ -108,8 +107,7 @@ def test_local_cache_construction(
     cache.construct_local_manifest()
     assert cache.fetch_api.cache._downloaded_data_path.is_file()
 
-    with open(manifest_path, 'rb') as in_file:
-        local_manifest = json.load(in_file)
+    local_manifest = cache.fetch_api.cache._downloaded_data_index.to_dict()
     fnames = set([pathlib.Path(k).name for k in local_manifest])
     assert 'ophys_file_1.nwb' in fnames
     assert len(local_manifest) == 9  # 8 metadata files and 1 data file
@@ -0,0 +1,98 @@
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+
+from allensdk.brain_observatory.behavior.data_objects.cell_specimens\
+    .traces.dff_traces import DFFTraces
+from allensdk.brain_observatory.behavior.data_objects.cell_specimens\
+    .traces.trace_array import TraceArray
+
+
+@pytest.fixture
+def traces():
+    rng = np.random.default_rng(1234)
+    return rng.random((5, 100))
+
+
+@pytest.fixture
+def cell_roi_ids():
+    return np.array([10, 3, 7, 42, 8])
+
+
+@pytest.mark.parametrize('source', ['array', 'h5', 'h5_time_major'])
+def test_get_and_take(tmp_path, traces, cell_roi_ids, source):
+    with h5py.File(tmp_path / 'traces.h5', 'w') as f:
+        if source == 'array':
+            trace_array = TraceArray(data=traces, cell_roi_ids=cell_roi_ids)
+        elif source == 'h5':
+            trace_array = TraceArray(
+                data=f.create_dataset('traces', data=traces),
+                cell_roi_ids=cell_roi_ids)
+        else:
+            trace_array = TraceArray(
+                data=f.create_dataset('traces', data=traces.T),
+                cell_roi_ids=cell_roi_ids, time_major=True)
+
+        assert trace_array.is_loaded == (source == 'array')
+        assert trace_array.shape == traces.shape
+        assert list(trace_array.cell_roi_ids) == list(cell_roi_ids)
+
+        frames = slice(20, 30)
+        np.testing.assert_array_equal(
+            trace_array.get(cell_roi_ids=[42, 10, 42], frames=frames),
+            traces[[3, 0, 3], 20:30])
+        np.testing.assert_array_equal(trace_array.get(frames=frames),
+                                      traces[:, 20:30])
+        assert trace_array.get(cell_roi_ids=[]).shape == (0, 100)
+
+        with pytest.raises(KeyError):
+            trace_array.get(cell_roi_ids=[1])
+
+        # taking traces does not read them
+        taken = trace_array.take(np.array([4, 1]))
+        assert taken.is_loaded == (source == 'array')
+        assert list(taken.cell_roi_ids) == [8, 3]
+        np.testing.assert_array_equal(taken.get(cell_roi_ids=[3]),
+                                      traces[[1]])
+
+        np.testing.assert_array_equal(taken.data, traces[[4, 1]])
+        np.testing.assert_array_equal(trace_array.data, traces)
+        assert trace_array.is_loaded
+        assert trace_array.data.flags['C_CONTIGUOUS']
+
+    # once loaded, the file is no longer needed
+    np.testing.assert_array_equal(taken.get(frames=slice(0, 2)),
+                                  traces[[4, 1], :2])
+
+
+def test_get_is_view(traces, cell_roi_ids):
+    trace_array = TraceArray(data=traces, cell_roi_ids=cell_roi_ids)
+    assert np.shares_memory(trace_array.get(frames=slice(5, 10)), traces)
+
+
+def test_mismatched_cell_roi_ids(traces):
+    with pytest.raises(ValueError):
+        TraceArray(data=traces, cell_roi_ids=[1, 2])
+
+
+def test_dataframe_view(traces, cell_roi_ids):
+    """The dataframe value is equivalent to the traces it was built from
+    and filter_and_reorder reorders the underlying matrix"""
+    df = pd.DataFrame({'dff': [x for x in traces]},
+                      index=pd.Index(cell_roi_ids, name='cell_roi_id'))
+    dff_traces = DFFTraces(traces=df)
+    pd.testing.assert_frame_equal(dff_traces.value, df)
+    assert dff_traces.get_number_of_frames() == 100
+
+    dff_traces.filter_and_reorder(roi_ids=np.array([42, 10]))
+    np.testing.assert_array_equal(dff_traces.get_trace_array().data,
+                                  traces[[3, 0]])
+    pd.testing.assert_frame_equal(dff_traces.value, df.loc[[42, 10]])
+
+    with pytest.raises(RuntimeError):
+        dff_traces.filter_and_reorder(roi_ids=np.array([42, 1]))
+    with pytest.warns(UserWarning):
+        dff_traces.filter_and_reorder(roi_ids=np.array([42, 1]),
+                                      raise_if_rois_missing=False)
+    pd.testing.assert_frame_equal(dff_traces.value, df.loc[[42]])
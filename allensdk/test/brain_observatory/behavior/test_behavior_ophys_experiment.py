@@ -217,6 +217,7 @@ def test_behavior_ophys_experiment_list_data_attributes_and_methods(
         'get_reward_rate',
         'get_rolling_performance_df',
         'get_segmentation_mask_image',
+        'get_trace_array',
         'licks',
         'max_projection',
         'metadata',
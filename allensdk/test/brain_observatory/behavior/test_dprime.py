@@ -12,7 +12,9 @@ from allensdk.brain_observatory.behavior.dprime import \
     get_rolling_dprime, \
     get_trial_count_corrected_false_alarm_rate, \
     get_trial_count_corrected_hit_rate, \
-    get_dprime
+    get_dprime, \
+    get_reward_rate, \
+    get_rolling_performance
 
 
 NaN = float('nan')
@@ -202,3 +204,62 @@ def test_dprime(hr, far, dprime):
         assert val > 0
     else:
         pass
+
+
+def test_get_reward_rate():
+    response_latency = [0.3, np.inf, 0.5, 1.0, 0.2, np.nan]
+    starttime = [0., 6., 12., 18., 24., 30.]
+
+    result = get_reward_rate(response_latency=response_latency,
+                             starttime=starttime,
+                             trial_window=2, initial_trials=2)
+    # e.g. trial 2 averages over trials 0-3: 2 rewarded over 18 s,
+    # trial 5 over trials 3-5: 1 rewarded over 12 s
+    np.testing.assert_allclose(
+        result, [NaN, NaN, 2 / 18 * 60, 2 / 18 * 60, 2 / 18 * 60, 1 / 12 * 60])
+
+
+@pytest.mark.parametrize('sliding_window', [3, 100])
+def test_get_rolling_performance(mock_rolling_dprime_fixture, sliding_window):
+    trials = mock_rolling_dprime_fixture.copy()
+    trials.loc[::7, 'aborted'] = True
+    outcomes = dict(
+        hit=trials.hit, miss=trials.miss, false_alarm=trials.false_alarm,
+        correct_reject=trials.correct_reject, aborted=trials.aborted)
+    response_latency = np.where(trials.hit, 0.2, np.inf)
+    starttime = np.arange(len(trials)) * 8.5
+
+    performance = get_rolling_performance(
+        response_latency=response_latency, starttime=starttime,
+        sliding_window=sliding_window, **outcomes)
+
+    assert len(performance) == len(trials)
+    assert performance.loc[trials.aborted].drop(
+        columns='reward_rate').isnull().all().all()
+
+    not_aborted = ~trials.aborted.values
+    hit_rate = get_trial_count_corrected_hit_rate(
+        hit=trials.hit, miss=trials.miss, aborted=trials.aborted,
+        sliding_window=sliding_window)
+    false_alarm_rate = get_trial_count_corrected_false_alarm_rate(
+        false_alarm=trials.false_alarm, correct_reject=trials.correct_reject,
+        aborted=trials.aborted, sliding_window=sliding_window)
+    expected = {
+        'hit_rate_raw': get_hit_rate(
+            hit=trials.hit, miss=trials.miss, aborted=trials.aborted,
+            sliding_window=sliding_window),
+        'hit_rate': hit_rate,
+        'false_alarm_rate_raw': get_false_alarm_rate(
+            false_alarm=trials.false_alarm,
+            correct_reject=trials.correct_reject, aborted=trials.aborted,
+            sliding_window=sliding_window),
+        'false_alarm_rate': false_alarm_rate,
+        'rolling_dprime': get_rolling_dprime(hit_rate, false_alarm_rate)
+    }
+    for column, values in expected.items():
+        np.testing.assert_array_equal(
+            performance[column].values[not_aborted], values)
+    np.testing.assert_array_equal(
+        performance['reward_rate'].values,
+        get_reward_rate(response_latency=response_latency,
+                        starttime=starttime))
@@ -4,11 +4,13 @@ import pytest
 
 import numpy as np
 import pandas as pd
+from scipy import stats
 
 from allensdk.brain_observatory.behavior.eye_tracking_processing import (
     load_eye_tracking_hdf, determine_outliers, compute_circular_area,
     compute_elliptical_area, determine_likely_blinks,
-    process_eye_tracking_data, EyeTrackingError)
+    process_eye_tracking_data, EyeTrackingError, compute_circular_areas,
+    compute_elliptical_areas, determine_likely_blinks_from_areas)
 
 
 def create_preload_eye_tracking_df(data: np.ndarray) -> pd.DataFrame:
@@ -88,6 +90,47 @@ def test_load_eye_tracking_hdf(hdf_fixture: Path, expected: pd.DataFrame):
     assert expected.equals(obtained)
 
 
+@pytest.mark.parametrize("hdf_fixture", [
+    {"cr": np.arange(15.).reshape(3, 5),
+     "eye": np.arange(15., 30.).reshape(3, 5) + 1j,
+     "pupil": np.arange(30., 45.).reshape(3, 5)},
+], indirect=["hdf_fixture"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 10])
+def test_load_eye_tracking_hdf_chunked(hdf_fixture: Path, chunk_size: int):
+    expected = create_loaded_eye_tracking_df(
+        np.arange(45.).reshape(3, 3, 5).transpose(1, 0, 2).reshape(3, 15))
+    obtained = load_eye_tracking_hdf(hdf_fixture, chunk_size=chunk_size)
+    assert expected.equals(obtained)
+
+
+@pytest.mark.parametrize("hdf_fixture", [
+    {"cr": np.arange(15.).reshape(3, 5),
+     "eye": np.arange(15., 30.).reshape(3, 5),
+     "pupil": np.arange(30., 45.).reshape(3, 5)},
+], indirect=["hdf_fixture"])
+@pytest.mark.parametrize("index", [[0, 1, 3], [2, 1, 0]])
+@pytest.mark.parametrize("chunk_size", [None, 2])
+def test_load_eye_tracking_hdf_mismatched_frames(hdf_fixture: Path,
+                                                 index: list,
+                                                 chunk_size: int):
+    pupil = pd.read_hdf(hdf_fixture, key="pupil")
+    pupil.index = index
+    pupil.to_hdf(hdf_fixture, key="pupil", mode="a")
+
+    # the rows of each field are aligned on the union of the frames
+    frames = pd.Index([0, 1, 2]).union(index)
+    expected = create_loaded_eye_tracking_df(
+        np.full((len(frames), 15), np.nan))
+    expected.index = pd.Index(frames, name='frame')
+    expected.iloc[frames.get_indexer([0, 1, 2]), :10] = \
+        np.arange(30.).reshape(2, 3, 5).transpose(1, 0, 2).reshape(3, 10)
+    expected.iloc[frames.get_indexer(index), 10:] = \
+        np.arange(30., 45.).reshape(3, 5)
+
+    obtained = load_eye_tracking_hdf(hdf_fixture, chunk_size=chunk_size)
+    pd.testing.assert_frame_equal(obtained, expected)
+
+
 @pytest.mark.parametrize("data_df, z_threshold, expected", [
     (create_area_df(
         np.array([[1, 1, 2],
@@ -137,6 +180,47 @@ def test_compute_elliptical_area(df_row: pd.Series, expected: float):
     assert obtained_area == expected
 
 
+def test_compute_areas():
+    widths = np.array([3., 2., np.nan, 1., 4.])
+    heights = np.array([2., 3., 1., np.nan, 4.])
+    rows = [pd.Series([w, h], index=["width", "height"])
+            for w, h in zip(widths, heights)]
+
+    np.testing.assert_array_equal(
+        compute_circular_areas(widths, heights),
+        [compute_circular_area(row) for row in rows])
+    np.testing.assert_array_equal(
+        compute_elliptical_areas(widths, heights),
+        [compute_elliptical_area(row) for row in rows])
+
+
+@pytest.mark.parametrize("z_threshold", [1.0, 2.5])
+@pytest.mark.parametrize("dilation_frames", [0, 1, 3])
+def test_determine_likely_blinks_from_areas(z_threshold, dilation_frames):
+    rng = np.random.default_rng(0)
+    eye_areas = pd.Series(rng.normal(100, 10, 200))
+    pupil_areas = pd.Series(rng.normal(50, 5, 200))
+    eye_areas[[10, 11, 150]] = np.nan
+    pupil_areas[[12, 80]] = np.nan
+    pupil_areas[100] = 1000
+
+    # reference: nan-omitting z-scores, then each blink marks the
+    # dilation_frames frames on either side of it
+    areas = np.column_stack([eye_areas, pupil_areas])
+    z_scores = np.abs(stats.zscore(areas, axis=0, nan_policy='omit'))
+    blinks = np.isnan(areas).any(axis=1) | \
+        (np.nan_to_num(z_scores) > z_threshold).any(axis=1)
+    expected = np.array([
+        blinks[max(i - dilation_frames, 0):i + dilation_frames + 1].any()
+        for i in range(len(blinks))])
+
+    obtained = determine_likely_blinks_from_areas(
+        eye_areas.to_numpy(), pupil_areas.to_numpy(),
+        z_threshold=z_threshold, dilation_frames=dilation_frames)
+    np.testing.assert_array_equal(obtained, expected)
+    assert obtained[100]
+
+
 @pytest.mark.parametrize(
     "eye_areas, pupil_areas, outliers, dilation_frames, expected",
     [
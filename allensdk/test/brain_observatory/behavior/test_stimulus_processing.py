@@ -7,7 +7,8 @@ import pytest
 from allensdk.brain_observatory.behavior.stimulus_processing import (
     get_stimulus_presentations, _get_stimulus_epoch, _get_draw_epochs,
     get_visual_stimuli_df, get_stimulus_metadata, get_gratings_metadata,
-    get_stimulus_templates, is_change_event, compute_trials_id_for_stimulus)
+    get_stimulus_templates, is_change_event, compute_trials_id_for_stimulus,
+    get_flashes_since_change)
 from allensdk.brain_observatory.behavior.data_objects.stimuli\
     .stimulus_templates import StimulusImage
 from allensdk.test.brain_observatory.behavior.conftest import get_resources_dir
@@ -489,3 +490,159 @@ def test_compute_trials_id_for_stimulus():
                                                        trials)
     assert np.array_equal(output_trials_ids.values,
                           expected_trials_id.values)
+
+
+def _get_flashes_since_change_reference(stimulus_presentations):
+    """Row by row implementation of get_flashes_since_change"""
+    flashes_since_change = pd.Series(data=np.zeros(len(stimulus_presentations),
+                                                   dtype=float),
+                                     index=stimulus_presentations.index,
+                                     name='flashes_since_change')
+    for idx, (pd_index, row) in enumerate(stimulus_presentations.iterrows()):
+        omitted = row['omitted']
+        if pd.isna(row['omitted']):
+            omitted = False
+        if row['image_name'] == 'omitted' or omitted:
+            flashes_since_change.iloc[idx] = flashes_since_change.iloc[idx - 1]
+        else:
+            if row['is_change'] or idx == 0:
+                flashes_since_change.iloc[idx] = 0
+            else:
+                flashes_since_change.iloc[idx] = \
+                    flashes_since_change.iloc[idx - 1] + 1
+    return flashes_since_change
+
+
+def _compute_trials_id_for_stimulus_reference(stim_pres_table, trials_table):
+    """Trial by trial implementation of compute_trials_id_for_stimulus"""
+    stim_pres_sorted = stim_pres_table.sort_values('start_time')
+    trials_sorted = trials_table.sort_values('start_time')
+    trials_ids = pd.Series(
+        data=np.full(len(stim_pres_sorted), -1, dtype=int),
+        index=stim_pres_sorted.index,
+        name='trials_id')
+    if 'active' in stim_pres_sorted.columns:
+        has_active = True
+        active_sorted = stim_pres_sorted.active
+    else:
+        has_active = False
+        active_sorted = pd.Series(
+            data=np.zeros(len(stim_pres_sorted), dtype=bool),
+            index=stim_pres_sorted.index,
+            name='active')
+
+    for idx, trial in trials_sorted.iterrows():
+        start_times = stim_pres_sorted.start_time
+        stim_mask = np.logical_and(start_times > trial.start_time,
+                                   start_times < trial.stop_time)
+        trials_ids[stim_mask] = idx
+        if not has_active:
+            active_sorted[stim_mask] = True
+
+    stim_blocks = stim_pres_sorted.stimulus_block
+    stim_image_names = stim_pres_sorted.image_name
+    active_stim_blocks = stim_blocks[active_sorted].unique()
+    passive_stim_blocks = stim_blocks[
+        np.logical_and(~active_sorted, ~stim_image_names.isna())].unique()
+
+    if len(passive_stim_blocks) > 0:
+        for active_stim_block in active_stim_blocks:
+            active_block_mask = stim_blocks == active_stim_block
+            active_images = stim_image_names[active_block_mask].values
+            for passive_stim_block in passive_stim_blocks:
+                passive_block_mask = stim_blocks == passive_stim_block
+                if np.array_equal(active_images,
+                                  stim_image_names[passive_block_mask].values):
+                    trials_ids.loc[passive_block_mask] = \
+                        trials_ids[active_block_mask].values
+
+    return trials_ids.sort_index()
+
+
+@pytest.fixture
+def real_stimulus_tables():
+    """Stimulus presentations and trials of a real session, with the
+    active image block replayed passively after the movie block"""
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data_objects',
+                                 'test_data')
+    presentations = pd.read_pickle(
+        os.path.join(test_data_dir, 'presentations.pkl'))
+    presentations = presentations[
+        ['start_time', 'stop_time', 'image_name', 'omitted',
+         'stimulus_block']]
+
+    replay = presentations[presentations['stimulus_block'] == 0].copy()
+    replay['stimulus_block'] = 3
+    replay['start_time'] += presentations['stop_time'].max()
+    replay['stop_time'] += presentations['stop_time'].max()
+    presentations = pd.concat([presentations, replay], ignore_index=True)
+    presentations['active'] = presentations['stimulus_block'] == 0
+
+    trials = pd.read_pickle(os.path.join(test_data_dir, 'trials.pkl'))
+    return presentations, trials[['start_time', 'stop_time']]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_get_flashes_since_change_matches_reference(real_stimulus_tables,
+                                                    seed):
+    """get_flashes_since_change matches the row by row implementation on a
+    real stimulus table with random changes and omissions"""
+    presentations, _ = real_stimulus_tables
+    presentations = presentations[presentations['image_name'].notna()]
+    presentations = presentations.reset_index(drop=True)
+    presentations['omitted'] = presentations['omitted'].astype(bool)
+
+    rng = np.random.default_rng(seed)
+    if seed > 0:
+        images = rng.choice(['A', 'B', 'C'], size=len(presentations),
+                            p=[0.8, 0.1, 0.1])
+        omitted = rng.random(len(presentations)) < 0.05
+        presentations['image_name'] = np.where(omitted, 'omitted', images)
+        presentations['omitted'] = omitted
+    presentations['is_change'] = is_change_event(
+        stimulus_presentations=presentations)
+    if seed > 0:
+        # omitted can be missing
+        presentations['omitted'] = presentations['omitted'].where(
+            rng.random(len(presentations)) > 0.1, None)
+
+    obtained = get_flashes_since_change(stimulus_presentations=presentations)
+    expected = _get_flashes_since_change_reference(presentations)
+    pd.testing.assert_series_equal(obtained, expected)
+
+
+def test_get_flashes_since_change():
+    stimulus_presentations = pd.DataFrame({
+        'image_name': ['omitted', 'A', 'A', 'omitted', 'A', 'B', 'B'],
+        'omitted': [True, False, False, True, np.nan, False, False],
+        'is_change': [False, False, False, False, False, True, False]
+    })
+    obtained = get_flashes_since_change(
+        stimulus_presentations=stimulus_presentations)
+    expected = pd.Series([0., 1., 2., 2., 3., 0., 1.],
+                         name='flashes_since_change')
+    pd.testing.assert_series_equal(obtained, expected)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('has_active', [True, False])
+def test_compute_trials_id_for_stimulus_matches_reference(
+        real_stimulus_tables, seed, has_active):
+    """compute_trials_id_for_stimulus matches the trial by trial
+    implementation on real stimulus and trials tables, including shuffled,
+    unsorted and overlapping trials"""
+    presentations, trials = real_stimulus_tables
+    if not has_active:
+        presentations = presentations.drop(columns='active')
+
+    rng = np.random.default_rng(seed)
+    if seed > 0:
+        trials = trials.sample(frac=1, random_state=seed)
+        presentations = presentations.sample(frac=1, random_state=seed)
+        trials['stop_time'] += rng.exponential(scale=2, size=len(trials))
+
+    obtained = compute_trials_id_for_stimulus(presentations, trials)
+    expected = _compute_trials_id_for_stimulus_reference(presentations,
+                                                         trials)
+    pd.testing.assert_series_equal(obtained, expected)
+    assert (obtained != -1).any()
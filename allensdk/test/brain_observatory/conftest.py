@@ -77,3 +77,16 @@ def behavior_ecephys_session_config_fixture():
         probes_to_skip=None)
 
     return session_data_list['sessions'][0]
+
+
+@pytest.fixture
+def spawn_worker_processes():
+    """Start worker processes with the 'spawn' start method (the default
+    on macOS and Windows), which pickles the arguments of the pool
+    initializer rather than inheriting them"""
+    import multiprocessing
+
+    start_method = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method('spawn', force=True)
+    yield
+    multiprocessing.set_start_method(start_method, force=True)
@@ -180,6 +180,13 @@ def test_contrast_stimulus(ecephys_api_w_contrast):
     assert (len(dg.conditionwise_statistics_contrast) == 36 * 6)
 
 
+def test_metrics_n_workers(ecephys_api):
+    session = EcephysSession(api=ecephys_api)
+    expected = DriftingGratings(ecephys_session=session).metrics
+    obtained = DriftingGratings(ecephys_session=session, n_workers=2).metrics
+    pd.testing.assert_frame_equal(expected, obtained)
+
+
 def test_metric_with_contrast(ecephys_api_w_contrast):
     session = EcephysSession(api=ecephys_api_w_contrast)
     dg = DriftingGratings(ecephys_session=session)
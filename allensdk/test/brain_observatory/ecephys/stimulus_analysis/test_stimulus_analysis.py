@@ -7,7 +7,9 @@ import warnings
 from allensdk.brain_observatory.ecephys.ecephys_session_api import EcephysSessionApi
 from allensdk.brain_observatory.ecephys.ecephys_session import EcephysSession
 from allensdk.brain_observatory.ecephys.stimulus_analysis.stimulus_analysis import StimulusAnalysis, \
-    running_modulation, lifetime_sparseness, fano_factor, overall_firing_rate, get_fr, osi, dsi
+    running_modulation, lifetime_sparseness, fano_factor, \
+    overall_firing_rate, get_fr, osi, dsi, aggregate_over_intervals, \
+    get_frs, reliability, calculate_time_delayed_correlation
 
 
 pd.set_option('display.max_columns', None)
@@ -75,6 +77,12 @@ class MockSessionApi(EcephysSessionApi):
             "velocity": np.linspace(-0.1, 11.0, 100)
         })
 
+    def get_pupil_data(self):
+        return pd.DataFrame({
+            "pupil_width": np.linspace(0.0, 9.9, 100),
+            "pupil_height": np.linspace(1.0, 10.9, 100)
+        }, index=pd.Index(np.linspace(0.0, 9.9, 100), name="Time (s)"))
+
 
 @pytest.fixture
 def ecephys_api():
@@ -228,6 +236,95 @@ def test_running_speed(ecephys_api):
     assert(np.isclose(stim_analysis.running_speed.loc[6]['running_speed'], 3.487879))
 
 
+def masked_presentation_reference(stim_table, sample_times, data, reducer):
+    """Summarize data over each presentation with a boolean mask per
+    presentation, as StimulusAnalysis.running_speed used to"""
+    rows = []
+    for start, stop in stim_table[['start_time', 'stop_time']].values:
+        mask = (sample_times >= start) & (sample_times < stop)
+        rows.append(getattr(data[mask], reducer)())
+    return pd.DataFrame(rows, index=stim_table.index.values).rename_axis(
+        'stimulus_presentation_id')
+
+
+def test_running_speed_matches_masked_mean(ecephys_api):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key='s0')
+    running_speed = session.running_speed
+    expected = masked_presentation_reference(
+        stim_analysis.stim_table, running_speed['start_time'].values,
+        running_speed[['velocity']], 'mean').rename(
+        columns={'velocity': 'running_speed'})
+    pd.testing.assert_frame_equal(stim_analysis.running_speed, expected)
+
+
+@pytest.mark.parametrize('reducer', ['mean', 'median', 'max'])
+def test_get_pupil_data(ecephys_api, reducer):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key='s0')
+    pupil_data = stim_analysis.get_pupil_data(reducer=reducer)
+
+    expected = masked_presentation_reference(
+        stim_analysis.stim_table, session.get_pupil_data().index.values,
+        session.get_pupil_data(), reducer)
+    pd.testing.assert_frame_equal(pupil_data, expected)
+
+    # presentation 1 spans [0.5, 1.0)
+    expected_width = {'mean': 0.7, 'median': 0.7, 'max': 0.9}[reducer]
+    assert np.isclose(pupil_data.loc[1, 'pupil_width'], expected_width)
+
+
+@pytest.mark.parametrize('reducer,expected', [
+    ('mean', [[1.5, 15.0], [np.nan, np.nan], [4.0, 6.0]]),
+    ('median', [[1.5, 15.0], [np.nan, np.nan], [4.0, 6.0]]),
+    ('max', [[3.0, 20.0], [np.nan, np.nan], [4.0, 6.0]])
+])
+def test_aggregate_over_intervals(reducer, expected):
+    sample_times = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+    values = np.array([[0.0, 10.0],
+                       [1.0, np.nan],
+                       [2.0, 20.0],
+                       [3.0, np.nan],
+                       [4.0, 6.0]])
+    obtained = aggregate_over_intervals(
+        sample_times, values,
+        start_times=[0.0, 2.5, 3.5], stop_times=[4.0, 3.0, 10.0],
+        reducer=reducer)
+    assert np.allclose(obtained, expected, equal_nan=True)
+
+    obtained = aggregate_over_intervals(
+        sample_times, values[:, 0],
+        start_times=[0.0, 2.5, 3.5], stop_times=[4.0, 3.0, 10.0],
+        reducer=reducer)
+    assert np.allclose(obtained, np.array(expected)[:, 0], equal_nan=True)
+
+
+def test_aggregate_over_intervals_median():
+    # one long interval spanning all samples, plus short, overlapping and
+    # empty intervals, over unsorted samples
+    rng = np.random.RandomState(4)
+    sample_times = rng.permutation(1000) / 10.0
+    values = rng.randn(1000, 2)
+    values[rng.rand(1000, 2) < 0.1] = np.nan
+    start_times = np.array([-1.0, 5.0, 5.05, 50.0, 20.0, 99.95])
+    stop_times = np.array([101.0, 5.35, 5.45, 50.0, 20.1, 200.0])
+
+    obtained = aggregate_over_intervals(sample_times, values, start_times,
+                                        stop_times, reducer='median')
+
+    expected = np.full((len(start_times), 2), np.nan)
+    for ii, (start, stop) in enumerate(zip(start_times, stop_times)):
+        in_interval = (sample_times >= start) & (sample_times < stop)
+        for jj in range(2):
+            valid = values[in_interval, jj]
+            valid = valid[~np.isnan(valid)]
+            if len(valid) > 0:
+                expected[ii, jj] = np.median(valid)
+    assert np.array_equal(obtained, expected, equal_nan=True)
+
+
 def test_spikes(ecephys_api):
     session = EcephysSession(api=ecephys_api)
     stim_analysis = StimulusAnalysis(ecephys_session=session, stimulus_key='s0')
@@ -259,6 +356,108 @@ def test_check_multiple_preferred_conditions(ecephys_api):
     assert(stim_analysis._check_multiple_pref_conditions(3, 'conditions', [0, 1]) is True)
 
 
+def test_preferred_conditions(ecephys_api):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key='s0')
+    preferred = stim_analysis.preferred_conditions
+    assert list(preferred.index) == list(stim_analysis.unit_ids)
+    for unit_id in stim_analysis.unit_ids:
+        expected = stim_analysis.conditionwise_statistics.loc[unit_id][
+            'spike_mean'].idxmax()
+        assert preferred.loc[unit_id] == expected
+
+
+def test_multiple_pref_conditions(ecephys_api):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key='s0')
+    expected = [
+        stim_analysis._check_multiple_pref_conditions(u, 'conditions', [0, 1])
+        for u in stim_analysis.unit_ids]
+    obtained = stim_analysis._get_multiple_pref_conditions('conditions',
+                                                           [0, 1])
+    assert np.all(obtained == expected)
+
+
+def test_vectorized_unit_metrics(ecephys_api):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key='s0', trial_duration=0.5)
+    unit_ids = stim_analysis.unit_ids
+    preferred = [stim_analysis._get_preferred_condition(unit_id)
+                 for unit_id in unit_ids]
+
+    expected = [stim_analysis._get_fano_factor(u, c)
+                for u, c in zip(unit_ids, preferred)]
+    assert np.allclose(stim_analysis._get_fano_factors(unit_ids), expected,
+                       equal_nan=True)
+
+    expected = np.array([stim_analysis._get_running_modulation(u, c)
+                         for u, c in zip(unit_ids, preferred)])
+    p_values, run_mods = stim_analysis._get_running_modulations(unit_ids)
+    assert np.allclose(p_values, expected[:, 0], equal_nan=True)
+    assert np.allclose(run_mods, expected[:, 1], equal_nan=True)
+
+    expected = [stim_analysis._get_time_to_peak(u, c)
+                for u, c in zip(unit_ids, preferred)]
+    assert np.allclose(stim_analysis._get_times_to_peak(unit_ids), expected,
+                       equal_nan=True)
+
+
+@pytest.mark.parametrize('stimulus_key,expected', [
+    ('s0', [2.0 / 3.0, 1.0, 0.0, 1.0, 1.0, 1.0 / 3.0]),
+    ('s1', [1.0, 1.0, 0.0, 0.0, 1.0, 0.0])
+])
+def test_get_overall_firing_rates(ecephys_api, stimulus_key, expected):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key=stimulus_key,
+                                     trial_duration=0.5)
+    unit_ids = stim_analysis.unit_ids
+    obtained = stim_analysis._get_overall_firing_rates(unit_ids)
+    assert np.allclose(obtained, expected)
+    assert np.array_equal(
+        obtained,
+        [stim_analysis._get_overall_firing_rate(u) for u in unit_ids])
+    assert len(stim_analysis._get_overall_firing_rates([])) == 0
+
+
+@pytest.mark.parametrize('block_starts,block_stops', [
+    ([0.0, 2.0], [1.5, 4.2]),
+    ([0.0, 1.0], [3.0, 2.0]),  # overlapping blocks
+    ([3.0], [1.0])  # inverted block
+])
+def test_get_overall_firing_rates_blocks(ecephys_api, block_starts,
+                                         block_stops):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key='s0')
+    stim_analysis._block_starts = np.array(block_starts)
+    stim_analysis._block_stops = np.array(block_stops)
+    unit_ids = stim_analysis.unit_ids
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = [stim_analysis._get_overall_firing_rate(u)
+                    for u in unit_ids]
+        obtained = stim_analysis._get_overall_firing_rates(unit_ids)
+    assert np.allclose(obtained, expected, equal_nan=True)
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_map_units(ecephys_api, n_workers):
+    session = EcephysSession(api=ecephys_api)
+    stim_analysis = StimulusAnalysis(ecephys_session=session,
+                                     stimulus_key='s0', trial_duration=0.5,
+                                     n_workers=n_workers)
+    unit_ids = stim_analysis.unit_ids
+    obtained = stim_analysis._map_units('_get_overall_firing_rate',
+                                        zip(unit_ids))
+    expected = [stim_analysis._get_overall_firing_rate(u) for u in unit_ids]
+    assert np.allclose(obtained, expected)
+
+
 def test_get_time_to_peak(ecephys_api):
     session = EcephysSession(api=ecephys_api)
     stim_analysis = StimulusAnalysis(ecephys_session=session, stimulus_key='s0', trial_duration=0.5)
@@ -332,6 +531,52 @@ def test_get_fr(spikes, sampling_freq, sweep_length, expected):
     assert(np.allclose(frs, expected))
 
 
+def test_get_frs():
+    sweeps = [np.array([0.82764702, 0.83624702, 1.09211374]), np.array([]),
+              np.array([0.1])]
+    frs = get_frs(sweeps, num_timestep_second=10, sweep_length=1.5)
+    assert frs.shape == (3, 15)
+    for fr, spikes in zip(frs, sweeps):
+        expected = get_fr(spikes, num_timestep_second=10, sweep_length=1.5)
+        assert np.allclose(fr, expected)
+
+
+@pytest.mark.parametrize('unit_sweeps,expected', [
+    ([np.array([0.5, 1.0]), np.array([0.5, 1.0]), np.array([0.5, 1.0, 2.0])],
+     0.7824578),
+    ([np.array([0.5, 1.0]), np.array([]), np.array([1.5])], -0.1937922),
+    ([np.array([]), np.array([])], np.nan),  # no variance
+])
+def test_reliability(unit_sweeps, expected):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        assert np.allclose(reliability(unit_sweeps), expected,
+                           equal_nan=True)
+
+
+def test_calculate_time_delayed_correlation():
+    counts = np.array([[[1, 0], [2, 1], [0, 0]],
+                       [[2, 3], [4, 1], [1, 1]],
+                       [[3, 0], [5, 2], [2, 2]],
+                       [[0, 1], [1, 4], [3, 2]]], dtype=np.uint16)
+    dataset = xr.DataArray(
+        counts,
+        dims=('stimulus_presentation_id', 'time_relative_to_stimulus_onset',
+              'unit_id'),
+        coords={'unit_id': [10, 11],
+                'time_relative_to_stimulus_onset': [0.0, 0.1, 0.2]})
+    rsc = calculate_time_delayed_correlation(dataset)
+
+    # correlations of the time bins over the trials where both are nonzero
+    expected = np.array([[[np.nan, 0.98198051, 1.0],
+                          [np.nan, np.nan, -0.72057669],
+                          [np.nan, np.nan, np.nan]],
+                         [[np.nan, -1.0, -1.0],
+                          [np.nan, np.nan, 0.75592895],
+                          [np.nan, np.nan, np.nan]]])
+    assert np.allclose(rsc, expected, equal_nan=True)
+
+
 @pytest.mark.parametrize('orivals,tuning,expected',
                          [
                              (np.array([1.0]), np.array([0.0, 30.0, 60.0, 90.0, 120.0, 150.0]), np.nan),
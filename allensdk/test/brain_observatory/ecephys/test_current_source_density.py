@@ -76,6 +76,35 @@ def test_accumulate_lfp_data(times, raw, channels, windows, volts_per_bit,
     assert np.allclose(obtained, expected)
 
 
+@pytest.mark.parametrize('dtype', [np.int16, np.float64])
+def test_accumulate_lfp_data_matches_extractor(dtype):
+    rng = np.random.default_rng(11)
+    times = np.cumsum(rng.uniform(0.5, 1.5, 200)) - 10
+    raw = rng.integers(-100, 100, (200, 6)).astype(dtype)
+    channels = [4, 0, 2]
+    windows = [np.arange(-20, 20, 0.7) + onset
+               for onset in rng.uniform(-20, times[-1] + 20, 25)]
+    windows[2] = windows[2][:-5]
+
+    def reference(lfp):
+        return lfp - lfp[:, [5]]
+
+    def extractor_factory(timestamps, lfp_raw, channel):
+        return interp_utils.regular_grid_extractor_factory(
+            timestamps, lfp_raw, channel)
+
+    expected = csd.accumulate_lfp_data(
+        times, reference(raw), channels, windows, 0.5,
+        extractor_factory=extractor_factory)
+    obtained = csd.accumulate_lfp_data(
+        times, raw, channels, windows, 0.5,
+        reference_function=reference, chunk_size=100)
+
+    assert obtained.shape == (25, 3, len(windows[2]))
+    assert np.isnan(obtained).any() == (dtype is np.float64)
+    assert np.array_equal(obtained, expected, equal_nan=True)
+
+
 @pytest.mark.parametrize('trial_mean_accumulated,spacing,expected,expected_channels', [
     [
         np.nanmean(np.arange(36).reshape([2, 6, 3]) ** 3, axis=0),
@@ -399,6 +399,20 @@ def test_presentationwise_spike_counts(spike_times_api):
     assert np.allclose([4, 2, 3], obtained.shape)
 
 
+def test_presentationwise_spike_counts_out(spike_times_api):
+    session = EcephysSession(api=spike_times_api)
+    out = np.zeros((4, 2, 3), dtype=np.uint32)
+    obtained = \
+        session.presentationwise_spike_counts(
+            np.linspace(-.1, .1, 3),
+            session.stimulus_presentations.index.values,
+            session.units.index.values,
+            out=out)
+
+    assert obtained.data is out
+    assert np.allclose([0, 3], out[2, :, 2])
+
+
 @pytest.mark.parametrize("spike_times,time_domain,expected", [
     [
         {1: [1.5, 2.5]},
@@ -438,6 +452,59 @@ def test_build_spike_histogram(spike_times, time_domain, expected, binarize):
     assert np.allclose(expected, obtained)
 
 
+def _loop_spike_histogram(time_domain, spike_times, unit_ids):
+    time_domain = np.array(time_domain)
+    expected = np.zeros(
+        (time_domain.shape[0], time_domain.shape[1] - 1, len(unit_ids)),
+        dtype=int)
+    for ii, unit_id in enumerate(unit_ids):
+        data = np.array(spike_times[unit_id])
+        starts = np.searchsorted(data, time_domain[:, :-1].flat)
+        ends = np.searchsorted(data, time_domain[:, 1:].flat, side="right")
+        expected[:, :, ii].flat = ends - starts
+    return expected
+
+
+@pytest.mark.parametrize("chunk_size", [None, 1, 7])
+def test_build_spike_histogram_matches_loop(chunk_size):
+    rng = np.random.default_rng(1234)
+    spike_times = {
+        unit_id: np.sort(rng.uniform(0, 100, rng.integers(0, 2000)))
+        for unit_id in range(12)
+    }
+    # some bin edges coincide exactly with spike times
+    spike_times[3] = np.arange(0, 100, 0.25)
+    bin_edges = np.linspace(-0.25, 0.5, 7)
+    offsets = np.sort(rng.uniform(0, 100, 50))
+    offsets[:10] = np.arange(10, 20)
+    time_domain = offsets[:, None] + bin_edges[None, :]
+    unit_ids = [5, 3, 0, 11, 7]
+
+    expected = _loop_spike_histogram(time_domain, spike_times, unit_ids)
+    obtained = build_spike_histogram(time_domain, spike_times, unit_ids,
+                                     chunk_size=chunk_size)
+    assert np.array_equal(expected, obtained)
+
+
+def test_build_spike_histogram_out(tmpdir_factory):
+    spike_times = {1: [1.5, 2.5], 2: [1.5, 1.55]}
+    time_domain = [[1, 2, 3, 4], [1.6, 2.0, 4.0, 4.1]]
+    path = str(tmpdir_factory.mktemp("histogram").join("counts.dat"))
+    out = np.memmap(path, dtype=np.uint32, mode="w+", shape=(2, 3, 2))
+
+    obtained = build_spike_histogram(time_domain, spike_times, [1, 2],
+                                     out=out, chunk_size=1)
+
+    assert obtained is out
+    assert np.array_equal(
+        np.stack(([[1, 1, 0], [0, 1, 0]], [[2, 0, 0], [0, 0, 0]]), axis=2),
+        obtained)
+
+    with pytest.raises(ValueError):
+        build_spike_histogram(time_domain, spike_times, [1],
+                              out=out)
+
+
 def test_presentationwise_spike_times(spike_times_api):
     session = EcephysSession(api=spike_times_api)
     obtained = \
@@ -457,6 +524,36 @@ def test_presentationwise_spike_times(spike_times_api):
                                   check_dtype=False)
 
 
+def get_interleaved_spike_times(self):
+    # spikes of every unit fall in several stimulus presentations, and are
+    # interleaved in time with the spikes of the other units
+    return {
+        0: np.array([0.1, 0.6, 1.7]),
+        1: np.array([0.05, 1.2, 1.6, 2.5]),
+        2: np.array([1.01, 1.03, 1.02])
+    }
+
+
+@pytest.mark.parametrize("units_per_block,expected_blocks", [
+    [1, [[0], [1], [2]]],
+    [2, [[0, 1], [2]]],
+    [10, [[0, 1, 2]]]
+])
+def test_iter_presentationwise_spike_times(spike_times_api, units_per_block,
+                                           expected_blocks):
+    spike_times_api.get_spike_times = types.MethodType(
+        get_interleaved_spike_times, spike_times_api)
+    session = EcephysSession(api=spike_times_api)
+    expected = session.presentationwise_spike_times()
+    assert set(expected['unit_id']) == {0, 1, 2}
+
+    blocks = list(session.iter_presentationwise_spike_times(
+        units_per_block=units_per_block))
+    assert [sorted(set(block['unit_id'])) for block in blocks] == \
+        expected_blocks
+    pd.testing.assert_frame_equal(expected, pd.concat(blocks).sort_index())
+
+
 def test_empty_presentationwise_spike_times(spike_times_api):
     # Test that when there are no spikes presentationwise_spike_times
     # doesn't fail and instead returns a empty dataframe
@@ -494,6 +591,41 @@ def test_conditionwise_spike_statistics_using_rates(spike_times_api):
     assert np.allclose([0, 0, 6], obtained["spike_mean"].values)
 
 
+@pytest.mark.parametrize("use_rates", [True, False])
+def test_conditionwise_spike_statistics_matches_groupby(spike_times_api,
+                                                        use_rates):
+    session = EcephysSession(api=spike_times_api)
+    unit_ids = session.units.index.values
+    presentations = session.stimulus_presentations
+
+    spikes = session.presentationwise_spike_times(unit_ids=unit_ids)
+    counts = spikes.groupby(
+        ["stimulus_presentation_id", "unit_id"]).size().reindex(
+            pd.MultiIndex.from_product(
+                [presentations.index.values, unit_ids],
+                names=["stimulus_presentation_id", "unit_id"]),
+            fill_value=0).rename("value").reset_index()
+    counts = counts.join(presentations[["stimulus_condition_id", "duration"]],
+                         on="stimulus_presentation_id")
+    if use_rates:
+        counts["value"] = counts["value"] / counts["duration"]
+    grouped = counts.groupby(["unit_id", "stimulus_condition_id"])["value"]
+
+    obtained = session.conditionwise_spike_statistics(unit_ids=unit_ids,
+                                                      use_rates=use_rates)
+    expected_index = grouped.mean().index
+    obtained = obtained.loc[expected_index]
+
+    assert ("spike_count" in obtained.columns) != use_rates
+    assert np.allclose(grouped.mean().values, obtained["spike_mean"])
+    assert np.allclose(grouped.std().values, obtained["spike_std"],
+                       equal_nan=True)
+    assert np.allclose(grouped.sem().values, obtained["spike_sem"],
+                       equal_nan=True)
+    assert np.array_equal(grouped.size().values,
+                          obtained["stimulus_presentation_count"])
+
+
 def test_empty_conditionwise_spike_statistics(spike_times_api):
     # special case when there are no spikes
     spike_times_api.get_spike_times = \
@@ -640,6 +772,53 @@ def test_get_lfp_mask_invalid(lfp_masking_api):
     xr.testing.assert_equal(expected, obtained)
 
 
+def test_get_lfp_windowed(lfp_masking_api, raw_lfp):
+    def get_lfp(pid, time_ranges=None, channel_ids=None):
+        start_time, stop_time = time_ranges
+        lfp = raw_lfp[pid]
+        lfp = lfp.sel(time=(lfp.time >= start_time) & (lfp.time < stop_time))
+        return lfp.sel(channel=channel_ids)
+
+    lfp_masking_api.get_lfp = get_lfp
+    session = EcephysSession(api=lfp_masking_api)
+    obtained = session.get_lfp(0, time_ranges=(0.4, 1.8), channel_ids=[1])
+
+    expected = xr.DataArray(
+        data=np.array([[7, 8, np.nan]]),
+        dims=['channel', 'time'],
+        coords=[[1], [0.5, 1.0, 1.5]]
+    )
+
+    xr.testing.assert_equal(expected, obtained)
+
+
+def test_get_valid_time_points(just_stim_table_api):
+    session = EcephysSession(api=just_stim_table_api)
+    rng = np.random.default_rng(3)
+    starts = rng.uniform(0, 100, 30)
+    invalid_times = pd.DataFrame({
+        "start_time": starts,
+        "stop_time": starts + rng.exponential(2.0, 30)
+    })
+    time_points = np.concatenate([
+        np.linspace(-1, 110, 5000),
+        invalid_times["start_time"].values,
+        invalid_times["stop_time"].values
+    ])
+
+    expected = np.ones(len(time_points), dtype=bool)
+    for _, interval in invalid_times.iterrows():
+        expected &= ~((time_points >= interval["start_time"])
+                      & (time_points <= interval["stop_time"]))
+
+    obtained = session._get_valid_time_points(time_points, invalid_times)
+    assert np.array_equal(obtained.values, expected)
+    assert np.array_equal(obtained.time.values, time_points)
+
+    obtained = session._get_valid_time_points(time_points, pd.DataFrame())
+    assert obtained.values.all()
+
+
 @pytest.mark.parametrize("inp,expected", [
     [[np.nan, np.nan, 4, 4, 4, 5, 5], [0, 2, 5, 7]]
 ])
@@ -1,9 +1,15 @@
 # most of the tests for this functionality are actually in test_write_nwb
 
+from types import SimpleNamespace
+
 import pytest
+import numpy as np
 import pandas as pd
 
 import allensdk.brain_observatory.ecephys.utils
+from allensdk.brain_observatory.ecephys.ecephys_session_api.\
+    ecephys_nwb_session_api import (
+        _time_ranges_to_slices, _channel_ids_to_columns, _read_lfp_windows)
 
 
 @pytest.mark.parametrize("left,right,expected,left_on,right_on", [
@@ -29,3 +35,80 @@ def test_clobbering_merge(left, right, expected, left_on, right_on):
         left_on=left_on,
         right_on=left_on)
     pd.testing.assert_frame_equal(expected, obtained, check_like=True)
+
+
+@pytest.fixture
+def lfp_series():
+    return SimpleNamespace(data=np.arange(40.).reshape(10, 4),
+                           timestamps=np.arange(10) * 0.5)
+
+
+@pytest.mark.parametrize("time_ranges,expected", [
+    [None, [slice(0, 10)]],
+    [(1.0, 2.0), [slice(2, 4)]],
+    # unsorted, overlapping and abutting ranges are merged
+    [[(3.0, 4.0), (0.2, 1.0), (0.9, 1.6), (2.0, 2.1)],
+     [slice(1, 5), slice(6, 8)]],
+    # ranges containing no samples are dropped
+    [[(5.0, 6.0), (1.1, 1.2), (2.0, 1.0)], []],
+    [[(4.2, 6.0), (-1.0, 0.1)], [slice(0, 1), slice(9, 10)]]
+])
+def test_time_ranges_to_slices(lfp_series, time_ranges, expected):
+    obtained = _time_ranges_to_slices(lfp_series.timestamps, time_ranges)
+    assert obtained == expected
+
+
+@pytest.mark.parametrize("channel_ids,expected_columns", [
+    [[12], [2]],
+    [[13, 10, 11], [3, 0, 1]],
+    [[11, 13, 11], [1, 3, 1]],
+    [[], []]
+])
+def test_channel_ids_to_columns(channel_ids, expected_columns):
+    channel_index = pd.Index([10, 11, 12, 13])
+    columns, channels = _channel_ids_to_columns(channel_index, channel_ids,
+                                                probe_id=1)
+    assert np.array_equal(columns, expected_columns)
+    assert np.array_equal(channels, channel_ids)
+
+
+def test_channel_ids_to_columns_all():
+    channel_index = pd.Index([10, 11, 12, 13])
+    columns, channels = _channel_ids_to_columns(channel_index, None,
+                                                probe_id=1)
+    assert columns == slice(None)
+    assert np.array_equal(channels, channel_index.values)
+
+
+def test_channel_ids_to_columns_unknown():
+    channel_index = pd.Index([10, 11, 12, 13])
+    with pytest.raises(KeyError, match=r"\[14, 9\].*probe 3"):
+        _channel_ids_to_columns(channel_index, [10, 14, 9], probe_id=3)
+
+
+@pytest.mark.parametrize("rows", [
+    [slice(0, 10)],
+    [slice(1, 3), slice(6, 8)],
+    [slice(4, 5)],
+    []
+])
+@pytest.mark.parametrize("columns", [
+    slice(None),
+    [2],
+    [1, 2, 3],
+    [3, 0, 1],
+    [2, 1],
+    [1, 3, 1],
+    []
+])
+def test_read_lfp_windows(lfp_series, rows, columns):
+    data, timestamps = _read_lfp_windows(lfp_series, rows,
+                                         columns if isinstance(columns, slice)
+                                         else np.array(columns, dtype=int))
+
+    row_index = np.concatenate(
+        [np.zeros(0, dtype=int)] + [np.arange(r.start, r.stop) for r in rows])
+    expected = lfp_series.data[row_index][:, columns]
+    assert data.shape == expected.shape
+    assert np.array_equal(data, expected)
+    assert np.array_equal(timestamps, lfp_series.timestamps[row_index])
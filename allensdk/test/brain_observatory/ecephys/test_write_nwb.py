@@ -946,6 +946,23 @@ def test_write_probe_lfp_file_roundtrip(
     xr.testing.assert_equal(obtained_lfp, expected_lfp)
     xr.testing.assert_equal(obtained_csd, expected_csd)
 
+    # windowed reads: overlapping, unsorted ranges and a channel subset
+    time_ranges = [(0.5, 0.8), (0.1, 0.3), (0.25, 0.4)]
+    obtained_lfp = obt.get_lfp(12345, time_ranges=time_ranges,
+                               channel_ids=[1, 2])
+    times = expected_lfp.time.values
+    in_window = ((times >= 0.1) & (times < 0.4)) | \
+        ((times >= 0.5) & (times < 0.8))
+    xr.testing.assert_equal(
+        obtained_lfp,
+        expected_lfp.isel(time=in_window).sel(channel=[1, 2]))
+
+    obtained_lfp = obt.get_lfp(12345, time_ranges=(2.0, 3.0))
+    assert obtained_lfp.shape == (0, 2)
+
+    with pytest.raises(KeyError):
+        obt.get_lfp(12345, channel_ids=[7])
+
 
 @pytest.fixture
 def invalid_epochs():
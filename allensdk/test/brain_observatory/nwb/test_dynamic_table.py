@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pynwb.epoch import TimeIntervals
+
+from allensdk.brain_observatory.nwb.dynamic_table import \
+    dataframe_to_dynamic_table
+
+
+@pytest.fixture
+def trials():
+    return pd.DataFrame({
+        'start_time': [0.0, 1.0, 2.0],
+        'stop_time': [0.5, 1.5, 2.5],
+        'image_name': ['im065', 'im077', None],
+        'go': [True, False, True],
+        'lick_times': [[0.1, 0.2], [], [2.2]],
+        'reward_time': [np.nan, 1.2, np.nan]
+    })
+
+
+def test_dataframe_to_dynamic_table(trials):
+    table = dataframe_to_dynamic_table(
+        df=trials,
+        table_type=TimeIntervals,
+        column_descriptions={'go': 'go trials'},
+        default_description='unknown',
+        name='trials',
+        description='experimental trials')
+
+    assert table.colnames == tuple(trials.columns)
+    assert list(table.id.data) == [0, 1, 2]
+    assert table['start_time'].description == \
+        'Start time of epoch, in seconds'
+    assert table['go'].description == 'go trials'
+    assert table['image_name'].description == 'unknown'
+
+    # lick_times is ragged
+    assert list(table['lick_times_index'].data) == [2, 2, 3]
+
+    obtained = table.to_dataframe()
+    for column in trials.columns:
+        for expected, value in zip(trials[column], obtained[column]):
+            if column == 'lick_times':
+                np.testing.assert_array_equal(value, expected)
+            elif pd.isna(expected):
+                assert pd.isna(value)
+            else:
+                assert value == expected
+
+
+def test_empty_ragged_column():
+    df = pd.DataFrame({'lick_times': [[], []]})
+    table = dataframe_to_dynamic_table(df=df, id=[4, 7], name='table',
+                                       description='table')
+    assert list(table.id.data) == [4, 7]
+    assert list(table['lick_times_index'].data) == [0, 0]
+    assert [len(x) for x in table.to_dataframe()['lick_times']] == [0, 0]
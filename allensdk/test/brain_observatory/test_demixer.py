@@ -1,3 +1,4 @@
+import h5py
 import numpy as np
 import pytest
 import scipy.sparse as sparse
@@ -123,3 +124,55 @@ def test_demix_invalid_max_block_size(raw_traces, stack, masks, max_block_size):
     with pytest.raises(ValueError, match="Invalid maximum block size*"):
         dmx.demix_time_dep_masks(raw_traces, stack, masks, max_block_size)
 
+
+@pytest.mark.parametrize("max_block_size", [7, -1])
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_demix_time_dep_masks_matches_demix_point(max_block_size, n_workers):
+    _check_demix_matches_demix_point(max_block_size, n_workers)
+
+
+def test_demix_time_dep_masks_spawned_workers(tmpdir,
+                                              spawn_worker_processes):
+    """An h5py stack is shared with spawned workers (which receive pickled
+    arguments) without pickling any h5py objects"""
+    _check_demix_matches_demix_point(7, 2, h5_path=str(tmpdir.join('s.h5')))
+
+
+def _check_demix_matches_demix_point(max_block_size, n_workers,
+                                     h5_path=None):
+    rng = np.random.RandomState(3)
+    N, T, H, W = 12, 20, 24, 24
+    masks = np.zeros((N, H, W), dtype=int)
+    for ii in range(N):
+        y, x = rng.randint(0, H - 6, 2)
+        masks[ii, y:y + rng.randint(2, 6), x:x + rng.randint(2, 6)] = 1
+    stack = rng.rand(T, H, W)
+    stack[4] = 0    # singular systems
+    raw_traces = rng.rand(N, T)
+    raw_traces[5, 9] = 0    # dropped frame
+
+    flat_masks = sparse.csr_matrix(masks.reshape(N, -1))
+    pixels_per_mask = masks.sum(axis=(1, 2))
+    expected_traces = np.zeros((N, T))
+    expected_drop_frames = []
+    for t in range(T):
+        demixed = dmx._demix_point(stack[t].ravel(), raw_traces[:, t],
+                                   flat_masks, pixels_per_mask)
+        expected_drop_frames.append(demixed is None)
+        if demixed is not None:
+            expected_traces[:, t] = demixed
+
+    if h5_path is None:
+        traces, drop_frames = dmx.demix_time_dep_masks(
+            raw_traces, stack, masks, max_block_size, n_workers=n_workers)
+    else:
+        with h5py.File(h5_path, 'w') as stack_file:
+            stack_file.create_dataset('data', data=stack)
+        with h5py.File(h5_path, 'r') as stack_file:
+            traces, drop_frames = dmx.demix_time_dep_masks(
+                raw_traces, stack_file['data'], masks, max_block_size,
+                n_workers=n_workers)
+
+    assert drop_frames == expected_drop_frames
+    np.testing.assert_allclose(traces, expected_traces, rtol=1e-10,
+                               atol=1e-12)
@@ -79,6 +79,78 @@ def test_movingmode_fast():
     assert np.all(x == y)
 
 
+@pytest.mark.parametrize("dtype", [np.float64, np.float32, np.int64])
+@pytest.mark.parametrize("kernelsize", [2, 7, 40])
+def test_movingmode_traces(dtype, kernelsize):
+    rng = np.random.RandomState(5)
+    traces = rng.normal(20, 4, (6, 100)) + np.sin(np.arange(100) / 10.) * 5
+    traces = traces.astype(dtype)
+    traces[2] -= 40     # negative trace
+
+    expected = np.zeros(traces.shape)
+    for trace, y in zip(traces, expected):
+        dff.movingmode_fast(trace, kernelsize, y)
+    obtained = np.zeros(traces.shape)
+    dff.movingmode_traces(traces, kernelsize, obtained)
+
+    assert np.array_equal(expected, obtained)
+
+    expected_average = np.zeros(traces.shape)
+    for trace, y in zip(expected, expected_average):
+        dff.movingaverage(trace, kernelsize, y)
+    obtained_average = np.zeros(traces.shape)
+    dff.movingaverage_traces(obtained, kernelsize, obtained_average)
+
+    assert np.array_equal(expected_average, obtained_average)
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_compute_dff_windowed_mode_traces(n_workers):
+    rng = np.random.RandomState(7)
+    traces = rng.normal(100, 10, (5, 300))
+    traces[3, 20] = np.nan
+
+    expected = np.zeros(traces.shape)
+    for trace, y in zip(traces, expected):
+        if np.any(np.isnan(trace)):
+            y[:] = np.nan
+            continue
+        modeline = np.zeros(trace.shape)
+        modeline_lp = np.zeros(trace.shape)
+        dff.movingmode_fast(trace, 50, modeline)
+        dff.movingaverage(modeline, 30, modeline_lp)
+        y[:] = (trace - modeline_lp) / modeline_lp
+
+    obtained = dff.compute_dff_windowed_mode(traces, mode_kernelsize=50,
+                                             mean_kernelsize=30,
+                                             n_workers=n_workers)
+
+    assert np.array_equal(expected, obtained, equal_nan=True)
+
+
+def test_compute_dff_windowed_median_workers():
+    rng = np.random.RandomState(9)
+    x = np.sin(np.arange(0, 200)) + rng.normal(0, 0.1, (5, 200))
+
+    results = []
+    for n_workers in [1, 3]:
+        noise_stds = []
+        small_frames = []
+        y = dff.compute_dff_windowed_median(
+            x, median_kernel_long=101,
+            median_kernel_short=11,
+            noise_stds=noise_stds,
+            n_small_baseline_frames=small_frames,
+            noise_kernel_length=5,
+            n_workers=n_workers)
+        results.append((y, noise_stds, small_frames))
+
+    assert np.array_equal(results[0][0], results[1][0])
+    assert results[0][1] == results[1][1]
+    assert results[0][2] == results[1][2]
+    assert len(results[0][1]) == 5
+
+
 def test_compute_dff_windowed_mode():
     x = np.array([[1, 5, -2, 3, 1, 10, 1, -2, 30, 5]])
 
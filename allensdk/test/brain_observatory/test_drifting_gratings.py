@@ -87,12 +87,26 @@ def mock_sweep_response():
                                    mean_sweep_response,
                                    pval))
 
+
+def mock_sweep_response_tensor():
+    sweep_response_tensor = MagicMock(name='sweep_response_tensor')
+    mean_sweep_response = MagicMock(name='mean_sweep_response')
+    pval = MagicMock(name='pval')
+
+    return MagicMock(name='get_sweep_response_tensor',
+                     return_value=(sweep_response_tensor,
+                                   mean_sweep_response,
+                                   pval))
+
 @patch.object(StimulusAnalysis,
               'get_speed_tuning',
               mock_speed_tuning())
 @patch.object(StimulusAnalysis,
               'get_sweep_response',
               mock_sweep_response())
+@patch.object(StimulusAnalysis,
+              'get_sweep_response_tensor',
+              mock_sweep_response_tensor())
 @pytest.mark.parametrize('trigger', (1, 2, 3, 4, 5))
 def test_harness(dataset, trigger):
     dg = DriftingGratings(dataset)
@@ -139,7 +153,6 @@ def test_harness(dataset, trigger):
     assert dg._tfvals is not StimulusAnalysis._PRELOAD
     assert dg._number_ori is not StimulusAnalysis._PRELOAD
     assert dg._number_tf is not StimulusAnalysis._PRELOAD
-    assert dg._sweep_response is not StimulusAnalysis._PRELOAD
     assert dg._mean_sweep_response is not StimulusAnalysis._PRELOAD
     assert dg._pval is not StimulusAnalysis._PRELOAD
     assert dg._response is not StimulusAnalysis._PRELOAD
@@ -91,9 +91,23 @@ def mock_sweep_response():
                                    mean_sweep_response,
                                    pval))
 
+
+def mock_sweep_response_tensor():
+    sweep_response_tensor = MagicMock(name='sweep_response_tensor')
+    mean_sweep_response = MagicMock(name='mean_sweep_response')
+    pval = MagicMock(name='pval')
+
+    return MagicMock(name='get_sweep_response_tensor',
+                     return_value=(sweep_response_tensor,
+                                   mean_sweep_response,
+                                   pval))
+
 @patch.object(StimulusAnalysis,
               'get_sweep_response',
               mock_sweep_response())
+@patch.object(StimulusAnalysis,
+              'get_sweep_response_tensor',
+              mock_sweep_response_tensor())
 @patch.object(LocallySparseNoise,
               'get_receptive_field',
               MagicMock(name='get_receptive_field'))
@@ -151,7 +165,6 @@ def test_harness(dataset,
         assert lsn._sweeplength is not StimulusAnalysis._PRELOAD
         assert lsn._interlength is not StimulusAnalysis._PRELOAD
         assert lsn._extralength is not StimulusAnalysis._PRELOAD
-        assert lsn._sweep_response is not StimulusAnalysis._PRELOAD
         assert lsn._mean_sweep_response is not StimulusAnalysis._PRELOAD
         assert lsn._pval is not StimulusAnalysis._PRELOAD
         assert lsn._receptive_field is not StimulusAnalysis._PRELOAD
@@ -86,12 +86,26 @@ def mock_sweep_response():
                                    mean_sweep_response,
                                    pval))
 
+
+def mock_sweep_response_tensor():
+    sweep_response_tensor = MagicMock(name='sweep_response_tensor')
+    mean_sweep_response = MagicMock(name='mean_sweep_response')
+    pval = MagicMock(name='pval')
+
+    return MagicMock(name='get_sweep_response_tensor',
+                     return_value=(sweep_response_tensor,
+                                   mean_sweep_response,
+                                   pval))
+
 @patch.object(StimulusAnalysis,
               'get_speed_tuning',
               mock_speed_tuning())
 @patch.object(StimulusAnalysis,
               'get_sweep_response',
               mock_sweep_response())
+@patch.object(StimulusAnalysis,
+              'get_sweep_response_tensor',
+              mock_sweep_response_tensor())
 @pytest.mark.parametrize('trigger', (1, 2, 3, 4, 5))
 def test_harness(dataset, trigger):
     ns = NaturalScenes(dataset)
@@ -138,7 +152,6 @@ def test_harness(dataset, trigger):
     assert ns._sweeplength is not StimulusAnalysis._PRELOAD
     assert ns._interlength is not StimulusAnalysis._PRELOAD
     assert ns._extralength is not StimulusAnalysis._PRELOAD
-    assert ns._sweep_response is not StimulusAnalysis._PRELOAD
     assert ns._mean_sweep_response is not StimulusAnalysis._PRELOAD
     assert ns._pval is not StimulusAnalysis._PRELOAD
     assert ns._response is not StimulusAnalysis._PRELOAD
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import allensdk.brain_observatory.r_neuropil as r_neuropil
+
+
+@pytest.fixture
+def traces():
+    np.random.seed(4)
+    af1 = r_neuropil.alpha_filter()
+    af2 = r_neuropil.alpha_filter(alpha=0.1, beta=0.5)
+
+    F_M, F_N = [], []
+    for _ in range(6):
+        F_M_i, F_N_i, _, _ = r_neuropil.synthesize_F(2000, af1, af2)
+        F_M.append(F_M_i + 1.0)
+        F_N.append(F_N_i)
+
+    return np.array(F_M), np.array(F_N)
+
+
+def test_error_from_moments(traces):
+    F_M, F_N = traces
+    moments = r_neuropil.fold_residual_moments(F_M, F_N)
+    rs = np.array([0.0, 0.5, 1.3])
+
+    obtained = r_neuropil.error_from_moments(moments, rs)
+
+    assert obtained.shape == (len(F_M), len(rs))
+    for i in range(len(F_M)):
+        ns = r_neuropil.NeuropilSubtract()
+        ns.set_F(F_M[i], F_N[i])
+        expected = [ns.estimate_error(r) for r in rs]
+        assert np.allclose(obtained[i], expected, rtol=1e-10)
+        assert np.allclose(r_neuropil.error_from_moments(moments, rs, i),
+                           expected, rtol=1e-10)
+
+
+def test_estimate_contamination_ratios_batch(traces):
+    F_M, F_N = traces
+
+    obtained = r_neuropil.estimate_contamination_ratios_batch(F_M, F_N)
+
+    assert len(obtained) == len(F_M)
+    for i, result in enumerate(obtained):
+        expected = r_neuropil.estimate_contamination_ratios(F_M[i], F_N[i])
+        # errors differ from the per-ROI fit by rounding only, which can
+        # move the searched ranges by a rounding error
+        assert np.isclose(result['r'], expected['r'], rtol=0, atol=1e-9)
+        assert np.isclose(result['err'], expected['err'], rtol=1e-10)
+        assert result['it'] == expected['it']
@@ -33,6 +33,7 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 #
+import h5py
 import numpy as np
 import pandas as pd
 import pytest
@@ -198,6 +199,61 @@ def test_calculate_traces(video, roi_mask_list):
     pd.testing.assert_frame_equal(expected_exclusions, pd.DataFrame(exclusions), check_like=True)
 
 
+@pytest.mark.parametrize('dtype', [np.uint16, np.float32])
+@pytest.mark.parametrize('n_workers', [1, 2])
+@pytest.mark.parametrize('block_size', [7, 1000])
+def test_calculate_traces_random(tmpdir, roi_mask_list, neuropil_masks,
+                                 dtype, n_workers, block_size):
+    _check_calculate_traces_random(tmpdir, roi_mask_list, neuropil_masks,
+                                   dtype, n_workers, block_size)
+
+
+def test_calculate_traces_spawned_workers(tmpdir, roi_mask_list,
+                                          neuropil_masks,
+                                          spawn_worker_processes):
+    """The h5py dataset is shared with spawned workers (which receive
+    pickled arguments) without pickling any h5py objects"""
+    _check_calculate_traces_random(tmpdir, roi_mask_list, neuropil_masks,
+                                   np.uint16, n_workers=2, block_size=7)
+
+
+def _check_calculate_traces_random(tmpdir, roi_mask_list, neuropil_masks,
+                                   dtype, n_workers, block_size):
+    rng = np.random.RandomState(11)
+    video = (rng.rand(30, 100, 100) * 4000).astype(dtype)
+    mask_list = roi_mask_list + neuropil_masks
+
+    # the per-mask reduction that calculate_traces must reproduce exactly
+    expected = np.full((len(mask_list), len(video)), np.nan)
+    for ii, mask in enumerate(mask_list):
+        if len(roi_masks.validate_mask(mask)) == 0:
+            subframe = video[:, mask.y:mask.y + mask.height,
+                             mask.x:mask.x + mask.width]
+            expected[ii] = subframe[:, mask.mask].sum(axis=1) / \
+                float(mask.mask.sum())
+
+    movie_path = str(tmpdir.join('movie.h5'))
+    with h5py.File(movie_path, 'w') as movie_file:
+        movie_file.create_dataset('data', data=video)
+
+    with h5py.File(movie_path, 'r') as movie_file:
+        obtained, _ = roi_masks.calculate_traces(
+            movie_file['data'], mask_list, block_size=block_size,
+            n_workers=n_workers)
+
+    assert np.array_equal(expected, obtained, equal_nan=True)
+
+
+def test_mask_weight_matrix(roi_mask_list, image_dims):
+    weights = roi_masks.mask_weight_matrix(
+        roi_mask_list, (image_dims['height'], image_dims['width']))
+    planes = np.array([mask.get_mask_plane() for mask in roi_mask_list])
+
+    assert weights.shape == (len(roi_mask_list), planes[0].size)
+    assert np.array_equal(weights.toarray(),
+                          planes.reshape(len(roi_mask_list), -1))
+
+
 def test_validate_masks(roi_mask_list, neuropil_masks):
     roi_mask_list.extend(neuropil_masks)
     roi_mask_list[3].mask = np.zeros_like(roi_mask_list[3].mask)
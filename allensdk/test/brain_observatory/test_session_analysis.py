@@ -35,9 +35,16 @@
 #
 import pytest
 from mock import patch
+import h5py
+import numpy as np
+import pandas as pd
 from allensdk.core.brain_observatory_nwb_data_set import \
     BrainObservatoryNwbDataSet
-from allensdk.brain_observatory.session_analysis import SessionAnalysis
+from allensdk.brain_observatory.session_analysis import \
+    SessionAnalysis, SESSION_ANALYSES, run_session_analysis
+from allensdk.brain_observatory.locally_sparse_noise import \
+    LocallySparseNoise
+import allensdk.brain_observatory.stimulus_info as stimulus_info
 import os
 
 
@@ -142,3 +149,290 @@ def test_session_get_session_type_c(session_c):
     session_type = session_c.nwb.get_session_type()
 
     assert session_type == 'three_session_C'
+
+
+def fake_analyze_stimulus(self, name):
+    """ Stand-in for SessionAnalysis.analyze_stimulus that returns small,
+    deterministic results for each stimulus """
+    n_cells = 3
+    seed = sum(ord(c) for c in name)
+    values = np.arange(n_cells, dtype=float) + seed
+
+    peak = pd.DataFrame({'peak_%s' % name: values,
+                         'cell_specimen_id': np.arange(n_cells)})
+    peak_run = None
+    if name == stimulus_info.NATURAL_MOVIE_ONE_SHORT:
+        peak_run = pd.DataFrame({'run_mod': -values,
+                                 'cell_specimen_id': np.arange(n_cells)})
+
+    receptive_field = None
+    if name.startswith('lsn'):
+        receptive_field = (name, {'0': {'chi_squared_analysis': {
+            'attrs': {'significant': True},
+            'pvalues': {'data': values}}}})
+
+    return dict(
+        dataframes=[('stim_table_%s' % name,
+                     pd.DataFrame({'start': [0, 10], 'end': [5, 15]}))],
+        arrays=[('response_%s' % name, np.outer(values, values)),
+                ('mean_response_%s' % name, np.ones((2, 2)) * seed)],
+        receptive_field=receptive_field,
+        peak=peak,
+        peak_run=peak_run,
+        metrics=pd.DataFrame({'metric_%s' % name: values}))
+
+
+@pytest.fixture
+def mock_data_set():
+    metadata = {'targeted_structure': 'VISp', 'experiment_container_id': 7}
+    with patch.object(BrainObservatoryNwbDataSet, 'get_metadata',
+                      return_value=metadata), \
+            patch.object(BrainObservatoryNwbDataSet, 'get_roi_ids',
+                         return_value=np.array(['a', 'b', 'c'])), \
+            patch.object(BrainObservatoryNwbDataSet, 'get_running_speed',
+                         return_value=(np.array([1.0, 3.0, np.nan]),
+                                       np.arange(3))):
+        yield
+
+
+@pytest.mark.parametrize('session', [stimulus_info.THREE_SESSION_A,
+                                     stimulus_info.THREE_SESSION_B,
+                                     stimulus_info.THREE_SESSION_C,
+                                     stimulus_info.THREE_SESSION_C2])
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_run_session(tmpdir_factory, mock_data_set, session, n_workers):
+    save_path = str(tmpdir_factory.mktemp('session') / 'analysis.h5')
+
+    with patch.object(BrainObservatoryNwbDataSet, 'get_session_type',
+                      return_value=session), \
+            patch.object(SessionAnalysis, 'analyze_stimulus',
+                         fake_analyze_stimulus):
+        sa = SessionAnalysis('nwb.nwb', save_path)
+        metrics = sa.run_session(n_workers=n_workers)
+
+    names = list(SESSION_ANALYSES[session])
+    assert sa.completed_analyses() == set(names)
+    if session == stimulus_info.THREE_SESSION_C2:
+        names.remove(stimulus_info.LOCALLY_SPARSE_NOISE_8DEG_SHORT)
+
+    peak = pd.read_hdf(save_path, 'analysis/peak')
+    expected_columns = ['run_mod', 'cell_specimen_id'] + \
+        ['peak_%s' % name for name in names] + \
+        ['targeted_structure', 'experiment_container_id']
+    assert list(peak.columns) == expected_columns
+    nm1 = fake_analyze_stimulus(None, stimulus_info.NATURAL_MOVIE_ONE_SHORT)
+    assert np.array_equal(peak['run_mod'], nm1['peak_run']['run_mod'])
+
+    assert set(metrics['cell'].keys()) == \
+        set(['metric_%s' % name for name in names] + ['roi_id'])
+    assert metrics['experiment']['mean_running_speed'] == 2.0
+
+    with h5py.File(save_path, 'r') as f:
+        for name in SESSION_ANALYSES[session]:
+            assert 'analysis/response_%s' % name in f
+        assert ('analysis/merge_mean_response' in f) == \
+            (session == stimulus_info.THREE_SESSION_C2)
+
+
+def test_run_session_resume(tmpdir_factory, mock_data_set):
+    save_path = str(tmpdir_factory.mktemp('session') / 'analysis.h5')
+    session = stimulus_info.THREE_SESSION_B
+    failing = stimulus_info.NATURAL_MOVIE_ONE_SHORT
+    calls = []
+
+    def crashing_analyze_stimulus(self, name):
+        calls.append(name)
+        if name == failing:
+            raise RuntimeError('crash')
+        return fake_analyze_stimulus(self, name)
+
+    with patch.object(BrainObservatoryNwbDataSet, 'get_session_type',
+                      return_value=session), \
+            patch.object(SessionAnalysis, 'analyze_stimulus',
+                         crashing_analyze_stimulus):
+        sa = SessionAnalysis('nwb.nwb', save_path)
+        with pytest.raises(RuntimeError):
+            sa.run_session(n_workers=1)
+
+        assert sa.completed_analyses() == set(SESSION_ANALYSES[session]) - \
+            {failing}
+
+        failing = None
+        calls.clear()
+        sa = SessionAnalysis('nwb.nwb', save_path)
+        sa.run_session(n_workers=1)
+
+        assert calls == [stimulus_info.NATURAL_MOVIE_ONE_SHORT]
+        assert sa.completed_analyses() == set(SESSION_ANALYSES[session])
+
+        # a complete session is not analyzed again
+        calls.clear()
+        sa.run_session(n_workers=1)
+        assert calls == []
+
+
+#: the peak response columns read by the SessionAnalysis.append_metrics_*
+#: methods, without their stimulus suffix
+_PEAK_COLUMNS = {
+    'dg': ['osi', 'dsi', 'ori', 'tf', 'ptest', 'cv_os', 'cv_ds',
+           'reliability', 'tf_index', 'run_modulation', 'p_run', 'peak_dff'],
+    'sg': ['osi', 'ori', 'sf', 'phase', 'ptest', 'time_to_peak',
+           'run_modulation', 'p_run', 'cv_os', 'sf_index', 'peak_dff',
+           'reliability'],
+    'ns': ['scene', 'ptest', 'time_to_peak', 'image_selectivity',
+           'reliability', 'run_modulation', 'p_run', 'peak_dff'],
+    'nm': ['response_reliability'],
+    'lsn': ['rf_chi2', 'rf_area_on', 'rf_center_on_x', 'rf_center_on_y',
+            'rf_area_off', 'rf_center_off_x', 'rf_center_off_y',
+            'rf_distance', 'rf_overlap_index']
+}
+
+
+def fake_stimulus_analysis_class(short_names):
+    """ Create a stand-in for a stimulus analysis class with small,
+    deterministic outputs.  short_names maps the stimulus argument of the
+    constructor to the short name of the stimulus. """
+
+    class FakeStimulusAnalysis(object):
+        save_cell_index_receptive_field_analysis = staticmethod(
+            LocallySparseNoise.save_cell_index_receptive_field_analysis)
+        merge_mean_response = staticmethod(
+            LocallySparseNoise.merge_mean_response)
+
+        orivals = tfvals = sfvals = phasevals = np.array([0.0, 45.0])
+
+        def __init__(self, data_set, stimulus=None):
+            self.name = short_names[stimulus]
+            self.roi_id = data_set.get_roi_ids()
+
+            n_cells = len(self.roi_id)
+            seed = sum(ord(c) for c in self.name)
+            values = np.arange(n_cells, dtype=float) + seed
+
+            # like the real peak tables, the columns have the object dtype
+            kind = self.name.rstrip('0123456789')
+            suffix = 'lsn' if kind == 'lsn' else self.name
+            peak = dict(('%s_%s' % (c, suffix), values)
+                        for c in _PEAK_COLUMNS[kind])
+            for c in ('ori', 'tf', 'sf', 'phase'):
+                if '%s_%s' % (c, suffix) in peak:
+                    peak['%s_%s' % (c, suffix)] = np.arange(n_cells) % 2
+            peak['cell_specimen_id'] = np.arange(n_cells)
+            self.peak = pd.DataFrame(peak, dtype=object)
+            self.peak_run = pd.DataFrame({'run_mod': -values,
+                                          'cell_specimen_id': peak[
+                                              'cell_specimen_id']})
+
+            self.stim_table = pd.DataFrame({'start': [0, 10],
+                                            'end': [5, 15]})
+            self.sweep_response = pd.DataFrame({'0': values})
+            self.mean_sweep_response = pd.DataFrame({'0': -values})
+            self.response = np.outer(values, values)
+            self.mean_response = self.receptive_field = np.ones((2, 2)) * seed
+            self.binned_cells_sp = self.binned_cells_vis = values
+            self.binned_dx_sp = self.binned_dx_vis = -values
+            self.cell_index_receptive_field_analysis_data = {
+                '0': {'chi_squared_analysis': {
+                    'attrs': {'significant': True},
+                    'pvalues': {'data': values}}}}
+
+        def get_noise_correlation(self):
+            n_outputs = 2 if self.name == 'ns' else 4
+            return (np.eye(3), ) + (None, ) * (n_outputs - 1)
+
+        def get_signal_correlation(self):
+            return np.eye(3) * 2, None
+
+        def get_representational_similarity(self):
+            return np.eye(3) * 3, None
+
+    return FakeStimulusAnalysis
+
+
+@pytest.fixture
+def fake_stimulus_analyses():
+    with patch.multiple(
+            'allensdk.brain_observatory.session_analysis',
+            DriftingGratings=fake_stimulus_analysis_class({None: 'dg'}),
+            StaticGratings=fake_stimulus_analysis_class({None: 'sg'}),
+            NaturalScenes=fake_stimulus_analysis_class({None: 'ns'}),
+            NaturalMovie=fake_stimulus_analysis_class({
+                stimulus_info.NATURAL_MOVIE_ONE: 'nm1',
+                stimulus_info.NATURAL_MOVIE_TWO: 'nm2',
+                stimulus_info.NATURAL_MOVIE_THREE: 'nm3'}),
+            LocallySparseNoise=fake_stimulus_analysis_class({
+                stimulus_info.LOCALLY_SPARSE_NOISE: 'lsn',
+                stimulus_info.LOCALLY_SPARSE_NOISE_4DEG: 'lsn4',
+                stimulus_info.LOCALLY_SPARSE_NOISE_8DEG: 'lsn8'})):
+        yield
+
+
+def assert_metrics_equal(metrics, expected):
+    assert metrics['experiment'] == expected['experiment']
+    assert set(metrics['cell'].keys()) == set(expected['cell'].keys())
+
+    for k, v in expected['cell'].items():
+        assert type(metrics['cell'][k]) is type(v), k
+        if isinstance(v, pd.Series):
+            pd.testing.assert_series_equal(metrics['cell'][k], v)
+        else:
+            np.testing.assert_array_equal(metrics['cell'][k], v)
+
+
+def read_analysis_file(path):
+    """ Read every dataset under analysis/, apart from the checkpoints """
+    datasets = {}
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset) and \
+                not name.startswith('checkpoints'):
+            datasets[name] = obj[()]
+
+    with h5py.File(path, 'r') as f:
+        f['analysis'].visititems(visit)
+
+    return datasets
+
+
+@pytest.mark.parametrize('session', [stimulus_info.THREE_SESSION_A,
+                                     stimulus_info.THREE_SESSION_B,
+                                     stimulus_info.THREE_SESSION_C,
+                                     stimulus_info.THREE_SESSION_C2])
+def test_run_session_matches_session_analysis(tmpdir_factory, mock_data_set,
+                                              fake_stimulus_analyses,
+                                              session):
+    tmpdir = tmpdir_factory.mktemp('session')
+    expected_path = str(tmpdir / 'expected.h5')
+    save_path = str(tmpdir / 'analysis.h5')
+
+    with patch.object(BrainObservatoryNwbDataSet, 'get_session_type',
+                      return_value=session):
+        expected = run_session_analysis('nwb.nwb', expected_path)
+
+        metrics = SessionAnalysis('nwb.nwb', save_path).run_session(
+            n_workers=1)
+        assert_metrics_equal(metrics, expected)
+
+        # resumed from the checkpoints of the first run
+        sa = SessionAnalysis('nwb.nwb', save_path)
+        with patch.object(SessionAnalysis, 'analyze_stimulus') as analyze:
+            metrics = sa.run_session(n_workers=1)
+        analyze.assert_not_called()
+        assert_metrics_equal(metrics, expected)
+
+    pd.testing.assert_frame_equal(
+        pd.read_hdf(save_path, 'analysis/peak'),
+        pd.read_hdf(expected_path, 'analysis/peak'))
+
+    datasets = read_analysis_file(save_path)
+    expected_datasets = read_analysis_file(expected_path)
+    assert set(datasets) == set(expected_datasets)
+
+    # only sessions A and B save the natural movie one stimulus table
+    saves_nm1_table = any(name.startswith('stim_table_nm1/')
+                          for name in datasets)
+    assert saves_nm1_table == (session in (stimulus_info.THREE_SESSION_A,
+                                           stimulus_info.THREE_SESSION_B))
+    for name, data in expected_datasets.items():
+        if not name.startswith('peak'):
+            np.testing.assert_array_equal(datasets[name], data)
@@ -86,12 +86,26 @@ def mock_sweep_response():
                                    mean_sweep_response,
                                    pval))
 
+
+def mock_sweep_response_tensor():
+    sweep_response_tensor = MagicMock(name='sweep_response_tensor')
+    mean_sweep_response = MagicMock(name='mean_sweep_response')
+    pval = MagicMock(name='pval')
+
+    return MagicMock(name='get_sweep_response_tensor',
+                     return_value=(sweep_response_tensor,
+                                   mean_sweep_response,
+                                   pval))
+
 @patch.object(StimulusAnalysis,
               'get_speed_tuning',
               mock_speed_tuning())
 @patch.object(StimulusAnalysis,
               'get_sweep_response',
               mock_sweep_response())
+@patch.object(StimulusAnalysis,
+              'get_sweep_response_tensor',
+              mock_sweep_response_tensor())
 @pytest.mark.parametrize('trigger', (1, 2, 3, 4, 5, 6, 7, 8, 9, 10))
 def test_harness(dataset, trigger):
     sg = StaticGratings(dataset)
@@ -173,7 +187,6 @@ def test_harness(dataset, trigger):
     assert sg._number_ori is not StimulusAnalysis._PRELOAD
     assert sg._number_sf is not StimulusAnalysis._PRELOAD
     assert sg._number_phase is not StimulusAnalysis._PRELOAD
-    assert sg._sweep_response is not StimulusAnalysis._PRELOAD
     assert sg._mean_sweep_response is not StimulusAnalysis._PRELOAD
     assert sg._pval is not StimulusAnalysis._PRELOAD
     assert sg._response is not StimulusAnalysis._PRELOAD
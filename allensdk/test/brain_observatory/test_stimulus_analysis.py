@@ -33,7 +33,11 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 #
-from allensdk.brain_observatory.stimulus_analysis import StimulusAnalysis
+from allensdk.brain_observatory.stimulus_analysis import (
+    StimulusAnalysis, speed_bin_edges, shuffled_bin_means)
+import numpy as np
+import pandas as pd
+import scipy.stats as st
 import pytest
 from mock import patch, MagicMock
 
@@ -138,3 +142,89 @@ def test_harness(dataset,
         assert sa._binned_dx_vis is not StimulusAnalysis._PRELOAD
         assert sa._binned_cells_vis is not StimulusAnalysis._PRELOAD
         assert sa._peak_run is not StimulusAnalysis._PRELOAD
+
+
+@pytest.mark.parametrize('interlength,sweeplength,extralength',
+                         [(30, 60, 0), (3, 7, 5)])
+def test_get_sweep_response(interlength, sweeplength, extralength):
+    rng = np.random.default_rng(7)
+    n_cells, n_timestamps = 5, 500
+    celltraces = rng.normal(100, 10, (n_cells, n_timestamps))
+    celltraces[1, :] = 4.0
+    dxcm = rng.normal(10, 3, n_timestamps - 5)
+    starts = np.sort(rng.integers(interlength, n_timestamps - 100, 20))
+    starts[-1] = n_timestamps - 4
+
+    sa = StimulusAnalysis(MagicMock(name='dataset'))
+    sa._celltraces = celltraces
+    sa._numbercells = n_cells
+    sa._dxcm = dxcm
+    sa._stim_table = pd.DataFrame({'start': starts},
+                                  index=np.arange(len(starts)) * 3)
+    sa.interlength = interlength
+    sa.sweeplength = sweeplength
+    sa.extralength = extralength
+
+    sweep_response, mean_sweep_response, pval = sa.get_sweep_response()
+    assert sa.sweep_response_tensor.shape == \
+        (len(starts), n_cells + 1, sweeplength + 2 * interlength)
+    assert sa.sweep_response_tensor.dtype == np.float32
+    assert list(sweep_response.columns) == \
+        ['0', '1', '2', '3', '4', 'dx']
+    assert (sweep_response.index == sa.stim_table.index).all()
+
+    response = slice(interlength, interlength + sweeplength + extralength)
+    for ii, (index, row) in enumerate(sa.stim_table.iterrows()):
+        start = int(row['start'] - interlength)
+        end = int(row['start'] + sweeplength + interlength)
+        for nc in range(n_cells):
+            temp = celltraces[nc, start:end]
+            expected = 100 * ((temp / np.mean(temp[:interlength])) - 1)
+            obtained = sweep_response[str(nc)][index]
+            assert obtained.dtype == np.float32
+            assert np.shares_memory(obtained, sa.sweep_response_tensor)
+            assert np.allclose(obtained, expected, rtol=1e-5)
+            assert np.isclose(mean_sweep_response[str(nc)][index],
+                              np.mean(expected[response]))
+            p_value = st.f_oneway(expected[:interlength],
+                                  expected[response]).pvalue
+            assert np.isclose(pval[str(nc)][index], p_value,
+                              equal_nan=True)
+        assert sweep_response['dx'][index].dtype == np.float32
+        assert np.allclose(sweep_response['dx'][index], dxcm[start:end],
+                           rtol=1e-5)
+
+
+def test_speed_bin_edges():
+    starts, ends = speed_bin_edges(5, 4, 3, 12)
+    assert np.array_equal(starts, [0, 5, 8, 11])
+    assert np.array_equal(ends, [5, 8, 11, 12])
+
+    starts, ends = speed_bin_edges(0, 2, 3, 2)
+    assert np.array_equal(starts, [0, 0])
+    assert np.array_equal(ends, [0, 2])
+
+
+@pytest.mark.parametrize('n_workers,max_batch_elements',
+                         [(1, 2 ** 24), (1, 500), (2, 500)])
+def test_shuffled_bin_means(n_workers, max_batch_elements):
+    rng = np.random.default_rng(11)
+    traces = rng.normal(0, 1, (4, 50))
+    order = np.argsort(rng.normal(0, 1, 50))
+    bin_starts, bin_ends = speed_bin_edges(0, 6, 10, 50)
+
+    obtained = shuffled_bin_means(traces, order, bin_starts, bin_ends,
+                                  n_shuffles=20, random_state=3,
+                                  n_workers=n_workers,
+                                  max_batch_elements=max_batch_elements)
+    assert obtained.shape == (4, 6, 20)
+
+    random_state = np.random.RandomState(3)
+    for shuffle in range(20):
+        shuffled = traces[:, random_state.permutation(50)][:, order]
+        for i, (start, end) in enumerate(zip(bin_starts, bin_ends)):
+            if start == end:
+                assert np.all(np.isnan(obtained[:, i, shuffle]))
+            else:
+                assert np.allclose(obtained[:, i, shuffle],
+                                   shuffled[:, start:end].mean(axis=1))
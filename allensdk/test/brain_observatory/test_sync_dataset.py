@@ -0,0 +1,62 @@
+import json
+
+import h5py
+import numpy as np
+import pytest
+
+from allensdk.brain_observatory.sync_dataset import Dataset
+
+
+def write_sync_file(path, data, counter_bits=32, compression=None):
+    meta = {'ni_daq': {'counter_output_freq': 100.0,
+                       'counter_bits': counter_bits},
+            'line_labels': ['a', 'b', 'c']}
+    with h5py.File(path, 'w') as f:
+        f.create_dataset('data', data=data, compression=compression)
+        f.create_dataset('meta', data=str(meta))
+    return path
+
+
+@pytest.fixture
+def sync_data():
+    rng = np.random.default_rng(42)
+    n_samples = 1000
+    data = np.zeros((n_samples, 2), dtype=np.uint32)
+    data[:, 0] = np.cumsum(rng.integers(1, 10, n_samples))
+    data[:, 1] = rng.integers(0, 8, n_samples)
+    return data
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_edges(tmp_path, sync_data, compression):
+    path = write_sync_file(tmp_path / 'sync.h5', sync_data,
+                           compression=compression)
+
+    with Dataset(str(path)) as dset:
+        events = dset.get_all_events()
+        assert np.array_equal(events, sync_data)
+        assert not events.flags.writeable
+        assert dset.get_all_events() is events
+
+        for bit, line in enumerate(['a', 'b', 'c']):
+            line_data = ((sync_data[:, 1] >> bit) & 1).astype(np.int8)
+            changes = np.diff(line_data, prepend=line_data[0])
+
+            rising = dset.get_rising_edges(line)
+            falling = dset.get_falling_edges(line, units='seconds')
+            assert np.array_equal(rising, sync_data[changes == 1, 0])
+            assert np.allclose(falling, sync_data[changes == -1, 0] / 100.0)
+            assert np.array_equal(dset.get_edges('all', line, 'samples'),
+                                  np.sort(sync_data[changes != 0, 0]))
+
+
+def test_process_times_rollover(tmp_path, sync_data):
+    counter = sync_data[:, 0].astype(np.int64) * 10000
+    expected = counter.copy()
+    sync_data[:, 0] = counter % 2 ** 32
+    path = write_sync_file(tmp_path / 'sync.h5', sync_data, counter_bits=16)
+
+    with Dataset(str(path)) as dset:
+        times = dset.get_all_times()
+        assert times.shape == (len(expected), 1)
+        assert np.array_equal(times[:, 0], expected)
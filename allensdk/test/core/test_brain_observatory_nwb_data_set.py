@@ -358,3 +358,100 @@ def test_find_stimulus_presentation_group_duplicate(stim_pres_h5):
 
     with pytest.raises(MissingStimulusException):
         obt = bonds._find_stimulus_presentation_group(stim_pres_h5, stimulus_name)
+
+
+@pytest.fixture
+def trace_nwb(tmpdir):
+    rng = np.random.RandomState(7)
+    n_cells, n_frames = 12, 300
+    path = str(tmpdir.join('traces.nwb'))
+    base = 'processing/brain_observatory_pipeline/'
+
+    with h5py.File(path, 'w') as f:
+        f['general/generated_by'] = np.array([b'pipeline', b'2.0'])
+        f[base + 'ImageSegmentation/cell_specimen_ids'] = \
+            rng.permutation(1000 + np.arange(n_cells))
+        fl = base + 'Fluorescence/'
+        f[fl + 'imaging_plane_1/timestamps'] = np.arange(n_frames) * 0.033
+        f[fl + 'imaging_plane_1/data'] = rng.rand(n_cells, n_frames)
+        f[fl + 'imaging_plane_1_demixed_signal/data'] = \
+            rng.rand(n_cells, n_frames)
+        f[fl + 'imaging_plane_1_neuropil_response/data'] = \
+            rng.rand(n_cells, n_frames)
+        f[fl + 'imaging_plane_1_neuropil_response/r'] = rng.rand(n_cells)
+        f[base + 'DfOverF/imaging_plane_1/timestamps'] = \
+            np.arange(n_frames) * 0.033
+        f[base + 'DfOverF/imaging_plane_1/data'] = rng.rand(n_cells, n_frames)
+
+    return path
+
+
+@pytest.mark.parametrize('persistent', [False, True])
+def test_trace_subsets(trace_nwb, persistent):
+    data_set = BrainObservatoryNwbDataSet(trace_nwb)
+    if persistent:
+        data_set.open()
+
+    with h5py.File(trace_nwb, 'r') as f:
+        fl = f['processing/brain_observatory_pipeline/Fluorescence']
+        all_ids = list(data_set.get_cell_specimen_ids())
+        ts = fl['imaging_plane_1/timestamps'][()]
+        demixed = fl['imaging_plane_1_demixed_signal/data'][()]
+        neuropil = fl['imaging_plane_1_neuropil_response/data'][()]
+        r = fl['imaging_plane_1_neuropil_response/r'][()]
+        dff = f['processing/brain_observatory_pipeline/'
+                'DfOverF/imaging_plane_1/data'][()]
+    corrected = demixed - neuropil * r[:, np.newaxis]
+
+    # unsorted, with a duplicate and two contiguous runs
+    ids = [all_ids[i] for i in [7, 2, 3, 4, 9, 2]]
+    inds = [7, 2, 3, 4, 9, 2]
+    assert data_set.get_cell_specimen_indices(ids) == inds
+
+    t, traces = data_set.get_corrected_fluorescence_traces(ids)
+    assert np.array_equal(t, ts)
+    assert np.array_equal(traces, corrected[inds])
+
+    t, traces = data_set.get_dff_traces(ids, time_range=(1.0, 2.0))
+    frames = (ts >= 1.0) & (ts < 2.0)
+    assert np.array_equal(t, ts[frames])
+    assert np.array_equal(traces, dff[inds][:, frames])
+
+    t, traces = data_set.get_demixed_traces(time_range=(None, 0.5))
+    assert np.array_equal(traces, demixed[:, ts < 0.5])
+
+    t, traces = data_set.get_neuropil_traces([], time_range=(5.0, None))
+    assert traces.shape == (0, np.count_nonzero(ts >= 5.0))
+    assert np.array_equal(data_set.get_neuropil_r(ids), r[inds])
+
+    # the cached timestamps are not shared with callers
+    t[:] = -1
+    assert np.array_equal(data_set.get_fluorescence_timestamps(), ts)
+
+    with pytest.raises(ValueError):
+        data_set.get_fluorescence_traces([-1])
+
+    data_set.close()
+
+
+def test_get_cell_specimen_indices_errors(trace_nwb):
+    data_set = BrainObservatoryNwbDataSet(trace_nwb)
+
+    with pytest.raises(TypeError, match='must be a list'):
+        data_set.get_cell_specimen_indices(1000)
+
+    with pytest.raises(ValueError, match=r'not found \(-1 is not in list\)'):
+        data_set.get_cell_specimen_indices([1000, -1])
+
+    with pytest.raises(ValueError, match='not found'):
+        data_set.get_cell_specimen_indices([[1000]])
+
+
+def test_persistent_handle(trace_nwb):
+    with BrainObservatoryNwbDataSet(trace_nwb) as data_set:
+        handle = data_set._h5
+        assert handle is not None
+        data_set.get_fluorescence_traces([data_set.get_cell_specimen_ids()[0]])
+        assert data_set._h5 is handle
+    assert data_set._h5 is None
+    assert not handle
@@ -0,0 +1,63 @@
+import multiprocessing
+import pickle
+
+import h5py
+import numpy as np
+import pytest
+
+from allensdk.core.multiprocessing_utils import imap_with_shared, \
+    shareable_array, H5DatasetReference
+
+
+def _row_sum(shared, row):
+    return row, shared[row].sum()
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+@pytest.mark.parametrize('ordered', [True, False])
+@pytest.mark.parametrize('start_method', [None, 'spawn'])
+def test_imap_with_shared(n_workers, ordered, start_method):
+    shared = np.arange(20.).reshape(10, 2)
+    results = list(imap_with_shared(_row_sum, range(10), shared=shared,
+                                    n_workers=n_workers, ordered=ordered,
+                                    chunksize=3, start_method=start_method))
+    if ordered:
+        assert [row for row, _ in results] == list(range(10))
+    assert dict(results) == {row: 4. * row + 1 for row in range(10)}
+
+
+def test_imap_with_shared_unavailable_start_method(monkeypatch):
+    """Test that func is called in this process if the start method is
+    not available on this platform"""
+    monkeypatch.setattr(multiprocessing, 'get_all_start_methods',
+                        lambda: ['spawn'])
+
+    def unpicklable(shared, item):
+        return shared + item
+
+    results = imap_with_shared(unpicklable, [1, 2], shared=10,
+                               n_workers=2, start_method='fork')
+    assert list(results) == [11, 12]
+
+
+def test_shareable_array(tmpdir):
+    data = np.arange(12).reshape(4, 3)
+    assert shareable_array(data) is data
+
+    path = str(tmpdir.join('data.h5'))
+    with h5py.File(path, 'w') as h5_file:
+        h5_file.create_dataset('group/data', data=data)
+
+    with h5py.File(path, 'r') as h5_file:
+        reference = shareable_array(h5_file['group/data'])
+    assert isinstance(reference, H5DatasetReference)
+
+    reference = pickle.loads(pickle.dumps(reference))
+    assert reference.shape == (4, 3)
+    assert len(reference) == 4
+    np.testing.assert_array_equal(reference[1:3], data[1:3])
+
+    # the file is not held open between reads
+    with h5py.File(path, 'a') as h5_file:
+        h5_file['group/data'][0] = -1
+    assert reference[0, 0] == -1
@@ -0,0 +1,75 @@
+""" Compare the batched spike histogram engine used by
+EcephysSession.presentationwise_spike_counts against the per-unit loop it
+replaced.
+
+usage: python benchmark_spike_histogram.py [--num_units N] ...
+"""
+import argparse
+import time
+
+import numpy as np
+
+from allensdk.brain_observatory.ecephys.ecephys_session import (
+    build_spike_histogram,
+    build_time_window_domain
+)
+
+
+def loop_spike_histogram(time_domain, spike_times, unit_ids):
+    tiled_data = np.zeros(
+        (time_domain.shape[0], time_domain.shape[1] - 1, len(unit_ids)),
+        dtype=np.uint16
+    )
+    starts = time_domain[:, :-1]
+    ends = time_domain[:, 1:]
+
+    for ii, unit_id in enumerate(unit_ids):
+        data = np.array(spike_times[unit_id])
+        start_positions = np.searchsorted(data, starts.flat)
+        end_positions = np.searchsorted(data, ends.flat, side="right")
+        tiled_data[:, :, ii].flat = end_positions - start_positions
+
+    return tiled_data
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_units", type=int, default=500)
+    parser.add_argument("--num_presentations", type=int, default=20000)
+    parser.add_argument("--num_bins", type=int, default=50)
+    parser.add_argument("--session_duration", type=float, default=10000.0)
+    parser.add_argument("--firing_rate", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    spike_times = {
+        unit_id: np.sort(rng.uniform(
+            0, args.session_duration,
+            rng.poisson(args.firing_rate * args.session_duration)
+        ))
+        for unit_id in range(args.num_units)
+    }
+    unit_ids = np.arange(args.num_units)
+
+    onsets = np.sort(rng.uniform(
+        0, args.session_duration - 1, args.num_presentations))
+    bin_edges = np.linspace(-0.1, 0.4, args.num_bins + 1)
+    domain = build_time_window_domain(bin_edges, onsets)
+
+    start = time.perf_counter()
+    expected = loop_spike_histogram(domain, spike_times, unit_ids)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    obtained = build_spike_histogram(domain, spike_times, unit_ids)
+    batched_time = time.perf_counter() - start
+
+    assert np.array_equal(expected, obtained)
+    print(f"counts shape: {obtained.shape}")
+    print(f"per-unit loop: {loop_time:.3f} s")
+    print(f"batched:       {batched_time:.3f} s")
+
+
+if __name__ == "__main__":
+    main()